@@ -1765,6 +1765,27 @@ if VECTOR_DB == "pgvector" and not PGVECTOR_DB_URL.startswith("postgres"):
 PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH = int(
     os.environ.get("PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH", "1536")
 )
+# ANN index: "ivfflat" (default), "hnsw" or "none" (exact search only)
+PGVECTOR_INDEX_METHOD = os.environ.get("PGVECTOR_INDEX_METHOD", "ivfflat").lower()
+PGVECTOR_IVFFLAT_LISTS = int(os.environ.get("PGVECTOR_IVFFLAT_LISTS", "100"))
+PGVECTOR_IVFFLAT_PROBES = int(os.environ.get("PGVECTOR_IVFFLAT_PROBES", "1"))
+PGVECTOR_HNSW_M = int(os.environ.get("PGVECTOR_HNSW_M", "16"))
+PGVECTOR_HNSW_EF_CONSTRUCTION = int(
+    os.environ.get("PGVECTOR_HNSW_EF_CONSTRUCTION", "64")
+)
+PGVECTOR_HNSW_EF_SEARCH = int(os.environ.get("PGVECTOR_HNSW_EF_SEARCH", "40"))
+# "relaxed_order" or "strict_order" keeps scanning the index until enough rows
+# pass the filters (requires pgvector >= 0.8), empty disables it
+PGVECTOR_ITERATIVE_SCAN = os.environ.get("PGVECTOR_ITERATIVE_SCAN", "").lower()
+# Collections up to this size are searched exactly through the collection_name
+# index instead of the shared ANN index
+PGVECTOR_EXACT_SEARCH_MAX_ROWS = int(
+    os.environ.get("PGVECTOR_EXACT_SEARCH_MAX_ROWS", "10000")
+)
+# Collections that grow past this size get their own partial ANN index (0 disables)
+PGVECTOR_PARTIAL_INDEX_MIN_ROWS = int(
+    os.environ.get("PGVECTOR_PARTIAL_INDEX_MIN_ROWS", "0")
+)
 
 # Pinecone
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY", None)
@@ -1968,6 +1989,43 @@ RAG_EMBEDDING_PREFIX_FIELD_NAME = os.environ.get(
     "RAG_EMBEDDING_PREFIX_FIELD_NAME", None
 )
 
+# Collection queries running at once in the process, on a shared thread pool
+try:
+    RAG_RETRIEVAL_MAX_WORKERS = int(os.environ.get("RAG_RETRIEVAL_MAX_WORKERS", "16"))
+except ValueError:
+    RAG_RETRIEVAL_MAX_WORKERS = 16
+
+# Seconds a single collection query may take before it is dropped from the
+# results (0 disables the deadline)
+try:
+    RAG_RETRIEVAL_TIMEOUT = float(os.environ.get("RAG_RETRIEVAL_TIMEOUT", "20"))
+except ValueError:
+    RAG_RETRIEVAL_TIMEOUT = 20.0
+
+# Reranking micro-batcher: (query, passage) pairs from concurrent requests that
+# arrive within the window are scored in one model call. For ONNX or quantized
+# CPU inference set SENTENCE_TRANSFORMERS_CROSS_ENCODER_BACKEND=onnx and e.g.
+# SENTENCE_TRANSFORMERS_CROSS_ENCODER_MODEL_KWARGS='{"file_name": "onnx/model_qint8_avx512.onnx"}'
+try:
+    RAG_RERANKING_BATCH_WINDOW_MS = float(
+        os.environ.get("RAG_RERANKING_BATCH_WINDOW_MS", "10")
+    )
+except ValueError:
+    RAG_RERANKING_BATCH_WINDOW_MS = 10.0
+
+try:
+    RAG_RERANKING_MAX_BATCH_SIZE = int(
+        os.environ.get("RAG_RERANKING_MAX_BATCH_SIZE", "128")
+    )
+except ValueError:
+    RAG_RERANKING_MAX_BATCH_SIZE = 128
+
+# Number of (query, passage) scores kept in memory (0 disables the cache)
+try:
+    RAG_RERANKING_CACHE_SIZE = int(os.environ.get("RAG_RERANKING_CACHE_SIZE", "20000"))
+except ValueError:
+    RAG_RERANKING_CACHE_SIZE = 20000
+
 RAG_RERANKING_ENGINE = PersistentConfig(
     "RAG_RERANKING_ENGINE",
     "rag.reranking_engine",
@@ -53,13 +53,15 @@ if USE_CUDA.lower() == "true":
 else:
     DEVICE_TYPE = "cpu"
 
-try:
-    import torch
+# Only probe for MPS on macOS, importing torch takes seconds
+if sys.platform == "darwin":
+    try:
+        import torch
 
-    if torch.backends.mps.is_available() and torch.backends.mps.is_built():
-        DEVICE_TYPE = "mps"
-except Exception:
-    pass
+        if torch.backends.mps.is_available() and torch.backends.mps.is_built():
+            DEVICE_TYPE = "mps"
+    except Exception:
+        pass
 
 ####################################
 # LOGGING
@@ -351,6 +353,230 @@ except ValueError:
     UVICORN_WORKERS = 1
     log.info(f"Invalid UVICORN_WORKERS value, defaulting to {UVICORN_WORKERS}")
 
+####################################
+# INGESTION JOB QUEUE
+####################################
+
+# When enabled, file uploads and knowledge batch adds are queued and processed
+# by the background ingestion workers instead of inside the request.
+ENABLE_BACKGROUND_INGESTION = (
+    os.environ.get("ENABLE_BACKGROUND_INGESTION", "False").lower() == "true"
+)
+
+try:
+    INGESTION_WORKER_CONCURRENCY = int(
+        os.environ.get("INGESTION_WORKER_CONCURRENCY", "2")
+    )
+except ValueError:
+    INGESTION_WORKER_CONCURRENCY = 2
+
+# Maximum number of jobs running at the same time for a single user
+try:
+    INGESTION_USER_CONCURRENCY = int(os.environ.get("INGESTION_USER_CONCURRENCY", "1"))
+except ValueError:
+    INGESTION_USER_CONCURRENCY = 1
+
+try:
+    INGESTION_JOB_LEASE_SECONDS = int(
+        os.environ.get("INGESTION_JOB_LEASE_SECONDS", "300")
+    )
+except ValueError:
+    INGESTION_JOB_LEASE_SECONDS = 300
+
+try:
+    INGESTION_JOB_MAX_ATTEMPTS = int(os.environ.get("INGESTION_JOB_MAX_ATTEMPTS", "3"))
+except ValueError:
+    INGESTION_JOB_MAX_ATTEMPTS = 3
+
+####################################
+# GENERATION JOB QUEUE
+####################################
+
+# Workers submitting and polling MidJourney / Kling / Jimeng / Seedream tasks.
+# Each step is a single upstream call, so workers are cheap coroutines.
+try:
+    GENERATION_WORKER_CONCURRENCY = int(
+        os.environ.get("GENERATION_WORKER_CONCURRENCY", "16")
+    )
+except ValueError:
+    GENERATION_WORKER_CONCURRENCY = 16
+
+try:
+    GENERATION_JOB_LEASE_SECONDS = int(
+        os.environ.get("GENERATION_JOB_LEASE_SECONDS", "120")
+    )
+except ValueError:
+    GENERATION_JOB_LEASE_SECONDS = 120
+
+# Retries of a submit/poll step failing with a transient (network, 5xx) error
+try:
+    GENERATION_JOB_MAX_ATTEMPTS = int(
+        os.environ.get("GENERATION_JOB_MAX_ATTEMPTS", "3")
+    )
+except ValueError:
+    GENERATION_JOB_MAX_ATTEMPTS = 3
+
+# Per provider cap of tasks in flight upstream, e.g. '{"midjourney": 5}'.
+# Providers not listed use their own default.
+try:
+    GENERATION_PROVIDER_CONCURRENCY = json.loads(
+        os.environ.get("GENERATION_PROVIDER_CONCURRENCY", "{}")
+    )
+except Exception:
+    GENERATION_PROVIDER_CONCURRENCY = {}
+
+# Upper bound of in-flight tasks fetched by one status poll, for providers
+# with a batch query endpoint
+try:
+    GENERATION_POLL_BATCH_SIZE = int(os.environ.get("GENERATION_POLL_BATCH_SIZE", "50"))
+except ValueError:
+    GENERATION_POLL_BATCH_SIZE = 50
+
+# Credit reserved for a paid generation task is checked again after this
+# long: released if its job is gone or failed, kept while it still runs
+try:
+    CREDIT_RESERVATION_TTL = int(os.environ.get("CREDIT_RESERVATION_TTL", "3600"))
+except ValueError:
+    CREDIT_RESERVATION_TTL = 3600
+
+####################################
+# UPSTREAM HTTP CLIENTS
+####################################
+
+# Every third-party upstream (LLM APIs, MidJourney, Kling, PPT, ...) gets its
+# own long-lived connection pool of this size
+try:
+    HTTP_CLIENT_MAX_CONNECTIONS = int(
+        os.environ.get("HTTP_CLIENT_MAX_CONNECTIONS", "100")
+    )
+except ValueError:
+    HTTP_CLIENT_MAX_CONNECTIONS = 100
+
+try:
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS = int(
+        os.environ.get("HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS", "20")
+    )
+except ValueError:
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# Seconds an idle keep-alive connection is kept open
+try:
+    HTTP_CLIENT_KEEPALIVE_EXPIRY = int(
+        os.environ.get("HTTP_CLIENT_KEEPALIVE_EXPIRY", "30")
+    )
+except ValueError:
+    HTTP_CLIENT_KEEPALIVE_EXPIRY = 30
+
+# Only used when the optional `h2` package is installed
+HTTP_CLIENT_HTTP2 = os.environ.get("HTTP_CLIENT_HTTP2", "True").lower() == "true"
+
+# Consecutive connection errors / 5xx responses after which an upstream host
+# is short-circuited, and seconds until a trial request is let through again
+try:
+    HTTP_CLIENT_BREAKER_THRESHOLD = int(
+        os.environ.get("HTTP_CLIENT_BREAKER_THRESHOLD", "5")
+    )
+except ValueError:
+    HTTP_CLIENT_BREAKER_THRESHOLD = 5
+
+try:
+    HTTP_CLIENT_BREAKER_RESET_SECONDS = int(
+        os.environ.get("HTTP_CLIENT_BREAKER_RESET_SECONDS", "30")
+    )
+except ValueError:
+    HTTP_CLIENT_BREAKER_RESET_SECONDS = 30
+
+# Connections tried per LLM request when a model is served by several of them,
+# retrying on another replica if one fails before anything reached the client
+try:
+    UPSTREAM_MAX_ATTEMPTS = int(os.environ.get("UPSTREAM_MAX_ATTEMPTS", "3"))
+except ValueError:
+    UPSTREAM_MAX_ATTEMPTS = 3
+
+# Ask OpenAI-compatible upstreams for a final usage chunk on streamed chat
+# completions (`stream_options.include_usage`), so credit is billed from it
+# instead of by counting tokens. Disable for upstreams rejecting the option.
+OPENAI_STREAM_INCLUDE_USAGE = (
+    os.environ.get("OPENAI_STREAM_INCLUDE_USAGE", "True").lower() == "true"
+)
+
+# Keep the start of chat payloads identical across turns (system prompt, tool
+# specs, full documents) and add per-turn context such as retrieved chunks to
+# the last user message, so upstream prompt caching can reuse the prefix.
+ENABLE_PROMPT_CACHE_SHAPING = (
+    os.environ.get("ENABLE_PROMPT_CACHE_SHAPING", "False").lower() == "true"
+)
+
+# Admission limits of outbound chat completions, per model, e.g.
+# '{"*": {"concurrency": 32}, "gpt-4o": {"concurrency": 8, "rate": 2, "burst": 4}}'.
+# A model uses its own entry, else the one of its connection type ("openai",
+# "ollama", ...), else "*". "rate" is requests per second. Unlimited if unset.
+try:
+    LLM_SCHEDULER_LIMITS = json.loads(os.environ.get("LLM_SCHEDULER_LIMITS", "{}"))
+except Exception:
+    LLM_SCHEDULER_LIMITS = {}
+
+# Seconds a request may wait for admission before it is rejected with a 429
+try:
+    LLM_SCHEDULER_QUEUE_TIMEOUT = int(
+        os.environ.get("LLM_SCHEDULER_QUEUE_TIMEOUT", "120")
+    )
+except ValueError:
+    LLM_SCHEDULER_QUEUE_TIMEOUT = 120
+
+####################################
+# PPT
+####################################
+
+# Seconds the PPT config is memoized per process. Updates through the API
+# apply at once on the handling process, other processes catch up after this.
+try:
+    PPT_CONFIG_CACHE_TTL = int(os.environ.get("PPT_CONFIG_CACHE_TTL", "30"))
+except ValueError:
+    PPT_CONFIG_CACHE_TTL = 30
+
+# Template and option lists proxied from the PPT API are served from cache for
+# PPT_CACHE_TTL seconds, then served stale while refreshed in the background
+# for up to PPT_CACHE_STALE_TTL more seconds
+try:
+    PPT_CACHE_TTL = int(os.environ.get("PPT_CACHE_TTL", "600"))
+except ValueError:
+    PPT_CACHE_TTL = 600
+
+try:
+    PPT_CACHE_STALE_TTL = int(os.environ.get("PPT_CACHE_STALE_TTL", "86400"))
+except ValueError:
+    PPT_CACHE_STALE_TTL = 86400
+
+# Generated decks streamed to users are also kept under CACHE_DIR/ppt, so
+# repeat downloads are served locally, for up to PPT_FILE_CACHE_TTL seconds
+PPT_FILE_CACHE_ENABLED = (
+    os.environ.get("PPT_FILE_CACHE_ENABLED", "True").lower() == "true"
+)
+
+try:
+    PPT_FILE_CACHE_TTL = int(os.environ.get("PPT_FILE_CACHE_TTL", "604800"))
+except ValueError:
+    PPT_FILE_CACHE_TTL = 604800
+
+####################################
+# TASKS
+####################################
+
+# Seconds a title / tags / query / autocomplete ... generation is reused for an
+# identical request to the same task model. 0 only shares in-flight calls.
+try:
+    TASK_COMPLETION_CACHE_TTL = int(os.environ.get("TASK_COMPLETION_CACHE_TTL", "60"))
+except ValueError:
+    TASK_COMPLETION_CACHE_TTL = 60
+
+# Seconds between the Redis heartbeats of the chat tasks a worker runs. A task
+# missing three heartbeats in a row is considered gone with its worker.
+try:
+    TASK_HEARTBEAT_INTERVAL = int(os.environ.get("TASK_HEARTBEAT_INTERVAL", "10"))
+except ValueError:
+    TASK_HEARTBEAT_INTERVAL = 10
+
 ####################################
 # WEBUI_AUTH (Required for security)
 ####################################
@@ -424,6 +650,19 @@ WEBSOCKET_SENTINEL_HOSTS = os.environ.get("WEBSOCKET_SENTINEL_HOSTS", "")
 
 WEBSOCKET_SENTINEL_PORT = os.environ.get("WEBSOCKET_SENTINEL_PORT", "26379")
 
+# Chat events of a message being generated are kept for clients resuming after
+# a reload: the last CHAT_STREAM_BUFFER_SIZE events of each message, until
+# CHAT_STREAM_BUFFER_TTL seconds after its last event
+try:
+    CHAT_STREAM_BUFFER_SIZE = int(os.environ.get("CHAT_STREAM_BUFFER_SIZE", "1000"))
+except ValueError:
+    CHAT_STREAM_BUFFER_SIZE = 1000
+
+try:
+    CHAT_STREAM_BUFFER_TTL = int(os.environ.get("CHAT_STREAM_BUFFER_TTL", "300"))
+except ValueError:
+    CHAT_STREAM_BUFFER_TTL = 300
+
 AIOHTTP_CLIENT_TIMEOUT = os.environ.get("AIOHTTP_CLIENT_TIMEOUT", "")
 
 if AIOHTTP_CLIENT_TIMEOUT == "":
@@ -453,6 +692,24 @@ else:
         AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST = 10
 
 
+# OpenAI / Ollama model lists are fetched in the background this often and
+# served from memory in between
+try:
+    MODEL_REGISTRY_REFRESH_INTERVAL = int(
+        os.environ.get("MODEL_REGISTRY_REFRESH_INTERVAL", "300")
+    )
+except ValueError:
+    MODEL_REGISTRY_REFRESH_INTERVAL = 300
+
+# How often workers look for a model list refreshed by another worker
+try:
+    MODEL_REGISTRY_SYNC_INTERVAL = int(
+        os.environ.get("MODEL_REGISTRY_SYNC_INTERVAL", "10")
+    )
+except ValueError:
+    MODEL_REGISTRY_SYNC_INTERVAL = 10
+
+
 AIOHTTP_CLIENT_TIMEOUT_TOOL_SERVER_DATA = os.environ.get(
     "AIOHTTP_CLIENT_TIMEOUT_TOOL_SERVER_DATA", "10"
 )
@@ -1,3 +1,5 @@
+from open_webui.utils import startup
+
 import asyncio
 import json
 import logging
@@ -55,6 +57,10 @@ from open_webui.utils.audit import AuditLevel, AuditLoggingMiddleware
 from open_webui.utils.credit.utils import is_free_request, check_credit_by_user_id
 from open_webui.utils.logger import start_logger
 from open_webui.utils.task_scheduler import start_task_scheduler, stop_task_scheduler
+from open_webui.utils.ingestion import ingestion_worker_pool
+from open_webui.utils.generation import generation_engine
+from open_webui.utils.http_client import http_clients
+from open_webui.utils.model_registry import model_registry
 from open_webui.socket.main import (
     app as socket_app,
     periodic_usage_pool_cleanup,
@@ -75,6 +81,8 @@ from open_webui.routers import (
     configs,
     groups,
     files,
+    ingestion,
+    generation,
     functions,
     memories,
     models,
@@ -98,6 +106,7 @@ from open_webui.routers.retrieval import (
     get_ef,
     get_rf,
 )
+from open_webui.retrieval.models.lazy import LazyModel
 
 from open_webui.internal.db import Session, engine
 
@@ -473,8 +482,11 @@ from open_webui.utils.oauth import OAuthManager
 from open_webui.utils.security_headers import SecurityHeadersMiddleware
 
 from open_webui.tasks import (
+    get_task_user_id,
     list_task_ids_by_chat_id,
+    start_task_registry,
     stop_task,
+    stop_task_registry,
     list_tasks,
 )  # Import from tasks.py
 
@@ -539,6 +551,8 @@ async def lifespan(app: FastAPI):
     )
     from open_webui.models.seedream_tasks import SeedreamTask
     from open_webui.models.ppt_config import PptConfigTable
+    from open_webui.models.ingestion_jobs import IngestionJob
+    from open_webui.models.generation_jobs import GenerationJob
     from open_webui.internal.db import Base, engine
 
     # 创建所有表
@@ -559,13 +573,37 @@ async def lifespan(app: FastAPI):
     log.info("启动任务调度器...")
     start_task_scheduler()
 
+    app.state.http_clients = http_clients
+    ingestion_worker_pool.start(app)
+    generation_engine.start(app)
+    model_registry.start(app)
+    start_task_registry()
+
+    # Load the local embedding model now that the worker is up, instead of
+    # making the first upload or search wait for it
+    if isinstance(app.state.ef, LazyModel):
+        app.state.ef.warm_up()
+
+    # 将旧的即梦3.0 Base64图像迁移到存储
+    asyncio.create_task(asyncio.to_thread(seedream.migrate_seedream_images))
+
+    startup.mark("lifespan")
+
     yield
 
+    await stop_task_registry()
+    await model_registry.stop()
+    await generation_engine.stop()
+    await ingestion_worker_pool.stop()
+    await http_clients.close()
+
     # 关闭任务调度器
     log.info("停止任务调度器...")
     stop_task_scheduler()
 
 
+startup.mark("imports")
+
 app = FastAPI(
     title="Open WebUI",
     docs_url="/docs" if ENV == "dev" else None,
@@ -1220,6 +1258,8 @@ app.include_router(memories.router, prefix="/api/v1/memories", tags=["memories"]
 app.include_router(folders.router, prefix="/api/v1/folders", tags=["folders"])
 app.include_router(groups.router, prefix="/api/v1/groups", tags=["groups"])
 app.include_router(files.router, prefix="/api/v1/files", tags=["files"])
+app.include_router(ingestion.router, prefix="/api/v1/ingestion", tags=["ingestion"])
+app.include_router(generation.router, prefix="/api/v1/generation", tags=["generation"])
 app.include_router(functions.router, prefix="/api/v1/functions", tags=["functions"])
 app.include_router(
     evaluations.router, prefix="/api/v1/evaluations", tags=["evaluations"]
@@ -1534,6 +1574,13 @@ async def chat_action(
 
 @app.post("/api/tasks/stop/{task_id}")
 async def stop_task_endpoint(task_id: str, user=Depends(get_verified_user)):
+    task_user_id = await get_task_user_id(task_id)
+    if task_user_id and task_user_id != user.id and user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with ID {task_id} not found.",
+        )
+
     try:
         result = await stop_task(task_id)
         return result
@@ -1543,7 +1590,7 @@ async def stop_task_endpoint(task_id: str, user=Depends(get_verified_user)):
 
 @app.get("/api/tasks")
 async def list_tasks_endpoint(user=Depends(get_verified_user)):
-    return {"tasks": list_tasks()}
+    return {"tasks": await list_tasks(None if user.role == "admin" else user.id)}
 
 
 @app.get("/api/tasks/chat/{chat_id}")
@@ -1552,7 +1599,7 @@ async def list_tasks_by_chat_id_endpoint(chat_id: str, user=Depends(get_verified
     if chat is None or chat.user_id != user.id:
         return {"task_ids": []}
 
-    task_ids = list_task_ids_by_chat_id(chat_id)
+    task_ids = await list_task_ids_by_chat_id(chat_id)
 
     print(f"Task IDs for chat {chat_id}: {task_ids}")
     return {"task_ids": task_ids}
@@ -1847,3 +1894,5 @@ else:
     log.warning(
         f"Frontend build directory not found at '{FRONTEND_BUILD_DIR}'. Serving API only."
     )
+
+startup.mark("app")
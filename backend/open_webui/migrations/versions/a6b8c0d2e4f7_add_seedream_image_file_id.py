@@ -0,0 +1,44 @@
+"""add seedream image file id
+
+Revision ID: a6b8c0d2e4f7
+Revises: f4c2a7b8d9e1
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a6b8c0d2e4f7"
+down_revision: Union[str, None] = "f4c2a7b8d9e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # seedream_tasks is created by create_all on startup, so on fresh installs
+    # it does not exist yet and gets the column from the model instead.
+    # Images still stored inline are moved to storage by the application on
+    # startup, since the storage provider is not available to migrations.
+    inspector = sa.inspect(op.get_bind())
+    if "seedream_tasks" not in inspector.get_table_names():
+        return
+
+    columns = [c["name"] for c in inspector.get_columns("seedream_tasks")]
+    if "image_file_id" not in columns:
+        op.add_column(
+            "seedream_tasks", sa.Column("image_file_id", sa.String(), nullable=True)
+        )
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "seedream_tasks" not in inspector.get_table_names():
+        return
+
+    columns = [c["name"] for c in inspector.get_columns("seedream_tasks")]
+    if "image_file_id" in columns:
+        op.drop_column("seedream_tasks", "image_file_id")
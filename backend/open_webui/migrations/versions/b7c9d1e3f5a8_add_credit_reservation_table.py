@@ -0,0 +1,64 @@
+"""add credit reservation table
+
+Revision ID: b7c9d1e3f5a8
+Revises: a6b8c0d2e4f7
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7c9d1e3f5a8"
+down_revision: Union[str, None] = "a6b8c0d2e4f7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "credit_reservation",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=24, scale=12), nullable=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("detail", sa.JSON(), nullable=True),
+        sa.Column("expires_at", sa.BigInteger(), nullable=False),
+        sa.Column("created_at", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_credit_reservation_user_id"),
+        "credit_reservation",
+        ["user_id"],
+        unique=False,
+    )
+    op.create_index(
+        "credit_reservation_status_expires_idx",
+        "credit_reservation",
+        ["status", "expires_at"],
+    )
+
+    op.add_column(
+        "generation_job", sa.Column("reservation_id", sa.String(), nullable=True)
+    )
+    op.create_index(
+        "generation_job_reservation_idx", "generation_job", ["reservation_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("generation_job_reservation_idx", table_name="generation_job")
+    op.drop_column("generation_job", "reservation_id")
+
+    op.drop_index(
+        "credit_reservation_status_expires_idx", table_name="credit_reservation"
+    )
+    op.drop_index(
+        op.f("ix_credit_reservation_user_id"), table_name="credit_reservation"
+    )
+    op.drop_table("credit_reservation")
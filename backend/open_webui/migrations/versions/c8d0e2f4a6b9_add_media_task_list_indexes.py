@@ -0,0 +1,55 @@
+"""add media task list indexes
+
+Revision ID: c8d0e2f4a6b9
+Revises: b7c9d1e3f5a8
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c8d0e2f4a6b9"
+down_revision: Union[str, None] = "b7c9d1e3f5a8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MEDIA_TASK_TABLES = ("midjourney_task", "kling_tasks", "jimeng_tasks", "seedream_tasks")
+
+
+def get_indexes(table: str) -> dict[str, list[str]]:
+    return {
+        f"{table}_user_created_idx": ["user_id", "created_at"],
+        f"{table}_status_updated_idx": ["status", "updated_at"],
+    }
+
+
+def upgrade() -> None:
+    # The media task tables are created by create_all on startup, so on fresh
+    # installs they do not exist yet and get the indexes from the models.
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    for table in MEDIA_TASK_TABLES:
+        if table not in tables:
+            continue
+
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        for name, columns in get_indexes(table).items():
+            if name not in existing:
+                op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    for table in MEDIA_TASK_TABLES:
+        if table not in tables:
+            continue
+
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        for name in get_indexes(table):
+            if name in existing:
+                op.drop_index(name, table_name=table)
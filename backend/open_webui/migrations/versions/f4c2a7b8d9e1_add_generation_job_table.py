@@ -0,0 +1,70 @@
+"""add generation job table
+
+Revision ID: f4c2a7b8d9e1
+Revises: e3b1f2a4c5d6
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f4c2a7b8d9e1"
+down_revision: Union[str, None] = "e3b1f2a4c5d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "generation_job",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("provider", sa.String(), nullable=False),
+        sa.Column("task_id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("external_id", sa.String(), nullable=True),
+        sa.Column("payload", sa.JSON(), nullable=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("stage", sa.String(), nullable=False),
+        sa.Column("progress", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("poll_count", sa.Integer(), nullable=False),
+        sa.Column("credits", sa.Integer(), nullable=False),
+        sa.Column("refunded", sa.Boolean(), nullable=False),
+        sa.Column("worker_id", sa.String(), nullable=True),
+        sa.Column("lease_expires_at", sa.BigInteger(), nullable=True),
+        sa.Column("available_at", sa.BigInteger(), nullable=False),
+        sa.Column("deadline_at", sa.BigInteger(), nullable=True),
+        sa.Column("created_at", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.BigInteger(), nullable=False),
+        sa.Column("completed_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "generation_job_status_available_idx",
+        "generation_job",
+        ["status", "available_at"],
+    )
+    op.create_index(
+        "generation_job_provider_task_idx",
+        "generation_job",
+        ["provider", "task_id"],
+        unique=True,
+    )
+    op.create_index(
+        "generation_job_provider_external_idx",
+        "generation_job",
+        ["provider", "external_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("generation_job_provider_external_idx", table_name="generation_job")
+    op.drop_index("generation_job_provider_task_idx", table_name="generation_job")
+    op.drop_index("generation_job_status_available_idx", table_name="generation_job")
+    op.drop_table("generation_job")
@@ -5,9 +5,10 @@ from typing import List, Optional
 
 from fastapi import HTTPException
 from pydantic import BaseModel, ConfigDict, Field
-from sqlalchemy import JSON, BigInteger, Column, Numeric, String
+from sqlalchemy import JSON, BigInteger, Column, Index, Numeric, String
 
 from open_webui.config import CREDIT_EXCHANGE_RATIO
+from open_webui.env import CREDIT_RESERVATION_TTL
 from open_webui.internal.db import Base, get_db
 
 ####################
@@ -48,6 +49,31 @@ class TradeTicket(Base):
     created_at = Column(BigInteger, index=True)
 
 
+class CreditReservation(Base):
+    """
+    Credit held for a paid generation task. The amount leaves the balance
+    when reserved, and either stays spent (committed) or is returned
+    (released) once the task settles.
+    """
+
+    __tablename__ = "credit_reservation"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(String, index=True, nullable=False)
+    amount = Column(Numeric(precision=24, scale=12))
+    # reserved, committed, released
+    status = Column(String, nullable=False)
+    detail = Column(JSON, nullable=True)
+
+    expires_at = Column(BigInteger, nullable=False)
+    created_at = Column(BigInteger, nullable=False)
+    updated_at = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("credit_reservation_status_expires_idx", "status", "expires_at"),
+    )
+
+
 ####################
 # Forms
 ####################
@@ -135,6 +161,18 @@ class TradeTicketModel(BaseModel):
     created_at: int = Field(default_factory=lambda: int(time.time()))
 
 
+class CreditReservationModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    user_id: str
+    amount: Decimal
+    status: str = "reserved"
+    detail: dict = Field(default_factory=lambda: {})
+    expires_at: int
+    created_at: int = Field(default_factory=lambda: int(time.time()))
+    updated_at: int = Field(default_factory=lambda: int(time.time()))
+
+
 ####################
 # Tables
 ####################
@@ -356,3 +394,157 @@ class CreditLogTable:
 
 
 CreditLogs = CreditLogTable()
+
+
+class CreditReservationTable:
+    def reserve_credit(
+        self,
+        user_id: str,
+        amount: Decimal,
+        detail: SetCreditFormDetail,
+        ttl: int = CREDIT_RESERVATION_TTL,
+    ) -> Optional[CreditReservationModel]:
+        """
+        Take `amount` off the balance with a single conditional UPDATE, so
+        concurrent requests can never overdraw it. Returns None when the
+        balance is insufficient.
+        """
+        now = int(time.time())
+        reservation = CreditReservationModel(
+            user_id=user_id,
+            amount=amount,
+            detail=detail.model_dump(),
+            expires_at=now + ttl,
+        )
+        with get_db() as db:
+            reserved = (
+                db.query(Credit)
+                .filter(Credit.user_id == user_id, Credit.credit >= amount)
+                .update(
+                    {"credit": Credit.credit - amount, "updated_at": now},
+                    synchronize_session=False,
+                )
+            )
+            if reserved:
+                balance = (
+                    db.query(Credit.credit).filter(Credit.user_id == user_id).scalar()
+                )
+                log = CreditLogModel(
+                    user_id=user_id, credit=balance, detail=reservation.detail
+                )
+                db.add(CreditLog(**log.model_dump()))
+                db.add(CreditReservation(**reservation.model_dump()))
+            db.commit()
+
+        if reserved:
+            return reservation
+
+        # Users without a credit row yet start with the default credit
+        if Credits.get_credit_by_user_id(user_id) is None:
+            Credits.init_credit_by_user_id(user_id)
+            return self.reserve_credit(user_id, amount, detail, ttl)
+        return None
+
+    def commit_reservation_by_id(self, id: str) -> bool:
+        """Keep the reserved credit spent. Returns False if already settled."""
+        with get_db() as db:
+            committed = (
+                db.query(CreditReservation)
+                .filter(
+                    CreditReservation.id == id, CreditReservation.status == "reserved"
+                )
+                .update(
+                    {"status": "committed", "updated_at": int(time.time())},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return committed > 0
+
+    def release_reservation_by_id(
+        self, id: str, detail: Optional[SetCreditFormDetail] = None
+    ) -> bool:
+        """
+        Return the reserved credit to the balance, in the same transaction
+        that settles the reservation. Returns False if already settled, so
+        credit is never returned twice.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            reservation = db.get(CreditReservation, id)
+            if reservation is None:
+                return False
+
+            released = (
+                db.query(CreditReservation)
+                .filter(
+                    CreditReservation.id == id, CreditReservation.status == "reserved"
+                )
+                .update(
+                    {"status": "released", "updated_at": now},
+                    synchronize_session=False,
+                )
+            )
+            if not released:
+                db.commit()
+                return False
+
+            if detail is None:
+                reserved_detail = reservation.detail or {}
+                detail = SetCreditFormDetail(
+                    desc=f"{reserved_detail.get('desc', '')}退款",
+                    api_path=reserved_detail.get("api_path", ""),
+                    api_params=reserved_detail.get("api_params", {}),
+                    usage={
+                        "credits_refunded": float(reservation.amount),
+                        "reason": "reservation_released",
+                    },
+                )
+
+            db.query(Credit).filter(Credit.user_id == reservation.user_id).update(
+                {"credit": Credit.credit + reservation.amount, "updated_at": now},
+                synchronize_session=False,
+            )
+            balance = (
+                db.query(Credit.credit)
+                .filter(Credit.user_id == reservation.user_id)
+                .scalar()
+            )
+            log = CreditLogModel(
+                user_id=reservation.user_id,
+                credit=balance,
+                detail=detail.model_dump(),
+            )
+            db.add(CreditLog(**log.model_dump()))
+            db.commit()
+            return True
+
+    def extend_reservation_by_id(self, id: str, ttl: int = CREDIT_RESERVATION_TTL):
+        now = int(time.time())
+        with get_db() as db:
+            db.query(CreditReservation).filter(
+                CreditReservation.id == id, CreditReservation.status == "reserved"
+            ).update(
+                {"expires_at": now + ttl, "updated_at": now},
+                synchronize_session=False,
+            )
+            db.commit()
+
+    def get_expired_reservations(
+        self, limit: int = 100
+    ) -> list[CreditReservationModel]:
+        with get_db() as db:
+            reservations = (
+                db.query(CreditReservation)
+                .filter(
+                    CreditReservation.status == "reserved",
+                    CreditReservation.expires_at < int(time.time()),
+                )
+                .order_by(CreditReservation.expires_at.asc())
+                .limit(limit)
+                .all()
+            )
+            return [CreditReservationModel.model_validate(r) for r in reservations]
+
+
+CreditReservations = CreditReservationTable()
@@ -0,0 +1,552 @@
+import logging
+import time
+import uuid
+from typing import Optional
+
+from open_webui.internal.db import Base, get_db
+from open_webui.env import SRC_LOG_LEVELS
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Index,
+    Integer,
+    String,
+    Text,
+    JSON,
+    and_,
+    func,
+    or_,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+####################
+# Generation Jobs DB Schema
+####################
+
+
+class GenerationJob(Base):
+    """
+    Queue entry driving one media generation task (midjourney_task,
+    kling_tasks, jimeng_tasks, seedream_tasks) through submit and polling.
+    """
+
+    __tablename__ = "generation_job"
+
+    id = Column(String, primary_key=True)
+    provider = Column(String, nullable=False)
+    # task_id of the provider's own task table
+    task_id = Column(String, nullable=False)
+    user_id = Column(String, nullable=False)
+    # Task id returned by the upstream API once submitted
+    external_id = Column(String, nullable=True)
+    payload = Column(JSON, nullable=True)
+
+    # queued, running, completed, failed, cancelled
+    status = Column(String, nullable=False, default="queued")
+    # submit, poll
+    stage = Column(String, nullable=False, default="submit")
+    progress = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=1)
+    poll_count = Column(Integer, nullable=False, default=0)
+
+    credits = Column(Integer, nullable=False, default=0)
+    refunded = Column(Boolean, nullable=False, default=False)
+    # Credit reservation settled when the job finishes
+    reservation_id = Column(String, nullable=True)
+
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(BigInteger, nullable=True)
+    available_at = Column(BigInteger, nullable=False)
+    deadline_at = Column(BigInteger, nullable=True)
+
+    created_at = Column(BigInteger, nullable=False)
+    updated_at = Column(BigInteger, nullable=False)
+    completed_at = Column(BigInteger, nullable=True)
+
+    __table_args__ = (
+        Index("generation_job_status_available_idx", "status", "available_at"),
+        Index("generation_job_provider_task_idx", "provider", "task_id", unique=True),
+        Index("generation_job_provider_external_idx", "provider", "external_id"),
+        Index("generation_job_reservation_idx", "reservation_id"),
+    )
+
+
+class GenerationJobModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    provider: str
+    task_id: str
+    user_id: str
+    external_id: Optional[str] = None
+    payload: Optional[dict] = None
+
+    status: str
+    stage: str = "submit"
+    progress: int = 0
+    error: Optional[str] = None
+
+    attempts: int = 0
+    max_attempts: int = 1
+    poll_count: int = 0
+
+    credits: int = 0
+    refunded: bool = False
+    reservation_id: Optional[str] = None
+
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[int] = None
+    available_at: int
+    deadline_at: Optional[int] = None
+
+    created_at: int  # timestamp in epoch
+    updated_at: int  # timestamp in epoch
+    completed_at: Optional[int] = None
+
+
+####################
+# Forms
+####################
+
+
+class GenerationJobForm(BaseModel):
+    provider: str
+    task_id: str
+    payload: Optional[dict] = None
+    credits: int = 0
+    reservation_id: Optional[str] = None
+    max_attempts: int = 1
+    deadline_at: Optional[int] = None
+
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class GenerationJobsTable:
+    def insert_new_job(
+        self, user_id: str, form_data: GenerationJobForm
+    ) -> Optional[GenerationJobModel]:
+        with get_db() as db:
+            now = int(time.time())
+            job = GenerationJobModel(
+                **{
+                    **form_data.model_dump(),
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "status": "queued",
+                    "stage": "submit",
+                    "available_at": now,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+
+            try:
+                result = GenerationJob(**job.model_dump())
+                db.add(result)
+                db.commit()
+                db.refresh(result)
+                return GenerationJobModel.model_validate(result)
+            except Exception as e:
+                log.exception(f"Error inserting a new generation job: {e}")
+                return None
+
+    def get_job_by_id(self, id: str) -> Optional[GenerationJobModel]:
+        with get_db() as db:
+            job = db.get(GenerationJob, id)
+            return GenerationJobModel.model_validate(job) if job else None
+
+    def get_job_by_task_id(
+        self, provider: str, task_id: str
+    ) -> Optional[GenerationJobModel]:
+        with get_db() as db:
+            job = (
+                db.query(GenerationJob)
+                .filter_by(provider=provider, task_id=task_id)
+                .first()
+            )
+            return GenerationJobModel.model_validate(job) if job else None
+
+    def get_job_by_external_id(
+        self, provider: str, external_id: str
+    ) -> Optional[GenerationJobModel]:
+        with get_db() as db:
+            job = (
+                db.query(GenerationJob)
+                .filter_by(provider=provider, external_id=external_id)
+                .first()
+            )
+            return GenerationJobModel.model_validate(job) if job else None
+
+    def get_job_by_reservation_id(
+        self, reservation_id: str
+    ) -> Optional[GenerationJobModel]:
+        with get_db() as db:
+            job = (
+                db.query(GenerationJob)
+                .filter(GenerationJob.reservation_id == reservation_id)
+                .first()
+            )
+            return GenerationJobModel.model_validate(job) if job else None
+
+    def get_provider_stats(self) -> dict:
+        with get_db() as db:
+            stats: dict[str, dict[str, int]] = {}
+            for provider, status, count in (
+                db.query(
+                    GenerationJob.provider,
+                    GenerationJob.status,
+                    func.count(GenerationJob.id),
+                )
+                .group_by(GenerationJob.provider, GenerationJob.status)
+                .all()
+            ):
+                stats.setdefault(provider, {})[status] = count
+            return stats
+
+    def claim_next_job(
+        self, worker_id: str, lease_seconds: int, provider_caps: dict[str, int]
+    ) -> Optional[GenerationJobModel]:
+        """
+        Atomically move the next job due for submission to "running".
+
+        Providers that already have `provider_caps[provider]` tasks in flight
+        upstream are skipped. The status guard in the UPDATE makes the claim
+        safe across workers and replicas.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            in_flight = dict(
+                db.query(GenerationJob.provider, func.count(GenerationJob.id))
+                .filter(
+                    or_(
+                        and_(
+                            GenerationJob.stage == "poll",
+                            GenerationJob.status.in_(ACTIVE_STATUSES),
+                        ),
+                        and_(
+                            GenerationJob.stage == "submit",
+                            GenerationJob.status == "running",
+                        ),
+                    )
+                )
+                .group_by(GenerationJob.provider)
+                .all()
+            )
+            busy_providers = [
+                provider
+                for provider, cap in provider_caps.items()
+                if in_flight.get(provider, 0) >= cap
+            ]
+
+            query = db.query(GenerationJob.id).filter(
+                GenerationJob.status == "queued",
+                GenerationJob.stage == "submit",
+                GenerationJob.available_at <= now,
+            )
+            if busy_providers:
+                query = query.filter(GenerationJob.provider.notin_(busy_providers))
+
+            candidates = (
+                query.order_by(GenerationJob.available_at.asc()).limit(10).all()
+            )
+
+            for (job_id,) in candidates:
+                claimed = (
+                    db.query(GenerationJob)
+                    .filter(
+                        GenerationJob.id == job_id,
+                        GenerationJob.status == "queued",
+                        GenerationJob.stage == "submit",
+                    )
+                    .update(
+                        {
+                            "status": "running",
+                            "worker_id": worker_id,
+                            "lease_expires_at": now + lease_seconds,
+                            "updated_at": now,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if claimed:
+                    return GenerationJobModel.model_validate(
+                        db.get(GenerationJob, job_id)
+                    )
+
+        return None
+
+    def claim_due_poll_jobs(
+        self, provider: str, worker_id: str, lease_seconds: int, limit: int
+    ) -> list[GenerationJobModel]:
+        """
+        Claim up to `limit` jobs of a provider that are due for a status poll,
+        so they can be fetched from the upstream API in one batch.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            job_ids = [
+                job_id
+                for (job_id,) in db.query(GenerationJob.id)
+                .filter(
+                    GenerationJob.provider == provider,
+                    GenerationJob.status == "queued",
+                    GenerationJob.stage == "poll",
+                    GenerationJob.available_at <= now,
+                )
+                .order_by(GenerationJob.available_at.asc())
+                .limit(limit)
+                .all()
+            ]
+            if not job_ids:
+                return []
+
+            db.query(GenerationJob).filter(
+                GenerationJob.id.in_(job_ids),
+                GenerationJob.status == "queued",
+                GenerationJob.stage == "poll",
+            ).update(
+                {
+                    "status": "running",
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + lease_seconds,
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+
+            return [
+                GenerationJobModel.model_validate(job)
+                for job in db.query(GenerationJob)
+                .filter(
+                    GenerationJob.id.in_(job_ids),
+                    GenerationJob.worker_id == worker_id,
+                    GenerationJob.status == "running",
+                )
+                .all()
+            ]
+
+    def renew_lease(self, id: str, worker_id: str, lease_seconds: int) -> bool:
+        now = int(time.time())
+        with get_db() as db:
+            renewed = (
+                db.query(GenerationJob)
+                .filter(
+                    GenerationJob.id == id,
+                    GenerationJob.worker_id == worker_id,
+                    GenerationJob.status == "running",
+                )
+                .update(
+                    {"lease_expires_at": now + lease_seconds, "updated_at": now},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return renewed > 0
+
+    def release_job_by_id(
+        self, id: str, worker_id: str, delay: int, updates: Optional[dict] = None
+    ) -> Optional[GenerationJobModel]:
+        """
+        Put a running job back in the queue, due again in `delay` seconds,
+        e.g. after it was submitted or polled without reaching a final state.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            db.query(GenerationJob).filter(
+                GenerationJob.id == id,
+                GenerationJob.worker_id == worker_id,
+                GenerationJob.status == "running",
+            ).update(
+                {
+                    **(updates or {}),
+                    "status": "queued",
+                    "worker_id": None,
+                    "lease_expires_at": None,
+                    "available_at": now + delay,
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            job = db.get(GenerationJob, id)
+            return GenerationJobModel.model_validate(job) if job else None
+
+    def finish_job_by_id(
+        self,
+        id: str,
+        status: str,
+        worker_id: Optional[str] = None,
+        error: Optional[str] = None,
+        updates: Optional[dict] = None,
+    ) -> Optional[GenerationJobModel]:
+        """
+        Move an active job to a final status (completed, failed, cancelled).
+        Returns None when the job was not active (or not owned by
+        `worker_id`), so each job is finished exactly once.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            query = db.query(GenerationJob).filter(
+                GenerationJob.id == id, GenerationJob.status.in_(ACTIVE_STATUSES)
+            )
+            if worker_id:
+                query = query.filter(
+                    GenerationJob.worker_id == worker_id,
+                    GenerationJob.status == "running",
+                )
+            finished = query.update(
+                {
+                    **(updates or {}),
+                    "status": status,
+                    "error": error,
+                    "progress": (
+                        100 if status == "completed" else GenerationJob.progress
+                    ),
+                    "worker_id": None,
+                    "lease_expires_at": None,
+                    "completed_at": now,
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            if not finished:
+                return None
+            return GenerationJobModel.model_validate(db.get(GenerationJob, id))
+
+    def defer_job_by_id(
+        self, id: str, delay: int, progress: Optional[int] = None
+    ) -> Optional[GenerationJobModel]:
+        """
+        Record progress pushed by a provider callback and postpone the next
+        status poll of the job, which is only needed if callbacks stop.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            updates = {"updated_at": now}
+            if progress is not None:
+                updates["progress"] = progress
+            db.query(GenerationJob).filter(
+                GenerationJob.id == id, GenerationJob.status.in_(ACTIVE_STATUSES)
+            ).update(updates, synchronize_session=False)
+            db.query(GenerationJob).filter(
+                GenerationJob.id == id, GenerationJob.status == "queued"
+            ).update({"available_at": now + delay}, synchronize_session=False)
+            db.commit()
+            job = db.get(GenerationJob, id)
+            return GenerationJobModel.model_validate(job) if job else None
+
+    def mark_refunded_by_id(self, id: str) -> bool:
+        """Flip `refunded` once, so credits are never returned twice."""
+        with get_db() as db:
+            updated = (
+                db.query(GenerationJob)
+                .filter(GenerationJob.id == id, GenerationJob.refunded == False)
+                .update(
+                    {"refunded": True, "updated_at": int(time.time())},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return updated > 0
+
+    def fail_expired_jobs(self) -> list[GenerationJobModel]:
+        """
+        Fail running jobs whose worker died during the submit, as the upstream
+        may already have accepted (and billed) the task, and jobs that lost
+        their lease on their last attempt, so a job that keeps killing its
+        worker is not requeued forever. The caller refunds them.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            job_ids = [
+                job_id
+                for (job_id,) in db.query(GenerationJob.id)
+                .filter(
+                    GenerationJob.status == "running",
+                    GenerationJob.lease_expires_at < now,
+                    or_(
+                        GenerationJob.stage == "submit",
+                        GenerationJob.attempts + 1 >= GenerationJob.max_attempts,
+                    ),
+                )
+                .all()
+            ]
+
+            failed = []
+            for job_id in job_ids:
+                error = (
+                    "任务提交中断，请重新提交"
+                    if db.get(GenerationJob, job_id).stage == "submit"
+                    else "任务处理中断，请稍后重试"
+                )
+                # Guarded, in case the worker renewed the lease meanwhile
+                updated = (
+                    db.query(GenerationJob)
+                    .filter(
+                        GenerationJob.id == job_id,
+                        GenerationJob.status == "running",
+                        GenerationJob.lease_expires_at < now,
+                    )
+                    .update(
+                        {
+                            "status": "failed",
+                            "error": error,
+                            "worker_id": None,
+                            "lease_expires_at": None,
+                            "completed_at": now,
+                            "updated_at": now,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if updated:
+                    failed.append(
+                        GenerationJobModel.model_validate(db.get(GenerationJob, job_id))
+                    )
+            return failed
+
+    def requeue_expired_jobs(self) -> int:
+        """
+        Put polling jobs whose worker died back in the queue, counting the
+        lost lease as an attempt. Call `fail_expired_jobs` first: submits
+        are never resumed and jobs out of attempts are failed there.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            requeued = (
+                db.query(GenerationJob)
+                .filter(
+                    GenerationJob.status == "running",
+                    GenerationJob.stage == "poll",
+                    GenerationJob.lease_expires_at < now,
+                    GenerationJob.attempts + 1 < GenerationJob.max_attempts,
+                )
+                .update(
+                    {
+                        "status": "queued",
+                        "attempts": GenerationJob.attempts + 1,
+                        "worker_id": None,
+                        "lease_expires_at": None,
+                        "available_at": now,
+                        "updated_at": now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return requeued
+
+
+GenerationJobs = GenerationJobsTable()
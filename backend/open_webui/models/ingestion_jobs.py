@@ -0,0 +1,424 @@
+import logging
+import time
+import uuid
+from typing import Optional
+
+from open_webui.internal.db import Base, get_db
+from open_webui.env import SRC_LOG_LEVELS
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger, Column, Index, Integer, String, Text, JSON, func
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+####################
+# Ingestion Jobs DB Schema
+####################
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_job"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(String, nullable=False)
+
+    # "file" (process an uploaded file) or "knowledge_batch"
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+
+    # queued, running, completed, failed, cancelled
+    status = Column(String, nullable=False, default="queued")
+    priority = Column(Integer, nullable=False, default=0)
+    progress = Column(Integer, nullable=False, default=0)
+    stage = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=1)
+
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(BigInteger, nullable=True)
+    available_at = Column(BigInteger, nullable=False)
+
+    created_at = Column(BigInteger, nullable=False)
+    updated_at = Column(BigInteger, nullable=False)
+    started_at = Column(BigInteger, nullable=True)
+    completed_at = Column(BigInteger, nullable=True)
+
+    __table_args__ = (
+        Index("ingestion_job_status_priority_idx", "status", "priority"),
+        Index("ingestion_job_user_id_idx", "user_id"),
+    )
+
+
+class IngestionJobModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    user_id: str
+
+    kind: str
+    payload: Optional[dict] = None
+    result: Optional[dict] = None
+
+    status: str
+    priority: int = 0
+    progress: int = 0
+    stage: Optional[str] = None
+    error: Optional[str] = None
+
+    attempts: int = 0
+    max_attempts: int = 1
+
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[int] = None
+    available_at: int
+
+    created_at: int  # timestamp in epoch
+    updated_at: int  # timestamp in epoch
+    started_at: Optional[int] = None
+    completed_at: Optional[int] = None
+
+
+####################
+# Forms
+####################
+
+
+class IngestionJobForm(BaseModel):
+    kind: str
+    payload: dict = {}
+    priority: int = 0
+    max_attempts: int = 1
+
+
+class IngestionJobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    priority: int
+    progress: int
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int
+    payload: Optional[dict] = None
+    result: Optional[dict] = None
+    created_at: int
+    updated_at: int
+    completed_at: Optional[int] = None
+
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class IngestionJobsTable:
+    def insert_new_job(
+        self, user_id: str, form_data: IngestionJobForm
+    ) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            now = int(time.time())
+            job = IngestionJobModel(
+                **{
+                    **form_data.model_dump(),
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "status": "queued",
+                    "available_at": now,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+
+            try:
+                result = IngestionJob(**job.model_dump())
+                db.add(result)
+                db.commit()
+                db.refresh(result)
+                return IngestionJobModel.model_validate(result)
+            except Exception as e:
+                log.exception(f"Error inserting a new ingestion job: {e}")
+                return None
+
+    def get_job_by_id(self, id: str) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            job = db.get(IngestionJob, id)
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def get_jobs_by_user_id(
+        self, user_id: str, status: Optional[str] = None, limit: int = 50
+    ) -> list[IngestionJobModel]:
+        with get_db() as db:
+            query = db.query(IngestionJob).filter_by(user_id=user_id)
+            if status:
+                query = query.filter_by(status=status)
+            return [
+                IngestionJobModel.model_validate(job)
+                for job in query.order_by(IngestionJob.created_at.desc())
+                .limit(limit)
+                .all()
+            ]
+
+    def get_jobs(
+        self, status: Optional[str] = None, limit: int = 100
+    ) -> list[IngestionJobModel]:
+        with get_db() as db:
+            query = db.query(IngestionJob)
+            if status:
+                query = query.filter_by(status=status)
+            return [
+                IngestionJobModel.model_validate(job)
+                for job in query.order_by(IngestionJob.created_at.desc())
+                .limit(limit)
+                .all()
+            ]
+
+    def claim_next_job(
+        self, worker_id: str, lease_seconds: int, user_concurrency: int
+    ) -> Optional[IngestionJobModel]:
+        """
+        Atomically move the highest priority runnable job to "running".
+
+        Users that already have `user_concurrency` running jobs are skipped so
+        that one large upload cannot starve everybody else. The status guard in
+        the UPDATE makes the claim safe across workers and replicas.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            busy_user_ids = [
+                user_id
+                for (user_id,) in db.query(IngestionJob.user_id)
+                .filter(IngestionJob.status == "running")
+                .group_by(IngestionJob.user_id)
+                .having(func.count(IngestionJob.id) >= user_concurrency)
+                .all()
+            ]
+
+            query = db.query(IngestionJob.id).filter(
+                IngestionJob.status == "queued",
+                IngestionJob.available_at <= now,
+            )
+            if busy_user_ids:
+                query = query.filter(IngestionJob.user_id.notin_(busy_user_ids))
+
+            candidates = (
+                query.order_by(
+                    IngestionJob.priority.desc(), IngestionJob.created_at.asc()
+                )
+                .limit(10)
+                .all()
+            )
+
+            for (job_id,) in candidates:
+                claimed = (
+                    db.query(IngestionJob)
+                    .filter(IngestionJob.id == job_id, IngestionJob.status == "queued")
+                    .update(
+                        {
+                            "status": "running",
+                            "worker_id": worker_id,
+                            "lease_expires_at": now + lease_seconds,
+                            "attempts": IngestionJob.attempts + 1,
+                            "started_at": now,
+                            "updated_at": now,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if claimed:
+                    return IngestionJobModel.model_validate(
+                        db.get(IngestionJob, job_id)
+                    )
+
+        return None
+
+    def renew_lease(self, id: str, worker_id: str, lease_seconds: int) -> bool:
+        """
+        Extend the lease of a running job. Returns False when the job is no
+        longer owned by this worker (e.g. it was cancelled).
+        """
+        now = int(time.time())
+        with get_db() as db:
+            renewed = (
+                db.query(IngestionJob)
+                .filter(
+                    IngestionJob.id == id,
+                    IngestionJob.worker_id == worker_id,
+                    IngestionJob.status == "running",
+                )
+                .update(
+                    {"lease_expires_at": now + lease_seconds, "updated_at": now},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return renewed > 0
+
+    def update_job_progress_by_id(
+        self, id: str, progress: int, stage: Optional[str] = None
+    ) -> bool:
+        with get_db() as db:
+            updated = (
+                db.query(IngestionJob)
+                .filter(IngestionJob.id == id, IngestionJob.status == "running")
+                .update(
+                    {
+                        "progress": max(0, min(100, progress)),
+                        "stage": stage,
+                        "updated_at": int(time.time()),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return updated > 0
+
+    def complete_job_by_id(
+        self, id: str, worker_id: str, result: Optional[dict] = None
+    ) -> Optional[IngestionJobModel]:
+        now = int(time.time())
+        with get_db() as db:
+            db.query(IngestionJob).filter(
+                IngestionJob.id == id,
+                IngestionJob.worker_id == worker_id,
+                IngestionJob.status == "running",
+            ).update(
+                {
+                    "status": "completed",
+                    "progress": 100,
+                    "stage": "completed",
+                    "result": result,
+                    "error": None,
+                    "lease_expires_at": None,
+                    "completed_at": now,
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            job = db.get(IngestionJob, id)
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def fail_job_by_id(
+        self, id: str, worker_id: str, error: str, retry_delay: int = 0
+    ) -> Optional[IngestionJobModel]:
+        """
+        Record a failed attempt. The job goes back to the queue until it has
+        used up `max_attempts`, after which it is marked as failed.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            job = (
+                db.query(IngestionJob)
+                .filter(
+                    IngestionJob.id == id,
+                    IngestionJob.worker_id == worker_id,
+                    IngestionJob.status == "running",
+                )
+                .first()
+            )
+            if job:
+                if job.attempts < job.max_attempts:
+                    job.status = "queued"
+                    job.available_at = now + retry_delay
+                else:
+                    job.status = "failed"
+                    job.completed_at = now
+                job.error = error
+                job.worker_id = None
+                job.lease_expires_at = None
+                job.updated_at = now
+                db.commit()
+
+            job = db.get(IngestionJob, id)
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def cancel_job_by_id(self, id: str) -> Optional[IngestionJobModel]:
+        now = int(time.time())
+        with get_db() as db:
+            db.query(IngestionJob).filter(
+                IngestionJob.id == id, IngestionJob.status.in_(ACTIVE_STATUSES)
+            ).update(
+                {
+                    "status": "cancelled",
+                    "stage": "cancelled",
+                    "lease_expires_at": None,
+                    "completed_at": now,
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            job = db.get(IngestionJob, id)
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def retry_job_by_id(self, id: str) -> Optional[IngestionJobModel]:
+        now = int(time.time())
+        with get_db() as db:
+            db.query(IngestionJob).filter(
+                IngestionJob.id == id,
+                IngestionJob.status.in_(("failed", "cancelled")),
+            ).update(
+                {
+                    "status": "queued",
+                    "progress": 0,
+                    "stage": None,
+                    "error": None,
+                    "attempts": 0,
+                    "worker_id": None,
+                    "available_at": now,
+                    "completed_at": None,
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            job = db.get(IngestionJob, id)
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def requeue_expired_jobs(self) -> int:
+        """
+        Put running jobs whose lease has expired (their worker died) back in
+        the queue, or fail them if they are out of attempts.
+        """
+        now = int(time.time())
+        with get_db() as db:
+            requeued = (
+                db.query(IngestionJob)
+                .filter(
+                    IngestionJob.status == "running",
+                    IngestionJob.lease_expires_at < now,
+                    IngestionJob.attempts < IngestionJob.max_attempts,
+                )
+                .update(
+                    {
+                        "status": "queued",
+                        "worker_id": None,
+                        "lease_expires_at": None,
+                        "available_at": now,
+                        "updated_at": now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.query(IngestionJob).filter(
+                IngestionJob.status == "running",
+                IngestionJob.lease_expires_at < now,
+            ).update(
+                {
+                    "status": "failed",
+                    "error": "Ingestion worker lost the job lease",
+                    "worker_id": None,
+                    "lease_expires_at": None,
+                    "completed_at": now,
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            return requeued
+
+
+IngestionJobs = IngestionJobsTable()
@@ -5,9 +5,20 @@
 
 import time
 import json
-from sqlalchemy import Column, String, Integer, Text, Boolean, Float, BigInteger
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Text,
+    Boolean,
+    Float,
+    BigInteger,
+    Index,
+    and_,
+    or_,
+)
 from sqlalchemy.sql import func
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from pydantic import BaseModel, Field
 
 from open_webui.internal.db import Base, SessionLocal
@@ -64,6 +75,11 @@ class JimengTask(Base):
         onupdate=lambda: int(time.time() * 1000),
     )
 
+    __table_args__ = (
+        Index("jimeng_tasks_user_created_idx", "user_id", "created_at"),
+        Index("jimeng_tasks_status_updated_idx", "status", "updated_at"),
+    )
+
 
 ####################
 # Pydantic模型
@@ -210,6 +226,58 @@ class JimengTasks:
             log.error(f"获取所有即梦视频任务失败: {str(e)}")
             return []
 
+    # 列表只查询这些字段，不加载大字段
+    LIST_COLUMNS = (
+        JimengTask.task_id,
+        JimengTask.status,
+        JimengTask.prompt,
+        JimengTask.image_url,
+        JimengTask.duration,
+        JimengTask.aspect_ratio,
+        JimengTask.cfg_scale,
+        JimengTask.credits_used,
+        JimengTask.video_url,
+        JimengTask.video_id,
+        JimengTask.fail_reason,
+        JimengTask.created_at,
+        JimengTask.updated_at,
+    )
+
+    @staticmethod
+    def get_task_list(
+        user_id: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[Tuple[int, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """按创建时间倒序分页获取任务列表，cursor 为上一页最后一条的 (created_at, task_id)"""
+        try:
+            with SessionLocal() as session:
+                query = session.query(*JimengTasks.LIST_COLUMNS)
+                if user_id:
+                    query = query.filter(JimengTask.user_id == user_id)
+                if cursor:
+                    created_at, task_id = cursor
+                    query = query.filter(
+                        or_(
+                            JimengTask.created_at < created_at,
+                            and_(
+                                JimengTask.created_at == created_at,
+                                JimengTask.task_id < task_id,
+                            ),
+                        )
+                    )
+                rows = (
+                    query.order_by(
+                        JimengTask.created_at.desc(), JimengTask.task_id.desc()
+                    )
+                    .limit(limit)
+                    .all()
+                )
+                return [row._asdict() for row in rows]
+        except Exception as e:
+            log.error(f"获取即梦任务列表失败: {e}")
+            return []
+
     @staticmethod
     def update_task_by_id(
         task_id: str, update_data: Dict[str, Any]
@@ -305,7 +373,7 @@ class JimengTasks:
                 tasks = (
                     session.query(JimengTask)
                     .filter(JimengTask.status == status)
-                    .order_by(JimengTask.created_at.desc())
+                    .order_by(JimengTask.updated_at.desc())
                     .limit(limit)
                     .all()
                 )
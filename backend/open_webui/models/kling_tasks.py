@@ -6,9 +6,20 @@
 import time
 import json
 import uuid
-from sqlalchemy import Column, String, Integer, Text, Boolean, Float, BigInteger
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Text,
+    Boolean,
+    Float,
+    BigInteger,
+    Index,
+    and_,
+    or_,
+)
 from sqlalchemy.sql import func
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from pydantic import BaseModel, Field, validator
 
 from open_webui.internal.db import Base, SessionLocal
@@ -59,6 +70,11 @@ class KlingTask(Base):
     created_at = Column(BigInteger, default=lambda: int(time.time() * 1000))
     updated_at = Column(BigInteger, default=lambda: int(time.time() * 1000))
 
+    __table_args__ = (
+        Index("kling_tasks_user_created_idx", "user_id", "created_at"),
+        Index("kling_tasks_status_updated_idx", "status", "updated_at"),
+    )
+
 
 ####################
 # Pydantic模型
@@ -254,6 +270,61 @@ class KlingTasks:
             log.error(f"获取用户可灵任务列表失败: {e}")
             return []
 
+    # 列表只查询这些字段，不加载大字段
+    LIST_COLUMNS = (
+        KlingTask.task_id,
+        KlingTask.status,
+        KlingTask.prompt,
+        KlingTask.negative_prompt,
+        KlingTask.model_name,
+        KlingTask.mode,
+        KlingTask.aspect_ratio,
+        KlingTask.duration,
+        KlingTask.cfg_scale,
+        KlingTask.credits_used,
+        KlingTask.video_url,
+        KlingTask.video_id,
+        KlingTask.video_duration,
+        KlingTask.task_status_msg,
+        KlingTask.created_at,
+        KlingTask.updated_at,
+    )
+
+    @staticmethod
+    def get_task_list(
+        user_id: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[Tuple[int, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """按创建时间倒序分页获取任务列表，cursor 为上一页最后一条的 (created_at, task_id)"""
+        try:
+            with SessionLocal() as session:
+                query = session.query(*KlingTasks.LIST_COLUMNS)
+                if user_id:
+                    query = query.filter(KlingTask.user_id == user_id)
+                if cursor:
+                    created_at, task_id = cursor
+                    query = query.filter(
+                        or_(
+                            KlingTask.created_at < created_at,
+                            and_(
+                                KlingTask.created_at == created_at,
+                                KlingTask.task_id < task_id,
+                            ),
+                        )
+                    )
+                rows = (
+                    query.order_by(
+                        KlingTask.created_at.desc(), KlingTask.task_id.desc()
+                    )
+                    .limit(limit)
+                    .all()
+                )
+                return [row._asdict() for row in rows]
+        except Exception as e:
+            log.error(f"获取可灵任务列表失败: {e}")
+            return []
+
     @staticmethod
     def update_task_by_id(
         task_id: str, update_data: Dict[str, Any]
@@ -340,7 +411,7 @@ class KlingTasks:
                 tasks = (
                     session.query(KlingTask)
                     .filter(KlingTask.status == status)
-                    .order_by(KlingTask.created_at.desc())
+                    .order_by(KlingTask.updated_at.desc())
                     .limit(limit)
                     .all()
                 )
@@ -1,12 +1,24 @@
 import logging
 import time
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 
 from open_webui.internal.db import Base, JSONField, get_db
 from open_webui.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON, Boolean, Integer, Float
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    String,
+    Text,
+    JSON,
+    Boolean,
+    Integer,
+    Float,
+    Index,
+    and_,
+    or_,
+)
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -60,6 +72,11 @@ class MidJourneyTask(Base):
     completed_at = Column(BigInteger, nullable=True)
     updated_at = Column(BigInteger, nullable=False)
 
+    __table_args__ = (
+        Index("midjourney_task_user_created_idx", "user_id", "created_at"),
+        Index("midjourney_task_status_updated_idx", "status", "updated_at"),
+    )
+
 
 class MidJourneyTaskModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -216,6 +233,67 @@ class MidJourneyTasksTable:
             log.exception(f"Failed to get tasks for user {user_id}: {e}")
             return []
 
+    # 列表只查询这些字段，不加载参考图片等大字段
+    LIST_COLUMNS = (
+        MidJourneyTask.task_id,
+        MidJourneyTask.user_id,
+        MidJourneyTask.mj_task_id,
+        MidJourneyTask.parent_task_id,
+        MidJourneyTask.prompt,
+        MidJourneyTask.final_prompt,
+        MidJourneyTask.mode,
+        MidJourneyTask.aspect_ratio,
+        MidJourneyTask.negative_prompt,
+        MidJourneyTask.status,
+        MidJourneyTask.progress,
+        MidJourneyTask.message,
+        MidJourneyTask.image_url,
+        MidJourneyTask.credits_used,
+        MidJourneyTask.created_at,
+        MidJourneyTask.completed_at,
+        MidJourneyTask.error_message,
+        MidJourneyTask.actions,
+        MidJourneyTask.seed,
+        MidJourneyTask.action_type,
+        MidJourneyTask.button_index,
+        MidJourneyTask.custom_id,
+    )
+
+    def get_task_list(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[Tuple[int, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """按创建时间倒序分页获取旧版格式的任务列表，cursor 为上一页最后一条的 (created_at, task_id)"""
+        try:
+            with get_db() as db:
+                query = db.query(*self.LIST_COLUMNS)
+                if user_id:
+                    query = query.filter(MidJourneyTask.user_id == user_id)
+                if cursor:
+                    created_at, task_id = cursor
+                    query = query.filter(
+                        or_(
+                            MidJourneyTask.created_at < created_at,
+                            and_(
+                                MidJourneyTask.created_at == created_at,
+                                MidJourneyTask.task_id < task_id,
+                            ),
+                        )
+                    )
+                rows = (
+                    query.order_by(
+                        MidJourneyTask.created_at.desc(), MidJourneyTask.task_id.desc()
+                    )
+                    .limit(limit)
+                    .all()
+                )
+                return [{**row._asdict(), "actions": row.actions or []} for row in rows]
+        except Exception as e:
+            log.exception(f"Failed to get task list: {e}")
+            return []
+
     def get_all_tasks(self, limit: int = 100) -> List[MidJourneyTaskModel]:
         """获取所有任务（管理员用）"""
         try:
@@ -140,6 +140,11 @@ class ModelPriceForm(BaseModel):
     completion_price: float = Field(
         default=0, description="completion token price for 1m tokens", ge=0
     )
+    cached_prompt_price: Optional[float] = Field(
+        default=None,
+        description="cached prompt token price for 1m tokens, prompt_price if not set",
+        ge=0,
+    )
     request_price: float = Field(default=0, description="price for 1m request", ge=0)
     minimum_credit: float = Field(
         default=0, description="min credit required for this model", ge=0
@@ -5,9 +5,20 @@
 
 import time
 import json
-from sqlalchemy import Column, String, Integer, Text, Boolean, Float, BigInteger
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Text,
+    Boolean,
+    Float,
+    BigInteger,
+    Index,
+    and_,
+    or_,
+)
 from sqlalchemy.sql import func
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from pydantic import BaseModel, Field
 
 from open_webui.internal.db import Base, SessionLocal
@@ -48,7 +59,8 @@ class SeedreamTask(Base):
 
     # 结果数据
     image_url = Column(Text)
-    image_data = Column(Text)  # Base64图像数据
+    image_data = Column(Text)  # Base64图像数据（旧数据，新任务保存在存储中）
+    image_file_id = Column(String)  # 存储中的图像文件ID
     request_id = Column(String)  # 即梦3.0的请求ID
     time_elapsed = Column(String)  # API处理时间
 
@@ -59,6 +71,11 @@ class SeedreamTask(Base):
         BigInteger, default=lambda: int(time.time()), onupdate=lambda: int(time.time())
     )
 
+    __table_args__ = (
+        Index("seedream_tasks_user_created_idx", "user_id", "created_at"),
+        Index("seedream_tasks_status_updated_idx", "status", "updated_at"),
+    )
+
 
 ####################
 # Pydantic模型
@@ -81,6 +98,7 @@ class SeedreamTaskForm(BaseModel):
     credits_used: int = 0
     image_url: Optional[str] = None
     image_data: Optional[str] = None
+    image_file_id: Optional[str] = None
     request_id: Optional[str] = None
     time_elapsed: Optional[str] = None
 
@@ -101,6 +119,7 @@ class SeedreamTaskResponse(BaseModel):
     credits_used: int
     image_url: Optional[str]
     image_data: Optional[str]
+    image_file_id: Optional[str]
     request_id: Optional[str]
     time_elapsed: Optional[str]
     created_at: int
@@ -141,6 +160,7 @@ class SeedreamTasks:
                     credits_used=task_form.credits_used,
                     image_url=task_form.image_url,
                     image_data=task_form.image_data,
+                    image_file_id=task_form.image_file_id,
                     request_id=task_form.request_id,
                     time_elapsed=task_form.time_elapsed,
                 )
@@ -204,6 +224,61 @@ class SeedreamTasks:
             log.error(f"获取所有即梦3.0任务失败: {str(e)}")
             return []
 
+    # 列表只查询这些字段，不加载大字段
+    LIST_COLUMNS = (
+        SeedreamTask.task_id,
+        SeedreamTask.user_id,
+        SeedreamTask.prompt,
+        SeedreamTask.width,
+        SeedreamTask.height,
+        SeedreamTask.seed,
+        SeedreamTask.scale,
+        SeedreamTask.status,
+        SeedreamTask.message,
+        SeedreamTask.credits_used,
+        SeedreamTask.image_url,
+        SeedreamTask.image_file_id,
+        SeedreamTask.time_elapsed,
+        SeedreamTask.created_at,
+        SeedreamTask.completed_at,
+        SeedreamTask.updated_at,
+    )
+
+    @staticmethod
+    def get_task_list(
+        user_id: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[Tuple[int, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """按创建时间倒序分页获取任务列表，cursor 为上一页最后一条的 (created_at, task_id)"""
+        try:
+            with SessionLocal() as session:
+                query = session.query(*SeedreamTasks.LIST_COLUMNS)
+                if user_id:
+                    query = query.filter(SeedreamTask.user_id == user_id)
+                if cursor:
+                    created_at, task_id = cursor
+                    query = query.filter(
+                        or_(
+                            SeedreamTask.created_at < created_at,
+                            and_(
+                                SeedreamTask.created_at == created_at,
+                                SeedreamTask.task_id < task_id,
+                            ),
+                        )
+                    )
+                rows = (
+                    query.order_by(
+                        SeedreamTask.created_at.desc(), SeedreamTask.task_id.desc()
+                    )
+                    .limit(limit)
+                    .all()
+                )
+                return [row._asdict() for row in rows]
+        except Exception as e:
+            log.error(f"获取即梦3.0任务列表失败: {e}")
+            return []
+
     @staticmethod
     def update_task_by_id(
         task_id: str, update_data: Dict[str, Any]
@@ -267,6 +342,52 @@ class SeedreamTasks:
             log.error(f"删除即梦3.0任务失败: {str(e)}")
             return False
 
+    @staticmethod
+    def get_task_ids_with_image_data(limit: int = 50) -> List[str]:
+        """获取仍在数据库中保存Base64图像的任务ID"""
+        try:
+            with SessionLocal() as session:
+                rows = (
+                    session.query(SeedreamTask.task_id)
+                    .filter(
+                        SeedreamTask.image_data.isnot(None),
+                        SeedreamTask.image_file_id.is_(None),
+                    )
+                    .limit(limit)
+                    .all()
+                )
+                return [row.task_id for row in rows]
+        except Exception as e:
+            log.error(f"获取待迁移的即梦3.0任务失败: {str(e)}")
+            return []
+
+    @staticmethod
+    def set_image_file_by_id(task_id: str, file_id: str, image_url: str) -> bool:
+        """记录存储中的图像文件并清除Base64数据，已记录过文件时返回False"""
+        try:
+            with SessionLocal() as session:
+                updated = (
+                    session.query(SeedreamTask)
+                    .filter(
+                        SeedreamTask.task_id == task_id,
+                        SeedreamTask.image_file_id.is_(None),
+                    )
+                    .update(
+                        {
+                            "image_file_id": file_id,
+                            "image_url": image_url,
+                            "image_data": None,
+                            "updated_at": int(time.time()),
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                session.commit()
+                return updated > 0
+        except Exception as e:
+            log.error(f"更新即梦3.0任务图像文件失败: {str(e)}")
+            return False
+
     @staticmethod
     def get_user_task_count(user_id: str) -> int:
         """获取用户任务总数"""
@@ -290,7 +411,7 @@ class SeedreamTasks:
                 tasks = (
                     session.query(SeedreamTask)
                     .filter(SeedreamTask.status == status)
-                    .order_by(SeedreamTask.created_at.desc())
+                    .order_by(SeedreamTask.updated_at.desc())
                     .limit(limit)
                     .all()
                 )
@@ -328,6 +449,7 @@ class SeedreamTasks:
                 "credits_used": task.credits_used,
                 "image_url": task.image_url,
                 "image_data": task.image_data,
+                "image_file_id": task.image_file_id,
                 "request_id": task.request_id,
                 "time_elapsed": task.time_elapsed,
                 "created_at": task.created_at,
@@ -0,0 +1,190 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+from open_webui.config import RAG_RETRIEVAL_MAX_WORKERS, RAG_RETRIEVAL_TIMEOUT
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+class RetrievalMetrics:
+    """
+    Thread-safe counters for the retrieval pipeline stages (embed, search,
+    fetch, bm25, rerank, ...), exposed through /retrieval/metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: dict[str, dict] = {}
+
+    def _get_stage(self, name: str) -> dict:
+        return self._stages.setdefault(
+            name,
+            {
+                "count": 0,
+                "errors": 0,
+                "timeouts": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+            },
+        )
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        with self._lock:
+            stage = self._get_stage(name)
+            stage["count"] += 1
+            stage["total_seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+            if error:
+                stage["errors"] += 1
+
+    def timeout(self, name: str, count: int = 1):
+        with self._lock:
+            self._get_stage(name)["timeouts"] += count
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, error)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    **stage,
+                    "avg_seconds": (
+                        stage["total_seconds"] / stage["count"]
+                        if stage["count"]
+                        else 0.0
+                    ),
+                }
+                for name, stage in self._stages.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+
+RETRIEVAL_METRICS = RetrievalMetrics()
+
+# Threads of a query that missed its deadline keep running (a running thread
+# cannot be cancelled) but give their slot back. The pool has room for that
+# many abandoned queries per slot before new ones wait for a thread.
+STRAGGLER_HEADROOM = 2
+
+_executor: Optional[ThreadPoolExecutor] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_executor_lock = threading.Lock()
+
+
+class RetrievalSlot:
+    """
+    One of the RAG_RETRIEVAL_MAX_WORKERS queries allowed to run at once,
+    released when the query finishes or misses its deadline, whichever
+    comes first.
+    """
+
+    def __init__(self, semaphore: threading.BoundedSemaphore):
+        self._semaphore = semaphore
+        self._lock = threading.Lock()
+        self._released = False
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._semaphore.release()
+
+
+def get_retrieval_executor() -> ThreadPoolExecutor:
+    """
+    Bounded thread pool shared by every retrieval request in the process, so
+    concurrent chats cannot spawn an unbounded number of threads.
+    """
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = max(1, RAG_RETRIEVAL_MAX_WORKERS)
+                _slots = threading.BoundedSemaphore(max_workers)
+                _executor = ThreadPoolExecutor(
+                    max_workers=max_workers * STRAGGLER_HEADROOM,
+                    thread_name_prefix="retrieval",
+                )
+    return _executor
+
+
+def run_with_deadline(
+    func: Callable,
+    args_list: list[tuple],
+    timeout: Optional[float] = RAG_RETRIEVAL_TIMEOUT,
+    stage: str = "collection",
+) -> list[Any]:
+    """
+    Run `func(*args)` for every entry of `args_list` on the shared executor.
+
+    Tasks that have not finished `timeout` seconds after the call are
+    abandoned and reported as None, so one slow collection only costs its own
+    results instead of delaying the whole answer. The deadline includes the
+    wait for a free slot, reported as the `<stage>_queue` metric. Abandoned
+    tasks keep running in the background but free their slot right away.
+    """
+    executor = get_retrieval_executor()
+    deadline = time.monotonic() + timeout if timeout else None
+
+    def timed(slot: RetrievalSlot, queued_at: float, *args):
+        RETRIEVAL_METRICS.observe(f"{stage}_queue", time.perf_counter() - queued_at)
+        try:
+            with RETRIEVAL_METRICS.stage(stage):
+                return func(*args)
+        finally:
+            slot.release()
+
+    futures: list[Optional[Future]] = []
+    slots: list[RetrievalSlot] = []
+    for args in args_list:
+        queued_at = time.perf_counter()
+        remaining = max(0.0, deadline - time.monotonic()) if deadline else None
+        if not _slots.acquire(timeout=remaining):
+            futures.append(None)
+            continue
+
+        slot = RetrievalSlot(_slots)
+        slots.append(slot)
+        futures.append(executor.submit(timed, slot, queued_at, *args))
+
+    submitted = [future for future in futures if future is not None]
+    remaining = max(0.0, deadline - time.monotonic()) if deadline else None
+    done, not_done = wait(submitted, timeout=remaining)
+
+    for future, slot in zip(submitted, slots):
+        if future in not_done:
+            future.cancel()
+            slot.release()
+
+    missed = len(futures) - len(done)
+    if missed:
+        RETRIEVAL_METRICS.timeout(stage, missed)
+        log.warning(
+            f"{missed} of {len(futures)} retrieval tasks exceeded the "
+            f"{timeout}s deadline, returning partial results"
+        )
+
+    return [
+        future.result() if future is not None and future in done else None
+        for future in futures
+    ]
@@ -0,0 +1,268 @@
+import hashlib
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.retrieval.executor import RETRIEVAL_METRICS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+class ScoreCache:
+    """Thread-safe LRU of (query, passage) -> relevance score."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._scores: OrderedDict[bytes, float] = OrderedDict()
+
+    @staticmethod
+    def key(query: str, passage: str) -> bytes:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(query.encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+        h.update(passage.encode("utf-8", "surrogatepass"))
+        return h.digest()
+
+    def get_many(self, keys: list[bytes]) -> list[Optional[float]]:
+        if self.maxsize <= 0:
+            return [None] * len(keys)
+        with self._lock:
+            results = []
+            for key in keys:
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                results.append(score)
+            return results
+
+    def set_many(self, items: dict[bytes, float]):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._scores.update(items)
+            for key in items:
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.maxsize:
+                self._scores.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._scores.clear()
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class BatchedReranker:
+    """
+    Wraps a reranking model (anything with `predict(pairs)`) with a score cache
+    and, for models that can score pairs of different queries in one call
+    (sentence-transformers CrossEncoder), a micro-batcher.
+
+    Every concurrent `predict` call pushes its uncached pairs on a queue. A
+    single dispatcher thread drains the queue for up to `batch_window_ms` (or
+    until `max_batch_size` pairs are collected), scores everything with one
+    `model.predict` call and hands each caller back its slice. On CPU this
+    replaces many small forward passes from the per-query retrieval threads
+    with a few large ones.
+
+    Call `close` once the reranker is replaced: the dispatcher thread holds
+    the model until it is stopped.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        batching: bool = True,
+        batch_window_ms: float = 10.0,
+        max_batch_size: int = 128,
+        cache_size: int = 20000,
+    ):
+        self.model = model
+        self.batching = batching and max_batch_size > 1
+        self.batch_window = max(0.0, batch_window_ms) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.cache = ScoreCache(cache_size)
+
+        # None is the sentinel that stops the dispatcher
+        self._queue: "queue.Queue[Optional[Tuple[List[Tuple[str, str]], Future]]]" = (
+            queue.Queue()
+        )
+        self._dispatcher: Optional[threading.Thread] = None
+        self._dispatcher_lock = threading.Lock()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "pairs": 0,
+            "cache_hits": 0,
+            "batches": 0,
+            "batched_pairs": 0,
+        }
+
+    def __getattr__(self, name):
+        # Expose the wrapped model's attributes (e.g. `model.config`)
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def _count(self, **kwargs):
+        with self._stats_lock:
+            for key, value in kwargs.items():
+                self._stats[key] += value
+
+    @property
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                **self._stats,
+                "cache_size": len(self.cache),
+                "avg_batch_size": (
+                    self._stats["batched_pairs"] / self._stats["batches"]
+                    if self._stats["batches"]
+                    else 0.0
+                ),
+            }
+
+    def predict(self, sentences: List[Tuple[str, str]]) -> Optional[np.ndarray]:
+        if not sentences:
+            return np.zeros(0, dtype=np.float32)
+
+        keys = [ScoreCache.key(query, passage) for query, passage in sentences]
+        scores = self.cache.get_many(keys)
+
+        # Score each distinct uncached pair once
+        missing: dict[bytes, Tuple[str, str]] = {}
+        for key, score, pair in zip(keys, scores, sentences):
+            if score is None and key not in missing:
+                missing[key] = pair
+
+        self._count(
+            requests=1,
+            pairs=len(sentences),
+            cache_hits=sum(score is not None for score in scores),
+        )
+
+        if missing:
+            pairs = list(missing.values())
+            future = self._submit(pairs) if self.batching else None
+            new_scores = future.result() if future else self._score(pairs)
+
+            if new_scores is None:
+                # e.g. the external reranker failed; do not cache anything
+                return None
+
+            computed = dict(zip(missing.keys(), new_scores))
+            self.cache.set_many(computed)
+            scores = [
+                computed[key] if score is None else score
+                for key, score in zip(keys, scores)
+            ]
+
+        return np.asarray(scores, dtype=np.float32)
+
+    def _score(self, pairs: List[Tuple[str, str]]) -> Optional[list[float]]:
+        start = time.perf_counter()
+        error = False
+        try:
+            scores = self.model.predict(pairs)
+            if scores is None:
+                return None
+            if hasattr(scores, "detach"):
+                scores = scores.detach().cpu().numpy()
+            return np.asarray(scores, dtype=np.float32).reshape(-1).tolist()
+        except Exception:
+            error = True
+            raise
+        finally:
+            RETRIEVAL_METRICS.observe(
+                "rerank_batch", time.perf_counter() - start, error
+            )
+            self._count(batches=1, batched_pairs=len(pairs))
+
+    def close(self):
+        """
+        Stop the dispatcher thread. Requests already queued are still scored,
+        later calls (e.g. retrievals that started before the reranker was
+        replaced) score their pairs directly.
+        """
+        with self._dispatcher_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._dispatcher is not None:
+                self._queue.put(None)
+
+    def _submit(self, pairs: List[Tuple[str, str]]) -> Optional[Future]:
+        """Queue pairs for the dispatcher, or return None once closed."""
+        # Under the lock, so nothing is queued behind the stop sentinel
+        with self._dispatcher_lock:
+            if self._closed:
+                return None
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch_loop,
+                    name="rerank-batcher",
+                    daemon=True,
+                )
+                self._dispatcher.start()
+
+            future: Future = Future()
+            self._queue.put((pairs, future))
+            return future
+
+    def _dispatch_loop(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            requests = [request]
+            size = len(request[0])
+
+            closing = False
+            deadline = time.monotonic() + self.batch_window
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        request = self._queue.get(timeout=remaining)
+                    else:
+                        request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                    break
+                requests.append(request)
+                size += len(request[0])
+
+            self._run_batch(requests)
+            if closing:
+                return
+
+    def _run_batch(self, requests: List[Tuple[List[Tuple[str, str]], Future]]):
+        pairs = [pair for request_pairs, _ in requests for pair in request_pairs]
+        try:
+            scores = self._score(pairs)
+        except Exception as e:
+            log.exception(f"Error scoring a reranking batch: {e}")
+            for _, future in requests:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for request_pairs, future in requests:
+            future.set_result(
+                None if scores is None else scores[offset : offset + len(request_pairs)]
+            )
+            offset += len(request_pairs)
@@ -0,0 +1,67 @@
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+class LazyModel:
+    """
+    A local model loaded on first use instead of at import, so a worker
+    serves requests before torch and the model weights are in memory.
+    Attributes are proxied to the loaded model.
+
+    A failed load (bad model name, failed download) is remembered: later
+    calls raise right away instead of loading again. Updating the embedding
+    config creates a new LazyModel, which tries again.
+    """
+
+    def __init__(self, name: str, load: Callable[[], Any]):
+        self.name = name
+        self._load = load
+        self._model = None
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def failed(self) -> bool:
+        return self._error is not None
+
+    def get(self) -> Any:
+        if self._model is None:
+            with self._lock:
+                if self._error is not None:
+                    raise RuntimeError(
+                        f"Model {self.name} failed to load: {self._error}"
+                    ) from self._error
+                if self._model is None:
+                    try:
+                        self._model = self._load()
+                    except Exception as e:
+                        log.error(f"Error loading model {self.name}: {e}")
+                        self._error = e
+                        raise
+                    log.info(f"Loaded model {self.name}")
+        return self._model
+
+    def warm_up(self):
+        """Load the model in a background thread, ahead of its first use."""
+
+        def load():
+            try:
+                self.get()
+            except Exception:
+                # Logged and remembered by get
+                pass
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
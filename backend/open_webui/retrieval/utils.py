@@ -2,13 +2,10 @@ import logging
 import os
 from typing import Optional, Union
 
+import numpy as np
 import requests
-import hashlib
-from concurrent.futures import ThreadPoolExecutor
 
 from huggingface_hub import snapshot_download
-from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 
 from open_webui.config import VECTOR_DB
@@ -18,6 +15,7 @@ from open_webui.models.users import UserModel
 from open_webui.models.files import Files
 
 from open_webui.retrieval.vector.main import GetResult
+from open_webui.retrieval.executor import RETRIEVAL_METRICS, run_with_deadline
 
 
 from open_webui.env import (
@@ -52,11 +50,15 @@ class VectorSearchRetriever(BaseRetriever):
         *,
         run_manager: CallbackManagerForRetrieverRun,
     ) -> list[Document]:
-        result = VECTOR_DB_CLIENT.search(
-            collection_name=self.collection_name,
-            vectors=[self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX)],
-            limit=self.top_k,
-        )
+        with RETRIEVAL_METRICS.stage("embed"):
+            query_embedding = self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX)
+
+        with RETRIEVAL_METRICS.stage("search"):
+            result = VECTOR_DB_CLIENT.search(
+                collection_name=self.collection_name,
+                vectors=[query_embedding],
+                limit=self.top_k,
+            )
 
         ids = result.ids[0]
         metadatas = result.metadatas[0]
@@ -66,6 +68,7 @@ class VectorSearchRetriever(BaseRetriever):
         for idx in range(len(ids)):
             results.append(
                 Document(
+                    id=ids[idx],
                     metadata=metadatas[idx],
                     page_content=documents[idx],
                 )
@@ -78,11 +81,12 @@ def query_doc(
 ):
     try:
         log.debug(f"query_doc:doc {collection_name}")
-        result = VECTOR_DB_CLIENT.search(
-            collection_name=collection_name,
-            vectors=[query_embedding],
-            limit=k,
-        )
+        with RETRIEVAL_METRICS.stage("search"):
+            result = VECTOR_DB_CLIENT.search(
+                collection_name=collection_name,
+                vectors=[query_embedding],
+                limit=k,
+            )
 
         if result:
             log.info(f"query_doc:result {result.ids} {result.metadatas}")
@@ -117,12 +121,25 @@ def query_doc_with_hybrid_search(
     k_reranker: int,
     r: float,
 ) -> dict:
+    # Imported on first use, langchain.retrievers pulls in transformers
+    from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
+    from langchain_community.retrievers import BM25Retriever
+
     try:
         log.debug(f"query_doc_with_hybrid_search:doc {collection_name}")
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=collection_result.documents[0],
-            metadatas=collection_result.metadatas[0],
-        )
+        with RETRIEVAL_METRICS.stage("bm25"):
+            # Keep the chunk ids so results can be deduplicated without
+            # hashing their text
+            bm25_retriever = BM25Retriever.from_documents(
+                [
+                    Document(id=id, page_content=document, metadata=metadata)
+                    for id, document, metadata in zip(
+                        collection_result.ids[0],
+                        collection_result.documents[0],
+                        collection_result.metadatas[0],
+                    )
+                ]
+            )
         bm25_retriever.k = k
 
         vector_search_retriever = VectorSearchRetriever(
@@ -147,19 +164,17 @@ def query_doc_with_hybrid_search(
 
         result = compression_retriever.invoke(query)
 
+        # The compressor already returns the documents best first, so only
+        # min(k, k_reranker) items have to be kept
+        result = result[:k]
+
+        ids = [d.id for d in result]
         distances = [d.metadata.get("score") for d in result]
         documents = [d.page_content for d in result]
         metadatas = [d.metadata for d in result]
 
-        # retrieve only min(k, k_reranker) items, sort and cut by distance if k < k_reranker
-        if k < k_reranker:
-            sorted_items = sorted(
-                zip(distances, metadatas, documents), key=lambda x: x[0], reverse=True
-            )
-            sorted_items = sorted_items[:k]
-            distances, documents, metadatas = map(list, zip(*sorted_items))
-
         result = {
+            "ids": [ids],
             "distances": [distances],
             "documents": [documents],
             "metadatas": [metadatas],
@@ -196,43 +211,66 @@ def merge_get_results(get_results: list[dict]) -> dict:
     return result
 
 
+def get_top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first. Uses argpartition so only the
+    selected items are sorted; NaN scores end up last.
+    """
+    scores = np.nan_to_num(scores, nan=-np.inf)
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < scores.size:
+        indices = np.argpartition(-scores, k - 1)[:k]
+    else:
+        indices = np.arange(scores.size)
+
+    return indices[np.argsort(-scores[indices], kind="stable")]
+
+
 def merge_and_sort_query_results(query_results: list[dict], k: int) -> dict:
-    # Initialize lists to store combined data
-    combined = dict()  # To store documents with unique document hashes
+    distances = []
+    documents = []
+    metadatas = []
+    keys = []
 
     for data in query_results:
-        distances = data["distances"][0]
-        documents = data["documents"][0]
-        metadatas = data["metadatas"][0]
-
-        for distance, document, metadata in zip(distances, documents, metadatas):
-            if isinstance(document, str):
-                doc_hash = hashlib.sha256(
-                    document.encode()
-                ).hexdigest()  # Compute a hash for uniqueness
-
-                if doc_hash not in combined.keys():
-                    combined[doc_hash] = (distance, document, metadata)
-                    continue  # if doc is new, no further comparison is needed
-
-                # if doc is alredy in, but new distance is better, update
-                if distance > combined[doc_hash][0]:
-                    combined[doc_hash] = (distance, document, metadata)
-
-    combined = list(combined.values())
-    # Sort the list based on distances
-    combined.sort(key=lambda x: x[0], reverse=True)
-
-    # Slice to keep only the top k elements
-    sorted_distances, sorted_documents, sorted_metadatas = (
-        zip(*combined[:k]) if combined else ([], [], [])
+        result_documents = data["documents"][0]
+        result_ids = (data.get("ids") or [None])[0] or [None] * len(result_documents)
+
+        distances.extend(data["distances"][0])
+        documents.extend(result_documents)
+        metadatas.extend(data["metadatas"][0])
+        # Deduplicate on the chunk id returned by the vector DB, only falling
+        # back to the text itself when a result carries no ids (e.g. hybrid)
+        keys.extend(
+            str(id) if id is not None else document
+            for id, document in zip(result_ids, result_documents)
+        )
+
+    valid = np.fromiter(
+        (isinstance(document, str) for document in documents),
+        dtype=bool,
+        count=len(documents),
     )
+    if not valid.any():
+        return {"distances": [[]], "documents": [[]], "metadatas": [[]]}
+
+    scores = np.asarray(distances, dtype=np.float64)
+    candidates = np.flatnonzero(valid)
+
+    # Order every candidate by score once, then keep the first (best)
+    # occurrence of each key
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    _, first = np.unique(np.asarray(keys, dtype=object)[order], return_index=True)
+    unique = order[first]
+
+    selected = unique[get_top_k_indices(scores[unique], k)]
 
-    # Create and return the output dictionary
     return {
-        "distances": [list(sorted_distances)],
-        "documents": [list(sorted_documents)],
-        "metadatas": [list(sorted_metadatas)],
+        "distances": [[distances[i] for i in selected]],
+        "documents": [[documents[i] for i in selected]],
+        "metadatas": [[metadatas[i] for i in selected]],
     }
 
 
@@ -278,22 +316,30 @@ def query_collection(
             return None, e
 
     # Generate all query embeddings (in one call)
-    query_embeddings = embedding_function(queries, prefix=RAG_EMBEDDING_QUERY_PREFIX)
+    with RETRIEVAL_METRICS.stage("embed"):
+        query_embeddings = embedding_function(
+            queries, prefix=RAG_EMBEDDING_QUERY_PREFIX
+        )
     log.debug(
         f"query_collection: processing {len(queries)} queries across {len(collection_names)} collections"
     )
 
-    with ThreadPoolExecutor() as executor:
-        future_results = []
-        for query_embedding in query_embeddings:
-            for collection_name in collection_names:
-                result = executor.submit(
-                    process_query_collection, collection_name, query_embedding
-                )
-                future_results.append(result)
-        task_results = [future.result() for future in future_results]
+    task_results = run_with_deadline(
+        process_query_collection,
+        [
+            (collection_name, query_embedding)
+            for query_embedding in query_embeddings
+            for collection_name in collection_names
+        ],
+    )
+
+    for task_result in task_results:
+        if task_result is None:
+            # Dropped after the per-collection deadline
+            error = True
+            continue
 
-    for result, err in task_results:
+        result, err = task_result
         if err is not None:
             error = True
         elif result is not None:
@@ -316,20 +362,30 @@ def query_collection_with_hybrid_search(
 ) -> dict:
     results = []
     error = False
-    # Fetch collection data once per collection sequentially
+
+    # Fetch collection data once per collection, in parallel
     # Avoid fetching the same data multiple times later
-    collection_results = {}
-    for collection_name in collection_names:
+    def fetch_collection(collection_name):
         try:
             log.debug(
                 f"query_collection_with_hybrid_search:VECTOR_DB_CLIENT.get:collection {collection_name}"
             )
-            collection_results[collection_name] = VECTOR_DB_CLIENT.get(
-                collection_name=collection_name
-            )
+            return VECTOR_DB_CLIENT.get(collection_name=collection_name)
         except Exception as e:
             log.exception(f"Failed to fetch collection {collection_name}: {e}")
-            collection_results[collection_name] = None
+            return None
+
+    collection_names = list(collection_names)
+    collection_results = dict(
+        zip(
+            collection_names,
+            run_with_deadline(
+                fetch_collection,
+                [(collection_name,) for collection_name in collection_names],
+                stage="fetch",
+            ),
+        )
+    )
 
     log.info(
         f"Starting hybrid search for {len(queries)} queries in {len(collection_names)} collections..."
@@ -361,11 +417,15 @@ def query_collection_with_hybrid_search(
         for q in queries
     ]
 
-    with ThreadPoolExecutor() as executor:
-        future_results = [executor.submit(process_query, cn, q) for cn, q in tasks]
-        task_results = [future.result() for future in future_results]
+    task_results = run_with_deadline(process_query, tasks)
+
+    for task_result in task_results:
+        if task_result is None:
+            # Dropped after the per-collection deadline
+            error = True
+            continue
 
-    for result, err in task_results:
+        result, err = task_result
         if err is not None:
             error = True
         elif result is not None:
@@ -780,7 +840,6 @@ def generate_embeddings(
         return embeddings[0] if isinstance(text, str) else embeddings
 
 
-import operator
 from typing import Optional, Sequence
 
 from langchain_core.callbacks import Callbacks
@@ -805,35 +864,40 @@ class RerankCompressor(BaseDocumentCompressor):
     ) -> Sequence[Document]:
         reranking = self.reranking_function is not None
 
-        if reranking:
-            scores = self.reranking_function.predict(
-                [(query, doc.page_content) for doc in documents]
-            )
-        else:
-            from sentence_transformers import util
+        with RETRIEVAL_METRICS.stage("rerank"):
+            if reranking:
+                scores = self.reranking_function.predict(
+                    [(query, doc.page_content) for doc in documents]
+                )
+                # The external reranker returns None when its request failed.
+                # Raise, so hybrid search falls back to plain vector search.
+                if scores is None:
+                    raise ValueError("Reranking failed, no scores returned")
+            else:
+                from sentence_transformers import util
 
-            query_embedding = self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX)
-            document_embedding = self.embedding_function(
-                [doc.page_content for doc in documents], RAG_EMBEDDING_CONTENT_PREFIX
-            )
-            scores = util.cos_sim(query_embedding, document_embedding)[0]
+                query_embedding = self.embedding_function(
+                    query, RAG_EMBEDDING_QUERY_PREFIX
+                )
+                document_embedding = self.embedding_function(
+                    [doc.page_content for doc in documents],
+                    RAG_EMBEDDING_CONTENT_PREFIX,
+                )
+                scores = util.cos_sim(query_embedding, document_embedding)[0]
 
-        docs_with_scores = list(
-            zip(documents, scores.tolist() if not isinstance(scores, list) else scores)
-        )
+        if hasattr(scores, "detach"):
+            # torch tensor (cos_sim or a torch based reranker)
+            scores = scores.detach().cpu().numpy()
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+
+        candidates = np.arange(scores.size)
         if self.r_score:
-            docs_with_scores = [
-                (d, s) for d, s in docs_with_scores if s >= self.r_score
-            ]
+            candidates = candidates[scores >= self.r_score]
 
-        result = sorted(docs_with_scores, key=operator.itemgetter(1), reverse=True)
         final_results = []
-        for doc, doc_score in result[: self.top_n]:
-            metadata = doc.metadata
-            metadata["score"] = doc_score
-            doc = Document(
-                page_content=doc.page_content,
-                metadata=metadata,
-            )
+        for idx in candidates[get_top_k_indices(scores[candidates], self.top_n)]:
+            # Reuse the retrieved documents instead of rebuilding them
+            doc = documents[idx]
+            doc.metadata["score"] = float(scores[idx])
             final_results.append(doc)
         return final_results
@@ -1,8 +1,16 @@
 from typing import Optional, List, Dict, Any
+import hashlib
+import json
 import logging
+import re
+import threading
+import time
 from sqlalchemy import (
+    and_,
+    or_,
     cast,
     column,
+    func,
     create_engine,
     Column,
     Integer,
@@ -28,11 +36,29 @@ from open_webui.retrieval.vector.main import (
     SearchResult,
     GetResult,
 )
-from open_webui.config import PGVECTOR_DB_URL, PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH
+from open_webui.config import (
+    PGVECTOR_DB_URL,
+    PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH,
+    PGVECTOR_INDEX_METHOD,
+    PGVECTOR_IVFFLAT_LISTS,
+    PGVECTOR_IVFFLAT_PROBES,
+    PGVECTOR_HNSW_M,
+    PGVECTOR_HNSW_EF_CONSTRUCTION,
+    PGVECTOR_HNSW_EF_SEARCH,
+    PGVECTOR_ITERATIVE_SCAN,
+    PGVECTOR_EXACT_SEARCH_MAX_ROWS,
+    PGVECTOR_PARTIAL_INDEX_MIN_ROWS,
+)
 
 from open_webui.env import SRC_LOG_LEVELS
 
 VECTOR_LENGTH = PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH
+INDEX_METHODS = ("ivfflat", "hnsw")
+# How long collection sizes are trusted before they are counted again
+COLLECTION_SIZE_TTL = 60
+METADATA_INDEX_NAME = "idx_document_chunk_vmetadata"
+# Names of the ANN indexes managed here, the only ones drop_index accepts
+MANAGED_INDEX_PATTERN = re.compile(r"^idx_document_chunk_vector[a-z0-9_]*$")
 Base = declarative_base()
 
 log = logging.getLogger(__name__)
@@ -49,8 +75,57 @@ class DocumentChunk(Base):
     vmetadata = Column(MutableDict.as_mutable(JSONB), nullable=True)
 
 
+def get_index_name(method: str, collection_name: Optional[str] = None) -> str:
+    if collection_name:
+        digest = hashlib.md5(collection_name.encode()).hexdigest()[:16]
+        return f"idx_document_chunk_vector_{method}_{digest}"
+    # The original ivfflat index keeps its name so existing installs reuse it
+    return (
+        "idx_document_chunk_vector"
+        if method == "ivfflat"
+        else f"idx_document_chunk_vector_{method}"
+    )
+
+
+def get_filter_values(value: Any) -> List[Any]:
+    """
+    JSON values a metadata filter value matches. Filters used to compare the
+    values as text, so numbers and numeric strings still match each other.
+    """
+    values = [value]
+    if isinstance(value, bool):
+        return values
+    if isinstance(value, (int, float)):
+        values.append(str(value))
+    elif isinstance(value, str):
+        try:
+            number = json.loads(value)
+        except ValueError:
+            return values
+        if isinstance(number, (int, float)) and not isinstance(number, bool):
+            values.append(number)
+    return values
+
+
+def get_metadata_filter(filter: Dict[str, Any]):
+    # Containment (vmetadata @> ...) can use the GIN index on vmetadata
+    return and_(
+        *[
+            or_(
+                *[
+                    DocumentChunk.vmetadata.contains({key: value})
+                    for value in get_filter_values(value)
+                ]
+            )
+            for key, value in filter.items()
+        ]
+    )
+
+
 class PgvectorClient(VectorDBBase):
     def __init__(self) -> None:
+        self._collection_sizes: Dict[str, tuple[int, float]] = {}
+        self._building_indexes: set[str] = set()
 
         # if no pgvector uri, use the existing database connection
         if not PGVECTOR_DB_URL:
@@ -80,12 +155,13 @@ class PgvectorClient(VectorDBBase):
             Base.metadata.create_all(bind=connection)
 
             # Create an index on the vector column if it doesn't exist
-            self.session.execute(
-                text(
-                    "CREATE INDEX IF NOT EXISTS idx_document_chunk_vector "
-                    "ON document_chunk USING ivfflat (vector vector_cosine_ops) WITH (lists = 100);"
+            if PGVECTOR_INDEX_METHOD in INDEX_METHODS:
+                self.session.execute(text(self.get_index_ddl(PGVECTOR_INDEX_METHOD)))
+            elif PGVECTOR_INDEX_METHOD != "none":
+                log.warning(
+                    f"Unknown PGVECTOR_INDEX_METHOD '{PGVECTOR_INDEX_METHOD}', "
+                    "falling back to exact search"
                 )
-            )
             self.session.execute(
                 text(
                     "CREATE INDEX IF NOT EXISTS idx_document_chunk_collection_name "
@@ -99,6 +175,8 @@ class PgvectorClient(VectorDBBase):
             log.exception(f"Error during initialization: {e}")
             raise
 
+        self.maybe_create_metadata_index()
+
     def check_vector_length(self) -> None:
         """
         Check if the VECTOR_LENGTH matches the existing vector column dimension in the database.
@@ -145,6 +223,179 @@ class PgvectorClient(VectorDBBase):
             vector = vector[:VECTOR_LENGTH]
         return vector
 
+    ####################
+    # Index management
+    ####################
+
+    def get_index_ddl(
+        self,
+        method: str,
+        collection_name: Optional[str] = None,
+        concurrently: bool = False,
+    ) -> str:
+        if method == "hnsw":
+            using = (
+                "hnsw (vector vector_cosine_ops) WITH "
+                f"(m = {PGVECTOR_HNSW_M}, ef_construction = {PGVECTOR_HNSW_EF_CONSTRUCTION})"
+            )
+        elif method == "ivfflat":
+            using = (
+                "ivfflat (vector vector_cosine_ops) WITH "
+                f"(lists = {PGVECTOR_IVFFLAT_LISTS})"
+            )
+        else:
+            raise ValueError(f"Unsupported pgvector index method: {method}")
+
+        ddl = (
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS "
+            f"{get_index_name(method, collection_name)} ON document_chunk USING {using}"
+        )
+        if collection_name:
+            # Partial index: the planner uses it for searches in this collection
+            ddl += " WHERE collection_name = '{}'".format(
+                collection_name.replace("'", "''")
+            )
+        return ddl + ";"
+
+    def create_index(
+        self,
+        method: Optional[str] = None,
+        collection_name: Optional[str] = None,
+        concurrently: bool = False,
+    ) -> str:
+        """
+        Create the shared ANN index, or a partial one for `collection_name`.
+        CONCURRENTLY avoids blocking writes but has to run outside a
+        transaction, so the statement uses its own autocommit connection.
+        """
+        method = method or PGVECTOR_INDEX_METHOD
+        ddl = self.get_index_ddl(method, collection_name, concurrently)
+
+        start = time.time()
+        self.execute_autocommit(ddl)
+
+        name = get_index_name(method, collection_name)
+        log.info(f"Created index {name} in {time.time() - start:.1f}s")
+        return name
+
+    def execute_autocommit(self, statement: str) -> None:
+        # CONCURRENTLY statements cannot run inside a transaction
+        with self.session.bind.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as connection:
+            connection.execute(text(statement))
+
+    def drop_index(self, name: str) -> None:
+        if not MANAGED_INDEX_PATTERN.match(name):
+            raise ValueError(f"Refusing to drop index {name}")
+        self.execute_autocommit(f"DROP INDEX CONCURRENTLY IF EXISTS {name};")
+        log.info(f"Dropped index {name}")
+
+    def get_collection_size(self, collection_name: str, cached: bool = True) -> int:
+        if cached:
+            size, checked_at = self._collection_sizes.get(collection_name, (0, 0))
+            if time.time() - checked_at < COLLECTION_SIZE_TTL:
+                return size
+
+        size = (
+            self.session.query(DocumentChunk)
+            .filter(DocumentChunk.collection_name == collection_name)
+            .count()
+        )
+        self._collection_sizes[collection_name] = (size, time.time())
+        return size
+
+    def maybe_create_partial_index(self, collection_name: str) -> None:
+        """
+        Give collections that grew past PGVECTOR_PARTIAL_INDEX_MIN_ROWS their own
+        ANN index, built in the background so the insert is not held up.
+        """
+        if (
+            PGVECTOR_PARTIAL_INDEX_MIN_ROWS <= 0
+            or PGVECTOR_INDEX_METHOD not in INDEX_METHODS
+        ):
+            return
+
+        name = get_index_name(PGVECTOR_INDEX_METHOD, collection_name)
+        if name in self._building_indexes:
+            return
+        if (
+            self.get_collection_size(collection_name, cached=False)
+            < PGVECTOR_PARTIAL_INDEX_MIN_ROWS
+        ):
+            return
+        if self.session.execute(
+            text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {"name": name}
+        ).first():
+            return
+
+        def build():
+            try:
+                self.create_index(collection_name=collection_name)
+            except Exception as e:
+                log.exception(f"Error creating partial index {name}: {e}")
+            finally:
+                self._building_indexes.discard(name)
+
+        self._building_indexes.add(name)
+        threading.Thread(target=build, name=f"pgvector-{name}", daemon=True).start()
+
+    def maybe_create_metadata_index(self) -> None:
+        """
+        Let metadata filters (vmetadata @> ...) use a GIN index. Existing
+        installs may have a large document_chunk table, so the index is built
+        concurrently and in the background.
+        """
+        try:
+            if self.session.execute(
+                text("SELECT 1 FROM pg_indexes WHERE indexname = :name"),
+                {"name": METADATA_INDEX_NAME},
+            ).first():
+                return
+        except Exception as e:
+            self.session.rollback()
+            log.warning(f"Error checking index {METADATA_INDEX_NAME}: {e}")
+            return
+
+        def build():
+            try:
+                start = time.time()
+                self.execute_autocommit(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {METADATA_INDEX_NAME} "
+                    "ON document_chunk USING gin (vmetadata jsonb_path_ops);"
+                )
+                log.info(
+                    f"Created index {METADATA_INDEX_NAME} in {time.time() - start:.1f}s"
+                )
+            except Exception as e:
+                log.exception(f"Error creating index {METADATA_INDEX_NAME}: {e}")
+
+        threading.Thread(
+            target=build, name=f"pgvector-{METADATA_INDEX_NAME}", daemon=True
+        ).start()
+
+    def apply_search_settings(self, limit: Optional[int]) -> None:
+        """
+        Tune the ANN scan for the current transaction. HNSW never returns more
+        than ef_search rows, so it is raised to at least `limit`.
+        """
+        settings = {}
+        if PGVECTOR_INDEX_METHOD == "hnsw":
+            settings["hnsw.ef_search"] = max(PGVECTOR_HNSW_EF_SEARCH, limit or 0)
+            if PGVECTOR_ITERATIVE_SCAN:
+                settings["hnsw.iterative_scan"] = PGVECTOR_ITERATIVE_SCAN
+        elif PGVECTOR_INDEX_METHOD == "ivfflat":
+            settings["ivfflat.probes"] = PGVECTOR_IVFFLAT_PROBES
+            if PGVECTOR_ITERATIVE_SCAN:
+                # ivfflat only supports relaxed ordering
+                settings["ivfflat.iterative_scan"] = "relaxed_order"
+
+        for name, value in settings.items():
+            self.session.execute(
+                text("SELECT set_config(:name, :value, true)"),
+                {"name": name, "value": str(value)},
+            )
+
     def insert(self, collection_name: str, items: List[VectorItem]) -> None:
         try:
             new_items = []
@@ -167,6 +418,8 @@ class PgvectorClient(VectorDBBase):
             self.session.rollback()
             log.exception(f"Error during insert: {e}")
             raise
+        self._collection_sizes.pop(collection_name, None)
+        self.maybe_create_partial_index(collection_name)
 
     def upsert(self, collection_name: str, items: List[VectorItem]) -> None:
         try:
@@ -201,6 +454,8 @@ class PgvectorClient(VectorDBBase):
             self.session.rollback()
             log.exception(f"Error during upsert: {e}")
             raise
+        self._collection_sizes.pop(collection_name, None)
+        self.maybe_create_partial_index(collection_name)
 
     def search(
         self,
@@ -208,10 +463,33 @@ class PgvectorClient(VectorDBBase):
         vectors: List[List[float]],
         limit: Optional[int] = None,
     ) -> Optional[SearchResult]:
+        return self._search(collection_name, vectors, limit)
+
+    def _search(
+        self,
+        collection_name: str,
+        vectors: List[List[float]],
+        limit: Optional[int] = None,
+        exact: Optional[bool] = None,
+    ) -> Optional[SearchResult]:
+        """
+        Small collections are searched exactly (unless `exact` says
+        otherwise): the shared ANN index would return the nearest rows of
+        *all* collections and leave few rows for this one after filtering.
+        """
         try:
             if not vectors:
                 return None
 
+            if exact is None:
+                exact = (
+                    PGVECTOR_INDEX_METHOD not in INDEX_METHODS
+                    or self.get_collection_size(collection_name)
+                    <= PGVECTOR_EXACT_SEARCH_MAX_ROWS
+                )
+            if not exact:
+                self.apply_search_settings(limit)
+
             # Adjust query vectors to VECTOR_LENGTH
             vectors = [self.adjust_vector_length(vector) for vector in vectors]
             num_queries = len(vectors)
@@ -230,20 +508,19 @@ class PgvectorClient(VectorDBBase):
                 .alias("query_vectors")
             )
 
+            distance = DocumentChunk.vector.cosine_distance(query_vectors.c.q_vector)
+
             # Build the lateral subquery for each query vector
             subq = (
                 select(
                     DocumentChunk.id,
                     DocumentChunk.text,
                     DocumentChunk.vmetadata,
-                    (
-                        DocumentChunk.vector.cosine_distance(query_vectors.c.q_vector)
-                    ).label("distance"),
-                )
-                .where(DocumentChunk.collection_name == collection_name)
-                .order_by(
-                    (DocumentChunk.vector.cosine_distance(query_vectors.c.q_vector))
-                )
+                    distance.label("distance"),
+                ).where(DocumentChunk.collection_name == collection_name)
+                # ANN indexes only match a bare `vector <=> q` ordering, adding
+                # zero forces an exact scan over the collection's rows
+                .order_by(distance + 0 if exact else distance)
             )
             if limit is not None:
                 subq = subq.limit(limit)
@@ -292,6 +569,7 @@ class PgvectorClient(VectorDBBase):
                 ids=ids, distances=distances, documents=documents, metadatas=metadatas
             )
         except Exception as e:
+            self.session.rollback()
             log.exception(f"Error during search: {e}")
             return None
 
@@ -303,8 +581,8 @@ class PgvectorClient(VectorDBBase):
                 DocumentChunk.collection_name == collection_name
             )
 
-            for key, value in filter.items():
-                query = query.filter(DocumentChunk.vmetadata[key].astext == str(value))
+            if filter:
+                query = query.filter(get_metadata_filter(filter))
 
             if limit is not None:
                 query = query.limit(limit)
@@ -364,12 +642,10 @@ class PgvectorClient(VectorDBBase):
             if ids:
                 query = query.filter(DocumentChunk.id.in_(ids))
             if filter:
-                for key, value in filter.items():
-                    query = query.filter(
-                        DocumentChunk.vmetadata[key].astext == str(value)
-                    )
+                query = query.filter(get_metadata_filter(filter))
             deleted = query.delete(synchronize_session=False)
             self.session.commit()
+            self._collection_sizes.pop(collection_name, None)
             log.info(f"Deleted {deleted} items from collection '{collection_name}'.")
         except Exception as e:
             self.session.rollback()
@@ -380,6 +656,7 @@ class PgvectorClient(VectorDBBase):
         try:
             deleted = self.session.query(DocumentChunk).delete()
             self.session.commit()
+            self._collection_sizes.clear()
             log.info(
                 f"Reset complete. Deleted {deleted} items from 'document_chunk' table."
             )
@@ -407,3 +684,133 @@ class PgvectorClient(VectorDBBase):
     def delete_collection(self, collection_name: str) -> None:
         self.delete(collection_name)
         log.info(f"Collection '{collection_name}' deleted.")
+
+    ####################
+    # Index health
+    ####################
+
+    def get_index_health(self) -> Dict[str, Any]:
+        """
+        Report the vector indexes on document_chunk (validity, size, scans),
+        the table size and the largest collections, for tuning the settings.
+        """
+        indexes = self.session.execute(
+            text(
+                "SELECT s.indexrelname AS name, "
+                "pg_get_indexdef(s.indexrelid) AS definition, "
+                "pg_relation_size(s.indexrelid) AS size_bytes, "
+                "s.idx_scan AS scans, i.indisvalid AS valid "
+                "FROM pg_stat_user_indexes s "
+                "JOIN pg_index i ON i.indexrelid = s.indexrelid "
+                "WHERE s.relname = 'document_chunk' "
+                "ORDER BY s.indexrelname"
+            )
+        ).all()
+        table = self.session.execute(
+            text(
+                "SELECT c.reltuples::bigint AS estimated_rows, "
+                "pg_total_relation_size(c.oid) AS size_bytes "
+                "FROM pg_class c WHERE c.relname = 'document_chunk'"
+            )
+        ).first()
+        version = self.session.execute(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        ).scalar()
+        collections = self.session.execute(
+            text(
+                "SELECT collection_name, count(*) AS rows FROM document_chunk "
+                "GROUP BY collection_name ORDER BY rows DESC LIMIT 20"
+            )
+        ).all()
+        self.session.commit()
+
+        partial_indexes = {
+            row.name: row.definition for row in indexes if " WHERE " in row.definition
+        }
+
+        return {
+            "pgvector_version": version,
+            "settings": {
+                "index_method": PGVECTOR_INDEX_METHOD,
+                "ivfflat_lists": PGVECTOR_IVFFLAT_LISTS,
+                "ivfflat_probes": PGVECTOR_IVFFLAT_PROBES,
+                "hnsw_m": PGVECTOR_HNSW_M,
+                "hnsw_ef_construction": PGVECTOR_HNSW_EF_CONSTRUCTION,
+                "hnsw_ef_search": PGVECTOR_HNSW_EF_SEARCH,
+                "iterative_scan": PGVECTOR_ITERATIVE_SCAN or None,
+                "exact_search_max_rows": PGVECTOR_EXACT_SEARCH_MAX_ROWS,
+                "partial_index_min_rows": PGVECTOR_PARTIAL_INDEX_MIN_ROWS,
+            },
+            "table": {
+                "estimated_rows": table.estimated_rows if table else 0,
+                "size_bytes": table.size_bytes if table else 0,
+            },
+            "indexes": [dict(row._mapping) for row in indexes],
+            "building_indexes": sorted(self._building_indexes),
+            "largest_collections": [
+                {
+                    "collection_name": row.collection_name,
+                    "rows": row.rows,
+                    "exact_search": row.rows <= PGVECTOR_EXACT_SEARCH_MAX_ROWS,
+                    "partial_index": any(
+                        get_index_name(method, row.collection_name) in partial_indexes
+                        for method in INDEX_METHODS
+                    ),
+                }
+                for row in collections
+            ],
+        }
+
+    def evaluate_recall(
+        self,
+        collection_name: Optional[str] = None,
+        sample_size: int = 20,
+        k: int = 10,
+    ) -> Dict[str, Any]:
+        """
+        Use `sample_size` stored vectors as queries and compare the ANN results
+        with an exact search, returning recall@k and the latency of both.
+        """
+        query = self.session.query(DocumentChunk.id, DocumentChunk.collection_name)
+        if collection_name:
+            query = query.filter(DocumentChunk.collection_name == collection_name)
+        sample = query.order_by(func.random()).limit(sample_size).all()
+
+        recalls = []
+        ann_seconds = 0.0
+        exact_seconds = 0.0
+        for chunk_id, chunk_collection_name in sample:
+            vector = self.session.execute(
+                select(DocumentChunk.vector).where(DocumentChunk.id == chunk_id)
+            ).scalar()
+            if vector is None:
+                continue
+            vector = [float(v) for v in vector]
+
+            start = time.perf_counter()
+            ann = self._search(chunk_collection_name, [vector], k, exact=False)
+            ann_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            exact = self._search(chunk_collection_name, [vector], k, exact=True)
+            exact_seconds += time.perf_counter() - start
+
+            if not ann or not exact or not exact.ids[0]:
+                continue
+            expected = set(exact.ids[0])
+            recalls.append(len(expected & set(ann.ids[0])) / len(expected))
+        self.session.commit()
+
+        evaluated = len(recalls)
+        return {
+            "collection_name": collection_name,
+            "index_method": PGVECTOR_INDEX_METHOD,
+            "k": k,
+            "sample_size": evaluated,
+            "recall": sum(recalls) / evaluated if evaluated else None,
+            "min_recall": min(recalls) if recalls else None,
+            "ann_latency_ms": ann_seconds * 1000 / evaluated if evaluated else None,
+            "exact_latency_ms": (
+                exact_seconds * 1000 / evaluated if evaluated else None
+            ),
+        }
@@ -18,7 +18,7 @@ from fastapi import (
 )
 from fastapi.responses import FileResponse, StreamingResponse
 from open_webui.constants import ERROR_MESSAGES
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import SRC_LOG_LEVELS, ENABLE_BACKGROUND_INGESTION
 
 from open_webui.models.users import Users
 from open_webui.models.files import (
@@ -34,6 +34,11 @@ from open_webui.routers.retrieval import ProcessFileForm, process_file
 from open_webui.routers.audio import transcribe
 from open_webui.storage.provider import Storage
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.ingestion import (
+    enqueue_ingestion_job,
+    get_ingestion_priority,
+    register_ingestion_handler,
+)
 from pydantic import BaseModel
 
 log = logging.getLogger(__name__)
@@ -75,6 +80,72 @@ def has_access_to_file(
     return has_access
 
 
+############################
+# Process Uploaded File
+############################
+
+
+def process_uploaded_file(request: Request, file: FileModel, user, context=None):
+    content_type = (file.meta or {}).get("content_type") or ""
+
+    if content_type.startswith(
+        (
+            "audio/mpeg",
+            "audio/wav",
+            "audio/ogg",
+            "audio/x-m4a",
+            "audio/webm",
+            "video/webm",
+        )
+    ):
+        if context:
+            context.report_progress(10, "transcribing")
+        file_path = Storage.get_file(file.path)
+        result = transcribe(request, file_path)
+
+        if context:
+            context.report_progress(60, "embedding")
+        process_file(
+            request,
+            ProcessFileForm(file_id=file.id, content=result.get("text", "")),
+            user=user,
+        )
+    elif content_type not in [
+        "image/png",
+        "image/jpeg",
+        "image/gif",
+        "video/mp4",
+        "video/ogg",
+        "video/quicktime",
+    ]:
+        if context:
+            context.report_progress(10, "processing")
+        process_file(request, ProcessFileForm(file_id=file.id), user=user)
+
+
+@register_ingestion_handler("file")
+def process_uploaded_file_job(request: Request, job, user, context):
+    file = Files.get_file_by_id(job.payload.get("file_id"))
+    if not file:
+        raise ValueError(ERROR_MESSAGES.NOT_FOUND)
+
+    Files.update_file_data_by_id(file.id, {"status": "processing"})
+    try:
+        process_uploaded_file(request, file, user, context)
+    except Exception as e:
+        Files.update_file_data_by_id(
+            file.id,
+            {
+                "status": "failed",
+                "error": str(e.detail) if hasattr(e, "detail") else str(e),
+            },
+        )
+        raise
+
+    Files.update_file_data_by_id(file.id, {"status": "completed", "error": None})
+    return {"file_id": file.id}
+
+
 ############################
 # Upload File
 ############################
@@ -87,6 +158,8 @@ def upload_file(
     user=Depends(get_verified_user),
     file_metadata: dict = None,
     process: bool = Query(True),
+    background: Optional[bool] = Query(None),
+    priority: int = Query(0),
 ):
     log.info(f"file.content_type: {file.content_type}")
 
@@ -123,47 +196,38 @@ def upload_file(
                 }
             ),
         )
+        if background is None:
+            background = ENABLE_BACKGROUND_INGESTION
+
         if process:
-            try:
+            if background:
+                # Return right away, the ingestion workers pick the job up
+                job = enqueue_ingestion_job(
+                    user.id,
+                    "file",
+                    {"file_id": id},
+                    priority=get_ingestion_priority(user, priority),
+                )
+                if not job:
+                    raise Exception("Error queueing file for processing")
 
-                if file.content_type.startswith(
-                    (
-                        "audio/mpeg",
-                        "audio/wav",
-                        "audio/ogg",
-                        "audio/x-m4a",
-                        "audio/webm",
-                        "video/webm",
-                    )
-                ):
-                    file_path = Storage.get_file(file_path)
-                    result = transcribe(request, file_path)
-
-                    process_file(
-                        request,
-                        ProcessFileForm(file_id=id, content=result.get("text", "")),
-                        user=user,
-                    )
-                elif file.content_type not in [
-                    "image/png",
-                    "image/jpeg",
-                    "image/gif",
-                    "video/mp4",
-                    "video/ogg",
-                    "video/quicktime",
-                ]:
-                    process_file(request, ProcessFileForm(file_id=id), user=user)
-
-                file_item = Files.get_file_by_id(id=id)
-            except Exception as e:
-                log.exception(e)
-                log.error(f"Error processing file: {file_item.id}")
-                file_item = FileModelResponse(
-                    **{
-                        **file_item.model_dump(),
-                        "error": str(e.detail) if hasattr(e, "detail") else str(e),
-                    }
+                file_item = Files.update_file_data_by_id(
+                    id, {"status": "pending", "job_id": job.id}
                 )
+                file_item = FileModelResponse(**file_item.model_dump(), job_id=job.id)
+            else:
+                try:
+                    process_uploaded_file(request, file_item, user)
+                    file_item = Files.get_file_by_id(id=id)
+                except Exception as e:
+                    log.exception(e)
+                    log.error(f"Error processing file: {file_item.id}")
+                    file_item = FileModelResponse(
+                        **{
+                            **file_item.model_dump(),
+                            "error": str(e.detail) if hasattr(e, "detail") else str(e),
+                        }
+                    )
 
         if file_item:
             return file_item
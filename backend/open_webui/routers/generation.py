@@ -0,0 +1,62 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from open_webui.constants import ERROR_MESSAGES
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.models.generation_jobs import GenerationJobs
+from open_webui.utils.auth import get_admin_user
+from open_webui.utils.generation import (
+    handle_generation_callback,
+    verify_callback_signature,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+router = APIRouter()
+
+
+############################
+# ProviderCallback
+############################
+
+
+@router.post("/callback/{provider}/{job_id}")
+async def provider_callback(
+    provider: str, job_id: str, request: Request, signature: str = ""
+):
+    # Called by the upstream provider: the signature in the URL handed out on
+    # submit stands in for authentication
+    if not signature or not verify_callback_signature(provider, job_id, signature):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=ERROR_MESSAGES.ACCESS_PROHIBITED,
+        )
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.INCORRECT_FORMAT(),
+        )
+
+    job = await handle_generation_callback(provider, job_id, payload)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+    return {"code": 0, "message": "ok"}
+
+
+############################
+# GetProviderStats
+############################
+
+
+@router.get("/stats")
+async def get_provider_stats(user=Depends(get_admin_user)):
+    return GenerationJobs.get_provider_stats()
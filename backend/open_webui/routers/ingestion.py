@@ -0,0 +1,91 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from open_webui.constants import ERROR_MESSAGES
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.models.ingestion_jobs import (
+    IngestionJobs,
+    IngestionJobResponse,
+)
+from open_webui.utils.auth import get_verified_user
+from open_webui.utils.ingestion import emit_ingestion_event, ingestion_worker_pool
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+router = APIRouter()
+
+
+def get_job_for_user(id: str, user):
+    job = IngestionJobs.get_job_by_id(id)
+    if not job or (job.user_id != user.id and user.role != "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+    return job
+
+
+############################
+# GetJobs
+############################
+
+
+@router.get("/jobs", response_model=list[IngestionJobResponse])
+async def get_jobs(
+    status: Optional[str] = None,
+    limit: int = 50,
+    user=Depends(get_verified_user),
+):
+    return IngestionJobs.get_jobs_by_user_id(user.id, status=status, limit=limit)
+
+
+############################
+# GetJobById
+############################
+
+
+@router.get("/jobs/{id}", response_model=IngestionJobResponse)
+async def get_job_by_id(id: str, user=Depends(get_verified_user)):
+    return get_job_for_user(id, user)
+
+
+############################
+# CancelJobById
+############################
+
+
+@router.post("/jobs/{id}/cancel", response_model=IngestionJobResponse)
+async def cancel_job_by_id(id: str, user=Depends(get_verified_user)):
+    job = get_job_for_user(id, user)
+    if job.status not in ("queued", "running"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(f"Job is already {job.status}"),
+        )
+
+    job = IngestionJobs.cancel_job_by_id(id)
+    await emit_ingestion_event(job)
+    return job
+
+
+############################
+# RetryJobById
+############################
+
+
+@router.post("/jobs/{id}/retry", response_model=IngestionJobResponse)
+async def retry_job_by_id(id: str, user=Depends(get_verified_user)):
+    job = get_job_for_user(id, user)
+    if job.status not in ("failed", "cancelled"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(f"Job is {job.status}"),
+        )
+
+    job = IngestionJobs.retry_job_by_id(id)
+    ingestion_worker_pool.notify()
+    await emit_ingestion_event(job)
+    return job
@@ -15,8 +15,23 @@ import httpx
 import logging
 
 from open_webui.utils.auth import get_verified_user, get_admin_user
-from open_webui.models.credits import Credits, AddCreditForm, SetCreditFormDetail
+from open_webui.models.credits import Credits, CreditReservations, SetCreditFormDetail
 from open_webui.models.jimeng_tasks import JimengTasks, JimengTaskForm
+from open_webui.utils.generation import (
+    GenerationProvider,
+    GenerationProviderError,
+    GenerationResult,
+    enqueue_generation_job,
+    get_callback_url,
+    register_generation_provider,
+    reserve_generation_credits,
+)
+from open_webui.utils.http_client import get_http_client
+from open_webui.utils.media import (
+    decode_task_cursor,
+    get_task_list_limit,
+    get_task_list_response,
+)
 from open_webui.config import (
     JIMENG_ENABLED,
     JIMENG_API_URL,
@@ -24,7 +39,6 @@ from open_webui.config import (
     JIMENG_CREDITS_5S,
     JIMENG_CREDITS_10S,
 )
-from decimal import Decimal
 
 log = logging.getLogger(__name__)
 
@@ -149,51 +163,51 @@ async def verify_jimeng_connection(request: Request, user=Depends(get_admin_user
         test_url = f"{api_url}/jimeng/submit/videos"
 
         # 发送测试请求（使用最小参数来验证API连接和认证）
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                test_url,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "prompt": "test connection",
-                    "duration": 5,
-                    "aspect_ratio": "16:9",
-                    "cfg_scale": 0.5,
-                },
-            )
+        client = get_http_client("jimeng")
+        response = await client.post(
+            test_url,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "prompt": "test connection",
+                "duration": 5,
+                "aspect_ratio": "16:9",
+                "cfg_scale": 0.5,
+            },
+        )
 
-            log.info(f"即梦API测试响应: HTTP {response.status_code}")
-
-            # 检查响应状态
-            if response.status_code == 200:
-                try:
-                    result = response.json()
-                    log.info(f"即梦API测试响应内容: {result}")
-                    if result.get("code") == "success":
-                        return {"message": "连接成功，API正常", "status": "success"}
-                    else:
-                        return {
-                            "message": f"API错误: {result.get('message', '未知错误')}",
-                            "status": "error",
-                        }
-                except Exception as e:
-                    log.error(f"解析API响应失败: {e}")
-                    return {"message": "API响应解析失败", "status": "error"}
-            elif response.status_code == 401 or response.status_code == 403:
-                return {
-                    "message": f"API Key无效或权限不足: HTTP {response.status_code}",
-                    "status": "error",
-                }
-            elif response.status_code == 400:
-                log.warning(f"API参数错误，但连接正常")
-                return {"message": "连接成功，但参数格式有误", "status": "warning"}
-            else:
-                return {
-                    "message": f"连接失败: HTTP {response.status_code}",
-                    "status": "error",
-                }
+        log.info(f"即梦API测试响应: HTTP {response.status_code}")
+
+        # 检查响应状态
+        if response.status_code == 200:
+            try:
+                result = response.json()
+                log.info(f"即梦API测试响应内容: {result}")
+                if result.get("code") == "success":
+                    return {"message": "连接成功，API正常", "status": "success"}
+                else:
+                    return {
+                        "message": f"API错误: {result.get('message', '未知错误')}",
+                        "status": "error",
+                    }
+            except Exception as e:
+                log.error(f"解析API响应失败: {e}")
+                return {"message": "API响应解析失败", "status": "error"}
+        elif response.status_code == 401 or response.status_code == 403:
+            return {
+                "message": f"API Key无效或权限不足: HTTP {response.status_code}",
+                "status": "error",
+            }
+        elif response.status_code == 400:
+            log.warning(f"API参数错误，但连接正常")
+            return {"message": "连接成功，但参数格式有误", "status": "warning"}
+        else:
+            return {
+                "message": f"连接失败: HTTP {response.status_code}",
+                "status": "error",
+            }
 
     except Exception as e:
         log.error(f"验证即梦连接失败: {e}")
@@ -251,26 +265,21 @@ async def generate_video(
         else:
             credits_cost = JIMENG_CREDITS_10S.value
 
-        # 检查用户积分
-        try:
-            user_credit = Credits.get_credit_by_user_id(user.id)
-            if not user_credit or user_credit.credit < credits_cost:
-                current_credits = user_credit.credit if user_credit else 0
-                log.warning(
-                    f"用户 {user.id} 积分不足: 当前{current_credits}, 需要{credits_cost}"
-                )
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"积分不足，当前{current_credits}v豆，需要{credits_cost}v豆",
-                )
-        except HTTPException:
-            raise
-        except Exception as e:
-            log.error(f"检查积分失败: {e}")
-            raise HTTPException(status_code=400, detail="积分系统错误")
-
-        # 构建即梦API请求
-        jimeng_api_url = f"{api_url}/jimeng/submit/videos"
+        # 预留积分，任务完成时确认扣除，失败时由任务引擎释放
+        task_id = str(uuid.uuid4())
+        reservation = reserve_generation_credits(
+            user.id,
+            credits_cost,
+            SetCreditFormDetail(
+                desc=f"即梦视频生成-{generate_request.duration}秒",
+                api_path="/jimeng/generate",
+                api_params={"task_id": task_id},
+                usage={
+                    "credits_used": credits_cost,
+                    "duration": generate_request.duration,
+                },
+            ),
+        )
 
         # 构建请求参数
         api_params = {
@@ -284,238 +293,214 @@ async def generate_video(
         if generate_request.image_url:
             api_params["image_url"] = generate_request.image_url
 
-        # 调用即梦API
-        log.info(f"用户 {user.id} 发起视频生成请求，调用即梦API: {jimeng_api_url}")
-        log.info(f"请求参数: {json.dumps(api_params, ensure_ascii=False, indent=2)}")
+        # 保存任务到数据库，由任务引擎提交到即梦平台
+        task_form = JimengTaskForm(
+            task_id=task_id,
+            user_id=user.id,
+            prompt=generate_request.prompt,
+            image_url=generate_request.image_url,
+            duration=generate_request.duration,
+            aspect_ratio=generate_request.aspect_ratio,
+            cfg_scale=generate_request.cfg_scale,
+            status=TaskStatus.NOT_START,
+            credits_used=credits_cost,
+            request_params=api_params,
+        )
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                jimeng_api_url,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json=api_params,
+        stored_task = JimengTasks.insert_new_task(task_form)
+        if not stored_task:
+            CreditReservations.release_reservation_by_id(reservation.id)
+            raise HTTPException(status_code=500, detail="任务创建失败，请稍后重试")
+
+        enqueue_generation_job(
+            "jimeng", task_id, user.id, credits_cost, reservation_id=reservation.id
+        )
+
+        log.info(f"视频生成任务已创建: user_id={user.id}, task_id={task_id}")
+
+        return {
+            "task_id": task_id,
+            "status": TaskStatus.SUBMITTED,
+            "message": "视频生成任务已提交到即梦平台",
+            "credits_used": credits_cost,
+        }
+
+    except HTTPException as he:
+        log.error(f"HTTP异常: {he.status_code} - {he.detail}")
+        raise
+    except Exception as e:
+        log.error(f"生成视频失败: {e}")
+        raise HTTPException(status_code=500, detail=f"生成视频失败: {str(e)}")
+
+
+def get_jimeng_task_update(task_data: Dict[str, Any]) -> Dict[str, Any]:
+    """从即梦任务数据中提取状态和视频信息（尝试多种可能的数据结构）"""
+    status = task_data.get("status")
+    update_data = {"status": status}
+
+    # 如果任务失败，记录失败原因
+    if status == TaskStatus.FAILURE:
+        update_data["fail_reason"] = task_data.get("fail_reason") or "未知错误"
+
+    if status == TaskStatus.SUCCESS:
+        video_url = None
+        inner = task_data.get("data") or {}
+
+        if isinstance(inner.get("data"), dict) and inner["data"].get("video"):
+            # 原来的路径：task_data.data.data.video
+            video_url = inner["data"]["video"]
+        elif inner.get("video"):
+            video_url = inner["video"]
+        elif task_data.get("video"):
+            video_url = task_data["video"]
+        elif task_data.get("video_url"):
+            video_url = task_data["video_url"]
+
+        if video_url:
+            update_data.update(
+                {
+                    "video_url": video_url,
+                    "video_id": task_data.get("task_id"),
+                    "finish_time": task_data.get("finish_time"),
+                }
+            )
+        else:
+            log.warning(
+                f"即梦任务已成功但无法提取视频URL，task_data结构: {list(task_data.keys())}"
             )
 
-            log.info(f"即梦API响应状态: HTTP {response.status_code}")
+    return update_data
 
-            if not response.is_success:
-                error_detail = f"即梦API调用失败: HTTP {response.status_code}"
-                try:
-                    error_data = response.json()
-                    log.error(f"即梦API错误响应: {error_data}")
-                    if "message" in error_data:
-                        error_detail = f"即梦API错误: {error_data['message']}"
-                except:
-                    error_detail = f"即梦API调用失败: HTTP {response.status_code}"
 
-                log.error(f"即梦API调用失败: {error_detail}")
-                raise HTTPException(status_code=400, detail=error_detail)
+@register_generation_provider
+class JimengProvider(GenerationProvider):
+    """由任务引擎驱动的即梦任务提交与轮询"""
 
-            # 解析API响应
-            try:
-                api_result = response.json()
-                log.info(f"即梦API成功响应: {api_result}")
-            except Exception as e:
-                log.error(f"解析即梦API响应失败: {e}")
-                raise HTTPException(status_code=500, detail="即梦API响应解析失败")
+    name = "jimeng"
+    title = "即梦视频"
+    max_concurrency = 5
+    poll_interval = 5
+    timeout = 1800
+    # 提交时带上notify_hook，超过该时间未收到回调才开始轮询
+    callback_timeout = 300
 
-            # 检查API响应格式
-            if api_result.get("code") != "success":
-                error_msg = api_result.get("message", "未知错误")
-                log.error(f"即梦API业务错误: {error_msg}")
-                raise HTTPException(status_code=400, detail=f"即梦API错误: {error_msg}")
+    def get_credentials(self, app):
+        api_url = JIMENG_API_URL.value
+        api_key = JIMENG_API_KEY.value
+        if not api_url or not api_key:
+            raise GenerationProviderError("即梦API配置不完整，请联系管理员")
+        return api_url, api_key
 
-            # 提取任务ID
-            task_id = api_result.get("data")
-            if not task_id:
-                log.error("即梦API响应缺少任务ID")
-                raise HTTPException(status_code=500, detail="即梦API响应格式错误")
+    def get_headers(self, api_key: str) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
 
-            log.info(f"即梦API成功创建任务: task_id={task_id}")
+    async def submit(self, app, job):
+        task = JimengTasks.get_task_by_id(job.task_id)
+        if not task:
+            raise GenerationProviderError("任务不存在")
+
+        api_url, api_key = self.get_credentials(app)
+        api_params = json.loads(task.request_params) if task.request_params else {}
+        callback_url = get_callback_url(app, job)
+        if callback_url:
+            api_params["notify_hook"] = callback_url
+
+        client = get_http_client("jimeng")
+        response = await client.post(
+            f"{api_url}/jimeng/submit/videos",
+            headers=self.get_headers(api_key),
+            json=api_params,
+        )
 
-            # 扣除用户积分
+        if not response.is_success:
+            error_detail = f"即梦API调用失败: HTTP {response.status_code}"
             try:
-                user_credit = Credits.get_credit_by_user_id(user.id)
-                old_credits = user_credit.credit
-                Credits.update_credit_by_user_id(
-                    user.id, user_credit.credit - credits_cost
-                )
-                log.info(
-                    f"用户 {user.id} 积分扣除成功: {old_credits} -> {old_credits - credits_cost} (扣除{credits_cost})"
-                )
-            except Exception as e:
-                log.error(f"扣除积分失败: {e}")
-                # 注意：这里不抛出异常，因为外部API已经调用成功
-
-            # 保存任务到数据库
-            task_form = JimengTaskForm(
-                task_id=task_id,
-                user_id=user.id,
-                prompt=generate_request.prompt,
-                image_url=generate_request.image_url,
-                duration=generate_request.duration,
-                aspect_ratio=generate_request.aspect_ratio,
-                cfg_scale=generate_request.cfg_scale,
-                status=TaskStatus.SUBMITTED,
-                credits_used=credits_cost,
-                request_params=api_params,
-                api_response=api_result,
+                error_data = response.json()
+                if "message" in error_data:
+                    error_detail = f"即梦API错误: {error_data['message']}"
+            except Exception:
+                pass
+            raise GenerationProviderError(
+                error_detail, retryable=response.status_code in (429, 503)
             )
 
-            stored_task = JimengTasks.insert_new_task(task_form)
-            if not stored_task:
-                log.error(f"任务存储失败: {task_id}")
-                # 不抛出异常，任务已经提交到即梦平台
-
-            log.info(
-                f"视频生成任务成功提交到即梦平台: user_id={user.id}, task_id={task_id}"
+        api_result = response.json()
+        if api_result.get("code") != "success" or not api_result.get("data"):
+            raise GenerationProviderError(
+                f"即梦API错误: {api_result.get('message', '未知错误')}"
             )
 
-            # 启动后台任务轮询状态
-            background_tasks.add_task(
-                poll_task_status, request.app, task_id, api_url, api_key
+        external_id = api_result["data"]
+        JimengTasks.update_task_by_id(
+            job.task_id,
+            {"status": TaskStatus.SUBMITTED, "api_response": api_result},
+        )
+        log.info(f"即梦任务已提交: {job.task_id} -> {external_id}")
+
+        return GenerationResult(external_id=external_id, progress=10)
+
+    async def poll(self, app, job):
+        api_url, api_key = self.get_credentials(app)
+
+        client = get_http_client("jimeng")
+        response = await client.get(
+            f"{api_url}/jimeng/fetch/{job.external_id}",
+            headers=self.get_headers(api_key),
+            timeout=30.0,
+        )
+        response.raise_for_status()
+
+        result = response.json()
+        if result.get("code") != "success" or "data" not in result:
+            raise GenerationProviderError(
+                f"即梦API错误: {result.get('message', '未知错误')}", retryable=True
             )
 
-            return {
-                "task_id": task_id,
-                "status": TaskStatus.SUBMITTED,
-                "message": "视频生成任务已提交到即梦平台",
-                "credits_used": credits_cost,
-            }
+        return self.apply_status(job, result["data"])
 
-    except HTTPException as he:
-        log.error(f"HTTP异常: {he.status_code} - {he.detail}")
-        raise
-    except Exception as e:
-        log.error(f"生成视频失败: {e}")
-        raise HTTPException(status_code=500, detail=f"生成视频失败: {str(e)}")
+    def get_callback_external_id(self, payload):
+        return self.get_callback_task(payload).get("task_id")
+
+    def apply_callback(self, job, payload):
+        return self.apply_status(job, self.get_callback_task(payload))
+
+    def get_callback_task(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        # notify_hook推送的是与查询接口相同的任务对象，兼容带code/data外层的格式
+        if "code" in payload and isinstance(payload.get("data"), dict):
+            return payload["data"]
+        return payload
+
+    def apply_status(self, job, task_data: Dict[str, Any]):
+        """将即梦任务状态写入任务记录"""
+        update_data = get_jimeng_task_update(task_data)
+        status = update_data["status"]
+
+        if status == TaskStatus.FAILURE:
+            return GenerationResult(status="failed", error=update_data["fail_reason"])
+
+        JimengTasks.update_task_by_id(job.task_id, update_data)
+
+        if status == TaskStatus.SUCCESS:
+            return GenerationResult(status="completed", progress=100)
+        return GenerationResult(
+            progress=50 if status == TaskStatus.IN_PROGRESS else job.progress
+        )
+
+    def on_failed(self, job, error):
+        JimengTasks.update_task_by_id(
+            job.task_id,
+            {"status": TaskStatus.FAILURE, "fail_reason": error},
+        )
 
+    def on_cancelled(self, job):
+        self.on_failed(job, "任务已取消")
 
-async def poll_task_status(app, task_id: str, api_url: str, api_key: str):
-    """后台任务：轮询任务状态"""
-    max_attempts = 60  # 最多尝试60次
-    poll_interval = 5  # 每5秒查询一次
-
-    for attempt in range(max_attempts):
-        try:
-            await asyncio.sleep(poll_interval)
-
-            # 构建查询URL
-            status_url = f"{api_url}/jimeng/fetch/{task_id}"
-
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    status_url,
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json",
-                    },
-                )
-
-                if response.is_success:
-                    result = response.json()
-
-                    if result.get("code") == "success" and "data" in result:
-                        task_data = result["data"]
-                        new_status = task_data.get("status")
-
-                        # 更新任务状态到数据库
-                        stored_task = JimengTasks.get_task_by_id(task_id)
-                        if stored_task:
-                            old_status = stored_task.status
-
-                            # 详细记录API响应用于调试
-                            log.info(f"即梦API响应详细数据 - task_id: {task_id}")
-                            log.info(
-                                f"API响应原始数据: {json.dumps(result, ensure_ascii=False, indent=2)}"
-                            )
-                            log.info(
-                                f"task_data内容: {json.dumps(task_data, ensure_ascii=False, indent=2)}"
-                            )
-
-                            update_data = {"status": new_status}
-
-                            # 如果任务失败，记录失败原因
-                            if new_status == TaskStatus.FAILURE:
-                                update_data["fail_reason"] = task_data.get(
-                                    "fail_reason", "未知错误"
-                                )
-
-                            # 如果任务成功，提取视频信息（尝试多种可能的数据结构）
-                            if new_status == TaskStatus.SUCCESS:
-                                video_url = None
-                                video_id = None
-
-                                # 尝试不同的数据结构路径
-                                if task_data.get("data") and task_data["data"].get(
-                                    "data"
-                                ):
-                                    # 原来的路径：task_data.data.data.video
-                                    video_info = task_data["data"]["data"]
-                                    if video_info.get("video"):
-                                        video_url = video_info["video"]
-                                        video_id = task_data.get("task_id")
-                                        log.info(
-                                            f"从路径 data.data.video 提取到视频URL: {video_url}"
-                                        )
-
-                                # 尝试直接从task_data.data获取
-                                elif task_data.get("data") and task_data["data"].get(
-                                    "video"
-                                ):
-                                    video_url = task_data["data"]["video"]
-                                    video_id = task_data.get("task_id")
-                                    log.info(
-                                        f"从路径 data.video 提取到视频URL: {video_url}"
-                                    )
-
-                                # 尝试直接从task_data获取
-                                elif task_data.get("video"):
-                                    video_url = task_data["video"]
-                                    video_id = task_data.get("task_id")
-                                    log.info(f"从路径 video 提取到视频URL: {video_url}")
-
-                                # 尝试从video_url字段获取
-                                elif task_data.get("video_url"):
-                                    video_url = task_data["video_url"]
-                                    video_id = task_data.get("task_id")
-                                    log.info(
-                                        f"从路径 video_url 提取到视频URL: {video_url}"
-                                    )
-
-                                if video_url:
-                                    update_data.update(
-                                        {
-                                            "video_url": video_url,
-                                            "video_id": video_id,
-                                            "finish_time": task_data.get("finish_time"),
-                                        }
-                                    )
-                                    log.info(
-                                        f"成功提取视频信息 - URL: {video_url}, ID: {video_id}"
-                                    )
-                                else:
-                                    log.warning(
-                                        f"任务 {task_id} 已成功但无法提取视频URL，task_data结构: {list(task_data.keys())}"
-                                    )
-
-                            # 更新到数据库
-                            JimengTasks.update_task_by_id(task_id, update_data)
-
-                            log.info(
-                                f"任务 {task_id} 状态更新: {old_status} -> {new_status}"
-                            )
-
-                            # 如果任务已完成或失败，停止轮询
-                            if new_status in [TaskStatus.SUCCESS, TaskStatus.FAILURE]:
-                                break
-
-        except Exception as e:
-            log.error(f"轮询任务 {task_id} 状态失败: {e}")
-
-    log.info(f"任务 {task_id} 轮询结束")
+    def get_task_data(self, task_id):
+        task = JimengTasks.get_task_by_id(task_id)
+        return JimengTasks.convert_to_response_format(task) if task else None
 
 
 @router.get("/task/{task_id}")
@@ -533,126 +518,6 @@ async def get_task_status(
         if stored_task.user_id != user.id:
             raise HTTPException(status_code=403, detail="无权访问此任务")
 
-        # 如果任务还在处理中，查询即梦API获取最新状态
-        if stored_task.status not in [TaskStatus.SUCCESS, TaskStatus.FAILURE]:
-            api_url = JIMENG_API_URL.value
-            api_key = JIMENG_API_KEY.value
-
-            if api_url and api_key:
-                try:
-                    # 查询即梦API获取最新状态
-                    status_url = f"{api_url}/jimeng/fetch/{task_id}"
-
-                    async with httpx.AsyncClient(timeout=30.0) as client:
-                        response = await client.get(
-                            status_url,
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Content-Type": "application/json",
-                            },
-                        )
-
-                        if response.is_success:
-                            api_result = response.json()
-
-                            if (
-                                api_result.get("code") == "success"
-                                and "data" in api_result
-                            ):
-                                task_data = api_result["data"]
-                                new_status = task_data.get("status")
-
-                                # 更新数据库中的任务状态
-                                log.info(
-                                    f"手动查询API响应详细数据 - task_id: {task_id}"
-                                )
-                                log.info(
-                                    f"API响应原始数据: {json.dumps(api_result, ensure_ascii=False, indent=2)}"
-                                )
-                                log.info(
-                                    f"task_data内容: {json.dumps(task_data, ensure_ascii=False, indent=2)}"
-                                )
-
-                                update_data = {"status": new_status}
-
-                                # 如果任务失败，记录失败原因
-                                if new_status == TaskStatus.FAILURE:
-                                    update_data["fail_reason"] = task_data.get(
-                                        "fail_reason", "未知错误"
-                                    )
-
-                                # 如果任务成功，提取视频信息（尝试多种可能的数据结构）
-                                if new_status == TaskStatus.SUCCESS:
-                                    video_url = None
-                                    video_id = None
-
-                                    # 尝试不同的数据结构路径
-                                    if task_data.get("data") and task_data["data"].get(
-                                        "data"
-                                    ):
-                                        # 原来的路径：task_data.data.data.video
-                                        video_info = task_data["data"]["data"]
-                                        if video_info.get("video"):
-                                            video_url = video_info["video"]
-                                            video_id = task_data.get("task_id")
-                                            log.info(
-                                                f"从路径 data.data.video 提取到视频URL: {video_url}"
-                                            )
-
-                                    # 尝试直接从task_data.data获取
-                                    elif task_data.get("data") and task_data[
-                                        "data"
-                                    ].get("video"):
-                                        video_url = task_data["data"]["video"]
-                                        video_id = task_data.get("task_id")
-                                        log.info(
-                                            f"从路径 data.video 提取到视频URL: {video_url}"
-                                        )
-
-                                    # 尝试直接从task_data获取
-                                    elif task_data.get("video"):
-                                        video_url = task_data["video"]
-                                        video_id = task_data.get("task_id")
-                                        log.info(
-                                            f"从路径 video 提取到视频URL: {video_url}"
-                                        )
-
-                                    # 尝试从video_url字段获取
-                                    elif task_data.get("video_url"):
-                                        video_url = task_data["video_url"]
-                                        video_id = task_data.get("task_id")
-                                        log.info(
-                                            f"从路径 video_url 提取到视频URL: {video_url}"
-                                        )
-
-                                    if video_url:
-                                        update_data.update(
-                                            {
-                                                "video_url": video_url,
-                                                "video_id": video_id,
-                                                "finish_time": task_data.get(
-                                                    "finish_time"
-                                                ),
-                                            }
-                                        )
-                                        log.info(
-                                            f"成功提取视频信息 - URL: {video_url}, ID: {video_id}"
-                                        )
-                                    else:
-                                        log.warning(
-                                            f"任务 {task_id} 已成功但无法提取视频URL，task_data结构: {list(task_data.keys())}"
-                                        )
-
-                                # 更新数据库
-                                updated_task = JimengTasks.update_task_by_id(
-                                    task_id, update_data
-                                )
-                                if updated_task:
-                                    stored_task = updated_task
-
-                except Exception as e:
-                    log.error(f"查询即梦API状态异常: {e}")
-
         return {
             "task_id": task_id,
             "status": stored_task.status,
@@ -672,35 +537,29 @@ async def get_task_status(
 
 
 @router.get("/tasks")
-async def get_user_tasks(request: Request, user=Depends(get_verified_user)):
-    """获取用户任务列表"""
+async def get_user_tasks(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    user=Depends(get_verified_user),
+):
+    """获取用户任务列表，下一页游标在 X-Next-Cursor 响应头中"""
+    page_cursor = decode_task_cursor(cursor)
+    limit = get_task_list_limit(limit, 50)
     try:
-        log.info(f"获取用户 {user.id} 的即梦任务列表")
-
-        # 从数据库获取用户的任务
-        tasks = JimengTasks.get_tasks_by_user_id(user.id)
-
-        user_tasks = []
-        for task in tasks:
-            user_tasks.append(
-                {
-                    "task_id": task.task_id,
-                    "status": task.status,
-                    "prompt": task.prompt or "",
-                    "image_url": task.image_url,
-                    "duration": task.duration,
-                    "aspect_ratio": task.aspect_ratio,
-                    "cfg_scale": task.cfg_scale,
-                    "credits_used": task.credits_used,
-                    "created_at": task.created_at,
-                    "updated_at": task.updated_at,
-                    "video_url": task.video_url,
-                    "video_id": task.video_id,
-                    "fail_reason": task.fail_reason or "",
-                }
-            )
+        # 从数据库获取用户的任务，只查询列表字段
+        tasks = JimengTasks.get_task_list(user.id, limit, page_cursor)
+
+        user_tasks = [
+            {
+                **task,
+                "prompt": task["prompt"] or "",
+                "fail_reason": task["fail_reason"] or "",
+            }
+            for task in tasks
+        ]
 
-        return user_tasks
+        return get_task_list_response(request, user_tasks, tasks, limit)
 
     except Exception as e:
         log.error(f"获取用户任务列表失败: {e}")
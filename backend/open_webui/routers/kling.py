@@ -21,8 +21,23 @@ from open_webui.models.kling_tasks import (
     KlingTaskResponse,
     CameraControl,
 )
-from open_webui.models.credits import Credits, AddCreditForm, SetCreditFormDetail
-from decimal import Decimal
+from open_webui.models.credits import Credits, CreditReservations, SetCreditFormDetail
+from open_webui.models.generation_jobs import GenerationJobs
+from open_webui.utils.generation import (
+    GenerationProvider,
+    GenerationProviderError,
+    GenerationResult,
+    enqueue_generation_job,
+    get_callback_url,
+    register_generation_provider,
+    reserve_generation_credits,
+)
+from open_webui.utils.http_client import get_http_client
+from open_webui.utils.media import (
+    decode_task_cursor,
+    get_task_list_limit,
+    get_task_list_response,
+)
 
 log = logging.getLogger(__name__)
 
@@ -140,73 +155,71 @@ async def verify_kling_connection(request: Request, user=Depends(get_admin_user)
         test_url = f"{api_url}/kling/v1/videos/text2video"
 
         # 发送测试请求（使用最小参数来验证API连接和认证）
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                test_url,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "prompt": "test connection",
-                    "model_name": "kling-v1",
-                    "mode": "std",
-                    "aspect_ratio": "16:9",
-                    "duration": "5",
-                },
-            )
+        client = get_http_client("kling")
+        response = await client.post(
+            test_url,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "prompt": "test connection",
+                "model_name": "kling-v1",
+                "mode": "std",
+                "aspect_ratio": "16:9",
+                "duration": "5",
+            },
+        )
+
+        log.info(f"可灵API测试响应: HTTP {response.status_code}")
 
-            log.info(f"可灵API测试响应: HTTP {response.status_code}")
-
-            # 检查响应状态
-            if response.status_code == 200:
-                # 解析响应检查是否是有效的API响应
-                try:
-                    result = response.json()
-                    log.info(f"可灵API测试响应内容: {result}")
-                    if "code" in result and "data" in result:
-                        if result["code"] == 0:
-                            return {"message": "连接成功，API正常", "status": "success"}
-                        else:
-                            return {
-                                "message": f"API错误: {result.get('message', '未知错误')}",
-                                "status": "error",
-                            }
+        # 检查响应状态
+        if response.status_code == 200:
+            # 解析响应检查是否是有效的API响应
+            try:
+                result = response.json()
+                log.info(f"可灵API测试响应内容: {result}")
+                if "code" in result and "data" in result:
+                    if result["code"] == 0:
+                        return {"message": "连接成功，API正常", "status": "success"}
                     else:
-                        return {"message": "API响应格式异常", "status": "error"}
-                except Exception as e:
-                    log.error(f"解析API响应失败: {e}")
-                    return {"message": "API响应解析失败", "status": "error"}
-            elif response.status_code == 401 or response.status_code == 403:
-                try:
-                    error_detail = response.json()
-                    error_msg = error_detail.get("message", "API Key无效或权限不足")
-                except:
-                    error_msg = "API Key无效或权限不足"
+                        return {
+                            "message": f"API错误: {result.get('message', '未知错误')}",
+                            "status": "error",
+                        }
+                else:
+                    return {"message": "API响应格式异常", "status": "error"}
+            except Exception as e:
+                log.error(f"解析API响应失败: {e}")
+                return {"message": "API响应解析失败", "status": "error"}
+        elif response.status_code == 401 or response.status_code == 403:
+            try:
+                error_detail = response.json()
+                error_msg = error_detail.get("message", "API Key无效或权限不足")
+            except:
+                error_msg = "API Key无效或权限不足"
+            return {
+                "message": f"{error_msg}: HTTP {response.status_code}",
+                "status": "error",
+            }
+        elif response.status_code == 400:
+            try:
+                error_detail = response.json()
+                error_msg = error_detail.get("message", "请求参数错误")
+                log.warning(f"API参数错误，但连接正常: {error_msg}")
                 return {
-                    "message": f"{error_msg}: HTTP {response.status_code}",
-                    "status": "error",
+                    "message": f"连接成功，但参数错误: {error_msg}",
+                    "status": "warning",
                 }
-            elif response.status_code == 400:
-                try:
-                    error_detail = response.json()
-                    error_msg = error_detail.get("message", "请求参数错误")
-                    log.warning(f"API参数错误，但连接正常: {error_msg}")
-                    return {
-                        "message": f"连接成功，但参数错误: {error_msg}",
-                        "status": "warning",
-                    }
-                except:
-                    return {"message": "连接成功，但请求格式有误", "status": "warning"}
-            else:
-                try:
-                    error_detail = response.json()
-                    error_msg = error_detail.get(
-                        "message", f"HTTP {response.status_code}"
-                    )
-                except:
-                    error_msg = f"HTTP {response.status_code}"
-                return {"message": f"连接失败: {error_msg}", "status": "error"}
+            except:
+                return {"message": "连接成功，但请求格式有误", "status": "warning"}
+        else:
+            try:
+                error_detail = response.json()
+                error_msg = error_detail.get("message", f"HTTP {response.status_code}")
+            except:
+                error_msg = f"HTTP {response.status_code}"
+            return {"message": f"连接失败: {error_msg}", "status": "error"}
 
     except Exception as e:
         log.error(f"验证可灵连接失败: {e}")
@@ -268,175 +281,67 @@ async def generate_video(
             else getattr(request.app.state.config, "KLING_STD_CREDITS", 5)
         )
 
-        # 提前检查用户积分
-        try:
-            user_credit = Credits.get_credit_by_user_id(user.id)
-            if not user_credit or user_credit.credit < credits_cost:
-                current_credits = user_credit.credit if user_credit else 0
-                log.warning(
-                    f"用户 {user.id} 积分不足: 当前{current_credits}, 需要{credits_cost}"
-                )
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"积分不足，当前{current_credits}v豆，需要{credits_cost}v豆",
-                )
-        except HTTPException:
-            raise
-        except Exception as e:
-            log.error(f"检查积分失败: {e}")
-            raise HTTPException(status_code=400, detail="积分系统错误")
-
-        # 构建可灵API请求
-        kling_api_url = f"{api_url}/kling/v1/videos/text2video"
-
-        # 构建回调URL
-        # 获取当前请求的host信息来构建回调URL
-        host_url = str(request.base_url).rstrip("/")
-        callback_url = f"{host_url}/api/v1/kling/callback"
-        log.info(f"设置回调URL: {callback_url}")
-
-        # 构建请求参数
-        api_params = {
-            "model_name": generate_request.model_name,
+        # 预留积分，任务完成时确认扣除，失败时由任务引擎释放
+        task_id = str(uuid.uuid4())
+        reservation = reserve_generation_credits(
+            user.id,
+            credits_cost,
+            SetCreditFormDetail(
+                desc=f"可灵视频生成-{generate_request.mode}模式",
+                api_path="/kling/generate",
+                api_params={
+                    "task_id": task_id,
+                    "model_name": generate_request.model_name,
+                    "duration": generate_request.duration,
+                },
+                usage={
+                    "credits_used": credits_cost,
+                    "mode": generate_request.mode,
+                },
+            ),
+        )
+
+        # 保存任务到数据库，由任务引擎提交到可灵平台
+        task_form_data = {
             "prompt": generate_request.prompt,
-            "cfg_scale": generate_request.cfg_scale,
+            "negative_prompt": generate_request.negative_prompt,
+            "model_name": generate_request.model_name,
             "mode": generate_request.mode,
             "aspect_ratio": generate_request.aspect_ratio,
             "duration": generate_request.duration,
-            "callback_url": callback_url,  # 添加回调URL
+            "cfg_scale": generate_request.cfg_scale,
+            "camera_control": (
+                generate_request.camera_control.dict(exclude_none=True)
+                if generate_request.camera_control
+                else None
+            ),
+            "callback_url": generate_request.callback_url,
+            "external_task_id": generate_request.external_task_id,
+            "credits_used": credits_cost,
         }
 
-        # 添加可选参数
-        if generate_request.negative_prompt:
-            api_params["negative_prompt"] = generate_request.negative_prompt
-        if generate_request.camera_control:
-            api_params["camera_control"] = generate_request.camera_control.dict(
-                exclude_none=True
-            )
-
-        # 调用可灵API
-        log.info(f"用户 {user.id} 发起视频生成请求，调用可灵API: {kling_api_url}")
-        log.info(f"请求参数: {json.dumps(api_params, ensure_ascii=False, indent=2)}")
-
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                kling_api_url,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json=api_params,
-            )
-
-            log.info(f"可灵API响应状态: HTTP {response.status_code}")
-            log.info(f"可灵API响应头: {dict(response.headers)}")
-
-            if not response.is_success:
-                error_detail = f"可灵API调用失败: HTTP {response.status_code}"
-                try:
-                    response_text = response.text
-                    log.error(f"可灵API错误响应原文: {response_text}")
-                    error_data = response.json()
-                    log.error(f"可灵API错误响应解析: {error_data}")
-                    if "message" in error_data:
-                        error_detail = f"可灵API错误: {error_data['message']}"
-                    elif "error" in error_data:
-                        error_detail = f"可灵API错误: {error_data['error']}"
-                except Exception as e:
-                    log.error(f"解析错误响应失败: {e}")
-                    error_detail = f"可灵API调用失败: HTTP {response.status_code} - {response.text[:200]}"
-
-                log.error(f"可灵API调用失败: {error_detail}")
-                raise HTTPException(status_code=400, detail=error_detail)
-
-            # 解析API响应
-            try:
-                response_text = response.text
-                log.info(f"可灵API响应原文: {response_text}")
-                api_result = response.json()
-                log.info(f"可灵API成功响应解析: {api_result}")
-            except Exception as e:
-                log.error(f"解析可灵API响应失败: {e}, 响应文本: {response.text[:500]}")
-                raise HTTPException(status_code=500, detail="可灵API响应解析失败")
-
-            # 检查API响应格式
-            if "code" not in api_result or "data" not in api_result:
-                log.error(f"可灵API响应格式错误: {api_result}")
-                raise HTTPException(status_code=500, detail="可灵API响应格式错误")
-
-            if api_result["code"] != 0:
-                error_msg = api_result.get("message", "未知错误")
-                log.error(
-                    f"可灵API业务错误: code={api_result['code']}, message={error_msg}"
-                )
-                raise HTTPException(status_code=400, detail=f"可灵API错误: {error_msg}")
-
-            # 提取任务信息
-            task_data = api_result["data"]
-            task_id = task_data["task_id"]
-            task_status = task_data["task_status"]
-
-            log.info(f"可灵API成功创建任务: task_id={task_id}, status={task_status}")
-
-            # 扣除用户积分（积分已经在调用API前检查过了）
-            try:
-                user_credit = Credits.get_credit_by_user_id(user.id)
-                old_credits = user_credit.credit
-                Credits.update_credit_by_user_id(
-                    user.id, user_credit.credit - credits_cost
-                )
-                log.info(
-                    f"用户 {user.id} 积分扣除成功: {old_credits} -> {old_credits - credits_cost} (扣除{credits_cost})"
-                )
-            except Exception as e:
-                log.error(f"扣除积分失败: {e}")
-                # 注意：这里不抛出异常，因为外部API已经调用成功
-
-            # 保存任务到数据库
-            task_form_data = {
-                "prompt": generate_request.prompt,
-                "negative_prompt": generate_request.negative_prompt,
-                "model_name": generate_request.model_name,
-                "mode": generate_request.mode,
-                "aspect_ratio": generate_request.aspect_ratio,
-                "duration": generate_request.duration,
-                "cfg_scale": generate_request.cfg_scale,
-                "camera_control": (
-                    generate_request.camera_control.dict()
-                    if generate_request.camera_control
-                    else None
-                ),
-                "callback_url": generate_request.callback_url,
-                "external_task_id": generate_request.external_task_id,
-                "credits_used": credits_cost,
-            }
-
-            stored_task = KlingTasks.insert_new_task(task_form_data, user.id, task_id)
-            if not stored_task:
-                log.error(f"任务存储失败: {task_id}")
-                # 不抛出异常，任务已经提交到可灵平台
-
-            # 如果有视频数据，立即更新
-            if task_data.get("videos") and len(task_data["videos"]) > 0:
-                video = task_data["videos"][0]
-                update_data = {
-                    "status": task_status,
-                    "video_id": video.get("id"),
-                    "video_url": video.get("url"),
-                    "video_duration": video.get("duration"),
-                }
-                KlingTasks.update_task_by_id(task_id, update_data)
+        stored_task = KlingTasks.insert_new_task(task_form_data, user.id, task_id)
+        if not stored_task:
+            CreditReservations.release_reservation_by_id(reservation.id)
+            raise HTTPException(status_code=500, detail="任务创建失败，请稍后重试")
+
+        enqueue_generation_job(
+            "kling",
+            task_id,
+            user.id,
+            credits_cost,
+            payload={"base_url": str(request.base_url).rstrip("/")},
+            reservation_id=reservation.id,
+        )
 
-            log.info(
-                f"视频生成任务成功提交到可灵平台: user_id={user.id}, task_id={task_id}, status={task_status}"
-            )
+        log.info(f"视频生成任务已创建: user_id={user.id}, task_id={task_id}")
 
-            return {
-                "task_id": task_id,
-                "status": task_status,
-                "message": "视频生成任务已提交到可灵平台",
-                "credits_used": credits_cost,
-            }
+        return {
+            "task_id": task_id,
+            "status": TaskStatus.SUBMITTED,
+            "message": "视频生成任务已提交到可灵平台",
+            "credits_used": credits_cost,
+        }
 
     except HTTPException as he:
         log.error(f"HTTP异常: {he.status_code} - {he.detail}")
@@ -461,99 +366,6 @@ async def get_task_status(
         if stored_task.user_id != user.id:
             raise HTTPException(status_code=403, detail="无权访问此任务")
 
-        # 如果任务还在处理中，查询可灵API获取最新状态
-        if stored_task.status in ["submitted", "processing"]:
-            api_url = getattr(request.app.state.config, "KLING_API_URL", "")
-            api_key = getattr(request.app.state.config, "KLING_API_KEY", "")
-
-            log.info(f"检查任务 {task_id} 状态 - 当前状态: {stored_task.status}")
-            log.info(
-                f"API配置 - URL: {api_url[:50] if api_url else 'None'}..., Key: {'已配置' if api_key else 'None'}"
-            )
-
-            if api_url and api_key:
-                try:
-                    # 查询可灵API获取最新状态
-                    status_url = f"{api_url}/kling/v1/videos/text2video/{task_id}"
-                    log.info(f"查询外部API状态: {status_url}")
-
-                    async with httpx.AsyncClient(timeout=30.0) as client:
-                        response = await client.get(
-                            status_url,
-                            headers={
-                                "Authorization": f"Bearer {api_key}",
-                                "Content-Type": "application/json",
-                            },
-                        )
-
-                        log.info(f"外部API状态查询响应: HTTP {response.status_code}")
-                        response_text = response.text
-                        log.info(f"外部API状态响应原文: {response_text}")
-
-                        if response.is_success:
-                            api_result = response.json()
-                            log.info(f"外部API状态响应解析: {api_result}")
-
-                            if api_result.get("code") == 0 and "data" in api_result:
-                                task_data = api_result["data"]
-                                old_status = stored_task.status
-                                new_status = task_data.get(
-                                    "task_status", stored_task.status
-                                )
-
-                                log.info(f"任务状态更新: {old_status} -> {new_status}")
-
-                                # 更新数据库中的任务状态
-                                update_data = {
-                                    "status": new_status,
-                                    "task_status_msg": task_data.get(
-                                        "task_status_msg", ""
-                                    ),
-                                }
-
-                                # 如果任务完成，提取视频信息
-                                if task_data.get("task_result"):
-                                    task_result = task_data["task_result"]
-                                    if (
-                                        task_result.get("videos")
-                                        and len(task_result["videos"]) > 0
-                                    ):
-                                        video = task_result["videos"][0]
-                                        update_data.update(
-                                            {
-                                                "video_url": video.get("url"),
-                                                "video_id": video.get("id"),
-                                                "video_duration": video.get("duration"),
-                                            }
-                                        )
-
-                                log.info(f"准备更新任务数据: {update_data}")
-
-                                # 更新数据库
-                                updated_task = KlingTasks.update_task_by_id(
-                                    task_id, update_data
-                                )
-                                if updated_task:
-                                    stored_task = updated_task
-
-                                log.info(f"任务状态已更新: {stored_task.status}")
-                            else:
-                                log.warning(
-                                    f"外部API响应格式异常: code={api_result.get('code')}, data存在={('data' in api_result)}"
-                                )
-                        else:
-                            log.error(
-                                f"外部API状态查询失败: HTTP {response.status_code} - {response_text}"
-                            )
-
-                except Exception as e:
-                    log.error(f"查询可灵API状态异常: {e}")
-                    import traceback
-
-                    log.error(f"异常堆栈: {traceback.format_exc()}")
-            else:
-                log.warning("API配置不完整，无法查询外部状态")
-
         log.info(
             f"返回任务状态: task_id={task_id}, status={stored_task.status}, video_url={stored_task.video_url}"
         )
@@ -578,38 +390,29 @@ async def get_task_status(
 
 
 @router.get("/tasks")
-async def get_user_tasks(request: Request, user=Depends(get_verified_user)):
-    """获取用户任务列表"""
+async def get_user_tasks(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    user=Depends(get_verified_user),
+):
+    """获取用户任务列表，下一页游标在 X-Next-Cursor 响应头中"""
+    page_cursor = decode_task_cursor(cursor)
+    limit = get_task_list_limit(limit, 50)
     try:
-        log.info(f"获取用户 {user.id} 的可灵任务列表")
-
-        # 从数据库获取用户的任务
-        tasks = KlingTasks.get_tasks_by_user_id(user.id)
-
-        user_tasks = []
-        for task in tasks:
-            user_tasks.append(
-                {
-                    "task_id": task.task_id,
-                    "status": task.status,
-                    "prompt": task.prompt or "",
-                    "negative_prompt": task.negative_prompt,
-                    "model_name": task.model_name,
-                    "mode": task.mode,
-                    "aspect_ratio": task.aspect_ratio,
-                    "duration": task.duration,
-                    "cfg_scale": task.cfg_scale,
-                    "credits_used": task.credits_used,
-                    "created_at": task.created_at,
-                    "updated_at": task.updated_at,
-                    "video_url": task.video_url,
-                    "video_id": task.video_id,
-                    "video_duration": task.video_duration,
-                    "task_status_msg": task.task_status_msg or "",
-                }
-            )
+        # 从数据库获取用户的任务，只查询列表字段
+        tasks = KlingTasks.get_task_list(user.id, limit, page_cursor)
+
+        user_tasks = [
+            {
+                **task,
+                "prompt": task["prompt"] or "",
+                "task_status_msg": task["task_status_msg"] or "",
+            }
+            for task in tasks
+        ]
 
-        return user_tasks
+        return get_task_list_response(request, user_tasks, tasks, limit)
 
     except Exception as e:
         log.error(f"获取用户任务列表失败: {e}")
@@ -661,7 +464,12 @@ async def kling_callback(request: Request):
             log.error("回调数据缺少task_id")
             return {"code": 1, "message": "缺少task_id"}
 
-        # 查找对应的任务
+        # 任务引擎提交的任务使用带签名的 /api/v1/generation/callback 回调，
+        # 未签名的旧回调不能修改其状态
+        if GenerationJobs.get_job_by_external_id("kling", task_id):
+            log.warning(f"忽略未签名的可灵回调: {task_id}")
+            return {"code": 0, "message": "回调已忽略"}
+
         stored_task = KlingTasks.get_task_by_id(task_id)
         if stored_task:
             old_status = stored_task.status
@@ -725,4 +533,168 @@ async def get_user_credits(user=Depends(get_verified_user)):
         raise HTTPException(status_code=500, detail="获取积分失败")
 
 
-# 后台任务处理功能暂时禁用
+def get_kling_video_update(task_data: Dict[str, Any]) -> Dict[str, Any]:
+    """从可灵任务数据中提取状态和视频信息"""
+    update_data = {
+        "status": task_data.get("task_status"),
+        "task_status_msg": task_data.get("task_status_msg", ""),
+    }
+
+    task_result = task_data.get("task_result") or {}
+    if task_result.get("videos"):
+        video = task_result["videos"][0]
+        update_data.update(
+            {
+                "video_url": video.get("url"),
+                "video_id": video.get("id"),
+                "video_duration": video.get("duration"),
+            }
+        )
+    return update_data
+
+
+@register_generation_provider
+class KlingProvider(GenerationProvider):
+    """由任务引擎驱动的可灵任务提交与轮询"""
+
+    name = "kling"
+    title = "可灵视频"
+    max_concurrency = 5
+    poll_interval = 10
+    timeout = 1800
+    # 配置了callback_url时，超过该时间未收到回调才开始轮询
+    callback_timeout = 300
+
+    def get_credentials(self, app):
+        api_url = getattr(app.state.config, "KLING_API_URL", "")
+        api_key = getattr(app.state.config, "KLING_API_KEY", "")
+        if not api_url or not api_key:
+            raise GenerationProviderError("可灵API配置不完整，请联系管理员")
+        return api_url, api_key
+
+    def get_headers(self, api_key: str) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+
+    async def submit(self, app, job):
+        task = KlingTasks.get_task_by_id(job.task_id)
+        if not task:
+            raise GenerationProviderError("任务不存在")
+
+        api_url, api_key = self.get_credentials(app)
+
+        api_params = {
+            "model_name": task.model_name,
+            "prompt": task.prompt,
+            "cfg_scale": task.cfg_scale,
+            "mode": task.mode,
+            "aspect_ratio": task.aspect_ratio,
+            "duration": task.duration,
+        }
+        callback_url = get_callback_url(app, job)
+        if callback_url:
+            api_params["callback_url"] = callback_url
+        if task.negative_prompt:
+            api_params["negative_prompt"] = task.negative_prompt
+        if task.camera_control:
+            api_params["camera_control"] = json.loads(task.camera_control)
+
+        client = get_http_client("kling")
+        response = await client.post(
+            f"{api_url}/kling/v1/videos/text2video",
+            headers=self.get_headers(api_key),
+            json=api_params,
+        )
+
+        if not response.is_success:
+            error_detail = f"可灵API调用失败: HTTP {response.status_code}"
+            try:
+                error_data = response.json()
+                if "message" in error_data:
+                    error_detail = f"可灵API错误: {error_data['message']}"
+                elif "error" in error_data:
+                    error_detail = f"可灵API错误: {error_data['error']}"
+            except Exception:
+                pass
+            raise GenerationProviderError(
+                error_detail, retryable=response.status_code in (429, 503)
+            )
+
+        api_result = response.json()
+        if api_result.get("code") != 0 or "data" not in api_result:
+            raise GenerationProviderError(
+                f"可灵API错误: {api_result.get('message', '未知错误')}"
+            )
+
+        task_data = api_result["data"]
+        KlingTasks.update_task_by_id(
+            job.task_id,
+            {
+                "status": task_data.get("task_status", TaskStatus.SUBMITTED),
+                "request_id": api_result.get("request_id"),
+            },
+        )
+        log.info(f"可灵任务已提交: {job.task_id} -> {task_data['task_id']}")
+
+        return GenerationResult(external_id=task_data["task_id"], progress=10)
+
+    async def poll(self, app, job):
+        api_url, api_key = self.get_credentials(app)
+
+        client = get_http_client("kling")
+        response = await client.get(
+            f"{api_url}/kling/v1/videos/text2video/{job.external_id}",
+            headers=self.get_headers(api_key),
+            timeout=30.0,
+        )
+        response.raise_for_status()
+
+        api_result = response.json()
+        if api_result.get("code") != 0 or "data" not in api_result:
+            raise GenerationProviderError(
+                f"可灵API错误: {api_result.get('message', '未知错误')}",
+                retryable=True,
+            )
+
+        return self.apply_status(job, api_result["data"])
+
+    def get_callback_external_id(self, payload):
+        return payload.get("task_id")
+
+    def apply_callback(self, job, payload):
+        return self.apply_status(job, payload)
+
+    def apply_status(self, job, task_data: Dict[str, Any]):
+        """将可灵任务状态写入任务记录"""
+        update_data = get_kling_video_update(task_data)
+        status = update_data["status"]
+
+        if status == TaskStatus.FAILED:
+            return GenerationResult(
+                status="failed",
+                error=update_data["task_status_msg"] or "视频生成失败",
+            )
+
+        KlingTasks.update_task_by_id(job.task_id, update_data)
+        if status == TaskStatus.SUCCEED:
+            return GenerationResult(status="completed", progress=100)
+
+        return GenerationResult(
+            progress=50 if status == TaskStatus.PROCESSING else job.progress
+        )
+
+    def on_failed(self, job, error):
+        KlingTasks.update_task_by_id(
+            job.task_id, {"status": TaskStatus.FAILED, "task_status_msg": error}
+        )
+
+    def on_cancelled(self, job):
+        KlingTasks.update_task_by_id(
+            job.task_id, {"status": TaskStatus.FAILED, "task_status_msg": "任务已取消"}
+        )
+
+    def get_task_data(self, task_id):
+        task = KlingTasks.get_task_by_id(task_id)
+        return KlingTasks.convert_to_response_format(task) if task else None
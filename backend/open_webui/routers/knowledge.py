@@ -1,6 +1,6 @@
 from typing import List, Optional
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
 import logging
 
 from open_webui.models.knowledge import (
@@ -16,15 +16,21 @@ from open_webui.routers.retrieval import (
     ProcessFileForm,
     process_files_batch,
     BatchProcessFilesForm,
+    BatchProcessFilesResponse,
 )
 from open_webui.storage.provider import Storage
 
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.utils.auth import get_verified_user
 from open_webui.utils.access_control import has_access, has_permission
+from open_webui.utils.ingestion import (
+    enqueue_ingestion_job,
+    get_ingestion_priority,
+    register_ingestion_handler,
+)
 
 
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import SRC_LOG_LEVELS, ENABLE_BACKGROUND_INGESTION
 from open_webui.models.models import Models, ModelForm
 
 log = logging.getLogger(__name__)
@@ -248,6 +254,7 @@ async def reindex_knowledge_files(request: Request, user=Depends(get_verified_us
 
 class KnowledgeFilesResponse(KnowledgeResponse):
     files: list[FileMetadataResponse]
+    job_id: Optional[str] = None
 
 
 @router.get("/{id}", response_model=Optional[KnowledgeFilesResponse])
@@ -682,6 +689,8 @@ def add_files_to_knowledge_batch(
     id: str,
     form_data: list[KnowledgeFileIdForm],
     user=Depends(get_verified_user),
+    background: Optional[bool] = Query(None),
+    priority: int = Query(0),
 ):
     """
     Add multiple files to a knowledge base
@@ -715,6 +724,31 @@ def add_files_to_knowledge_batch(
             )
         files.append(file)
 
+    if background is None:
+        background = ENABLE_BACKGROUND_INGESTION
+
+    if background:
+        # Return right away, the ingestion workers pick the job up
+        job = enqueue_ingestion_job(
+            user.id,
+            "knowledge_batch",
+            {"knowledge_id": id, "file_ids": [file.id for file in files]},
+            priority=get_ingestion_priority(user, priority),
+        )
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=ERROR_MESSAGES.DEFAULT("Error queueing files for processing"),
+            )
+
+        return KnowledgeFilesResponse(
+            **knowledge.model_dump(),
+            files=Files.get_file_metadatas_by_ids(
+                (knowledge.data or {}).get("file_ids", [])
+            ),
+            job_id=job.id,
+        )
+
     # Process files
     try:
         result = process_files_batch(
@@ -728,18 +762,7 @@ def add_files_to_knowledge_batch(
         )
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # Add successful files to knowledge base
-    data = knowledge.data or {}
-    existing_file_ids = data.get("file_ids", [])
-
-    # Only add files that were successfully processed
-    successful_file_ids = [r.file_id for r in result.results if r.status == "completed"]
-    for file_id in successful_file_ids:
-        if file_id not in existing_file_ids:
-            existing_file_ids.append(file_id)
-
-    data["file_ids"] = existing_file_ids
-    knowledge = Knowledges.update_knowledge_data_by_id(id=id, data=data)
+    knowledge, existing_file_ids = add_processed_files_to_knowledge(id, result)
 
     # If there were any errors, include them in the response
     if result.errors:
@@ -757,3 +780,49 @@ def add_files_to_knowledge_batch(
         **knowledge.model_dump(),
         files=Files.get_file_metadatas_by_ids(existing_file_ids),
     )
+
+
+def add_processed_files_to_knowledge(id: str, result: BatchProcessFilesResponse):
+    knowledge = Knowledges.get_knowledge_by_id(id=id)
+
+    # Add successful files to knowledge base
+    data = knowledge.data or {}
+    existing_file_ids = data.get("file_ids", [])
+
+    # Only add files that were successfully processed
+    successful_file_ids = [r.file_id for r in result.results if r.status == "completed"]
+    for file_id in successful_file_ids:
+        if file_id not in existing_file_ids:
+            existing_file_ids.append(file_id)
+
+    data["file_ids"] = existing_file_ids
+    knowledge = Knowledges.update_knowledge_data_by_id(id=id, data=data)
+    return knowledge, existing_file_ids
+
+
+@register_ingestion_handler("knowledge_batch")
+def process_knowledge_batch_job(request: Request, job, user, context):
+    knowledge_id = job.payload.get("knowledge_id")
+    if not Knowledges.get_knowledge_by_id(id=knowledge_id):
+        raise ValueError(ERROR_MESSAGES.NOT_FOUND)
+
+    files = Files.get_files_by_ids(job.payload.get("file_ids", []))
+
+    context.report_progress(10, "embedding")
+    result = process_files_batch(
+        request=request,
+        form_data=BatchProcessFilesForm(files=files, collection_name=knowledge_id),
+        user=user,
+    )
+
+    context.report_progress(90, "indexing")
+    add_processed_files_to_knowledge(knowledge_id, result)
+
+    if result.errors and not any(r.status == "completed" for r in result.results):
+        raise ValueError("; ".join(f"{e.file_id}: {e.error}" for e in result.errors))
+
+    return {
+        "knowledge_id": knowledge_id,
+        "file_ids": [r.file_id for r in result.results if r.status == "completed"],
+        "errors": [f"{e.file_id}: {e.error}" for e in result.errors],
+    }
@@ -16,7 +16,28 @@ import logging
 
 from open_webui.utils.auth import get_verified_user, get_admin_user
 from open_webui.models.midjourney_tasks import MidJourneyTasks, MidJourneyTaskForm
-from open_webui.models.credits import Credits, AddCreditForm, SetCreditFormDetail
+from open_webui.models.credits import (
+    Credits,
+    CreditReservations,
+    AddCreditForm,
+    SetCreditFormDetail,
+)
+from open_webui.utils.generation import (
+    GenerationProvider,
+    GenerationProviderError,
+    GenerationResult,
+    cancel_generation_job,
+    enqueue_generation_job,
+    get_callback_url,
+    register_generation_provider,
+    reserve_generation_credits,
+)
+from open_webui.utils.http_client import get_http_client
+from open_webui.utils.media import (
+    decode_task_cursor,
+    get_task_list_limit,
+    get_task_list_response,
+)
 from decimal import Decimal
 
 log = logging.getLogger(__name__)
@@ -267,43 +288,21 @@ async def generate_image(
         if credits_needed <= 0:
             raise HTTPException(status_code=500, detail="积分配置错误，请联系管理员")
 
-        # 检查用户真实v豆余额
-        try:
-            user_credit = Credits.get_credit_by_user_id(user.id)
-            if not user_credit:
-                # 如果用户没有积分记录，初始化一个
-                user_credit = Credits.init_credit_by_user_id(user.id)
-        except Exception as e:
-            log.error(f"获取用户积分失败: {str(e)}")
-            raise HTTPException(status_code=400, detail="获取用户积分失败，请稍后重试")
-
-        current_balance = float(user_credit.credit)
-        if current_balance < credits_needed:
-            raise HTTPException(
-                status_code=400,
-                detail=f"v豆余额不足，需要{credits_needed}v豆，当前余额：{current_balance:.2f}v豆",
-            )
-
-        # 扣除v豆
-        try:
-            deduct_form = AddCreditForm(
-                user_id=user.id,
-                amount=Decimal(-credits_needed),
-                detail=SetCreditFormDetail(
-                    desc=f"MidJourney图像生成-{request.mode}模式",
-                    api_path="/midjourney/generate",
-                    api_params={
-                        "mode": request.mode,
-                        "prompt": request.prompt[:50] + "...",
-                    },
-                    usage={"credits_used": credits_needed, "mode": request.mode},
-                ),
-            )
-            Credits.add_credit_by_user_id(deduct_form)
-            log.info(f"用户 {user.id} 消耗了 {credits_needed} v豆用于MidJourney任务")
-        except Exception as e:
-            log.error(f"扣除用户积分失败: {str(e)}")
-            raise HTTPException(status_code=500, detail="扣除积分失败，请稍后重试")
+        # 预留v豆，任务完成时确认扣除，失败或取消时释放
+        reservation = reserve_generation_credits(
+            user.id,
+            credits_needed,
+            SetCreditFormDetail(
+                desc=f"MidJourney图像生成-{request.mode}模式",
+                api_path="/midjourney/generate",
+                api_params={
+                    "mode": request.mode,
+                    "prompt": request.prompt[:50] + "...",
+                },
+                usage={"credits_used": credits_needed, "mode": request.mode},
+            ),
+        )
+        log.info(f"用户 {user.id} 预留了 {credits_needed} v豆用于MidJourney任务")
 
         # 生成任务ID
         task_id = str(uuid.uuid4())
@@ -425,15 +424,21 @@ async def generate_image(
         # 保存到数据库
         saved_task = MidJourneyTasks.insert_new_task(task_form)
         if not saved_task:
+            CreditReservations.release_reservation_by_id(reservation.id)
             raise HTTPException(status_code=500, detail="任务创建失败，请稍后重试")
 
         log.info(
             f"新的MidJourney任务已创建: {task_id}, 用户: {user.id}, 模式: {request.mode}"
         )
 
-        # 启动异步任务处理，传递当前配置
-        asyncio.create_task(
-            process_midjourney_task(task_id, config_api_url, config_api_key)
+        # 交给任务引擎提交并轮询，失败或取消时退还v豆
+        enqueue_generation_job(
+            "midjourney",
+            task_id,
+            user.id,
+            credits_needed,
+            {"base_url": str(req.base_url).rstrip("/")},
+            reservation.id,
         )
 
         return TaskResponse(
@@ -468,19 +473,24 @@ async def get_task_status(task_id: str, user=Depends(get_verified_user)):
 
 
 @router.get("/tasks")
-async def list_user_tasks(user=Depends(get_verified_user)):
-    """获取用户的任务列表"""
+def list_user_tasks(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    user=Depends(get_verified_user),
+):
+    """获取用户的任务列表，不含参考图片，下一页游标在 X-Next-Cursor 响应头中"""
+    page_cursor = decode_task_cursor(cursor)
     if user.role == "admin":
         # 管理员可以看到所有任务
-        tasks = MidJourneyTasks.get_all_tasks(limit=100)
+        limit = get_task_list_limit(limit, 100)
+        tasks = MidJourneyTasks.get_task_list(None, limit, page_cursor)
     else:
         # 普通用户只能看到自己的任务
-        tasks = MidJourneyTasks.get_tasks_by_user_id(user.id, limit=50)
-
-    # 转换为旧版格式确保兼容性
-    user_tasks = [MidJourneyTasks.convert_to_legacy_format(task) for task in tasks]
+        limit = get_task_list_limit(limit, 50)
+        tasks = MidJourneyTasks.get_task_list(user.id, limit, page_cursor)
 
-    return {"tasks": user_tasks}
+    return get_task_list_response(request, {"tasks": tasks}, tasks, limit)
 
 
 @router.delete("/task/{task_id}")
@@ -495,11 +505,19 @@ async def cancel_task(task_id: str, user=Depends(get_verified_user)):
         raise HTTPException(status_code=403, detail="无权访问此任务")
 
     # 只能取消未完成的任务
-    if task.status in ["completed", "failed"]:
+    if task.status in ["completed", "failed", "cancelled"]:
         raise HTTPException(status_code=400, detail="任务已完成，无法取消")
 
-    # 取消任务，退还v豆（仅当任务未完成时）
-    if task.status not in ["completed"] and task.credits_used > 0:
+    # 由任务引擎停止轮询并退还v豆
+    job = cancel_generation_job("midjourney", task_id)
+    if job:
+        if job.status != "cancelled":
+            raise HTTPException(status_code=400, detail="任务已完成，无法取消")
+        log.info(f"任务已取消: {task_id}")
+        return {"message": "任务已取消"}
+
+    # 没有引擎任务记录的旧任务，直接退还v豆
+    if task.credits_used > 0:
         try:
             refund_form = AddCreditForm(
                 user_id=user.id,
@@ -557,276 +575,291 @@ async def debug_task(task_id: str, user=Depends(get_verified_user)):
     }
 
 
-async def process_midjourney_task(
-    task_id: str, config_api_url: str = None, config_api_key: str = None
-):
-    """处理MidJourney任务的异步函数"""
-    task = MidJourneyTasks.get_task_by_id(task_id)
-
-    if not task:
-        log.error(f"任务不存在: {task_id}")
-        return
-
-    # 为了保持代码兼容性，将数据库任务转换为字典格式
-    task_info = MidJourneyTasks.convert_to_legacy_format(task)
-
-    # 定义更新任务状态的辅助函数
-    def update_task_status(**updates):
-        try:
-            MidJourneyTasks.update_task_by_id(task_id, updates)
-            # 同时更新本地task_info以保持兼容性
-            task_info.update(updates)
-        except Exception as e:
-            log.error(f"更新任务状态失败 {task_id}: {e}")
-
-    try:
-        log.info(f"开始处理MidJourney任务: {task_id}")
-
-        # 验证任务状态
-        if task_info["status"] != "submitted":
-            log.warning(f"任务状态异常: {task_id}, 当前状态: {task_info['status']}")
-            return
-
-        # 阶段1: 提交到MidJourney API
-        update_task_status(
-            status="processing", message="正在提交到MidJourney服务", progress=10
-        )
-
-        log.info(f"开始处理任务: {task_id}, prompt: {task_info['prompt'][:50]}...")
-
-        # 构建API请求
-        request_data = {
-            "prompt": task_info["final_prompt"],
-            "mode": task_info["mode"],
-            "reference_images": task_info.get("reference_images", []),
-            "advanced_params": task_info.get("advanced_params"),
-        }
-
-        # 调用真实的MidJourney API
-        api_response = await call_midjourney_api(
-            config_api_url, config_api_key, request_data
+def parse_midjourney_actions(buttons: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """解析MidJourney返回的动作按钮"""
+    actions = []
+    for button in buttons or []:
+        button_label = button.get("label", "")
+        button_emoji = button.get("emoji", "")
+
+        # 确定动作类型
+        if button_label and button_label.startswith("U"):
+            action_type = "upscale"
+            display_label = button_label
+        elif button_label and button_label.startswith("V"):
+            action_type = "variation"
+            display_label = button_label
+        elif button_emoji == "🔄":
+            action_type = "reroll"
+            display_label = "重新生成"
+        else:
+            action_type = "unknown"
+            display_label = button_label or button_emoji or "未知"
+
+        actions.append(
+            {
+                "label": display_label,
+                "custom_id": button.get("customId", ""),
+                "type": action_type,
+                "emoji": button_emoji,
+            }
         )
+    return actions
+
+
+def get_midjourney_error_message(error: str) -> str:
+    """根据错误类型设置不同的错误消息"""
+    error_str = error.lower()
+    if "验证失败" in error_str or "validation" in error_str:
+        return f"参数验证失败: {error}"
+    elif "network" in error_str or "connection" in error_str:
+        return "网络连接失败，请稍后重试"
+    elif "timeout" in error_str or "超时" in error_str:
+        return "请求超时，请稍后重试"
+    elif "配置" in error_str:
+        return "服务配置错误，请联系管理员"
+    # 显示详细错误信息用于调试
+    return f"生成失败: {error}"
+
+
+@register_generation_provider
+class MidJourneyProvider(GenerationProvider):
+    """由任务引擎驱动的MidJourney任务提交与轮询"""
+
+    name = "midjourney"
+    title = "MidJourney"
+    max_concurrency = 10
+    poll_interval = 5
+    timeout = 900
+    # 配置了notifyHook时，超过该时间未收到回调才开始轮询
+    callback_timeout = 90
+
+    # 首次批量查询失败（接口不存在）后置为False
+    supports_batch_fetch = True
+
+    def get_credentials(self, app):
+        api_url = getattr(app.state.config, "MIDJOURNEY_API_URL", "")
+        api_key = getattr(app.state.config, "MIDJOURNEY_API_KEY", "")
+        if not api_url or not api_key:
+            raise GenerationProviderError("MidJourney服务配置不完整，请联系管理员")
+        return api_url, api_key
+
+    async def submit(self, app, job):
+        task = MidJourneyTasks.get_task_by_id(job.task_id)
+        if not task:
+            raise GenerationProviderError("任务不存在")
+
+        api_url, api_key = self.get_credentials(app)
+        notify_hook = get_callback_url(app, job)
+
+        if task.parent_task_id:
+            # 动作任务：基于原始任务的MidJourney ID
+            parent_task = MidJourneyTasks.get_task_by_id(task.parent_task_id)
+            if not parent_task or not parent_task.mj_task_id:
+                raise GenerationProviderError("找不到原始任务的MidJourney ID")
+
+            MidJourneyTasks.update_task_by_id(
+                job.task_id,
+                {"status": "processing", "progress": 10, "message": "正在提交动作请求"},
+            )
+            api_response = await call_midjourney_action_api(
+                api_url,
+                api_key,
+                task.custom_id,
+                parent_task.mj_task_id,
+                parent_task.mode or "fast",
+                notify_hook,
+            )
+            message = "动作已提交，正在处理"
+        else:
+            MidJourneyTasks.update_task_by_id(
+                job.task_id,
+                {
+                    "status": "processing",
+                    "progress": 10,
+                    "message": "正在提交到MidJourney服务",
+                },
+            )
+            api_response = await call_midjourney_api(
+                api_url,
+                api_key,
+                {
+                    "prompt": task.final_prompt,
+                    "mode": task.mode,
+                    "reference_images": task.reference_images or [],
+                    "advanced_params": task.advanced_params,
+                    "notify_hook": notify_hook,
+                },
+            )
+            message = "任务已提交，正在生成图像"
 
-        if not api_response["success"]:
-            raise Exception(f"API调用失败: {api_response.get('error', '未知错误')}")
-
-        # 获取MidJourney任务ID
         mj_task_id = api_response["task_id"]
-
-        update_task_status(
-            mj_task_id=mj_task_id, message="任务已提交，正在生成图像", progress=20
+        MidJourneyTasks.update_task_by_id(
+            job.task_id, {"mj_task_id": mj_task_id, "message": message, "progress": 20}
         )
+        log.info(f"MidJourney任务已提交: {job.task_id} -> {mj_task_id}")
 
-        log.info(f"MidJourney任务已提交: {mj_task_id}")
+        return GenerationResult(external_id=mj_task_id, progress=20)
 
-        # 阶段2: 轮询任务状态
-        max_polls = 60  # 最多轮询60次 (5分钟)
-        poll_interval = 5  # 5秒间隔
-        poll_count = 0
+    async def poll(self, app, job):
+        task = MidJourneyTasks.get_task_by_id(job.task_id)
+        if not task:
+            raise GenerationProviderError("任务不存在")
 
-        while poll_count < max_polls:
-            await asyncio.sleep(poll_interval)
-            poll_count += 1
+        api_url, api_key = self.get_credentials(app)
+        status_response = await fetch_midjourney_task(
+            api_url, api_key, job.external_id, task.mode or "fast"
+        )
+        return self.apply_status(job, task, status_response)
 
-            # 查询任务状态 - 使用传递的配置参数
-            status_response = await fetch_midjourney_task(
-                config_api_url, config_api_key, mj_task_id, task_info["mode"]
-            )
+    async def poll_many(self, app, jobs):
+        """通过list-by-condition一次查询多个任务，不支持时退回逐个查询"""
+        if not self.supports_batch_fetch or len(jobs) == 1:
+            return await super().poll_many(app, jobs)
 
-            if status_response.get("status") == "FAILURE":
-                error_msg = status_response.get("failReason", "任务执行失败")
-                raise Exception(f"MidJourney任务失败: {error_msg}")
+        api_url, api_key = self.get_credentials(app)
+        status_responses = await fetch_midjourney_tasks(
+            api_url, api_key, [job.external_id for job in jobs]
+        )
+        if status_responses is None:
+            log.info("MidJourney服务不支持批量查询，改为逐个查询任务")
+            self.supports_batch_fetch = False
+            return await super().poll_many(app, jobs)
+
+        results = {}
+        missing = []
+        for job in jobs:
+            status_response = status_responses.get(job.external_id)
+            if status_response is None:
+                missing.append(job)
+                continue
 
-            # 更新进度
-            progress_str = status_response.get("progress", "0%")
             try:
-                progress_num = int(progress_str.replace("%", ""))
-                # 映射MidJourney进度到我们的进度 (20-95)
-                mapped_progress = 20 + int(progress_num * 0.75)
-                current_progress = min(mapped_progress, 95)
-            except:
-                # 如果无法解析进度，使用默认进度更新
-                current_progress = min(20 + poll_count * 2, 90)
-
-            update_task_status(
-                progress=current_progress,
-                message=f"MidJourney正在生成图像 ({progress_str})",
+                results[job.id] = await asyncio.to_thread(
+                    self.apply_task_status, job, status_response
+                )
+            except Exception as e:
+                results[job.id] = e
+
+        if missing:
+            results.update(await super().poll_many(app, missing))
+        return results
+
+    def get_callback_external_id(self, payload):
+        return payload.get("id")
+
+    def apply_callback(self, job, payload):
+        # notifyHook推送的是与查询接口相同的任务对象
+        return self.apply_task_status(job, payload)
+
+    def apply_task_status(self, job, status_response: Dict[str, Any]):
+        task = MidJourneyTasks.get_task_by_id(job.task_id)
+        if not task:
+            raise GenerationProviderError("任务不存在")
+        return self.apply_status(job, task, status_response)
+
+    def apply_status(self, job, task, status_response: Dict[str, Any]):
+        """将MidJourney任务状态写入任务记录"""
+        is_action = bool(task.parent_task_id)
+        mj_status = status_response.get("status")
+
+        if mj_status == "FAILURE":
+            error_msg = status_response.get("failReason") or (
+                "动作执行失败" if is_action else "任务执行失败"
             )
+            prefix = "MidJourney动作失败" if is_action else "MidJourney任务失败"
+            return GenerationResult(status="failed", error=f"{prefix}: {error_msg}")
 
-            log.info(
-                f"任务进度更新: {task_id} - {task_info['progress']}% - {task_info['message']}"
-            )
+        if mj_status == "CANCEL":
+            return GenerationResult(status="failed", error="任务已被MidJourney取消")
 
-            # 处理不同的任务状态
-            mj_status = status_response.get("status")
-
-            if mj_status == "SUCCESS":
-                # 解析动作按钮
-                buttons = status_response.get("buttons", [])
-                actions = []
-                for button in buttons:
-                    button_label = button.get("label", "")
-                    button_emoji = button.get("emoji", "")
-
-                    # 确定动作类型
-                    if button_label and button_label.startswith("U"):
-                        action_type = "upscale"
-                        display_label = button_label
-                    elif button_label and button_label.startswith("V"):
-                        action_type = "variation"
-                        display_label = button_label
-                    elif button_emoji == "🔄":
-                        action_type = "reroll"
-                        display_label = "重新生成"
-                    else:
-                        action_type = "unknown"
-                        display_label = button_label or button_emoji or "未知"
-
-                    actions.append(
-                        {
-                            "label": display_label,
-                            "custom_id": button.get("customId", ""),
-                            "type": action_type,
-                            "emoji": button_emoji,
-                        }
-                    )
+        # 映射MidJourney进度到我们的进度 (20-95)
+        progress_str = status_response.get("progress") or "0%"
+        try:
+            progress = min(20 + int(int(progress_str.replace("%", "")) * 0.75), 95)
+        except ValueError:
+            progress = min(20 + job.poll_count * 2, 90)
+
+        if mj_status == "SUCCESS":
+            update_data = {
+                "status": "completed",
+                "message": "动作执行完成" if is_action else "图像生成完成",
+                "progress": 100,
+                "image_url": status_response.get("imageUrl"),
+                "completed_at": int(time.time()),
+                "actions": parse_midjourney_actions(status_response.get("buttons")),
+            }
 
+            if not is_action:
                 # 提取种子值（如果存在）
-                properties = status_response.get("properties", {})
+                properties = status_response.get("properties") or {}
                 final_prompt = properties.get("finalPrompt", "")
-                seed_value = task_info.get("seed")  # 获取原有的种子值
+                seed_value = task.seed
 
                 if "--seed" in final_prompt:
                     try:
-                        seed_match = final_prompt.split("--seed")[1].split()[0]
-                        seed_value = int(seed_match)
-                    except:
-                        if not seed_value:
-                            seed_value = random.randint(0, 4294967295)
-                elif not seed_value:
+                        seed_value = int(final_prompt.split("--seed")[1].split()[0])
+                    except (IndexError, ValueError):
+                        pass
+                if not seed_value:
                     seed_value = random.randint(0, 4294967295)
 
-                # 更新任务为完成状态
-                update_task_status(
-                    status="completed",
-                    message="图像生成完成",
-                    progress=100,
-                    image_url=status_response.get("imageUrl"),
-                    completed_at=int(time.time()),
-                    actions=actions,
-                    seed=seed_value,
-                    final_prompt=(
-                        final_prompt if final_prompt else task_info.get("final_prompt")
-                    ),
-                )
-
-                log.info(f"MidJourney任务成功完成: {task_id}")
-                break
-
-            elif mj_status in ["NOT_START", "SUBMITTED"]:
-                # 任务等待中
-                current_progress = max(task_info.get("progress", 0), 5)
-                update_task_status(
-                    message="任务已提交，等待处理", progress=current_progress
-                )
-
-            elif mj_status == "IN_PROGRESS":
-                # 任务处理中，继续轮询
-                pass  # 进度已在上面更新
-
-            elif mj_status == "MODAL":
-                # 需要用户确认（一般不会出现在imagine任务中）
-                update_task_status(message="等待确认")
-
-            elif mj_status == "CANCEL":
-                # 任务被取消
-                update_task_status(
-                    status="cancelled",
-                    message="任务已取消",
-                    completed_at=int(time.time()),
-                )
-                break
-
+                update_data["seed"] = seed_value
+                update_data["final_prompt"] = final_prompt or task.final_prompt
+
+            MidJourneyTasks.update_task_by_id(job.task_id, update_data)
+            log.info(f"MidJourney任务成功完成: {job.task_id}")
+            return GenerationResult(status="completed", progress=100)
+
+        if mj_status in ["NOT_START", "SUBMITTED"]:
+            progress = max(task.progress or 0, 5)
+            message = "任务已提交，等待处理"
+        elif mj_status == "MODAL":
+            # 需要用户确认（一般不会出现在imagine任务中）
+            message = "等待确认"
+        elif is_action:
+            message = f"动作执行中 ({progress_str})"
         else:
-            # 轮询超时
-            raise Exception("任务处理超时，请稍后重试")
-
-    except asyncio.CancelledError:
-        # 任务被取消，退还v豆
-        try:
-            refund_form = AddCreditForm(
-                user_id=task_info["user_id"],
-                amount=Decimal(task_info.get("credits_used", 0)),
-                detail=SetCreditFormDetail(
-                    desc=f"MidJourney任务取消退款-{task_info.get('mode', 'unknown')}模式",
-                    api_path="/midjourney/process",
-                    api_params={"task_id": task_id, "cancel_reason": "task_cancelled"},
-                    usage={
-                        "credits_refunded": task_info.get("credits_used", 0),
-                        "reason": "task_cancelled",
-                    },
-                ),
-            )
-            Credits.add_credit_by_user_id(refund_form)
-            log.info(
-                f"任务取消，已退还 {task_info.get('credits_used', 0)} v豆给用户 {task_info['user_id']}"
-            )
-        except Exception as refund_error:
-            log.error(f"退还v豆失败: {str(refund_error)}")
+            message = f"MidJourney正在生成图像 ({progress_str})"
 
-        log.info(f"MidJourney任务被取消: {task_id}")
-        update_task_status(
-            status="cancelled", message="任务已取消", completed_at=int(time.time())
+        MidJourneyTasks.update_task_by_id(
+            job.task_id, {"progress": progress, "message": message}
         )
+        return GenerationResult(progress=progress)
 
-    except Exception as e:
-        log.error(f"MidJourney任务处理失败: {task_id}")
-        log.error(f"错误详情: {str(e)}")
-
-        # 根据错误类型设置不同的错误消息
-        error_str = str(e).lower()
-        if "验证失败" in error_str or "validation" in error_str:
-            error_message = f"参数验证失败: {str(e)}"
-        elif "network" in error_str or "connection" in error_str:
-            error_message = "网络连接失败，请稍后重试"
-        elif "timeout" in error_str:
-            error_message = "请求超时，请稍后重试"
-        elif "配置" in error_str:
-            error_message = "服务配置错误，请联系管理员"
-        else:
-            # 显示详细错误信息用于调试
-            error_message = f"生成失败: {str(e)}"
+    def on_failed(self, job, error):
+        task = MidJourneyTasks.get_task_by_id(job.task_id)
+        if not task:
+            return
 
-        # 任务失败，退还v豆
-        try:
-            refund_form = AddCreditForm(
-                user_id=task_info["user_id"],
-                amount=Decimal(task_info.get("credits_used", 0)),
-                detail=SetCreditFormDetail(
-                    desc=f"MidJourney任务失败退款-{task_info.get('mode', 'unknown')}模式",
-                    api_path="/midjourney/generate",
-                    api_params={"task_id": task_id, "refund_reason": "task_failed"},
-                    usage={
-                        "credits_refunded": task_info.get("credits_used", 0),
-                        "reason": "task_failed",
-                    },
+        MidJourneyTasks.update_task_by_id(
+            job.task_id,
+            {
+                "status": "failed",
+                "error_message": error,
+                "message": (
+                    f"动作执行失败: {error}"
+                    if task.parent_task_id
+                    else get_midjourney_error_message(error)
                 ),
-            )
-            Credits.add_credit_by_user_id(refund_form)
-            log.info(
-                f"任务失败，已退还 {task_info.get('credits_used', 0)} v豆给用户 {task_info['user_id']}"
-            )
-        except Exception as refund_error:
-            log.error(f"退还v豆失败: {str(refund_error)}")
+                "completed_at": int(time.time()),
+            },
+        )
 
-        # 设置失败状态
-        update_task_status(
-            status="failed",
-            error_message=str(e),
-            message=error_message,
-            completed_at=int(time.time()),
+    def on_cancelled(self, job):
+        MidJourneyTasks.update_task_by_id(
+            job.task_id,
+            {
+                "status": "cancelled",
+                "message": "任务已取消",
+                "completed_at": int(time.time()),
+            },
         )
 
+    def get_task_data(self, task_id):
+        task = MidJourneyTasks.get_task_by_id(task_id)
+        return MidJourneyTasks.convert_to_legacy_format(task) if task else None
+
 
 # 新增：执行MidJourney动作的路由
 class ActionRequest(BaseModel):
@@ -859,49 +892,26 @@ async def execute_action(
     if original_task["status"] != "completed":
         raise HTTPException(status_code=400, detail="只能对已完成的任务执行动作")
 
-    # 检查用户v豆余额并扣除动作操作所需积分
+    # 预留动作操作所需v豆
     action_credits_needed = 5  # 动作操作通常消耗较少积分
 
-    try:
-        user_credit = Credits.get_credit_by_user_id(user.id)
-        if not user_credit:
-            user_credit = Credits.init_credit_by_user_id(user.id)
-    except Exception as e:
-        log.error(f"获取用户积分失败: {str(e)}")
-        raise HTTPException(status_code=400, detail="获取用户积分失败，请稍后重试")
-
-    current_balance = float(user_credit.credit)
-    if current_balance < action_credits_needed:
-        raise HTTPException(
-            status_code=400,
-            detail=f"v豆余额不足，执行{request.action_type}操作需要{action_credits_needed}v豆，当前余额：{current_balance:.2f}v豆",
-        )
-
-    # 扣除v豆
-    try:
-        deduct_form = AddCreditForm(
-            user_id=user.id,
-            amount=Decimal(-action_credits_needed),
-            detail=SetCreditFormDetail(
-                desc=f"MidJourney动作操作-{request.action_type}",
-                api_path="/midjourney/action",
-                api_params={
-                    "action_type": request.action_type,
-                    "parent_task_id": task_id,
-                },
-                usage={
-                    "credits_used": action_credits_needed,
-                    "action_type": request.action_type,
-                },
-            ),
-        )
-        Credits.add_credit_by_user_id(deduct_form)
-        log.info(
-            f"用户 {user.id} 消耗了 {action_credits_needed} v豆用于MidJourney动作操作"
-        )
-    except Exception as e:
-        log.error(f"扣除用户积分失败: {str(e)}")
-        raise HTTPException(status_code=500, detail="扣除积分失败，请稍后重试")
+    reservation = reserve_generation_credits(
+        user.id,
+        action_credits_needed,
+        SetCreditFormDetail(
+            desc=f"MidJourney动作操作-{request.action_type}",
+            api_path="/midjourney/action",
+            api_params={
+                "action_type": request.action_type,
+                "parent_task_id": task_id,
+            },
+            usage={
+                "credits_used": action_credits_needed,
+                "action_type": request.action_type,
+            },
+        ),
+    )
+    log.info(f"用户 {user.id} 预留了 {action_credits_needed} v豆用于MidJourney动作操作")
 
     # 生成新任务ID
     new_task_id = str(uuid.uuid4())
@@ -927,15 +937,17 @@ async def execute_action(
     # 保存到数据库
     saved_action_task = MidJourneyTasks.insert_new_task(action_task_form)
     if not saved_action_task:
+        CreditReservations.release_reservation_by_id(reservation.id)
         raise HTTPException(status_code=500, detail="动作任务创建失败，请稍后重试")
 
-    # 获取当前MidJourney配置
-    config_api_url = getattr(req.app.state.config, "MIDJOURNEY_API_URL", "")
-    config_api_key = getattr(req.app.state.config, "MIDJOURNEY_API_KEY", "")
-
-    # 启动异步处理，传递当前配置
-    asyncio.create_task(
-        process_action_task(new_task_id, config_api_url, config_api_key)
+    # 交给任务引擎提交并轮询，失败或取消时退还v豆
+    enqueue_generation_job(
+        "midjourney",
+        new_task_id,
+        user.id,
+        action_credits_needed,
+        {"base_url": str(req.base_url).rstrip("/")},
+        reservation.id,
     )
 
     log.info(
@@ -950,390 +962,230 @@ async def execute_action(
     )
 
 
-async def process_action_task(
-    task_id: str, config_api_url: str = None, config_api_key: str = None
-):
-    """处理MidJourney动作任务"""
-    task = MidJourneyTasks.get_task_by_id(task_id)
-
-    if not task:
-        log.error(f"动作任务不存在: {task_id}")
-        return
-
-    # 转换为字典格式保持兼容性
-    task_info = MidJourneyTasks.convert_to_legacy_format(task)
-
-    # 定义更新任务状态的辅助函数
-    def update_action_task_status(**updates):
-        try:
-            MidJourneyTasks.update_task_by_id(task_id, updates)
-            # 同时更新本地task_info以保持兼容性
-            task_info.update(updates)
-        except Exception as e:
-            log.error(f"更新动作任务状态失败 {task_id}: {e}")
+async def call_midjourney_api(
+    api_url: str, api_key: str, request_data: Dict[str, Any]
+) -> Dict[str, Any]:
+    """调用真实的MidJourney API，失败时抛出异常"""
 
+    client = get_http_client("midjourney")
     try:
-        log.info(f"开始处理MidJourney动作任务: {task_id}")
-
-        update_action_task_status(
-            status="processing", progress=10, message="正在提交动作请求"
-        )
-
-        # 获取原始任务的MidJourney任务ID
-        parent_task_id = task_info.get("parent_task_id")
-        parent_task_model = (
-            MidJourneyTasks.get_task_by_id(parent_task_id) if parent_task_id else None
-        )
-        parent_task = (
-            MidJourneyTasks.convert_to_legacy_format(parent_task_model)
-            if parent_task_model
-            else None
-        )
-
-        if not parent_task or not parent_task.get("mj_task_id"):
-            raise Exception("找不到原始任务的MidJourney ID")
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
 
-        original_mj_task_id = parent_task["mj_task_id"]
-        custom_id = task_info.get("custom_id")
+        # 构建API请求负载 (按照文档格式)
+        prompt = request_data.get("prompt", "")
+        mode = request_data.get("mode", "fast")
 
-        # 使用传递的API配置
-        current_api_url = config_api_url
-        current_api_key = config_api_key
+        # 根据模式使用正确的API端点路径 - 按照文档格式
+        mode_path_map = {
+            "fast": "fast",
+            "relax": "relax",
+            "turbo": "fast",  # turbo模式使用fast端点
+        }
+        mode_path = mode_path_map.get(mode, "fast")
+        submit_url = f"{api_url}/{mode_path}/mj/submit/imagine"
+
+        # 使用LinkAPI文档指定的标准参数格式
+        # Turbo模式的处理：
+        # 1. 使用fast端点（因为大多数API没有独立的turbo端点）
+        # 2. 在prompt中添加--turbo参数（在MidJourney中这是启用turbo模式的标准方式）
+        final_prompt = prompt
+        if mode == "turbo":
+            # 检查prompt中是否已经包含--turbo参数
+            if "--turbo" not in final_prompt.lower():
+                final_prompt += " --turbo"
+            log.info(f"Turbo模式检测，已在prompt中添加--turbo参数")
+
+        payload = {"prompt": final_prompt, "base64Array": []}
+        if request_data.get("notify_hook"):
+            payload["notifyHook"] = request_data["notify_hook"]
+
+        # 添加参考图片 (按照文档的base64Array格式)
+        reference_images = request_data.get("reference_images", [])
+        if reference_images:
+            for ref_img in reference_images:
+                # 前端发送的是字典对象，包含base64字段
+                if isinstance(ref_img, dict):
+                    base64_data = ref_img.get("base64", "")
+                    if base64_data:
+                        # 确保有正确的data URL前缀
+                        if not base64_data.startswith("data:"):
+                            base64_data = f"data:image/jpeg;base64,{base64_data}"
+                        payload["base64Array"].append(base64_data)
+                        log.info(
+                            f"添加参考图片: {ref_img.get('filename', '未知文件名')}, 类型: {ref_img.get('type', 'unknown')}"
+                        )
+                else:
+                    log.warning(f"参考图片格式不正确: {type(ref_img)}")
 
-        action_response = await call_midjourney_action_api(
-            current_api_url,
-            current_api_key,
-            custom_id,
-            original_mj_task_id,
-            parent_task.get("mode", "fast"),
+        log.info(f"调用MidJourney API: {submit_url} (模式: {mode})")
+        log.info(
+            f"请求负载: prompt长度={len(payload['prompt'])}, 参考图数量={len(payload['base64Array'])}"
         )
+        if mode == "turbo":
+            log.info(f"Turbo模式 - 最终prompt片段: {payload['prompt'][-50:]}")
 
-        if not action_response["success"]:
-            raise Exception(
-                f"动作API调用失败: {action_response.get('error', '未知错误')}"
-            )
-
-        # 获取新的MidJourney任务ID
-        new_mj_task_id = action_response["task_id"]
-
-        update_action_task_status(
-            mj_task_id=new_mj_task_id, message="动作已提交，正在处理", progress=20
+        # 实际API调用
+        response = await client.post(
+            submit_url, json=payload, headers=headers, timeout=30.0
         )
 
-        log.info(f"MidJourney动作任务已提交: {new_mj_task_id}")
-
-        # 轮询动作任务状态
-        max_polls = 60  # 最多轮询60次 (5分钟)
-        poll_interval = 5  # 5秒间隔
-        poll_count = 0
-
-        while poll_count < max_polls:
-            await asyncio.sleep(poll_interval)
-            poll_count += 1
-
-            # 使用传递的API配置
-            current_api_url = config_api_url
-            current_api_key = config_api_key
-
-            status_response = await fetch_midjourney_task(
-                current_api_url,
-                current_api_key,
-                new_mj_task_id,
-                parent_task.get("mode", "fast"),
-            )
-
-            if status_response.get("status") == "FAILURE":
-                error_msg = status_response.get("failReason", "动作执行失败")
-                raise Exception(f"MidJourney动作失败: {error_msg}")
-
-            # 更新进度
-            progress_str = status_response.get("progress", "0%")
-            try:
-                progress_num = int(progress_str.replace("%", ""))
-                mapped_progress = 20 + int(progress_num * 0.75)
-                current_progress = min(mapped_progress, 95)
-            except:
-                current_progress = min(20 + poll_count * 2, 90)
-
-            update_action_task_status(
-                progress=current_progress, message=f"动作执行中 ({progress_str})"
+        if response.status_code != 200:
+            raise GenerationProviderError(
+                f"API调用失败: {response.status_code} - {response.text}",
+                retryable=response.status_code in (429, 503),
             )
 
-            log.info(f"动作任务进度更新: {task_id} - {task_info['progress']}%")
-
-            # 检查是否完成
-            if status_response.get("status") == "SUCCESS":
-                # 解析动作按钮
-                buttons = status_response.get("buttons", [])
-                actions = []
-                for button in buttons:
-                    button_label = button.get("label", "")
-                    button_emoji = button.get("emoji", "")
-
-                    # 确定动作类型
-                    if button_label and button_label.startswith("U"):
-                        action_type = "upscale"
-                        display_label = button_label
-                    elif button_label and button_label.startswith("V"):
-                        action_type = "variation"
-                        display_label = button_label
-                    elif button_emoji == "🔄":
-                        action_type = "reroll"
-                        display_label = "重新生成"
-                    else:
-                        action_type = "unknown"
-                        display_label = button_label or button_emoji or "未知"
-
-                    actions.append(
-                        {
-                            "label": display_label,
-                            "custom_id": button.get("customId", ""),
-                            "type": action_type,
-                            "emoji": button_emoji,
-                        }
-                    )
-
-                # 动作完成，更新任务状态
-                update_action_task_status(
-                    status="completed",
-                    progress=100,
-                    message="动作执行完成",
-                    image_url=status_response.get("imageUrl"),
-                    completed_at=int(time.time()),
-                    actions=actions,
-                )
-
-                log.info(f"MidJourney动作任务完成: {task_id}")
-                break
+        result = response.json()
+        if result.get("code") != 1:
+            error_desc = result.get("description", "未知错误")
+            # 优化特定错误信息的显示
+            if error_desc == "quota_not_enough":
+                raise GenerationProviderError("API配额不足，请检查账户余额并充值")
+            elif error_desc == "parameter error":
+                raise GenerationProviderError("API参数错误，请检查配置")
+            else:
+                raise GenerationProviderError(f"任务提交失败: {error_desc}")
 
-        else:
-            # 轮询超时
-            raise Exception("动作处理超时，请稍后重试")
+        return {
+            "success": True,
+            "task_id": result["result"],
+            "status": "submitted",
+            "code": result.get("code"),
+            "description": result.get("description", "提交成功"),
+            "result": result["result"],
+        }
 
     except Exception as e:
-        log.error(f"MidJourney动作任务失败: {task_id}, 错误: {str(e)}")
+        log.error(f"MidJourney API调用失败: {str(e)}")
+        raise
 
-        # 动作任务失败，退还v豆
-        try:
-            refund_form = AddCreditForm(
-                user_id=task_info["user_id"],
-                amount=Decimal(task_info.get("credits_used", 0)),
-                detail=SetCreditFormDetail(
-                    desc=f"MidJourney动作失败退款-{task_info.get('action_type', 'unknown')}",
-                    api_path="/midjourney/action",
-                    api_params={"task_id": task_id, "refund_reason": "action_failed"},
-                    usage={
-                        "credits_refunded": task_info.get("credits_used", 0),
-                        "reason": "action_failed",
-                    },
-                ),
-            )
-            Credits.add_credit_by_user_id(refund_form)
-            log.info(
-                f"动作任务失败，已退还 {task_info.get('credits_used', 0)} v豆给用户 {task_info['user_id']}"
-            )
-        except Exception as refund_error:
-            log.error(f"退还v豆失败: {str(refund_error)}")
 
-        update_action_task_status(
-            status="failed",
-            message=f"动作执行失败: {str(e)}",
-            completed_at=int(time.time()),
-        )
+async def call_midjourney_action_api(
+    api_url: str,
+    api_key: str,
+    custom_id: str,
+    task_id: str,
+    mode: str = "fast",
+    notify_hook: Optional[str] = None,
+) -> Dict[str, Any]:
+    """调用MidJourney动作API，失败时抛出异常"""
 
+    client = get_http_client("midjourney")
+    try:
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
 
-async def call_midjourney_api(
-    api_url: str, api_key: str, request_data: Dict[str, Any]
-) -> Dict[str, Any]:
-    """调用真实的MidJourney API"""
+        # 根据模式使用正确的动作API端点路径 - 按照文档格式
+        mode_path_map = {
+            "fast": "fast",
+            "relax": "relax",
+            "turbo": "fast",  # turbo模式使用fast端点 + --turbo参数
+        }
+        mode_path = mode_path_map.get(mode, "fast")
+        action_url = f"{api_url}/{mode_path}/mj/submit/action"
 
-    async with httpx.AsyncClient() as client:
-        try:
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
+        # 按照文档格式构建请求
+        payload = {"customId": custom_id, "taskId": task_id}
+        if notify_hook:
+            payload["notifyHook"] = notify_hook
 
-            # 构建API请求负载 (按照文档格式)
-            prompt = request_data.get("prompt", "")
-            mode = request_data.get("mode", "fast")
+        log.info(f"调用MidJourney动作API: {action_url}")
+        log.info(f"动作请求: customId={custom_id}, taskId={task_id}")
 
-            # 根据模式使用正确的API端点路径 - 按照文档格式
-            mode_path_map = {
-                "fast": "fast",
-                "relax": "relax",
-                "turbo": "fast",  # turbo模式使用fast端点
-            }
-            mode_path = mode_path_map.get(mode, "fast")
-            submit_url = f"{api_url}/{mode_path}/mj/submit/imagine"
-
-            # 使用LinkAPI文档指定的标准参数格式
-            # Turbo模式的处理：
-            # 1. 使用fast端点（因为大多数API没有独立的turbo端点）
-            # 2. 在prompt中添加--turbo参数（在MidJourney中这是启用turbo模式的标准方式）
-            final_prompt = prompt
-            if mode == "turbo":
-                # 检查prompt中是否已经包含--turbo参数
-                if "--turbo" not in final_prompt.lower():
-                    final_prompt += " --turbo"
-                log.info(f"Turbo模式检测，已在prompt中添加--turbo参数")
-
-            payload = {"prompt": final_prompt, "base64Array": []}
-
-            # 添加参考图片 (按照文档的base64Array格式)
-            reference_images = request_data.get("reference_images", [])
-            if reference_images:
-                for ref_img in reference_images:
-                    # 前端发送的是字典对象，包含base64字段
-                    if isinstance(ref_img, dict):
-                        base64_data = ref_img.get("base64", "")
-                        if base64_data:
-                            # 确保有正确的data URL前缀
-                            if not base64_data.startswith("data:"):
-                                base64_data = f"data:image/jpeg;base64,{base64_data}"
-                            payload["base64Array"].append(base64_data)
-                            log.info(
-                                f"添加参考图片: {ref_img.get('filename', '未知文件名')}, 类型: {ref_img.get('type', 'unknown')}"
-                            )
-                    else:
-                        log.warning(f"参考图片格式不正确: {type(ref_img)}")
+        # 实际API调用
+        response = await client.post(
+            action_url, json=payload, headers=headers, timeout=30.0
+        )
 
-            log.info(f"调用MidJourney API: {submit_url} (模式: {mode})")
-            log.info(
-                f"请求负载: prompt长度={len(payload['prompt'])}, 参考图数量={len(payload['base64Array'])}"
+        if response.status_code != 200:
+            raise GenerationProviderError(
+                f"动作API调用失败: {response.status_code} - {response.text}",
+                retryable=response.status_code in (429, 503),
             )
-            if mode == "turbo":
-                log.info(f"Turbo模式 - 最终prompt片段: {payload['prompt'][-50:]}")
 
-            # 实际API调用
-            response = await client.post(
-                submit_url, json=payload, headers=headers, timeout=30.0
+        result = response.json()
+        if result.get("code") != 1:
+            raise GenerationProviderError(
+                f"动作提交失败: {result.get('description', '未知错误')}"
             )
 
-            if response.status_code != 200:
-                raise Exception(
-                    f"API调用失败: {response.status_code} - {response.text}"
-                )
-
-            result = response.json()
-            if result.get("code") != 1:
-                error_desc = result.get("description", "未知错误")
-                # 优化特定错误信息的显示
-                if error_desc == "quota_not_enough":
-                    raise Exception("API配额不足，请检查账户余额并充值")
-                elif error_desc == "parameter error":
-                    raise Exception("API参数错误，请检查配置")
-                else:
-                    raise Exception(f"任务提交失败: {error_desc}")
-
-            return {
-                "success": True,
-                "task_id": result["result"],
-                "status": "submitted",
-                "code": result.get("code"),
-                "description": result.get("description", "提交成功"),
-                "result": result["result"],
-            }
+        return {
+            "success": True,
+            "task_id": result["result"],
+            "status": "submitted",
+            "code": result.get("code"),
+            "description": result.get("description", "动作提交成功"),
+            "result": result["result"],
+        }
 
-        except Exception as e:
-            log.error(f"MidJourney API调用失败: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "code": -1,
-                "description": str(e),
-            }
+    except Exception as e:
+        log.error(f"MidJourney动作API调用失败: {str(e)}")
+        raise
 
 
-async def call_midjourney_action_api(
-    api_url: str, api_key: str, custom_id: str, task_id: str, mode: str = "fast"
+async def fetch_midjourney_task(
+    api_url: str, api_key: str, task_id: str, mode: str = "fast"
 ) -> Dict[str, Any]:
-    """调用MidJourney动作API"""
+    """查询MidJourney任务状态"""
 
-    async with httpx.AsyncClient() as client:
-        try:
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
+    client = get_http_client("midjourney")
+    try:
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
 
-            # 根据模式使用正确的动作API端点路径 - 按照文档格式
-            mode_path_map = {
-                "fast": "fast",
-                "relax": "relax",
-                "turbo": "fast",  # turbo模式使用fast端点 + --turbo参数
-            }
-            mode_path = mode_path_map.get(mode, "fast")
-            action_url = f"{api_url}/{mode_path}/mj/submit/action"
+        # 任务查询使用fast端点路径（根据文档规范）
+        fetch_url = f"{api_url}/fast/mj/task/{task_id}/fetch"
 
-            # 按照文档格式构建请求
-            payload = {"customId": custom_id, "taskId": task_id}
+        log.info(f"查询MidJourney任务: {fetch_url}")
 
-            log.info(f"调用MidJourney动作API: {action_url}")
-            log.info(f"动作请求: customId={custom_id}, taskId={task_id}")
+        # 实际API调用
+        response = await client.get(fetch_url, headers=headers, timeout=30.0)
 
-            # 实际API调用
-            response = await client.post(
-                action_url, json=payload, headers=headers, timeout=30.0
+        if response.status_code != 200:
+            raise GenerationProviderError(
+                f"任务查询失败: {response.status_code} - {response.text}",
+                retryable=response.status_code == 429 or response.status_code >= 500,
             )
 
-            if response.status_code != 200:
-                raise Exception(
-                    f"动作API调用失败: {response.status_code} - {response.text}"
-                )
-
-            result = response.json()
-            if result.get("code") != 1:
-                raise Exception(
-                    f"动作提交失败: {result.get('description', '未知错误')}"
-                )
-
-            return {
-                "success": True,
-                "task_id": result["result"],
-                "status": "submitted",
-                "code": result.get("code"),
-                "description": result.get("description", "动作提交成功"),
-                "result": result["result"],
-            }
+        return response.json()
 
-        except Exception as e:
-            log.error(f"MidJourney动作API调用失败: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "code": -1,
-                "description": str(e),
-            }
-
-
-async def fetch_midjourney_task(
-    api_url: str, api_key: str, task_id: str, mode: str = "fast"
-) -> Dict[str, Any]:
-    """查询MidJourney任务状态"""
-
-    async with httpx.AsyncClient() as client:
-        try:
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
-
-            # 任务查询使用fast端点路径（根据文档规范）
-            fetch_url = f"{api_url}/fast/mj/task/{task_id}/fetch"
-
-            log.info(f"查询MidJourney任务: {fetch_url}")
+    except Exception as e:
+        log.error(f"MidJourney任务查询失败: {str(e)}")
+        raise
 
-            # 实际API调用
-            response = await client.get(fetch_url, headers=headers, timeout=30.0)
 
-            if response.status_code != 200:
-                raise Exception(
-                    f"任务查询失败: {response.status_code} - {response.text}"
-                )
+async def fetch_midjourney_tasks(
+    api_url: str, api_key: str, task_ids: List[str]
+) -> Optional[Dict[str, Dict[str, Any]]]:
+    """批量查询MidJourney任务状态，返回 {任务ID: 任务}；接口不存在时返回None"""
+
+    client = get_http_client("midjourney")
+    response = await client.post(
+        f"{api_url}/fast/mj/task/list-by-condition",
+        json={"ids": task_ids},
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        timeout=30.0,
+    )
 
-            return response.json()
+    if response.status_code in (404, 405):
+        return None
+    if response.status_code != 200:
+        raise GenerationProviderError(
+            f"任务批量查询失败: {response.status_code} - {response.text}",
+            retryable=response.status_code == 429 or response.status_code >= 500,
+        )
 
-        except Exception as e:
-            log.error(f"MidJourney任务查询失败: {str(e)}")
-            return {"status": "FAILURE", "failReason": str(e)}
+    result = response.json()
+    if not isinstance(result, list):
+        return None
+    return {task.get("id"): task for task in result if isinstance(task, dict)}
@@ -1,18 +1,13 @@
-# TODO: Implement a more intelligent load balancing mechanism for distributing requests among multiple backend instances.
-# Current implementation uses a simple round-robin approach (random.choice). Consider incorporating algorithms like weighted round-robin,
-# least connections, or least response time for better resource utilization and performance optimization.
-
 import asyncio
+import copy
 import json
 import logging
 import os
-import random
 import re
 import time
 from typing import Optional, Union
 from urllib.parse import urlparse
 import aiohttp
-from aiocache import cached
 import requests
 from open_webui.models.users import UserModel
 
@@ -46,7 +41,11 @@ from open_webui.utils.payload import (
     apply_model_system_prompt_to_body,
 )
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.http_client import get_http_session
 from open_webui.utils.access_control import has_access
+from open_webui.utils.model_registry import model_registry
+from open_webui.utils.pull_manager import pull_manager
+from open_webui.utils.upstream_pool import UpstreamUnavailableError, upstream_pool
 
 
 from open_webui.config import (
@@ -65,6 +64,9 @@ from open_webui.constants import ERROR_MESSAGES
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 
+# Last successful /api/tags response of each connection, served while it is down
+LAST_MODEL_RESPONSES: dict[str, dict] = {}
+
 
 ##########################################
 #
@@ -76,40 +78,46 @@ log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": user.name,
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                ssl=AIOHTTP_CLIENT_SESSION_SSL,
-            ) as response:
-                return await response.json()
+        session = get_http_session("ollama")
+        async with session.get(
+            url,
+            headers={
+                "Content-Type": "application/json",
+                **({"Authorization": f"Bearer {key}"} if key else {}),
+                **(
+                    {
+                        "X-OpenWebUI-User-Name": user.name,
+                        "X-OpenWebUI-User-Id": user.id,
+                        "X-OpenWebUI-User-Email": user.email,
+                        "X-OpenWebUI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+            ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
         return None
 
 
-async def cleanup_response(
-    response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
-):
+async def cleanup_response(response: Optional[aiohttp.ClientResponse]):
+    # The session is shared, only the response is released
     if response:
         response.close()
-    if session:
-        await session.close()
+
+
+async def iterate_response(response: StreamingResponse):
+    try:
+        async for chunk in response.body_iterator:
+            yield chunk
+    finally:
+        if response.background:
+            await response.background()
 
 
 async def send_post_request(
@@ -123,10 +131,7 @@ async def send_post_request(
 
     r = None
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
-
+        session = get_http_session("ollama")
         r = await session.post(
             url,
             data=payload,
@@ -145,6 +150,7 @@ async def send_post_request(
                 ),
             },
             ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
         r.raise_for_status()
 
@@ -158,13 +164,11 @@ async def send_post_request(
                 r.content,
                 status_code=r.status,
                 headers=response_headers,
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             res = await r.json()
-            await cleanup_response(r, session)
+            await cleanup_response(r)
             return res
 
     except Exception as e:
@@ -192,6 +196,65 @@ def get_api_key(idx, url, configs):
     )  # Legacy support
 
 
+async def send_model_request(
+    request: Request,
+    path: str,
+    payload: dict,
+    url_idx: Optional[int] = None,
+    stream: bool = True,
+    content_type: Optional[str] = None,
+    user: UserModel = None,
+):
+    """
+    Send `payload` to the connection picked by the upstream pool among those
+    serving its model, failing over to another one if it errors before
+    responding. A `url_idx` given by the caller pins the connection.
+    """
+    urls = request.app.state.config.OLLAMA_BASE_URLS
+    configs = request.app.state.config.OLLAMA_API_CONFIGS
+
+    if url_idx is None:
+        models = request.app.state.OLLAMA_MODELS
+        if payload["model"] not in models:
+            raise HTTPException(
+                status_code=400,
+                detail=ERROR_MESSAGES.MODEL_NOT_FOUND(payload["model"]),
+            )
+        model = models[payload["model"]]
+        candidates = pull_manager.exclude_pulling(
+            urls, model.get("urls", []), model.get("name", payload["model"])
+        )
+    else:
+        candidates = [url_idx]
+
+    async def send(idx, upstream):
+        url = urls[idx]
+        api_config = configs.get(str(idx), configs.get(url, {}))  # Legacy support
+
+        body = payload
+        prefix_id = api_config.get("prefix_id", None)
+        if prefix_id:
+            body = {**payload, "model": payload["model"].replace(f"{prefix_id}.", "")}
+
+        response = await send_post_request(
+            url=f"{url}{path}",
+            payload=json.dumps(body),
+            stream=stream,
+            key=get_api_key(idx, url, configs),
+            content_type=content_type,
+            user=user,
+        )
+        if isinstance(response, StreamingResponse):
+            return upstream.track_response(response)
+        upstream.done()
+        return response
+
+    response, _ = await upstream_pool.send(
+        "ollama", urls, candidates, send, model=payload["model"]
+    )
+    return response
+
+
 ##########################################
 #
 # API routes
@@ -294,6 +357,9 @@ async def update_config(
         if key in keys
     }
 
+    # Serve the models of the new connections right away
+    await model_registry.refresh(request.app, "ollama")
+
     return {
         "ENABLE_OLLAMA_API": request.app.state.config.ENABLE_OLLAMA_API,
         "OLLAMA_BASE_URLS": request.app.state.config.OLLAMA_BASE_URLS,
@@ -301,16 +367,17 @@ async def update_config(
     }
 
 
-@cached(ttl=1)
-async def get_all_models(request: Request, user: UserModel = None):
-    log.info("get_all_models()")
+async def fetch_all_models(request: Request):
+    log.info("fetch_all_models()")
     if request.app.state.config.ENABLE_OLLAMA_API:
         request_tasks = []
+        fetched = set()
         for idx, url in enumerate(request.app.state.config.OLLAMA_BASE_URLS):
             if (str(idx) not in request.app.state.config.OLLAMA_API_CONFIGS) and (
                 url not in request.app.state.config.OLLAMA_API_CONFIGS  # Legacy support
             ):
-                request_tasks.append(send_get_request(f"{url}/api/tags", user=user))
+                fetched.add(idx)
+                request_tasks.append(send_get_request(f"{url}/api/tags"))
             else:
                 api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
                     str(idx),
@@ -323,14 +390,22 @@ async def get_all_models(request: Request, user: UserModel = None):
                 key = api_config.get("key", None)
 
                 if enable:
-                    request_tasks.append(
-                        send_get_request(f"{url}/api/tags", key, user=user)
-                    )
+                    fetched.add(idx)
+                    request_tasks.append(send_get_request(f"{url}/api/tags", key))
                 else:
                     request_tasks.append(asyncio.ensure_future(asyncio.sleep(0, None)))
 
         responses = await asyncio.gather(*request_tasks)
 
+        for idx in fetched:
+            url = request.app.state.config.OLLAMA_BASE_URLS[idx]
+            if responses[idx] is None:
+                # Keep serving the last good list of a connection that is down
+                responses[idx] = copy.deepcopy(LAST_MODEL_RESPONSES.get(url))
+            else:
+                LAST_MODEL_RESPONSES[url] = copy.deepcopy(responses[idx])
+                pull_manager.update_digests(url, responses[idx].get("models", []))
+
         for idx, response in enumerate(responses):
             if response:
                 url = request.app.state.config.OLLAMA_BASE_URLS[idx]
@@ -385,15 +460,32 @@ async def get_all_models(request: Request, user: UserModel = None):
             )
         }
 
+        # Connections updating a model serve it again once their pull is over
+        for model in models["models"]:
+            model["urls"] = pull_manager.exclude_pulling(
+                request.app.state.config.OLLAMA_BASE_URLS,
+                model["urls"],
+                model.get("name", model["model"]),
+            )
+
     else:
         models = {"models": []}
 
-    request.app.state.OLLAMA_MODELS = {
-        model["model"]: model for model in models["models"]
-    }
     return models
 
 
+def set_all_models(app, models: dict):
+    app.state.OLLAMA_MODELS = {model["model"]: model for model in models["models"]}
+
+
+model_registry.register("ollama", fetch_all_models, set_all_models)
+
+
+async def get_all_models(request: Request, user: UserModel = None):
+    """Models of all Ollama connections, kept up to date by the model registry."""
+    return await model_registry.get(request.app, "ollama")
+
+
 async def get_filtered_models(models, user):
     # Filter models based on user access control
     filtered_models = []
@@ -582,11 +674,25 @@ async def pull_model(
     # Admin should be able to pull models from any source
     payload = {**form_data.model_dump(exclude_none=True), "insecure": True}
 
-    return await send_post_request(
-        url=f"{url}/api/pull",
-        payload=json.dumps(payload),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
-        user=user,
+    async def start():
+        response = await send_post_request(
+            url=f"{url}/api/pull",
+            payload=json.dumps(payload),
+            key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
+            user=user,
+        )
+        return iterate_response(response)
+
+    return StreamingResponse(
+        await pull_manager.stream(
+            url,
+            "pull",
+            form_data.name,
+            payload,
+            start,
+            on_done=lambda: model_registry.refresh(request.app, "ollama"),
+        ),
+        media_type="application/x-ndjson",
     )
 
 
@@ -645,12 +751,27 @@ async def create_model(
 ):
     log.debug(f"form_data: {form_data}")
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
+    payload = form_data.model_dump(exclude_none=True)
+
+    async def start():
+        response = await send_post_request(
+            url=f"{url}/api/create",
+            payload=json.dumps(payload),
+            key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
+            user=user,
+        )
+        return iterate_response(response)
 
-    return await send_post_request(
-        url=f"{url}/api/create",
-        payload=form_data.model_dump_json(exclude_none=True).encode(),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
-        user=user,
+    return StreamingResponse(
+        await pull_manager.stream(
+            url,
+            "create",
+            form_data.model or "",
+            payload,
+            start,
+            on_done=lambda: model_registry.refresh(request.app, "ollama"),
+        ),
+        media_type="application/x-ndjson",
     )
 
 
@@ -802,7 +923,7 @@ async def show_model_info(
             detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.name),
         )
 
-    url_idx = random.choice(models[form_data.name]["urls"])
+    url_idx = get_ollama_url_idx(request, form_data.name)
 
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
@@ -876,7 +997,7 @@ async def embed(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idx = get_ollama_url_idx(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -963,7 +1084,7 @@ async def embeddings(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idx = get_ollama_url_idx(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -1055,28 +1176,18 @@ async def generate_completion(
         if ":" not in model:
             model = f"{model}:latest"
 
-        if model in models:
-            url_idx = random.choice(models[model]["urls"])
-        else:
+        if model not in models:
             raise HTTPException(
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.model),
             )
+        form_data.model = model
 
-    url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
-    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
-        str(url_idx),
-        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        form_data.model = form_data.model.replace(f"{prefix_id}.", "")
-
-    return await send_post_request(
-        url=f"{url}/api/generate",
-        payload=form_data.model_dump_json(exclude_none=True).encode(),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
+    return await send_model_request(
+        request,
+        "/api/generate",
+        form_data.model_dump(exclude_none=True),
+        url_idx=url_idx,
         user=user,
     )
 
@@ -1112,17 +1223,21 @@ class GenerateChatCompletionForm(BaseModel):
     tools: Optional[list[dict]] = None
 
 
-async def get_ollama_url(request: Request, model: str, url_idx: Optional[int] = None):
+def get_ollama_url_idx(request: Request, model: str) -> int:
+    """Connection to use for `model`, least loaded of the healthy ones."""
+    urls = request.app.state.config.OLLAMA_BASE_URLS
+    models = request.app.state.OLLAMA_MODELS
+    url_idx = upstream_pool.pick(
+        "ollama",
+        urls,
+        pull_manager.exclude_pulling(
+            urls, models[model].get("urls", []), models[model].get("name", model)
+        ),
+        model=model,
+    )
     if url_idx is None:
-        models = request.app.state.OLLAMA_MODELS
-        if model not in models:
-            raise HTTPException(
-                status_code=400,
-                detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
-            )
-        url_idx = random.choice(models[model].get("urls", []))
-    url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
-    return url, url_idx
+        raise UpstreamUnavailableError()
+    return url_idx
 
 
 @router.post("/api/chat")
@@ -1191,21 +1306,13 @@ async def generate_chat_completion(
     if ":" not in payload["model"]:
         payload["model"] = f"{payload['model']}:latest"
 
-    url, url_idx = await get_ollama_url(request, payload["model"], url_idx)
-    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
-        str(url_idx),
-        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
     # payload["keep_alive"] = -1 # keep alive forever
-    return await send_post_request(
-        url=f"{url}/api/chat",
-        payload=json.dumps(payload),
+    return await send_model_request(
+        request,
+        "/api/chat",
+        payload,
+        url_idx=url_idx,
         stream=form_data.stream,
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         content_type="application/x-ndjson",
         user=user,
     )
@@ -1294,22 +1401,12 @@ async def generate_openai_completion(
     if ":" not in payload["model"]:
         payload["model"] = f"{payload['model']}:latest"
 
-    url, url_idx = await get_ollama_url(request, payload["model"], url_idx)
-    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
-        str(url_idx),
-        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-
-    if prefix_id:
-        payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
-
-    return await send_post_request(
-        url=f"{url}/v1/completions",
-        payload=json.dumps(payload),
+    return await send_model_request(
+        request,
+        "/v1/completions",
+        payload,
+        url_idx=url_idx,
         stream=payload.get("stream", False),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
     )
 
@@ -1376,21 +1473,12 @@ async def generate_openai_chat_completion(
     if ":" not in payload["model"]:
         payload["model"] = f"{payload['model']}:latest"
 
-    url, url_idx = await get_ollama_url(request, payload["model"], url_idx)
-    api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
-        str(url_idx),
-        request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
-
-    return await send_post_request(
-        url=f"{url}/v1/chat/completions",
-        payload=json.dumps(payload),
+    return await send_model_request(
+        request,
+        "/v1/chat/completions",
+        payload,
+        url_idx=url_idx,
         stream=payload.get("stream", False),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
     )
 
@@ -1569,8 +1657,14 @@ async def download_model(
     if file_name:
         file_path = f"{UPLOAD_DIR}/{file_name}"
 
+        async def start():
+            return download_file_stream(url, form_data.url, file_path, file_name)
+
+        # Two downloads of a file would append to the same partial file
         return StreamingResponse(
-            download_file_stream(url, form_data.url, file_path, file_name),
+            await pull_manager.stream(
+                url, "download", file_name, {"url": form_data.url}, start
+            ),
         )
     else:
         return None
@@ -1,17 +1,17 @@
 import asyncio
+import copy
 import hashlib
 import json
 import logging
 from typing import Optional
 
 import aiohttp
-from aiocache import cached
 import requests
 
 from fastapi import Depends, HTTPException, Request, APIRouter
 from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
-from starlette.background import BackgroundTask
+from starlette.background import BackgroundTask, BackgroundTasks
 
 from open_webui.models.models import Models
 from open_webui.config import (
@@ -23,6 +23,7 @@ from open_webui.env import (
     AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST,
     ENABLE_FORWARD_USER_INFO_HEADERS,
     BYPASS_MODEL_ACCESS_CONTROL,
+    OPENAI_STREAM_INCLUDE_USAGE,
 )
 from open_webui.models.users import UserModel
 
@@ -41,10 +42,16 @@ from open_webui.utils.misc import (
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_access
 from open_webui.utils.credit.usage import CreditDeduct
+from open_webui.utils.http_client import get_http_session
+from open_webui.utils.model_registry import model_registry
+from open_webui.utils.upstream_pool import upstream_pool
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["OPENAI"])
 
+# Last successful /models response of each connection, served while it is down
+LAST_MODEL_RESPONSES: dict[str, dict] = {}
+
 
 ##########################################
 #
@@ -56,39 +63,36 @@ log.setLevel(SRC_LOG_LEVELS["OPENAI"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url,
-                headers={
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": user.name,
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                ssl=AIOHTTP_CLIENT_SESSION_SSL,
-            ) as response:
-                return await response.json()
+        session = get_http_session("openai")
+        async with session.get(
+            url,
+            headers={
+                **({"Authorization": f"Bearer {key}"} if key else {}),
+                **(
+                    {
+                        "X-OpenWebUI-User-Name": user.name,
+                        "X-OpenWebUI-User-Id": user.id,
+                        "X-OpenWebUI-User-Email": user.email,
+                        "X-OpenWebUI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+            ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
         return None
 
 
-async def cleanup_response(
-    response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
-):
+async def cleanup_response(response: Optional[aiohttp.ClientResponse]):
+    # The session is shared, only the response is released
     if response:
         response.close()
-    if session:
-        await session.close()
 
 
 def openai_o_series_handler(payload):
@@ -174,6 +178,9 @@ async def update_config(
         if key in keys
     }
 
+    # Serve the models of the new connections right away
+    await model_registry.refresh(request.app, "openai")
+
     return {
         "ENABLE_OPENAI_API": request.app.state.config.ENABLE_OPENAI_API,
         "OPENAI_API_BASE_URLS": request.app.state.config.OPENAI_API_BASE_URLS,
@@ -286,10 +293,12 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
             request.app.state.config.OPENAI_API_KEYS += [""] * (num_urls - num_keys)
 
     request_tasks = []
+    fetched = set()
     for idx, url in enumerate(request.app.state.config.OPENAI_API_BASE_URLS):
         if (str(idx) not in request.app.state.config.OPENAI_API_CONFIGS) and (
             url not in request.app.state.config.OPENAI_API_CONFIGS  # Legacy support
         ):
+            fetched.add(idx)
             request_tasks.append(
                 send_get_request(
                     f"{url}/models",
@@ -310,6 +319,7 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
 
             if enable:
                 if len(model_ids) == 0:
+                    fetched.add(idx)
                     request_tasks.append(
                         send_get_request(
                             f"{url}/models",
@@ -340,6 +350,14 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
 
     responses = await asyncio.gather(*request_tasks)
 
+    for idx in fetched:
+        url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
+        if responses[idx] is None:
+            # Keep serving the last good list of a connection that is down
+            responses[idx] = copy.deepcopy(LAST_MODEL_RESPONSES.get(url))
+        elif isinstance(responses[idx], list) or "error" not in responses[idx]:
+            LAST_MODEL_RESPONSES[url] = copy.deepcopy(responses[idx])
+
     for idx, response in enumerate(responses):
         if response:
             url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
@@ -382,14 +400,13 @@ async def get_filtered_models(models, user):
     return filtered_models
 
 
-@cached(ttl=1)
-async def get_all_models(request: Request, user: UserModel) -> dict[str, list]:
-    log.info("get_all_models()")
+async def fetch_all_models(request: Request) -> dict[str, list]:
+    log.info("fetch_all_models()")
 
     if not request.app.state.config.ENABLE_OPENAI_API:
         return {"data": []}
 
-    responses = await get_all_models_responses(request, user=user)
+    responses = await get_all_models_responses(request, user=None)
 
     def extract_data(response):
         if response and "data" in response:
@@ -437,11 +454,26 @@ async def get_all_models(request: Request, user: UserModel) -> dict[str, list]:
 
     models = {"data": merge_models_lists(map(extract_data, responses))}
     log.debug(f"models: {models}")
-
-    request.app.state.OPENAI_MODELS = {model["id"]: model for model in models["data"]}
     return models
 
 
+def set_all_models(app, models: dict[str, list]):
+    # `urlIdxs` lists every connection serving the model, for load balancing
+    openai_models = {}
+    for model in models["data"]:
+        url_idxs = openai_models.get(model["id"], {}).get("urlIdxs", [])
+        openai_models[model["id"]] = {**model, "urlIdxs": [*url_idxs, model["urlIdx"]]}
+    app.state.OPENAI_MODELS = openai_models
+
+
+model_registry.register("openai", fetch_all_models, set_all_models)
+
+
+async def get_all_models(request: Request, user: UserModel = None) -> dict[str, list]:
+    """Models of all connections, kept up to date by the model registry."""
+    return await model_registry.get(request.app, "openai")
+
+
 @router.get("/models")
 @router.get("/models/{url_idx}")
 async def get_models(
@@ -598,8 +630,6 @@ async def generate_chat_completion(
     if BYPASS_MODEL_ACCESS_CONTROL:
         bypass_filter = True
 
-    idx = 0
-
     payload = {**form_data}
     metadata = payload.pop("metadata", None)
 
@@ -637,26 +667,12 @@ async def generate_chat_completion(
 
     await get_all_models(request, user=user)
     model = request.app.state.OPENAI_MODELS.get(model_id)
-    if model:
-        idx = model["urlIdx"]
-    else:
+    if not model:
         raise HTTPException(
             status_code=404,
             detail="Model not found",
         )
 
-    # Get the API config for the model
-    api_config = request.app.state.config.OPENAI_API_CONFIGS.get(
-        str(idx),
-        request.app.state.config.OPENAI_API_CONFIGS.get(
-            request.app.state.config.OPENAI_API_BASE_URLS[idx], {}
-        ),  # Legacy support
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
-
     # Add user info to the payload if the model is a pipeline
     if "pipeline" in model and model.get("pipeline"):
         payload["user"] = {
@@ -666,44 +682,55 @@ async def generate_chat_completion(
             "role": user.role,
         }
 
-    url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
-    key = request.app.state.config.OPENAI_API_KEYS[idx]
-
-    # Check if model is from "o" series
-    is_o_series = payload["model"].lower().startswith(("o1", "o3", "o4"))
-    if is_o_series:
-        payload = openai_o_series_handler(payload)
-    elif "api.openai.com" not in url:
-        # Remove "max_completion_tokens" from the payload for backward compatibility
-        if "max_completion_tokens" in payload:
-            payload["max_tokens"] = payload["max_completion_tokens"]
-            del payload["max_completion_tokens"]
-
-    if "max_tokens" in payload and "max_completion_tokens" in payload:
-        del payload["max_tokens"]
-
-    # Convert the modified body back to JSON
     if "logit_bias" in payload:
         payload["logit_bias"] = json.loads(
             convert_logit_bias_input_to_json(payload["logit_bias"])
         )
 
-    payload = json.dumps(payload)
+    # Have the upstream report the usage of streams in a final chunk
+    if payload.get("stream") and OPENAI_STREAM_INCLUDE_USAGE:
+        payload["stream_options"] = {
+            **(payload.get("stream_options") or {}),
+            "include_usage": True,
+        }
 
-    r = None
-    session = None
-    streaming = False
-    response = None
+    def get_request_body(idx: int) -> str:
+        body = {**payload}
+        url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
 
-    try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
+        # Get the API config for the connection
+        api_config = request.app.state.config.OPENAI_API_CONFIGS.get(
+            str(idx),
+            request.app.state.config.OPENAI_API_CONFIGS.get(url, {}),  # Legacy support
         )
 
-        r = await session.request(
+        prefix_id = api_config.get("prefix_id", None)
+        if prefix_id:
+            body["model"] = body["model"].replace(f"{prefix_id}.", "")
+
+        # Check if model is from "o" series
+        is_o_series = body["model"].lower().startswith(("o1", "o3", "o4"))
+        if is_o_series:
+            body = openai_o_series_handler(body)
+        elif "api.openai.com" not in url:
+            # Remove "max_completion_tokens" from the payload for backward compatibility
+            if "max_completion_tokens" in body:
+                body["max_tokens"] = body["max_completion_tokens"]
+                del body["max_completion_tokens"]
+
+        if "max_tokens" in body and "max_completion_tokens" in body:
+            del body["max_tokens"]
+
+        return json.dumps(body)
+
+    async def send(idx, upstream):
+        url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
+        key = request.app.state.config.OPENAI_API_KEYS[idx]
+
+        return await session.request(
             method="POST",
             url=f"{url}/chat/completions",
-            data=payload,
+            data=get_request_body(idx),
             headers={
                 "Authorization": f"Bearer {key}",
                 "Content-Type": "application/json",
@@ -727,32 +754,53 @@ async def generate_chat_completion(
                 ),
             },
             ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
+        )
+
+    r = None
+    upstream = None
+    session = None
+    streaming = False
+    response = None
+
+    try:
+        session = get_http_session("openai")
+        # Fails over to another connection serving the model while nothing
+        # has been sent to the client yet
+        r, upstream = await upstream_pool.send(
+            "openai",
+            request.app.state.config.OPENAI_API_BASE_URLS,
+            model.get("urlIdxs") or [model["urlIdx"]],
+            send,
+            model=model_id,
         )
 
         # Check if response is SSE
         if "text/event-stream" in r.headers.get("Content-Type", ""):
 
-            async def consumer_content(content):
-                with CreditDeduct(
-                    user=user,
-                    model_id=model_id,
-                    body=form_data,
-                    is_stream=True,
-                ) as credit_deduct:
-                    async for chunk in content:
-                        credit_deduct.run(response=chunk)
-                        yield chunk
-
-                    yield credit_deduct.usage_message
+            credit_deduct = CreditDeduct(
+                user=user,
+                model_id=model_id,
+                body=form_data,
+                is_stream=True,
+            )
 
             streaming = True
-            return StreamingResponse(
-                consumer_content(r.content),
-                status_code=r.status,
-                headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+            return upstream.track_response(
+                StreamingResponse(
+                    # Lines are forwarded as is, usage is only parsed at the end
+                    credit_deduct.passthrough(r.content),
+                    status_code=r.status,
+                    headers=dict(r.headers),
+                    # The credit is deducted once the stream is over, even if
+                    # the client went away early
+                    background=BackgroundTasks(
+                        [
+                            BackgroundTask(cleanup_response, response=r),
+                            BackgroundTask(credit_deduct.settle),
+                        ]
+                    ),
+                )
             )
         else:
             try:
@@ -786,10 +834,9 @@ async def generate_chat_completion(
             detail=detail if detail else "Open WebUI: Server Connection Error",
         )
     finally:
-        if not streaming and session:
-            if r:
-                r.close()
-            await session.close()
+        if not streaming and r:
+            r.close()
+            upstream.done(status=r.status)
 
 
 @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
@@ -809,7 +856,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
     streaming = False
 
     try:
-        session = aiohttp.ClientSession(trust_env=True)
+        session = get_http_session("openai")
         r = await session.request(
             method=request.method,
             url=f"{url}/{path}",
@@ -829,6 +876,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
                 ),
             },
             ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
         r.raise_for_status()
 
@@ -839,9 +887,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             response_data = await r.json()
@@ -864,7 +910,5 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
             detail=detail if detail else "Open WebUI: Server Connection Error",
         )
     finally:
-        if not streaming and session:
-            if r:
-                r.close()
-            await session.close()
+        if not streaming and r:
+            r.close()
@@ -3,11 +3,15 @@ PPT 生成 API Integration Router
 提供PPT生成API的集成接口，基于即梦PPT开放API
 """
 
+import os
 import uuid
 import time
 import json
 import asyncio
+import hashlib
 from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote
 from typing import Dict, Optional, Any, List
 from fastapi import (
     APIRouter,
@@ -19,7 +23,7 @@ from fastapi import (
     UploadFile,
     Form,
 )
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field, validator, ValidationError
 import httpx
 import logging
@@ -27,6 +31,16 @@ import logging
 from open_webui.utils.auth import get_verified_user, get_admin_user
 from open_webui.models.credits import Credits, AddCreditForm, SetCreditFormDetail
 from open_webui.models.ppt_config import PptConfigs, PptConfigModel
+from open_webui.utils.http_client import get_http_client
+from open_webui.utils.cache import StaleWhileRevalidateCache
+from open_webui.env import (
+    PPT_CONFIG_CACHE_TTL,
+    PPT_CACHE_TTL,
+    PPT_CACHE_STALE_TTL,
+    PPT_FILE_CACHE_ENABLED,
+    PPT_FILE_CACHE_TTL,
+)
+from open_webui.config import CACHE_DIR
 from decimal import Decimal
 
 log = logging.getLogger(__name__)
@@ -38,9 +52,150 @@ DEFAULT_PPT_API_URL = "https://open.docmee.cn"
 DEFAULT_PPT_CREDITS = 10
 
 
+# 进程内缓存的PPT配置 (缓存时间, 配置)
+_ppt_config_cache: Optional[tuple] = None
+
+# 模板和生成选项很少变化，缓存上游响应，过期后先返回旧数据再后台刷新
+ppt_response_cache = StaleWhileRevalidateCache(
+    ttl=PPT_CACHE_TTL, stale_ttl=PPT_CACHE_STALE_TTL
+)
+
+# 服务状态只短暂缓存，且不返回过期结果，上游异常时状态检查能及时反映
+PPT_STATUS_CACHE_TTL = 10
+ppt_status_cache = StaleWhileRevalidateCache(ttl=PPT_STATUS_CACHE_TTL)
+
+
 def get_current_ppt_config() -> PptConfigModel:
     """获取当前PPT配置"""
-    return PptConfigs.get_or_create_config()
+    global _ppt_config_cache
+    if (
+        _ppt_config_cache is not None
+        and time.monotonic() - _ppt_config_cache[0] < PPT_CONFIG_CACHE_TTL
+    ):
+        return _ppt_config_cache[1]
+
+    config = PptConfigs.get_or_create_config()
+    _ppt_config_cache = (time.monotonic(), config)
+    return config
+
+
+def get_ppt_cache_key(config: PptConfigModel, *key) -> tuple:
+    """
+    上游响应的缓存键，带上API地址和密钥的摘要：其他worker更新配置后，
+    本worker读到新配置时不会再返回旧上游的数据
+    """
+    upstream = f"{config.api_url}\0{config.api_key}".encode()
+    return (hashlib.sha256(upstream).hexdigest()[:16], *key)
+
+
+PPT_FILE_CACHE_DIR = CACHE_DIR / "ppt"
+
+
+def get_cached_ppt_file(cache_key: str) -> Optional[Path]:
+    """本地缓存的PPT文件，不存在或已过期时返回None"""
+    if not PPT_FILE_CACHE_ENABLED:
+        return None
+    path = PPT_FILE_CACHE_DIR / f"{cache_key}.pptx"
+    try:
+        if time.time() - path.stat().st_mtime < PPT_FILE_CACHE_TTL:
+            return path
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def prune_ppt_file_cache():
+    now = time.time()
+    for path in PPT_FILE_CACHE_DIR.glob("*"):
+        try:
+            if now - path.stat().st_mtime > PPT_FILE_CACHE_TTL:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def get_ppt_download_headers(filename: str) -> Dict[str, str]:
+    return {
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+        "Cache-Control": "private, max-age=0, must-revalidate",
+    }
+
+
+async def stream_ppt_file(
+    url: str,
+    filename: str,
+    cache_key: str,
+    range_header: Optional[str] = None,
+    **kwargs,
+) -> Response:
+    """
+    将上游文件以分块传输直接转发给客户端，不在内存中缓冲整个文件。
+    完整下载时同时写入本地缓存，带Range的请求直接透传给上游。
+    """
+    cached = get_cached_ppt_file(cache_key)
+    if cached:
+        # FileResponse自带Range支持
+        return FileResponse(cached, headers=get_ppt_download_headers(filename))
+
+    headers = kwargs.pop("headers", {})
+    if range_header:
+        headers["Range"] = range_header
+
+    client = get_http_client("ppt")
+    upstream = await client.send(
+        client.build_request("GET", url, headers=headers, **kwargs), stream=True
+    )
+    if upstream.status_code not in (200, 206):
+        await upstream.aclose()
+        raise HTTPException(status_code=upstream.status_code, detail="下载PPT失败")
+
+    cache_path = None
+    if PPT_FILE_CACHE_ENABLED and upstream.status_code == 200:
+        PPT_FILE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cache_path = PPT_FILE_CACHE_DIR / f"{cache_key}.pptx"
+
+    async def body():
+        tmp_path = (
+            cache_path.with_suffix(f".{uuid.uuid4().hex}.part") if cache_path else None
+        )
+        file = open(tmp_path, "wb") if tmp_path else None
+        complete = False
+        try:
+            async for chunk in upstream.aiter_bytes():
+                if file:
+                    file.write(chunk)
+                yield chunk
+            complete = True
+        finally:
+            await upstream.aclose()
+            if file:
+                file.close()
+                if complete:
+                    os.replace(tmp_path, cache_path)
+                    prune_ppt_file_cache()
+                else:
+                    tmp_path.unlink(missing_ok=True)
+
+    response_headers = get_ppt_download_headers(filename)
+    response_headers["Accept-Ranges"] = "bytes"
+    for header in ("content-length", "content-range"):
+        if header in upstream.headers:
+            response_headers[header] = upstream.headers[header]
+
+    return StreamingResponse(
+        body(),
+        status_code=upstream.status_code,
+        media_type=upstream.headers.get("content-type", "application/octet-stream"),
+        headers=response_headers,
+    )
+
+
+def invalidate_ppt_config():
+    """配置更新后清除配置和上游响应缓存"""
+    global _ppt_config_cache
+    _ppt_config_cache = None
+    ppt_response_cache.invalidate()
+    ppt_status_cache.invalidate()
 
 
 class PptTaskRequest(BaseModel):
@@ -90,7 +245,7 @@ async def get_ppt_config(user=Depends(get_admin_user)):
 async def get_ppt_config(user=Depends(get_verified_user)):
     """获取PPT配置"""
     try:
-        config = PptConfigs.get_or_create_config()
+        config = get_current_ppt_config()
         return config.model_dump(exclude={"api_key", "api_url"})
     except Exception as e:
         log.error(f"获取PPT配置失败: {str(e)}")
@@ -105,6 +260,7 @@ async def update_ppt_config(config: PptConfigModel, user=Depends(get_admin_user)
             config.model_dump(exclude={"id", "created_at", "updated_at"})
         )
         if updated_config:
+            invalidate_ppt_config()
             log.info(f"PPT配置已更新: enabled={updated_config.enabled}")
             return {"success": True, "message": "配置已更新"}
         else:
@@ -121,20 +277,26 @@ async def get_template_options(user=Depends(get_verified_user)):
     if not config.enabled:
         raise HTTPException(status_code=503, detail="PPT功能未启用")
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{config.api_url}/api/ppt/template/options",
-                headers={"Api-Key": config.api_key},
-            )
+    async def load():
+        client = get_http_client("ppt")
+        response = await client.get(
+            f"{config.api_url}/api/ppt/template/options",
+            headers={"Api-Key": config.api_key},
+        )
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status_code, detail="获取模板选项失败"
-                )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code, detail="获取模板选项失败"
+            )
 
+    try:
+        return await ppt_response_cache.get(
+            get_ppt_cache_key(config, "template_options"), load
+        )
+    except HTTPException:
+        raise
     except httpx.RequestError as e:
         log.error(f"获取模板选项网络错误: {str(e)}")
         raise HTTPException(status_code=503, detail=f"网络请求失败: {str(e)}")
@@ -158,27 +320,34 @@ async def get_templates(request: TemplateRequest, user=Depends(get_verified_user
     if not config.enabled:
         raise HTTPException(status_code=503, detail="PPT功能未启用")
 
-    try:
-        request_data = {
-            "page": request.page,
-            "size": request.size,
-            "filters": request.filters.dict(),
-        }
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{config.api_url}/api/ppt/templates",
-                json=request_data,
-                headers={"Content-Type": "application/json", "Api-Key": config.api_key},
-            )
+    request_data = {
+        "page": request.page,
+        "size": request.size,
+        "filters": request.filters.dict(),
+    }
+
+    async def load():
+        client = get_http_client("ppt")
+        response = await client.post(
+            f"{config.api_url}/api/ppt/templates",
+            json=request_data,
+            headers={"Content-Type": "application/json", "Api-Key": config.api_key},
+        )
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status_code, detail="获取模板失败"
-                )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(status_code=response.status_code, detail="获取模板失败")
 
+    try:
+        return await ppt_response_cache.get(
+            get_ppt_cache_key(
+                config, "templates", json.dumps(request_data, sort_keys=True)
+            ),
+            load,
+        )
+    except HTTPException:
+        raise
     except httpx.RequestError as e:
         log.error(f"获取模板网络错误: {str(e)}")
         raise HTTPException(status_code=503, detail=f"网络请求失败: {str(e)}")
@@ -246,36 +415,34 @@ async def create_ppt_task(
             )
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{config.api_url}/api/ppt/v2/createTask",
-                    data=form_data,
-                    files=files_data,
-                    headers={"Api-Key": config.api_key},
-                )
+            client = get_http_client("ppt")
+            response = await client.post(
+                f"{config.api_url}/api/ppt/v2/createTask",
+                data=form_data,
+                files=files_data,
+                headers={"Api-Key": config.api_key},
+            )
 
-                if response.status_code == 200:
-                    result = response.json()
-                    return result
-                else:
-                    # PPT API调用失败，需要退费
-                    refund_form = AddCreditForm(
-                        user_id=user.id,
-                        amount=Decimal(credits_needed),
-                        detail=SetCreditFormDetail(
-                            desc="PPT生成失败退费",
-                            api_path="/api/v1/ppt/v2/createTask",
-                            api_params={"type": type, "content": content or ""},
-                            usage={"refund_credits": credits_needed},
-                        ),
-                    )
-                    Credits.add_credit_by_user_id(refund_form)
-                    log.info(
-                        f"PPT生成失败，为用户 {user.email} 退费 {credits_needed} v豆"
-                    )
-                    raise HTTPException(
-                        status_code=response.status_code, detail="创建任务失败"
-                    )
+            if response.status_code == 200:
+                result = response.json()
+                return result
+            else:
+                # PPT API调用失败，需要退费
+                refund_form = AddCreditForm(
+                    user_id=user.id,
+                    amount=Decimal(credits_needed),
+                    detail=SetCreditFormDetail(
+                        desc="PPT生成失败退费",
+                        api_path="/api/v1/ppt/v2/createTask",
+                        api_params={"type": type, "content": content or ""},
+                        usage={"refund_credits": credits_needed},
+                    ),
+                )
+                Credits.add_credit_by_user_id(refund_form)
+                log.info(f"PPT生成失败，为用户 {user.email} 退费 {credits_needed} v豆")
+                raise HTTPException(
+                    status_code=response.status_code, detail="创建任务失败"
+                )
 
         except httpx.RequestError as e:
             # 网络错误，退费
@@ -316,6 +483,26 @@ async def create_ppt_task(
         raise HTTPException(status_code=500, detail=f"创建任务失败: {str(e)}")
 
 
+async def get_cached_generation_options(config: PptConfigModel):
+    async def load():
+        client = get_http_client("ppt")
+        response = await client.get(
+            f"{config.api_url}/api/ppt/v2/options",
+            headers={"Api-Key": config.api_key},
+        )
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code, detail="获取生成选项失败"
+            )
+
+    return await ppt_response_cache.get(
+        get_ppt_cache_key(config, "generation_options"), load
+    )
+
+
 @router.get("/v2/options")
 async def get_generation_options(user=Depends(get_verified_user)):
     """获取生成选项"""
@@ -324,19 +511,9 @@ async def get_generation_options(user=Depends(get_verified_user)):
         raise HTTPException(status_code=503, detail="PPT功能未启用")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{config.api_url}/api/ppt/v2/options",
-                headers={"Api-Key": config.api_key},
-            )
-
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status_code, detail="获取生成选项失败"
-                )
-
+        return await get_cached_generation_options(config)
+    except HTTPException:
+        raise
     except httpx.RequestError as e:
         log.error(f"获取生成选项网络错误: {str(e)}")
         raise HTTPException(status_code=503, detail=f"网络请求失败: {str(e)}")
@@ -377,26 +554,26 @@ async def generate_content(
         api_url = f"{config.api_url}/api/ppt/v2/generateContent"
         log.info(f"请求API URL: {api_url}")
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                api_url,
-                json=request_data,
-                headers={"Content-Type": "application/json", "Api-Key": config.api_key},
-            )
+        client = get_http_client("ppt")
+        response = await client.post(
+            api_url,
+            json=request_data,
+            headers={"Content-Type": "application/json", "Api-Key": config.api_key},
+        )
 
-            log.info(f"PPT API响应状态: {response.status_code}")
+        log.info(f"PPT API响应状态: {response.status_code}")
 
-            if response.status_code == 200:
-                result = response.json()
-                log.info(f"PPT API响应成功: {result}")
-                return result
-            else:
-                error_text = await response.atext()
-                log.error(f"PPT API响应失败: {response.status_code} - {error_text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"生成内容失败: {error_text}",
-                )
+        if response.status_code == 200:
+            result = response.json()
+            log.info(f"PPT API响应成功: {result}")
+            return result
+        else:
+            error_text = await response.atext()
+            log.error(f"PPT API响应失败: {response.status_code} - {error_text}")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"生成内容失败: {error_text}",
+            )
 
     except httpx.RequestError as e:
         log.error(f"生成PPT内容网络错误: {str(e)}")
@@ -427,19 +604,17 @@ async def update_content(
     try:
         request_data = request.dict()
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{config.api_url}/api/ppt/v2/updateContent",
-                json=request_data,
-                headers={"Content-Type": "application/json", "Api-Key": config.api_key},
-            )
+        client = get_http_client("ppt")
+        response = await client.post(
+            f"{config.api_url}/api/ppt/v2/updateContent",
+            json=request_data,
+            headers={"Content-Type": "application/json", "Api-Key": config.api_key},
+        )
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status_code, detail="修改内容失败"
-                )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(status_code=response.status_code, detail="修改内容失败")
 
     except httpx.RequestError as e:
         log.error(f"修改PPT内容网络错误: {str(e)}")
@@ -475,26 +650,26 @@ async def generate_ppt(request: GeneratePptRequest, user=Depends(get_verified_us
         api_url = f"{config.api_url}/api/ppt/v2/generatePptx"
         log.info(f"请求API URL: {api_url}")
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                api_url,
-                json=request_data,
-                headers={"Content-Type": "application/json", "Api-Key": config.api_key},
-            )
+        client = get_http_client("ppt")
+        response = await client.post(
+            api_url,
+            json=request_data,
+            headers={"Content-Type": "application/json", "Api-Key": config.api_key},
+        )
 
-            log.info(f"PPT生成API响应状态: {response.status_code}")
+        log.info(f"PPT生成API响应状态: {response.status_code}")
 
-            if response.status_code == 200:
-                result = response.json()
-                log.info(f"PPT生成API响应成功: {result}")
-                return result
-            else:
-                error_text = await response.atext()
-                log.error(f"PPT生成API响应失败: {response.status_code} - {error_text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"生成PPT失败: {error_text}",
-                )
+        if response.status_code == 200:
+            result = response.json()
+            log.info(f"PPT生成API响应成功: {result}")
+            return result
+        else:
+            error_text = await response.atext()
+            log.error(f"PPT生成API响应失败: {response.status_code} - {error_text}")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"生成PPT失败: {error_text}",
+            )
 
     except ValidationError as e:
         log.error(f"生成PPT请求数据验证失败: {str(e)}")
@@ -526,19 +701,19 @@ async def get_user_ppts(request: PptListRequest, user=Depends(get_verified_user)
     try:
         request_data = request.dict()
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{config.api_url}/api/ppt/listPptx",
-                json=request_data,
-                headers={"Content-Type": "application/json", "Api-Key": config.api_key},
-            )
+        client = get_http_client("ppt")
+        response = await client.post(
+            f"{config.api_url}/api/ppt/listPptx",
+            json=request_data,
+            headers={"Content-Type": "application/json", "Api-Key": config.api_key},
+        )
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status_code, detail="获取PPT列表失败"
-                )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code, detail="获取PPT列表失败"
+            )
 
     except httpx.RequestError as e:
         log.error(f"获取PPT列表网络错误: {str(e)}")
@@ -556,19 +731,19 @@ async def load_ppt(id: str, user=Depends(get_verified_user)):
         raise HTTPException(status_code=503, detail="PPT功能未启用")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{config.api_url}/api/ppt/loadPptx",
-                params={"id": id},
-                headers={"Api-Key": config.api_key},
-            )
+        client = get_http_client("ppt")
+        response = await client.get(
+            f"{config.api_url}/api/ppt/loadPptx",
+            params={"id": id},
+            headers={"Api-Key": config.api_key},
+        )
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status_code, detail="加载PPT数据失败"
-                )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code, detail="加载PPT数据失败"
+            )
 
     except httpx.RequestError as e:
         log.error(f"加载PPT数据网络错误: {str(e)}")
@@ -597,19 +772,19 @@ async def load_ppt_markdown(
     try:
         request_data = request.dict()
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{config.api_url}/api/ppt/loadPptxMarkdown",
-                json=request_data,
-                headers={"Content-Type": "application/json", "Api-Key": config.api_key},
-            )
+        client = get_http_client("ppt")
+        response = await client.post(
+            f"{config.api_url}/api/ppt/loadPptxMarkdown",
+            json=request_data,
+            headers={"Content-Type": "application/json", "Api-Key": config.api_key},
+        )
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status_code, detail="加载PPT大纲失败"
-                )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code, detail="加载PPT大纲失败"
+            )
 
     except httpx.RequestError as e:
         log.error(f"加载PPT大纲网络错误: {str(e)}")
@@ -636,20 +811,67 @@ async def download_ppt(request: DownloadPptRequest, user=Depends(get_verified_us
     try:
         request_data = request.dict()
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{config.api_url}/api/ppt/downloadPptx",
-                json=request_data,
-                headers={"Content-Type": "application/json", "Api-Key": config.api_key},
-            )
+        client = get_http_client("ppt")
+        response = await client.post(
+            f"{config.api_url}/api/ppt/downloadPptx",
+            json=request_data,
+            headers={"Content-Type": "application/json", "Api-Key": config.api_key},
+        )
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status_code, detail="下载PPT失败"
-                )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(status_code=response.status_code, detail="下载PPT失败")
+
+    except httpx.RequestError as e:
+        log.error(f"下载PPT网络错误: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"网络请求失败: {str(e)}")
+    except Exception as e:
+        log.error(f"下载PPT失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"下载PPT失败: {str(e)}")
+
+
+@router.get("/downloadPptx/file")
+async def download_ppt_file(
+    req: Request, id: str, refresh: bool = False, user=Depends(get_verified_user)
+):
+    """通过服务端流式下载PPT文件，重复下载直接使用本地缓存"""
+    config = get_current_ppt_config()
+    if not config.enabled:
+        raise HTTPException(status_code=503, detail="PPT功能未启用")
+
+    cache_key = quote(id, safe="")
+    cached = None if refresh else get_cached_ppt_file(cache_key)
+    if cached:
+        return FileResponse(cached, headers=get_ppt_download_headers(f"{id}.pptx"))
+
+    try:
+        # 先获取带有效期的文件链接
+        client = get_http_client("ppt")
+        response = await client.post(
+            f"{config.api_url}/api/ppt/downloadPptx",
+            json={"id": id, "refresh": refresh},
+            headers={"Content-Type": "application/json", "Api-Key": config.api_key},
+        )
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail="下载PPT失败")
+
+        data = response.json().get("data") or {}
+        if not data.get("fileUrl"):
+            raise HTTPException(status_code=502, detail="下载PPT失败: 未返回文件链接")
+
+        if refresh:
+            (PPT_FILE_CACHE_DIR / f"{cache_key}.pptx").unlink(missing_ok=True)
+
+        return await stream_ppt_file(
+            data["fileUrl"],
+            data.get("name") or f"{id}.pptx",
+            cache_key,
+            range_header=req.headers.get("range"),
+        )
 
+    except HTTPException:
+        raise
     except httpx.RequestError as e:
         log.error(f"下载PPT网络错误: {str(e)}")
         raise HTTPException(status_code=503, detail=f"网络请求失败: {str(e)}")
@@ -660,7 +882,7 @@ async def download_ppt(request: DownloadPptRequest, user=Depends(get_verified_us
 
 @router.get("/downloadWithAnimation")
 async def download_ppt_with_animation(
-    type: int = 1, id: str = None, user=Depends(get_verified_user)
+    req: Request, type: int = 1, id: str = None, user=Depends(get_verified_user)
 ):
     """下载智能动画PPT"""
     config = get_current_ppt_config()
@@ -671,29 +893,18 @@ async def download_ppt_with_animation(
         raise HTTPException(status_code=400, detail="PPT ID不能为空")
 
     try:
-        params = {"type": type, "id": id}
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{config.api_url}/api/ppt/downloadWithAnimation",
-                params=params,
-                headers={"Api-Key": config.api_key},
-            )
-
-            if response.status_code == 200:
-                # 返回文件流
-                return Response(
-                    content=response.content,
-                    media_type="application/octet-stream",
-                    headers={
-                        "Content-Disposition": f"attachment; filename=ppt_with_animation_{id}.pptx"
-                    },
-                )
-            else:
-                raise HTTPException(
-                    status_code=response.status_code, detail="下载动画PPT失败"
-                )
+        # 返回文件流
+        return await stream_ppt_file(
+            f"{config.api_url}/api/ppt/downloadWithAnimation",
+            f"ppt_with_animation_{id}.pptx",
+            f"{quote(id, safe='')}_animation_{type}",
+            range_header=req.headers.get("range"),
+            params={"type": type, "id": id},
+            headers={"Api-Key": config.api_key},
+        )
 
+    except HTTPException:
+        raise
     except httpx.RequestError as e:
         log.error(f"下载动画PPT网络错误: {str(e)}")
         raise HTTPException(status_code=503, detail=f"网络请求失败: {str(e)}")
@@ -710,28 +921,40 @@ async def get_ppt_status(user=Depends(get_verified_user)):
         if not config.enabled:
             return {"enabled": False, "message": "PPT功能未启用"}
 
-        # 测试连接
-        async with httpx.AsyncClient() as client:
+        # 测试连接，几秒内的检查结果直接复用
+        async def probe():
+            client = get_http_client("ppt")
             response = await client.get(
                 f"{config.api_url}/api/ppt/v2/options",
                 headers={"Api-Key": config.api_key},
                 timeout=5.0,
             )
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=response.status_code, detail="获取生成选项失败"
+                )
+            # 顺便刷新生成选项缓存
+            ppt_response_cache.set(
+                get_ppt_cache_key(config, "generation_options"), response.json()
+            )
+            return True
 
-            if response.status_code == 200:
-                return {
-                    "enabled": True,
-                    "status": "online",
-                    "message": "PPT服务正常",
-                    "api_key": config.api_key,  # 添加api_key供前端使用
-                }
-            else:
-                return {
-                    "enabled": True,
-                    "status": "error",
-                    "message": f"PPT服务异常: {response.status_code}",
-                    "api_key": config.api_key,  # 即使服务异常也返回api_key
-                }
+        try:
+            await ppt_status_cache.get(get_ppt_cache_key(config, "status"), probe)
+        except HTTPException as e:
+            return {
+                "enabled": True,
+                "status": "error",
+                "message": f"PPT服务异常: {e.status_code}",
+                "api_key": config.api_key,  # 即使服务异常也返回api_key
+            }
+
+        return {
+            "enabled": True,
+            "status": "online",
+            "message": "PPT服务正常",
+            "api_key": config.api_key,  # 添加api_key供前端使用
+        }
 
     except httpx.RequestError as e:
         return {
@@ -41,6 +41,7 @@ from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
 # Document loaders
 from open_webui.retrieval.loaders.main import Loader
 from open_webui.retrieval.loaders.youtube import YoutubeLoader
+from open_webui.retrieval.models.lazy import LazyModel
 
 # Web search engines
 from open_webui.retrieval.web.main import SearchResult
@@ -67,6 +68,7 @@ from open_webui.retrieval.web.sougou import search_sougou
 from open_webui.retrieval.web.firecrawl import search_firecrawl
 from open_webui.retrieval.web.external import search_external
 
+from open_webui.retrieval.executor import RETRIEVAL_METRICS
 from open_webui.retrieval.utils import (
     get_embedding_function,
     get_model_path,
@@ -90,6 +92,9 @@ from open_webui.config import (
     DEFAULT_LOCALE,
     RAG_EMBEDDING_CONTENT_PREFIX,
     RAG_EMBEDDING_QUERY_PREFIX,
+    RAG_RERANKING_BATCH_WINDOW_MS,
+    RAG_RERANKING_MAX_BATCH_SIZE,
+    RAG_RERANKING_CACHE_SIZE,
 )
 from open_webui.env import (
     SRC_LOG_LEVELS,
@@ -120,18 +125,21 @@ def get_ef(
 ):
     ef = None
     if embedding_model and engine == "":
-        from sentence_transformers import SentenceTransformer
 
-        try:
-            ef = SentenceTransformer(
+        def load():
+            from sentence_transformers import SentenceTransformer
+
+            return SentenceTransformer(
                 get_model_path(embedding_model, auto_update),
                 device=DEVICE_TYPE,
                 trust_remote_code=RAG_EMBEDDING_MODEL_TRUST_REMOTE_CODE,
                 backend=SENTENCE_TRANSFORMERS_BACKEND,
                 model_kwargs=SENTENCE_TRANSFORMERS_MODEL_KWARGS,
             )
-        except Exception as e:
-            log.debug(f"Error loading SentenceTransformer: {e}")
+
+        # Loaded on first use, sentence-transformers takes seconds to import
+        # and the model may have to be downloaded first
+        ef = LazyModel(embedding_model, load)
 
     return ef
 
@@ -185,6 +193,20 @@ def get_rf(
                     log.error(f"CrossEncoder: {e}")
                     raise Exception(ERROR_MESSAGES.DEFAULT("CrossEncoder error"))
 
+    if rf is not None:
+        from open_webui.retrieval.models.batched import BatchedReranker
+
+        # ColBERT and external rerankers score a single query per call, so
+        # they only get the score cache; cross-encoders also get batched.
+        rf = BatchedReranker(
+            rf,
+            batching=engine != "external"
+            and "jinaai/jina-colbert-v2" not in reranking_model,
+            batch_window_ms=RAG_RERANKING_BATCH_WINDOW_MS,
+            max_batch_size=RAG_RERANKING_MAX_BATCH_SIZE,
+            cache_size=RAG_RERANKING_CACHE_SIZE,
+        )
+
     return rf
 
 
@@ -224,6 +246,105 @@ async def get_status(request: Request):
     }
 
 
+@router.get("/metrics")
+async def get_retrieval_metrics(request: Request, user=Depends(get_admin_user)):
+    rf = request.app.state.rf
+    return {
+        "stages": RETRIEVAL_METRICS.snapshot(),
+        "reranker": rf.stats if hasattr(rf, "stats") else None,
+    }
+
+
+@router.post("/metrics/reset")
+async def reset_retrieval_metrics(user=Depends(get_admin_user)):
+    RETRIEVAL_METRICS.reset()
+    return True
+
+
+class VectorIndexForm(BaseModel):
+    method: Optional[str] = None
+    collection_name: Optional[str] = None
+    concurrently: bool = True
+
+
+def get_vector_index_client():
+    if not hasattr(VECTOR_DB_CLIENT, "get_index_health"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Index management is only available for the pgvector backend",
+        )
+    return VECTOR_DB_CLIENT
+
+
+@router.get("/vector/index")
+async def get_vector_index_health(user=Depends(get_admin_user)):
+    client = get_vector_index_client()
+    try:
+        return await run_in_threadpool(client.get_index_health)
+    except Exception as e:
+        log.exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(e),
+        )
+
+
+@router.get("/vector/index/recall")
+async def get_vector_index_recall(
+    collection_name: Optional[str] = None,
+    sample_size: int = 20,
+    k: int = 10,
+    user=Depends(get_admin_user),
+):
+    client = get_vector_index_client()
+    try:
+        return await run_in_threadpool(
+            client.evaluate_recall,
+            collection_name,
+            max(1, min(sample_size, 200)),
+            max(1, min(k, 100)),
+        )
+    except Exception as e:
+        log.exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(e),
+        )
+
+
+@router.post("/vector/index")
+async def create_vector_index(form_data: VectorIndexForm, user=Depends(get_admin_user)):
+    client = get_vector_index_client()
+    try:
+        name = await run_in_threadpool(
+            client.create_index,
+            form_data.method,
+            form_data.collection_name,
+            form_data.concurrently,
+        )
+        return {"status": True, "name": name}
+    except Exception as e:
+        log.exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(e),
+        )
+
+
+@router.delete("/vector/index/{name}")
+async def delete_vector_index(name: str, user=Depends(get_admin_user)):
+    client = get_vector_index_client()
+    try:
+        await run_in_threadpool(client.drop_index, name)
+        return {"status": True}
+    except Exception as e:
+        log.exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(e),
+        )
+
+
 @router.get("/embedding")
 async def get_embedding_config(request: Request, user=Depends(get_admin_user)):
     return {
@@ -296,6 +417,8 @@ async def update_embedding_config(
             request.app.state.config.RAG_EMBEDDING_ENGINE,
             request.app.state.config.RAG_EMBEDDING_MODEL,
         )
+        if isinstance(request.app.state.ef, LazyModel):
+            request.app.state.ef.warm_up()
 
         request.app.state.EMBEDDING_FUNCTION = get_embedding_function(
             request.app.state.config.RAG_EMBEDDING_ENGINE,
@@ -557,6 +680,8 @@ async def update_rag_config(
     )
     # Free up memory if hybrid search is disabled
     if not request.app.state.config.ENABLE_RAG_HYBRID_SEARCH:
+        if request.app.state.rf is not None:
+            request.app.state.rf.close()
         request.app.state.rf = None
 
     request.app.state.config.TOP_K_RERANKER = (
@@ -643,6 +768,7 @@ async def update_rag_config(
         request.app.state.config.RAG_RERANKING_MODEL = form_data.RAG_RERANKING_MODEL
 
         try:
+            previous_rf = request.app.state.rf
             request.app.state.rf = get_rf(
                 request.app.state.config.RAG_RERANKING_ENGINE,
                 request.app.state.config.RAG_RERANKING_MODEL,
@@ -650,6 +776,9 @@ async def update_rag_config(
                 request.app.state.config.RAG_EXTERNAL_RERANKER_API_KEY,
                 True,
             )
+            # Stop the old batcher thread, which would keep its model loaded
+            if previous_rf is not None:
+                previous_rf.close()
         except Exception as e:
             log.error(f"Error loading reranking model: {e}")
             request.app.state.config.ENABLE_RAG_HYBRID_SEARCH = False
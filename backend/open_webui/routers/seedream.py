@@ -3,6 +3,10 @@
 提供即梦3.0图像生成API的集成接口
 """
 
+import asyncio
+import base64
+import io
+import json
 import uuid
 import time
 from datetime import datetime
@@ -14,8 +18,26 @@ import logging
 
 from open_webui.utils.auth import get_verified_user, get_admin_user
 from open_webui.models.seedream_tasks import SeedreamTasks, SeedreamTaskForm
-from open_webui.models.credits import Credits, AddCreditForm, SetCreditFormDetail
-from decimal import Decimal
+from open_webui.models.credits import Credits, CreditReservations, SetCreditFormDetail
+from open_webui.utils.generation import (
+    GenerationProvider,
+    GenerationProviderError,
+    GenerationResult,
+    enqueue_generation_job,
+    register_generation_provider,
+    reserve_generation_credits,
+)
+from open_webui.utils.http_client import get_http_client
+from open_webui.utils.media import (
+    decode_task_cursor,
+    delete_media_file,
+    download_media_file,
+    get_image_content_type,
+    get_media_file_response,
+    get_task_list_limit,
+    get_task_list_response,
+    store_media_file,
+)
 
 log = logging.getLogger(__name__)
 
@@ -184,7 +206,7 @@ async def get_user_credits(user=Depends(get_verified_user)):
 async def generate_image(
     req: Request, request: SeedreamGenerateRequest, user=Depends(get_verified_user)
 ):
-    """生成图像（同步接口）"""
+    """提交图像生成任务，立即返回任务ID"""
     try:
         # 获取配置
         config_enabled = getattr(req.app.state.config, "SEEDREAM_ENABLED", False)
@@ -203,39 +225,18 @@ async def generate_image(
                 status_code=503, detail="即梦3.0服务配置不完整，请联系管理员配置API信息"
             )
 
-        # 检查用户积分
-        try:
-            user_credit = Credits.get_credit_by_user_id(user.id)
-            if not user_credit:
-                user_credit = Credits.init_credit_by_user_id(user.id)
-        except Exception as e:
-            log.error(f"获取用户积分失败: {str(e)}")
-            raise HTTPException(status_code=400, detail="获取用户积分失败，请稍后重试")
-
-        current_balance = float(user_credit.credit)
-        if current_balance < config_credits:
-            raise HTTPException(
-                status_code=400,
-                detail=f"v豆余额不足，需要{config_credits}v豆，当前余额：{current_balance:.2f}v豆",
-            )
-
-        # 扣除积分
-        try:
-            deduct_form = AddCreditForm(
-                user_id=user.id,
-                amount=Decimal(-config_credits),
-                detail=SetCreditFormDetail(
-                    desc="即梦3.0图像生成",
-                    api_path="/seedream/generate",
-                    api_params={"prompt": request.prompt[:50] + "..."},
-                    usage={"credits_used": config_credits, "service": "seedream"},
-                ),
-            )
-            Credits.add_credit_by_user_id(deduct_form)
-            log.info(f"用户 {user.id} 消耗了 {config_credits} v豆用于即梦3.0任务")
-        except Exception as e:
-            log.error(f"扣除用户积分失败: {str(e)}")
-            raise HTTPException(status_code=500, detail="扣除积分失败，请稍后重试")
+        # 预留积分，任务完成时确认扣除，失败时释放
+        reservation = reserve_generation_credits(
+            user.id,
+            config_credits,
+            SetCreditFormDetail(
+                desc="即梦3.0图像生成",
+                api_path="/seedream/generate",
+                api_params={"prompt": request.prompt[:50] + "..."},
+                usage={"credits_used": config_credits, "service": "seedream"},
+            ),
+        )
+        log.info(f"用户 {user.id} 预留了 {config_credits} v豆用于即梦3.0任务")
 
         # 生成任务ID
         task_id = str(uuid.uuid4())
@@ -252,7 +253,7 @@ async def generate_image(
             height=request.height,
             return_url=request.return_url,
             logo_info=request.logo_info.dict() if request.logo_info else None,
-            status="processing",
+            status="submitted",
             message="正在生成图像",
             credits_used=config_credits,
         )
@@ -260,119 +261,34 @@ async def generate_image(
         # 保存到数据库
         saved_task = SeedreamTasks.insert_new_task(task_form)
         if not saved_task:
-            # 如果任务创建失败，退还积分
-            try:
-                refund_form = AddCreditForm(
-                    user_id=user.id,
-                    amount=Decimal(config_credits),
-                    detail=SetCreditFormDetail(
-                        desc="即梦3.0任务创建失败退款",
-                        api_path="/seedream/generate",
-                        api_params={"task_id": task_id},
-                        usage={
-                            "credits_refunded": config_credits,
-                            "reason": "task_creation_failed",
-                        },
-                    ),
-                )
-                Credits.add_credit_by_user_id(refund_form)
-            except Exception as refund_error:
-                log.error(f"退还积分失败: {str(refund_error)}")
-
+            # 如果任务创建失败，释放预留的积分
+            CreditReservations.release_reservation_by_id(
+                reservation.id,
+                SetCreditFormDetail(
+                    desc="即梦3.0任务创建失败退款",
+                    api_path="/seedream/generate",
+                    api_params={"task_id": task_id},
+                    usage={
+                        "credits_refunded": config_credits,
+                        "reason": "task_creation_failed",
+                    },
+                ),
+            )
             raise HTTPException(status_code=500, detail="任务创建失败，请稍后重试")
 
         log.info(f"新的即梦3.0任务已创建: {task_id}, 用户: {user.id}")
 
-        # 调用即梦3.0 API（同步调用）
-        try:
-            api_response = await call_seedream_api(
-                config_api_url, config_api_key, request.dict()
-            )
-
-            if api_response["success"]:
-                # 更新任务为成功状态
-                update_data = {
-                    "status": "completed",
-                    "message": "图像生成完成",
-                    "image_url": api_response.get("image_url"),
-                    "image_data": api_response.get("image_data"),
-                    "completed_at": int(time.time()),
-                }
-                SeedreamTasks.update_task_by_id(task_id, update_data)
-
-                log.info(f"即梦3.0任务成功完成: {task_id}")
-
-                return SeedreamResponse(
-                    task_id=task_id,
-                    status="completed",
-                    message="图像生成完成",
-                    credits_used=config_credits,
-                    image_url=api_response.get("image_url"),
-                    image_data=api_response.get("image_data"),
-                )
-            else:
-                # API调用失败，退还积分
-                try:
-                    refund_form = AddCreditForm(
-                        user_id=user.id,
-                        amount=Decimal(config_credits),
-                        detail=SetCreditFormDetail(
-                            desc="即梦3.0生成失败退款",
-                            api_path="/seedream/generate",
-                            api_params={"task_id": task_id},
-                            usage={
-                                "credits_refunded": config_credits,
-                                "reason": "generation_failed",
-                            },
-                        ),
-                    )
-                    Credits.add_credit_by_user_id(refund_form)
-                    log.info(f"生成失败，已退还 {config_credits} v豆给用户 {user.id}")
-                except Exception as refund_error:
-                    log.error(f"退还积分失败: {str(refund_error)}")
-
-                # 更新任务为失败状态
-                update_data = {
-                    "status": "failed",
-                    "message": f"生成失败: {api_response['error']}",
-                    "completed_at": int(time.time()),
-                }
-                SeedreamTasks.update_task_by_id(task_id, update_data)
-
-                raise HTTPException(
-                    status_code=500, detail=f"图像生成失败: {api_response['error']}"
-                )
-
-        except Exception as e:
-            # 异常处理，退还积分
-            try:
-                refund_form = AddCreditForm(
-                    user_id=user.id,
-                    amount=Decimal(config_credits),
-                    detail=SetCreditFormDetail(
-                        desc="即梦3.0异常退款",
-                        api_path="/seedream/generate",
-                        api_params={"task_id": task_id},
-                        usage={
-                            "credits_refunded": config_credits,
-                            "reason": "exception",
-                        },
-                    ),
-                )
-                Credits.add_credit_by_user_id(refund_form)
-                log.info(f"生成异常，已退还 {config_credits} v豆给用户 {user.id}")
-            except Exception as refund_error:
-                log.error(f"退还积分失败: {str(refund_error)}")
-
-            # 更新任务为失败状态
-            update_data = {
-                "status": "failed",
-                "message": f"生成异常: {str(e)}",
-                "completed_at": int(time.time()),
-            }
-            SeedreamTasks.update_task_by_id(task_id, update_data)
+        # 交给任务引擎调用即梦3.0 API，完成后通过socket推送，失败时退还积分
+        enqueue_generation_job(
+            "seedream", task_id, user.id, config_credits, reservation_id=reservation.id
+        )
 
-            raise HTTPException(status_code=500, detail=f"图像生成异常: {str(e)}")
+        return SeedreamResponse(
+            task_id=task_id,
+            status="submitted",
+            message="任务已提交，正在生成图像",
+            credits_used=config_credits,
+        )
 
     except HTTPException:
         raise
@@ -398,15 +314,35 @@ async def get_task_status(task_id: str, user=Depends(get_verified_user)):
 
 
 @router.get("/tasks")
-async def list_user_tasks(user=Depends(get_verified_user)):
-    """获取用户的任务列表"""
+def list_user_tasks(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    user=Depends(get_verified_user),
+):
+    """获取用户的任务列表，不含图像数据，下一页游标在 X-Next-Cursor 响应头中"""
+    page_cursor = decode_task_cursor(cursor)
     if user.role == "admin":
-        tasks = SeedreamTasks.get_all_tasks(limit=100)
+        limit = get_task_list_limit(limit, 100)
+        tasks = SeedreamTasks.get_task_list(None, limit, page_cursor)
     else:
-        tasks = SeedreamTasks.get_tasks_by_user_id(user.id, limit=50)
+        limit = get_task_list_limit(limit, 50)
+        tasks = SeedreamTasks.get_task_list(user.id, limit, page_cursor)
+
+    return get_task_list_response(request, {"tasks": tasks}, tasks, limit)
+
+
+@router.get("/task/{task_id}/image")
+def get_task_image(request: Request, task_id: str, user=Depends(get_verified_user)):
+    """获取任务生成的图像，支持Range请求和浏览器缓存"""
+    task = SeedreamTasks.get_task_by_id(task_id)
+    if not task or not task.image_file_id:
+        raise HTTPException(status_code=404, detail="图像不存在")
+
+    if task.user_id != user.id and user.role != "admin":
+        raise HTTPException(status_code=403, detail="无权访问此任务")
 
-    user_tasks = [SeedreamTasks.convert_to_response_format(task) for task in tasks]
-    return {"tasks": user_tasks}
+    return get_media_file_response(request, task.image_file_id)
 
 
 @router.delete("/task/{task_id}")
@@ -420,7 +356,9 @@ async def delete_task(task_id: str, user=Depends(get_verified_user)):
     if task.user_id != user.id and user.role != "admin":
         raise HTTPException(status_code=403, detail="无权访问此任务")
 
-    # 删除任务
+    # 删除任务及存储中的图像
+    if task.image_file_id:
+        delete_media_file(task.image_file_id)
     deleted = SeedreamTasks.delete_task_by_id(task_id)
     if not deleted:
         raise HTTPException(status_code=500, detail="删除任务失败")
@@ -432,87 +370,241 @@ async def delete_task(task_id: str, user=Depends(get_verified_user)):
 async def call_seedream_api(
     api_url: str, api_key: str, request_data: Dict[str, Any]
 ) -> Dict[str, Any]:
-    """调用即梦3.0 API"""
+    """调用即梦3.0 API，失败时抛出异常"""
 
-    async with httpx.AsyncClient() as client:
-        try:
-            # 构建请求头
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
+    client = get_http_client("seedream")
+    try:
+        # 构建请求头
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
 
-            # 构建API URL（按照文档要求替换）
-            full_url = f"{api_url}/volcv/v1?Action=CVProcess&Version=2022-08-31"
-
-            # 构建请求负载
-            payload = {
-                "req_key": "high_aes_general_v30l_zt2i",  # 固定值
-                "prompt": request_data.get("prompt", ""),
-                "use_pre_llm": request_data.get("use_pre_llm", False),
-                "seed": request_data.get("seed", -1),
-                "scale": request_data.get("scale", 2.5),
-                "width": request_data.get("width", 1328),
-                "height": request_data.get("height", 1328),
-                "return_url": request_data.get("return_url", True),
-            }
+        # 构建API URL（按照文档要求替换）
+        full_url = f"{api_url}/volcv/v1?Action=CVProcess&Version=2022-08-31"
+
+        # 构建请求负载
+        payload = {
+            "req_key": "high_aes_general_v30l_zt2i",  # 固定值
+            "prompt": request_data.get("prompt", ""),
+            "use_pre_llm": request_data.get("use_pre_llm", False),
+            "seed": request_data.get("seed", -1),
+            "scale": request_data.get("scale", 2.5),
+            "width": request_data.get("width", 1328),
+            "height": request_data.get("height", 1328),
+            "return_url": request_data.get("return_url", True),
+        }
+
+        # 添加水印信息（如果存在）
+        if request_data.get("logo_info"):
+            payload["logo_info"] = request_data["logo_info"]
 
-            # 添加水印信息（如果存在）
-            if request_data.get("logo_info"):
-                payload["logo_info"] = request_data["logo_info"]
+        log.info(f"调用即梦3.0 API: {full_url}")
+        log.info(
+            f"请求负载: prompt长度={len(payload['prompt'])}, 尺寸={payload['width']}x{payload['height']}"
+        )
 
-            log.info(f"调用即梦3.0 API: {full_url}")
-            log.info(
-                f"请求负载: prompt长度={len(payload['prompt'])}, 尺寸={payload['width']}x{payload['height']}"
+        # 发送请求
+        response = await client.post(
+            full_url,
+            json=payload,
+            headers=headers,
+            timeout=60.0,  # 即梦3.0是同步接口，可能需要较长时间
+        )
+
+        if response.status_code != 200:
+            raise GenerationProviderError(
+                f"API调用失败: {response.status_code} - {response.text}",
+                retryable=response.status_code in (429, 503),
             )
 
-            # 发送请求
-            response = await client.post(
-                full_url,
-                json=payload,
-                headers=headers,
-                timeout=60.0,  # 即梦3.0是同步接口，可能需要较长时间
+        result = response.json()
+
+        # 检查响应状态
+        if result.get("code") != 10000:
+            error_msg = result.get("message", "未知错误")
+            log.error(f"即梦3.0 API返回错误: {error_msg}")
+            raise GenerationProviderError(f"API返回错误: {error_msg}")
+
+        # 解析响应数据
+        data = result.get("data", {})
+        image_urls = data.get("image_urls", [])
+        binary_data_base64 = data.get("binary_data_base64", [])
+
+        response_data = {
+            "success": True,
+            "message": "生成成功",
+            "request_id": result.get("request_id"),
+            "time_elapsed": result.get("time_elapsed"),
+        }
+
+        # 优先使用图片URL
+        if image_urls:
+            response_data["image_url"] = image_urls[0]
+
+        # 如果有Base64数据也返回
+        if binary_data_base64:
+            response_data["image_data"] = binary_data_base64[0]
+
+        return response_data
+
+    except Exception as e:
+        log.error(f"即梦3.0 API调用失败: {str(e)}")
+        raise
+
+
+def get_seedream_image_url(task_id: str) -> str:
+    return f"/api/v1/seedream/task/{task_id}/image"
+
+
+async def store_seedream_image(
+    task, image_url: Optional[str], image_data: Optional[str]
+):
+    """将生成结果写入存储，优先直接转存上游图片链接"""
+    data = {"source": "seedream", "task_id": task.task_id}
+    if image_url:
+        return await download_media_file(
+            image_url, task.user_id, f"seedream-{task.task_id}", data
+        )
+    if image_data:
+        return await asyncio.to_thread(
+            store_seedream_image_data, task.task_id, task.user_id, image_data
+        )
+    return None
+
+
+def store_seedream_image_data(task_id: str, user_id: str, image_data: str):
+    contents = base64.b64decode(image_data)
+    return store_media_file(
+        user_id,
+        io.BytesIO(contents),
+        f"seedream-{task_id}",
+        get_image_content_type(contents),
+        {"source": "seedream", "task_id": task_id},
+    )
+
+
+def migrate_seedream_images(batch_size: int = 50):
+    """将旧任务中保存在数据库里的Base64图像迁移到存储"""
+    migrated = 0
+    failed = set()
+    while True:
+        task_ids = [
+            task_id
+            for task_id in SeedreamTasks.get_task_ids_with_image_data(
+                limit=batch_size + len(failed)
             )
+            if task_id not in failed
+        ]
+        if not task_ids:
+            break
 
-            if response.status_code != 200:
-                raise Exception(
-                    f"API调用失败: {response.status_code} - {response.text}"
+        for task_id in task_ids:
+            task = SeedreamTasks.get_task_by_id(task_id)
+            try:
+                image_file = store_seedream_image_data(
+                    task_id, task.user_id, task.image_data
                 )
+            except Exception as e:
+                log.warning(f"迁移即梦3.0任务图像失败: {task_id}, {e}")
+                failed.add(task_id)
+                continue
+
+            if SeedreamTasks.set_image_file_by_id(
+                task_id, image_file.id, get_seedream_image_url(task_id)
+            ):
+                migrated += 1
+            else:
+                # 其他实例已完成迁移
+                delete_media_file(image_file.id)
+                failed.add(task_id)
 
-            result = response.json()
+    if migrated:
+        log.info(f"已将{migrated}个即梦3.0任务图像迁移到存储")
 
-            # 检查响应状态
-            if result.get("code") != 10000:
-                error_msg = result.get("message", "未知错误")
-                log.error(f"即梦3.0 API返回错误: {error_msg}")
-                raise Exception(f"API返回错误: {error_msg}")
 
-            # 解析响应数据
-            data = result.get("data", {})
-            image_urls = data.get("image_urls", [])
-            binary_data_base64 = data.get("binary_data_base64", [])
+@register_generation_provider
+class SeedreamProvider(GenerationProvider):
+    """由任务引擎驱动的即梦3.0图像生成（上游为同步接口，提交即完成）"""
 
-            response_data = {
-                "success": True,
-                "message": "生成成功",
-                "request_id": result.get("request_id"),
-                "time_elapsed": result.get("time_elapsed"),
-            }
+    name = "seedream"
+    title = "即梦3.0"
+    max_concurrency = 10
+    timeout = 300
 
-            # 优先使用图片URL
-            if image_urls:
-                response_data["image_url"] = image_urls[0]
+    async def submit(self, app, job):
+        task = SeedreamTasks.get_task_by_id(job.task_id)
+        if not task:
+            raise GenerationProviderError("任务不存在")
 
-            # 如果有Base64数据也返回
-            if binary_data_base64:
-                response_data["image_data"] = binary_data_base64[0]
+        api_url = getattr(app.state.config, "SEEDREAM_API_URL", "")
+        api_key = getattr(app.state.config, "SEEDREAM_API_KEY", "")
+        if not api_url or not api_key:
+            raise GenerationProviderError(
+                "即梦3.0服务配置不完整，请联系管理员配置API信息"
+            )
 
-            return response_data
+        SeedreamTasks.update_task_by_id(
+            job.task_id, {"status": "processing", "message": "正在生成图像"}
+        )
+        api_response = await call_seedream_api(
+            api_url,
+            api_key,
+            {
+                "prompt": task.prompt,
+                "use_pre_llm": task.use_pre_llm,
+                "seed": task.seed,
+                "scale": task.scale,
+                "width": task.width,
+                "height": task.height,
+                "return_url": task.return_url,
+                "logo_info": json.loads(task.logo_info) if task.logo_info else None,
+            },
+        )
 
+        update_data = {"image_url": api_response.get("image_url")}
+        try:
+            image_file = await store_seedream_image(
+                task, api_response.get("image_url"), api_response.get("image_data")
+            )
+            if image_file:
+                update_data = {
+                    "image_file_id": image_file.id,
+                    "image_url": get_seedream_image_url(job.task_id),
+                }
         except Exception as e:
-            log.error(f"即梦3.0 API调用失败: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "message": f"API调用失败: {str(e)}",
-            }
+            # 保存失败时保留上游图片链接，不重复提交生成
+            log.warning(f"即梦3.0图像保存到存储失败: {job.task_id}, {e}")
+
+        SeedreamTasks.update_task_by_id(
+            job.task_id,
+            {
+                **update_data,
+                "status": "completed",
+                "message": "图像生成完成",
+                "request_id": api_response.get("request_id"),
+                "time_elapsed": str(api_response.get("time_elapsed") or ""),
+                "completed_at": int(time.time()),
+            },
+        )
+        log.info(f"即梦3.0任务成功完成: {job.task_id}")
+
+        return GenerationResult(status="completed", progress=100)
+
+    async def poll(self, app, job):
+        # 提交即完成，任务不会进入轮询阶段
+        raise GenerationProviderError("即梦3.0任务不支持状态查询")
+
+    def on_failed(self, job, error):
+        SeedreamTasks.update_task_by_id(
+            job.task_id,
+            {
+                "status": "failed",
+                "message": f"生成失败: {error}",
+                "completed_at": int(time.time()),
+            },
+        )
+
+    def get_task_data(self, task_id):
+        task = SeedreamTasks.get_task_by_id(task_id)
+        return SeedreamTasks.convert_to_response_format(task) if task else None
@@ -3,6 +3,9 @@ from fastapi.responses import JSONResponse, RedirectResponse
 
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
+import hashlib
+import json
 import logging
 import re
 
@@ -18,6 +21,8 @@ from open_webui.utils.task import (
     moa_response_generation_template,
 )
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.cache import StaleWhileRevalidateCache
+from open_webui.utils.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_TOOLS
 from open_webui.constants import TASKS
 
 from open_webui.routers.pipelines import process_pipeline_inlet_filter
@@ -37,13 +42,83 @@ from open_webui.config import (
     DEFAULT_MOA_GENERATION_PROMPT_TEMPLATE,
     CREDIT_NO_CREDIT_MSG,
 )
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import SRC_LOG_LEVELS, TASK_COMPLETION_CACHE_TTL
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
 router = APIRouter()
 
+# Identical task generations share one upstream call and are reused briefly
+task_completions = StaleWhileRevalidateCache(ttl=TASK_COMPLETION_CACHE_TTL)
+
+# Key of the generation each session is waiting on, see generate_task_completion
+SESSION_TASK_KEYS: dict[str, tuple] = {}
+
+
+def get_task_completion_key(payload: dict, user_id: str) -> tuple:
+    # Per user: the call is billed to, and checked against, the user making it
+    body = {k: v for k, v in payload.items() if k != "metadata"}
+    digest = hashlib.sha256(
+        json.dumps(body, sort_keys=True, ensure_ascii=False, default=str).encode()
+    ).hexdigest()
+    return (user_id, payload.get("metadata", {}).get("task"), payload["model"], digest)
+
+
+async def generate_task_completion(
+    request: Request,
+    payload: dict,
+    user,
+    session_id: Optional[str] = None,
+    priority: str = PRIORITY_BACKGROUND,
+):
+    """
+    Requests of a user for the same task, task model and prompt share one
+    upstream call, and its response is reused for TASK_COMPLETION_CACHE_TTL
+    seconds. With a `session_id`, a newer request of the session cancels the
+    call the older one is waiting on.
+    """
+    if getattr(request.state, "direct", False):
+        # Direct connections are per user, nothing to share
+        return await generate_chat_completion(
+            request, form_data=payload, user=user, priority=priority
+        )
+
+    key = get_task_completion_key(payload, user.id)
+    if session_id:
+        session_id = f"{user.id}:{session_id}"
+        previous = SESSION_TASK_KEYS.get(session_id)
+        if previous is not None and previous != key:
+            task_completions.cancel(previous)
+        SESSION_TASK_KEYS[session_id] = key
+
+    try:
+        while True:
+            try:
+                response = await task_completions.get(
+                    key,
+                    lambda: generate_chat_completion(
+                        request, form_data=payload, user=user, priority=priority
+                    ),
+                )
+                break
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                if session_id and SESSION_TASK_KEYS.get(session_id) != key:
+                    return JSONResponse(
+                        status_code=status.HTTP_409_CONFLICT,
+                        content={"detail": "Superseded by a newer request"},
+                    )
+                # The shared call was cancelled by another session, start over
+    finally:
+        if session_id and SESSION_TASK_KEYS.get(session_id) == key:
+            del SESSION_TASK_KEYS[session_id]
+
+    if not isinstance(response, dict):
+        task_completions.invalidate(key)
+    return response
+
 
 ##################################
 #
@@ -223,7 +298,7 @@ async def generate_title(
         raise e
 
     try:
-        return await generate_chat_completion(request, form_data=payload, user=user)
+        return await generate_task_completion(request, payload, user)
     except Exception as e:
         log.error("Exception occurred", exc_info=True)
         return JSONResponse(
@@ -299,7 +374,7 @@ async def generate_chat_tags(
         raise e
 
     try:
-        return await generate_chat_completion(request, form_data=payload, user=user)
+        return await generate_task_completion(request, payload, user)
     except Exception as e:
         log.error(f"Error generating chat completion: {e}")
         return JSONResponse(
@@ -373,7 +448,7 @@ async def generate_image_prompt(
         raise e
 
     try:
-        return await generate_chat_completion(request, form_data=payload, user=user)
+        return await generate_task_completion(request, payload, user)
     except Exception as e:
         log.error("Exception occurred", exc_info=True)
         return JSONResponse(
@@ -457,7 +532,9 @@ async def generate_queries(
         raise e
 
     try:
-        return await generate_chat_completion(request, form_data=payload, user=user)
+        return await generate_task_completion(
+            request, payload, user, priority=PRIORITY_TOOLS
+        )
     except Exception as e:
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -546,7 +623,15 @@ async def generate_autocompletion(
         raise e
 
     try:
-        return await generate_chat_completion(request, form_data=payload, user=user)
+        return await generate_task_completion(
+            request,
+            payload,
+            user,
+            # Each browser tab (socket session) or chat supersedes its own
+            # pending completion only
+            session_id=form_data.get("session_id") or form_data.get("chat_id"),
+            priority=PRIORITY_TOOLS,
+        )
     except Exception as e:
         log.error(f"Error generating chat completion: {e}")
         return JSONResponse(
@@ -623,7 +708,7 @@ async def generate_emoji(
         raise e
 
     try:
-        return await generate_chat_completion(request, form_data=payload, user=user)
+        return await generate_task_completion(request, payload, user)
     except Exception as e:
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,4 +1,3 @@
-import black
 import logging
 import markdown
 
@@ -11,9 +10,14 @@ from starlette.responses import FileResponse
 
 
 from open_webui.utils.misc import get_gravatar_url
-from open_webui.utils.pdf_generator import PDFGenerator
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.code_interpreter import execute_code_jupyter
+from open_webui.utils.http_client import http_clients
+from open_webui.utils.llm_scheduler import llm_scheduler
+from open_webui.utils.model_registry import model_registry
+from open_webui.utils.pull_manager import pull_manager
+from open_webui.utils.startup import get_startup_profile
+from open_webui.utils.upstream_pool import upstream_pool
 from open_webui.env import SRC_LOG_LEVELS
 
 log = logging.getLogger(__name__)
@@ -33,6 +37,8 @@ class CodeForm(BaseModel):
 
 @router.post("/code/format")
 async def format_code(form_data: CodeForm, user=Depends(get_verified_user)):
+    import black
+
     try:
         formatted_code = black.format_str(form_data.code, mode=black.Mode())
         return {"code": formatted_code}
@@ -91,6 +97,8 @@ class ChatForm(BaseModel):
 async def download_chat_as_pdf(
     form_data: ChatTitleMessagesForm, user=Depends(get_verified_user)
 ):
+    from open_webui.utils.pdf_generator import PDFGenerator
+
     try:
         pdf_bytes = PDFGenerator(form_data).generate_chat_pdf()
 
@@ -125,6 +133,36 @@ async def download_db(user=Depends(get_admin_user)):
     )
 
 
+@router.get("/http/clients")
+async def get_http_client_stats(user=Depends(get_admin_user)):
+    return http_clients.get_stats()
+
+
+@router.get("/models/registry")
+async def get_model_registry_stats(user=Depends(get_admin_user)):
+    return model_registry.get_stats()
+
+
+@router.get("/upstreams")
+async def get_upstream_stats(user=Depends(get_admin_user)):
+    return upstream_pool.get_stats()
+
+
+@router.get("/scheduler")
+async def get_scheduler_stats(user=Depends(get_admin_user)):
+    return llm_scheduler.get_stats()
+
+
+@router.get("/pulls")
+async def get_pull_stats(user=Depends(get_admin_user)):
+    return pull_manager.get_stats()
+
+
+@router.get("/startup")
+async def get_startup_stats(user=Depends(get_admin_user)):
+    return get_startup_profile()
+
+
 @router.get("/litellm/config")
 async def download_litellm_config_yaml(user=Depends(get_admin_user)):
     return FileResponse(
@@ -9,11 +9,14 @@ from open_webui.models.users import Users, UserNameResponse
 from open_webui.models.channels import Channels
 from open_webui.models.chats import Chats
 from open_webui.utils.redis import (
+    get_async_redis_connection,
     get_sentinels_from_env,
     get_sentinel_url_from_env,
 )
 
 from open_webui.env import (
+    CHAT_STREAM_BUFFER_SIZE,
+    CHAT_STREAM_BUFFER_TTL,
     ENABLE_WEBSOCKET_SUPPORT,
     WEBSOCKET_MANAGER,
     WEBSOCKET_REDIS_URL,
@@ -22,7 +25,7 @@ from open_webui.env import (
     WEBSOCKET_SENTINEL_HOSTS,
 )
 from open_webui.utils.auth import decode_token
-from open_webui.socket.utils import RedisDict, RedisLock
+from open_webui.socket.utils import MessageEventBuffer, RedisDict, RedisLock
 
 from open_webui.env import (
     GLOBAL_LOG_LEVEL,
@@ -96,12 +99,22 @@ if WEBSOCKET_MANAGER == "redis":
     aquire_func = clean_up_lock.aquire_lock
     renew_func = clean_up_lock.renew_lock
     release_func = clean_up_lock.release_lock
+
+    MESSAGE_EVENTS = MessageEventBuffer(
+        CHAT_STREAM_BUFFER_SIZE,
+        CHAT_STREAM_BUFFER_TTL,
+        redis=get_async_redis_connection(
+            redis_url=WEBSOCKET_REDIS_URL, redis_sentinels=redis_sentinels
+        ),
+    )
 else:
     SESSION_POOL = {}
     USER_POOL = {}
     USAGE_POOL = {}
     aquire_func = release_func = renew_func = lambda: True
 
+    MESSAGE_EVENTS = MessageEventBuffer(CHAT_STREAM_BUFFER_SIZE, CHAT_STREAM_BUFFER_TTL)
+
 
 async def periodic_usage_pool_cleanup():
     if not aquire_func():
@@ -276,6 +289,25 @@ async def channel_events(sid, data):
         )
 
 
+@sio.on("chat:resume")
+async def chat_resume(sid, data):
+    """
+    Events of a message emitted after sequence `seq`, for a client that
+    reconnected while the message was still being generated.
+    """
+    user = SESSION_POOL.get(sid)
+    if not user or not isinstance(data, dict) or not data.get("message_id"):
+        return None
+
+    buffer = await MESSAGE_EVENTS.get(data["message_id"], int(data.get("seq") or 0))
+    if buffer is None or buffer["user_id"] != user["id"]:
+        return None
+    if data.get("chat_id") and buffer["chat_id"] != data["chat_id"]:
+        return None
+
+    return {"events": buffer["events"], "done": buffer["done"]}
+
+
 @sio.on("user-list")
 async def user_list(sid):
     if sid in SESSION_POOL:
@@ -315,16 +347,19 @@ def get_event_emitter(request_info, update_db=True):
             )
         )
 
-        emit_tasks = [
-            sio.emit(
-                "chat-events",
-                {
-                    "chat_id": request_info.get("chat_id", None),
-                    "message_id": request_info.get("message_id", None),
-                    "data": event_data,
-                },
-                to=session_id,
+        payload = {
+            "chat_id": request_info.get("chat_id", None),
+            "message_id": request_info.get("message_id", None),
+            "data": event_data,
+        }
+        if payload["message_id"]:
+            # Numbered, so a reconnecting client can resume where it left off
+            payload["seq"] = await MESSAGE_EVENTS.append(
+                payload["message_id"], user_id, payload["chat_id"], event_data
             )
+
+        emit_tasks = [
+            sio.emit("chat-events", payload, to=session_id)
             for session_id in session_ids
         ]
 
@@ -370,6 +405,19 @@ def get_event_emitter(request_info, update_db=True):
     return __event_emitter__
 
 
+async def emit_to_user(user_id: str, event: str, data: dict):
+    """
+    Emit an event to every active session of a user. Used by background
+    workers that are not tied to a chat message.
+    """
+    await asyncio.gather(
+        *[
+            sio.emit(event, data, to=session_id)
+            for session_id in USER_POOL.get(user_id, [])
+        ]
+    )
+
+
 def get_event_call(request_info):
     async def __event_caller__(event_data):
         response = await sio.call(
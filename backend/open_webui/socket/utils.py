@@ -1,7 +1,21 @@
+import asyncio
 import json
+import logging
+import time
 import uuid
+from collections import deque
+from typing import Optional
+
+from open_webui.env import SRC_LOG_LEVELS
 from open_webui.utils.redis import get_redis_connection
 
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["SOCKET"])
+
+# How long buffered events wait before they are mirrored to Redis. Content
+# snapshots superseded within that time are never written.
+REDIS_FLUSH_INTERVAL = 0.5
+
 
 class RedisLock:
     def __init__(self, redis_url, lock_name, timeout_secs, redis_sentinels=[]):
@@ -89,3 +103,157 @@ class RedisDict:
         if key not in self:
             self[key] = default
         return self[key]
+
+
+def is_content_snapshot(data: dict) -> bool:
+    return data.get("type") == "chat:completion" and set(data.get("data") or {}) == {
+        "content"
+    }
+
+
+class MessageEventBuffer:
+    """
+    Ring buffer of the chat events emitted for each message being generated,
+    numbered by a per-message sequence, so a client reconnecting mid-stream
+    can catch up from the last sequence it saw instead of re-reading the
+    chat. Kept in memory by the worker running the generation and, given an
+    async Redis client, mirrored to a Redis stream for the other workers in
+    the background, every REDIS_FLUSH_INTERVAL seconds at most.
+    """
+
+    def __init__(self, maxlen: int, ttl: int, redis=None):
+        self.maxlen = max(1, maxlen)
+        self.ttl = ttl
+        self.redis = redis
+        self._buffers: dict[str, dict] = {}
+
+    def _key(self, message_id: str) -> str:
+        return f"open-webui:message-events:{message_id}"
+
+    def _expire(self):
+        now = time.monotonic()
+        for message_id in [
+            message_id
+            for message_id, buffer in self._buffers.items()
+            if now - buffer["updated_at"] > self.ttl
+        ]:
+            del self._buffers[message_id]
+
+    async def append(
+        self, message_id: str, user_id: str, chat_id: str, data: dict
+    ) -> int:
+        buffer = self._buffers.get(message_id)
+        if buffer is None:
+            self._expire()
+            buffer = self._buffers[message_id] = {
+                "user_id": user_id,
+                "chat_id": chat_id,
+                "seq": 0,
+                "events": deque(maxlen=self.maxlen),
+                "done": False,
+                # Not mirrored to Redis yet
+                "pending": {},
+                "deleted": [],
+                "flush": None,
+            }
+
+        buffer["seq"] += 1
+        buffer["updated_at"] = time.monotonic()
+        seq = buffer["seq"]
+
+        # Streamed completions carry the whole message so far, so a snapshot
+        # supersedes the one right before it instead of piling up
+        superseded = None
+        events = buffer["events"]
+        if is_content_snapshot(data) and events and is_content_snapshot(events[-1][1]):
+            superseded = events.pop()[0]
+        events.append((seq, data))
+
+        done = data.get("type") == "chat:completion" and bool(
+            (data.get("data") or {}).get("done")
+        )
+        buffer["done"] = buffer["done"] or done
+
+        if self.redis:
+            if superseded is not None:
+                if buffer["pending"].pop(superseded, None) is None:
+                    buffer["deleted"].append(superseded)
+            buffer["pending"][seq] = data
+
+            # Mirrored in the background, emitting never waits on Redis
+            if buffer["flush"] is None or buffer["flush"].done():
+                buffer["flush"] = asyncio.create_task(self._flush(message_id, buffer))
+
+        return seq
+
+    async def _flush(self, message_id: str, buffer: dict):
+        if not buffer["done"]:
+            await asyncio.sleep(REDIS_FLUSH_INTERVAL)
+
+        key = self._key(message_id)
+        # Events appended while a write is in flight go with the next one
+        while buffer["pending"] or buffer["deleted"]:
+            pending, buffer["pending"] = buffer["pending"], {}
+            deleted, buffer["deleted"] = buffer["deleted"], []
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    if deleted:
+                        pipe.xdel(key, *[f"{seq}-0" for seq in deleted])
+                    for seq, data in pending.items():
+                        pipe.xadd(
+                            key,
+                            {"data": json.dumps(data)},
+                            id=f"{seq}-0",
+                            maxlen=self.maxlen,
+                            approximate=True,
+                        )
+                    pipe.hset(
+                        f"{key}:meta",
+                        mapping={
+                            "user_id": buffer["user_id"],
+                            "chat_id": buffer["chat_id"] or "",
+                            "done": int(buffer["done"]),
+                        },
+                    )
+                    pipe.expire(key, self.ttl)
+                    pipe.expire(f"{key}:meta", self.ttl)
+                    await pipe.execute()
+            except Exception as e:
+                log.debug(f"Failed to buffer events of {message_id} in Redis: {e}")
+
+    async def get(self, message_id: str, after: int = 0) -> Optional[dict]:
+        """Owner, chat and events after sequence `after` of a message."""
+        buffer = self._buffers.get(message_id)
+        if buffer is not None:
+            return {
+                "user_id": buffer["user_id"],
+                "chat_id": buffer["chat_id"],
+                "done": buffer["done"],
+                "events": [
+                    {"seq": seq, "data": data}
+                    for seq, data in buffer["events"]
+                    if seq > after
+                ],
+            }
+
+        if self.redis:
+            key = self._key(message_id)
+            try:
+                meta = await self.redis.hgetall(f"{key}:meta")
+                if meta:
+                    entries = await self.redis.xrange(key, min=f"{after + 1}-0")
+                    return {
+                        "user_id": meta["user_id"],
+                        "chat_id": meta["chat_id"] or None,
+                        "done": meta.get("done") == "1",
+                        "events": [
+                            {
+                                "seq": int(entry_id.split("-")[0]),
+                                "data": json.loads(fields["data"]),
+                            }
+                            for entry_id, fields in entries
+                        ],
+                    }
+            except Exception as e:
+                log.debug(f"Failed to read events of {message_id} from Redis: {e}")
+        return None
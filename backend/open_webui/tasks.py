@@ -1,11 +1,174 @@
 # tasks.py
 import asyncio
-from typing import Dict
+import logging
+import time
+from typing import Dict, Optional
 from uuid import uuid4
 
+from open_webui.env import (
+    SRC_LOG_LEVELS,
+    REDIS_URL,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    TASK_HEARTBEAT_INTERVAL,
+)
+from open_webui.utils.redis import get_async_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+# Tasks running on other workers are tracked in Redis: a sorted set of task
+# IDs scored by their last heartbeat, one per chat, and a hash per task. Stop
+# requests for them are published to the owner over pub/sub.
+REDIS_KEY_PREFIX = "open-webui:tasks"
+REDIS_STOP_CHANNEL = f"{REDIS_KEY_PREFIX}:stop"
+
+# Seconds after its last heartbeat a task is considered gone with its worker
+TASK_TTL = 3 * TASK_HEARTBEAT_INTERVAL
+
+# Seconds to wait for the owner of a remote task to confirm it stopped
+STOP_TIMEOUT = 5
+
+WORKER_ID = str(uuid4())
+
 # A dictionary to keep track of active tasks
 tasks: Dict[str, asyncio.Task] = {}
 chat_tasks = {}
+task_users: Dict[str, Optional[str]] = {}
+
+_redis = None
+_background: set[asyncio.Task] = set()
+_registry_tasks: list[asyncio.Task] = []
+
+
+def _run_in_background(coroutine):
+    # Keep a reference, the event loop only holds weak ones
+    task = asyncio.create_task(coroutine)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _register(task_id: str, id=None, user_id=None):
+    if not _redis:
+        return
+    try:
+        now = time.time()
+        async with _redis.pipeline(transaction=False) as pipe:
+            pipe.hset(
+                f"{REDIS_KEY_PREFIX}:{task_id}",
+                mapping={
+                    "worker_id": WORKER_ID,
+                    "chat_id": id or "",
+                    "user_id": user_id or "",
+                },
+            )
+            pipe.expire(f"{REDIS_KEY_PREFIX}:{task_id}", TASK_TTL)
+            pipe.zadd(REDIS_KEY_PREFIX, {task_id: now})
+            if id:
+                pipe.zadd(f"{REDIS_KEY_PREFIX}:chat:{id}", {task_id: now})
+                pipe.expire(f"{REDIS_KEY_PREFIX}:chat:{id}", TASK_TTL)
+            await pipe.execute()
+    except Exception as e:
+        log.debug(f"Failed to register task {task_id} in Redis: {e}")
+
+
+async def _unregister(task_id: str, id=None):
+    if not _redis:
+        return
+    try:
+        async with _redis.pipeline(transaction=False) as pipe:
+            pipe.delete(f"{REDIS_KEY_PREFIX}:{task_id}")
+            pipe.zrem(REDIS_KEY_PREFIX, task_id)
+            if id:
+                pipe.zrem(f"{REDIS_KEY_PREFIX}:chat:{id}", task_id)
+            await pipe.execute()
+    except Exception as e:
+        log.debug(f"Failed to unregister task {task_id} from Redis: {e}")
+
+
+async def _heartbeat():
+    while True:
+        await asyncio.sleep(TASK_HEARTBEAT_INTERVAL)
+        if not tasks:
+            continue
+        try:
+            now = time.time()
+            async with _redis.pipeline(transaction=False) as pipe:
+                pipe.zadd(REDIS_KEY_PREFIX, {task_id: now for task_id in tasks})
+                for task_id in tasks:
+                    pipe.expire(f"{REDIS_KEY_PREFIX}:{task_id}", TASK_TTL)
+                for id, task_ids in chat_tasks.items():
+                    if id and task_ids:
+                        key = f"{REDIS_KEY_PREFIX}:chat:{id}"
+                        pipe.zadd(key, {task_id: now for task_id in task_ids})
+                        pipe.expire(key, TASK_TTL)
+                await pipe.execute()
+        except Exception as e:
+            log.debug(f"Failed to send task heartbeats to Redis: {e}")
+
+
+async def _listen_for_stop_requests():
+    while True:
+        try:
+            async with _redis.pubsub() as pubsub:
+                await pubsub.subscribe(REDIS_STOP_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    task = tasks.get(message["data"])
+                    if task:
+                        log.info(f"Stopping task {message['data']} on request")
+                        task.cancel()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning(f"Lost the task stop channel, reconnecting: {e}")
+            await asyncio.sleep(TASK_HEARTBEAT_INTERVAL)
+
+
+async def _get_live_task_ids(key: str) -> list[str]:
+    if not _redis:
+        return []
+    try:
+        # Tasks of a worker that died stop getting heartbeats and age out
+        expired_before = time.time() - TASK_TTL
+        async with _redis.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(key, "-inf", expired_before)
+            pipe.zrangebyscore(key, expired_before, "+inf")
+            _, task_ids = await pipe.execute()
+        return task_ids
+    except Exception as e:
+        log.debug(f"Failed to list tasks from Redis: {e}")
+        return []
+
+
+def start_task_registry():
+    """
+    Share the tasks of this worker through Redis, so they can be listed and
+    stopped from any worker. Without Redis, tasks are local to the worker.
+    """
+    global _redis
+    if _redis or not REDIS_URL:
+        return
+
+    _redis = get_async_redis_connection(
+        REDIS_URL,
+        get_sentinels_from_env(REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT),
+    )
+    _registry_tasks.append(asyncio.create_task(_heartbeat()))
+    _registry_tasks.append(asyncio.create_task(_listen_for_stop_requests()))
+
+
+async def stop_task_registry():
+    global _redis
+    for task in _registry_tasks:
+        task.cancel()
+    await asyncio.gather(*_registry_tasks, *_background, return_exceptions=True)
+    _registry_tasks.clear()
+
+    if _redis:
+        await _redis.aclose()
+        _redis = None
 
 
 def cleanup_task(task_id: str, id=None):
@@ -13,6 +176,7 @@ def cleanup_task(task_id: str, id=None):
     Remove a completed or canceled task from the global `tasks` dictionary.
     """
     tasks.pop(task_id, None)  # Remove the task if it exists
+    task_users.pop(task_id, None)
 
     # If an ID is provided, remove the task from the chat_tasks dictionary
     if id and task_id in chat_tasks.get(id, []):
@@ -20,8 +184,10 @@ def cleanup_task(task_id: str, id=None):
         if not chat_tasks[id]:  # If no tasks left for this ID, remove the entry
             chat_tasks.pop(id, None)
 
+    _run_in_background(_unregister(task_id, id))
 
-def create_task(coroutine, id=None):
+
+def create_task(coroutine, id=None, user_id=None):
     """
     Create a new asyncio task and add it to the global task dictionary.
     """
@@ -31,6 +197,7 @@ def create_task(coroutine, id=None):
     # Add a done callback for cleanup
     task.add_done_callback(lambda t: cleanup_task(task_id, id))
     tasks[task_id] = task
+    task_users[task_id] = user_id
 
     # If an ID is provided, associate the task with that ID
     if chat_tasks.get(id):
@@ -38,6 +205,7 @@ def create_task(coroutine, id=None):
     else:
         chat_tasks[id] = [task_id]
 
+    _run_in_background(_register(task_id, id, user_id))
     return task_id, task
 
 
@@ -48,27 +216,56 @@ def get_task(task_id: str):
     return tasks.get(task_id)
 
 
-def list_tasks():
+async def get_task_user_id(task_id: str) -> Optional[str]:
     """
-    List all currently active task IDs.
+    ID of the user a task runs for, on this worker or another one.
     """
-    return list(tasks.keys())
+    if task_id in tasks:
+        return task_users.get(task_id)
+    if _redis:
+        try:
+            return await _redis.hget(f"{REDIS_KEY_PREFIX}:{task_id}", "user_id")
+        except Exception as e:
+            log.debug(f"Failed to read task {task_id} from Redis: {e}")
+    return None
 
 
-def list_task_ids_by_chat_id(id):
+async def list_tasks(user_id: Optional[str] = None):
     """
-    List all tasks associated with a specific ID.
+    List the IDs of the tasks active on any worker, optionally of one user only.
     """
-    return chat_tasks.get(id, [])
+    task_ids = list(
+        dict.fromkeys([*tasks, *await _get_live_task_ids(REDIS_KEY_PREFIX)])
+    )
+    if user_id is None:
+        return task_ids
+    return [
+        task_id for task_id in task_ids if await get_task_user_id(task_id) == user_id
+    ]
+
+
+async def list_task_ids_by_chat_id(id):
+    """
+    List all tasks associated with a specific ID, on any worker.
+    """
+    return list(
+        dict.fromkeys(
+            [
+                *chat_tasks.get(id, []),
+                *await _get_live_task_ids(f"{REDIS_KEY_PREFIX}:chat:{id}"),
+            ]
+        )
+    )
 
 
 async def stop_task(task_id: str):
     """
-    Cancel a running task and remove it from the global task list.
+    Cancel a running task and remove it from the global task list. Tasks of
+    other workers are asked to stop over Redis.
     """
     task = tasks.get(task_id)
     if not task:
-        raise ValueError(f"Task with ID {task_id} not found.")
+        return await stop_remote_task(task_id)
 
     task.cancel()  # Request task cancellation
     try:
@@ -79,3 +276,28 @@ async def stop_task(task_id: str):
         return {"status": True, "message": f"Task {task_id} successfully stopped."}
 
     return {"status": False, "message": f"Failed to stop task {task_id}."}
+
+
+async def stop_remote_task(task_id: str):
+    key = f"{REDIS_KEY_PREFIX}:{task_id}"
+    try:
+        if not _redis or not await _redis.exists(key):
+            raise ValueError(f"Task with ID {task_id} not found.")
+
+        await _redis.publish(REDIS_STOP_CHANNEL, task_id)
+
+        # The owner unregisters the task once it is cancelled
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+            if not await _redis.exists(key):
+                return {
+                    "status": True,
+                    "message": f"Task {task_id} successfully stopped.",
+                }
+    except ValueError:
+        raise
+    except Exception as e:
+        log.warning(f"Failed to stop task {task_id} through Redis: {e}")
+
+    return {"status": False, "message": f"Failed to stop task {task_id}."}
@@ -0,0 +1,115 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from open_webui.retrieval.models.batched import BatchedReranker, ScoreCache
+
+
+class Model:
+    """Scores a pair by the length of its passage, logging every call."""
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def predict(self, pairs):
+        with self.lock:
+            self.calls.append(list(pairs))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return [float(len(passage)) for _, passage in pairs]
+
+
+def get_pairs(query: str, n: int = 4):
+    return [(query, "x" * (i + 1)) for i in range(n)]
+
+
+def test_concurrent_requests_are_batched():
+    model = Model()
+    reranker = BatchedReranker(model, batch_window_ms=200, max_batch_size=1000)
+    queries = [f"query {i}" for i in range(8)]
+
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        results = list(
+            executor.map(lambda query: reranker.predict(get_pairs(query)), queries)
+        )
+    reranker.close()
+
+    # Every caller gets the scores of its own pairs back
+    assert [list(scores) for scores in results] == [[1.0, 2.0, 3.0, 4.0]] * 8
+    assert len(model.calls) < len(queries)
+    assert sum(len(call) for call in model.calls) == 8 * 4
+    assert reranker.stats["batches"] == len(model.calls)
+
+
+def test_max_batch_size():
+    model = Model()
+    reranker = BatchedReranker(model, batch_window_ms=200, max_batch_size=4)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda i: reranker.predict(get_pairs(f"q{i}")), range(4)))
+    reranker.close()
+
+    assert all(len(call) <= 4 for call in model.calls)
+
+
+def test_cached_scores_skip_the_model():
+    model = Model()
+    reranker = BatchedReranker(model, batching=False)
+
+    # Duplicate pairs are scored once
+    assert list(reranker.predict(get_pairs("q") * 2)) == [1.0, 2.0, 3.0, 4.0] * 2
+    assert model.calls == [get_pairs("q")]
+
+    scores = reranker.predict(get_pairs("q", 6))
+    assert list(scores) == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    assert model.calls[1] == get_pairs("q", 6)[4:]
+    assert reranker.stats["cache_hits"] == 4
+
+
+def test_failed_scores_are_not_cached():
+    class ExternalReranker:
+        def predict(self, pairs):
+            return None
+
+    reranker = BatchedReranker(ExternalReranker(), batching=False)
+
+    assert reranker.predict(get_pairs("q")) is None
+    assert len(reranker.cache) == 0
+
+
+def test_model_errors_reach_every_caller():
+    reranker = BatchedReranker(Model(fail=True), batch_window_ms=50)
+
+    with pytest.raises(RuntimeError):
+        reranker.predict(get_pairs("q"))
+    reranker.close()
+
+
+def test_close_stops_the_dispatcher():
+    model = Model()
+    reranker = BatchedReranker(model, batch_window_ms=1)
+    reranker.predict(get_pairs("q"))
+    dispatcher = reranker._dispatcher
+
+    reranker.close()
+    dispatcher.join(timeout=1)
+    assert not dispatcher.is_alive()
+
+    # Retrievals that still hold the old reranker score directly
+    assert list(reranker.predict(get_pairs("other"))) == [1.0, 2.0, 3.0, 4.0]
+    assert reranker._dispatcher is dispatcher
+
+
+def test_score_cache_evicts_least_recently_used():
+    cache = ScoreCache(2)
+    a, b, c = (ScoreCache.key("q", passage) for passage in "abc")
+
+    cache.set_many({a: 1.0, b: 2.0})
+    assert cache.get_many([a]) == [1.0]
+    cache.set_many({c: 3.0})
+
+    assert cache.get_many([a, b, c]) == [1.0, None, 3.0]
+    assert len(cache) == 2
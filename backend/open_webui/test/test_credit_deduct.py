@@ -0,0 +1,144 @@
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+from starlette.background import BackgroundTask, BackgroundTasks
+from starlette.responses import StreamingResponse
+
+from open_webui.models.users import UserModel
+from open_webui.utils import middleware
+from open_webui.utils.credit import usage
+from open_webui.utils.credit.usage import CreditDeduct
+from open_webui.utils.llm_scheduler import ModelQueue, Ticket
+from open_webui.utils.upstream_pool import Upstream, UpstreamAttempt
+
+USER = UserModel(
+    id="1",
+    name="John Doe",
+    email="john.doe@openwebui.com",
+    role="user",
+    profile_image_url="/user.png",
+    last_active_at=1627351200,
+    updated_at=1627351200,
+    created_at=1627351200,
+)
+
+METADATA = {
+    "user_id": USER.id,
+    "session_id": "session",
+    "chat_id": "chat",
+    "message_id": "message",
+}
+
+
+def get_line(data: dict) -> bytes:
+    return f"data: {json.dumps(data)}\n".encode()
+
+
+async def get_content(lines: list[bytes]):
+    for line in lines:
+        yield line
+
+
+def get_credit_deduct(monkeypatch, deductions: list) -> CreditDeduct:
+    monkeypatch.setattr(usage.Models, "get_model_by_id", lambda id: None)
+    monkeypatch.setattr(
+        CreditDeduct, "deduct", lambda self: deductions.append(self.usage)
+    )
+    return CreditDeduct(
+        user=USER,
+        model_id="gpt-4o",
+        body={"messages": [{"role": "user", "content": "Hello"}]},
+        is_stream=True,
+    )
+
+
+def get_response(credit_deduct: CreditDeduct, lines: list[bytes]):
+    # Built and wrapped like the OpenAI router does
+    response = StreamingResponse(
+        credit_deduct.passthrough(get_content(lines)),
+        media_type="text/event-stream",
+        background=BackgroundTasks([BackgroundTask(credit_deduct.settle)]),
+    )
+    response = UpstreamAttempt(Upstream("openai", "http://a")).track_response(response)
+    return Ticket(ModelQueue("openai:gpt-4o", concurrency=1)).release_after(response)
+
+
+def test_streamed_response_is_billed_once(monkeypatch):
+    deductions = []
+    credit_deduct = get_credit_deduct(monkeypatch, deductions)
+    lines = [
+        get_line({"id": "1", "choices": [{"delta": {"content": "Hi"}}], "usage": None}),
+        get_line(
+            {
+                "id": "1",
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": 5,
+                    "completion_tokens": 1,
+                    "total_tokens": 6,
+                },
+            }
+        ),
+        b"data: [DONE]\n",
+    ]
+    response = get_response(credit_deduct, lines)
+
+    emitter = MagicMock()
+    chats = MagicMock()
+    chats.get_messages_by_chat_id.return_value = {}
+    tasks = []
+
+    async def event_emitter(event):
+        emitter(event)
+
+    def create_task(coroutine, id=None, user_id=None):
+        tasks.append(asyncio.ensure_future(coroutine))
+        return id, tasks[-1]
+
+    monkeypatch.setattr(middleware, "Chats", chats)
+    monkeypatch.setattr(middleware, "get_event_emitter", lambda m: event_emitter)
+    monkeypatch.setattr(middleware, "get_event_call", lambda m: event_emitter)
+    monkeypatch.setattr(middleware, "get_sorted_filter_ids", lambda model: [])
+    monkeypatch.setattr(middleware, "get_active_status_by_user_id", lambda id: True)
+    monkeypatch.setattr(middleware, "create_task", create_task)
+
+    async def run():
+        await middleware.process_chat_response(
+            MagicMock(), response, {"model": "gpt-4o"}, USER, METADATA, {}, [], {}
+        )
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert len(deductions) == 1
+    assert deductions[0].total_tokens == 6
+
+
+def test_usage_is_counted_when_upstream_reports_none(monkeypatch):
+    deductions = []
+    # Words stand for tokens, tiktoken downloads its encodings
+    encoder = MagicMock()
+    encoder.encode = str.split
+    monkeypatch.setattr(usage.calculator, "get_encoder", lambda **kwargs: encoder)
+    credit_deduct = get_credit_deduct(monkeypatch, deductions)
+    lines = [
+        get_line({"id": "1", "choices": [{"delta": {"content": "Hello"}}]}),
+        get_line({"id": "1", "choices": [{"delta": {"content": " world"}}]}),
+        b"data: [DONE]\n",
+    ]
+
+    async def run():
+        chunks = [
+            chunk async for chunk in credit_deduct.passthrough(get_content(lines))
+        ]
+        # Nothing to report without upstream usage, the count waits for settle
+        assert chunks == lines
+        credit_deduct.settle()
+        credit_deduct.settle()
+
+    asyncio.run(run())
+
+    assert len(deductions) == 1
+    assert deductions[0].completion_tokens == 2
+    assert deductions[0].prompt_tokens == 1
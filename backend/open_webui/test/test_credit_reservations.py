@@ -0,0 +1,107 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+from open_webui.internal.db import Base, engine, get_db
+from open_webui.models.credits import (
+    Credit,
+    CreditLog,
+    CreditReservation,
+    CreditReservations,
+    Credits,
+    SetCreditForm,
+    SetCreditFormDetail,
+)
+
+
+@pytest.fixture
+def user_id():
+    Base.metadata.create_all(
+        bind=engine,
+        tables=[Credit.__table__, CreditLog.__table__, CreditReservation.__table__],
+    )
+    user_id = f"test-{uuid.uuid4()}"
+    Credits.set_credit_by_user_id(
+        SetCreditForm(
+            user_id=user_id, credit=Decimal("10"), detail=SetCreditFormDetail()
+        )
+    )
+    yield user_id
+    with get_db() as db:
+        for model in (Credit, CreditLog, CreditReservation):
+            db.query(model).filter_by(user_id=user_id).delete()
+        db.commit()
+
+
+def get_balance(user_id: str) -> Decimal:
+    return Credits.get_credit_by_user_id(user_id).credit
+
+
+def reserve(user_id: str, amount: str):
+    return CreditReservations.reserve_credit(
+        user_id, Decimal(amount), SetCreditFormDetail(desc="test")
+    )
+
+
+def test_reserve_takes_credit_off_the_balance(user_id):
+    reservation = reserve(user_id, "4")
+
+    assert reservation is not None
+    assert reservation.status == "reserved"
+    assert get_balance(user_id) == Decimal("6")
+
+
+def test_reserve_rejects_insufficient_credit(user_id):
+    assert reserve(user_id, "6") is not None
+    assert reserve(user_id, "6") is None
+
+    # The rejected reservation leaves no trace
+    assert get_balance(user_id) == Decimal("4")
+    with get_db() as db:
+        assert db.query(CreditReservation).filter_by(user_id=user_id).count() == 1
+
+
+def test_concurrent_reservations_never_overdraw(user_id):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        reservations = list(executor.map(lambda _: reserve(user_id, "3"), range(8)))
+
+    assert len([r for r in reservations if r is not None]) == 3
+    assert get_balance(user_id) == Decimal("1")
+
+
+def test_commit_happens_once(user_id):
+    reservation = reserve(user_id, "4")
+
+    assert CreditReservations.commit_reservation_by_id(reservation.id)
+    assert not CreditReservations.commit_reservation_by_id(reservation.id)
+    # A committed reservation can no longer be refunded
+    assert not CreditReservations.release_reservation_by_id(reservation.id)
+    assert get_balance(user_id) == Decimal("6")
+
+
+def test_release_refunds_once(user_id):
+    reservation = reserve(user_id, "4")
+
+    assert CreditReservations.release_reservation_by_id(reservation.id)
+    assert not CreditReservations.release_reservation_by_id(reservation.id)
+    assert not CreditReservations.commit_reservation_by_id(reservation.id)
+    assert get_balance(user_id) == Decimal("10")
+
+
+def test_expired_reservations(user_id):
+    reservation = reserve(user_id, "4")
+    with get_db() as db:
+        db.query(CreditReservation).filter_by(id=reservation.id).update(
+            {"expires_at": int(time.time()) - 1}
+        )
+        db.commit()
+
+    expired = CreditReservations.get_expired_reservations(limit=1000)
+    assert reservation.id in [r.id for r in expired]
+
+    assert CreditReservations.release_reservation_by_id(reservation.id)
+    expired = CreditReservations.get_expired_reservations(limit=1000)
+    assert reservation.id not in [r.id for r in expired]
@@ -0,0 +1,308 @@
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from open_webui.internal.db import Base, engine, get_db
+from open_webui.models.generation_jobs import (
+    GenerationJob,
+    GenerationJobForm,
+    GenerationJobModel,
+    GenerationJobs,
+)
+from open_webui.utils import generation
+from open_webui.utils.generation import (
+    GenerationProvider,
+    GenerationResult,
+    GenerationTaskEngine,
+    is_retryable_error,
+)
+
+
+def get_status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://upstream/submit")
+    return httpx.HTTPStatusError(
+        "error", request=request, response=httpx.Response(status_code, request=request)
+    )
+
+
+class Provider(GenerationProvider):
+    name = "test"
+
+    async def submit(self, app, job):
+        return GenerationResult(external_id="upstream")
+
+    async def poll(self, app, job):
+        return GenerationResult(progress=job.progress)
+
+
+def get_job(**kwargs) -> GenerationJobModel:
+    now = int(time.time())
+    return GenerationJobModel(
+        **{
+            "id": "job",
+            "provider": "test",
+            "task_id": "task",
+            "user_id": "user",
+            "status": "running",
+            "stage": "poll",
+            "available_at": now,
+            "created_at": now,
+            "updated_at": now,
+            **kwargs,
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "error, retryable",
+    [
+        (get_status_error(429), True),
+        (get_status_error(503), True),
+        # The upstream may have accepted the task behind a failing gateway
+        (get_status_error(502), False),
+        (get_status_error(504), False),
+        (get_status_error(500), False),
+        (httpx.ConnectError("refused"), True),
+        (httpx.ReadTimeout("timeout"), False),
+    ],
+)
+def test_submit_is_retried_only_if_it_never_started_the_task(error, retryable):
+    assert is_retryable_error(error, "submit") == retryable
+
+
+def test_poll_is_retried_on_gateway_errors():
+    assert is_retryable_error(get_status_error(502), "poll")
+    assert is_retryable_error(httpx.ReadTimeout("timeout"), "poll")
+
+
+def test_poll_sweep_survives_a_failing_job():
+    task_engine = GenerationTaskEngine()
+    expired = [
+        get_job(id=f"expired-{i}", deadline_at=int(time.time()) - 1) for i in range(2)
+    ]
+    due = [get_job(id="due")]
+    applied = []
+
+    async def apply_result(provider, job, result):
+        applied.append(job.id)
+        if job.id == "expired-0":
+            raise RuntimeError("database is locked")
+
+    class BatchProvider(Provider):
+        async def poll_many(self, app, jobs):
+            return {job.id: GenerationResult(progress=50) for job in jobs}
+
+    task_engine._apply_result = apply_result
+    asyncio.run(task_engine._poll_jobs(BatchProvider(), expired + due))
+
+    assert applied == ["expired-0", "expired-1", "due"]
+
+
+LEASE_SECONDS = 60
+
+
+@pytest.fixture
+def provider():
+    Base.metadata.create_all(bind=engine, tables=[GenerationJob.__table__])
+    provider = f"test-{uuid.uuid4()}"
+    yield provider
+    with get_db() as db:
+        db.query(GenerationJob).filter_by(provider=provider).delete()
+        db.commit()
+
+
+def expire_lease(id: str):
+    with get_db() as db:
+        db.query(GenerationJob).filter_by(id=id).update(
+            {"lease_expires_at": int(time.time()) - 1}
+        )
+        db.commit()
+
+
+def reap_expired_jobs() -> list[str]:
+    failed = [job.id for job in GenerationJobs.fail_expired_jobs()]
+    GenerationJobs.requeue_expired_jobs()
+    return failed
+
+
+def start_polling(provider: str, max_attempts: int = 3) -> GenerationJobModel:
+    job = GenerationJobs.insert_new_job(
+        "user",
+        GenerationJobForm(provider=provider, task_id="task", max_attempts=max_attempts),
+    )
+    assert GenerationJobs.claim_next_job("worker-a", LEASE_SECONDS, {}).id == job.id
+    GenerationJobs.release_job_by_id(
+        job.id, "worker-a", 0, {"stage": "poll", "external_id": "upstream"}
+    )
+    polled = GenerationJobs.claim_due_poll_jobs(provider, "worker-a", LEASE_SECONDS, 10)
+    assert [job.id for job in polled] == [job.id]
+    return job
+
+
+def test_expired_submit_lease_fails_the_job(provider):
+    job = GenerationJobs.insert_new_job(
+        "user", GenerationJobForm(provider=provider, task_id="task", max_attempts=3)
+    )
+    claimed = GenerationJobs.claim_next_job("worker-a", LEASE_SECONDS, {})
+    assert claimed.id == job.id
+    assert claimed.status == "running"
+
+    expire_lease(job.id)
+    # The upstream may have accepted the task already: never submit it twice
+    assert job.id in reap_expired_jobs()
+
+    job = GenerationJobs.get_job_by_id(job.id)
+    assert job.status == "failed"
+    assert job.worker_id is None
+    # The worker that lost the lease can no longer renew or finish the job
+    assert not GenerationJobs.renew_lease(job.id, "worker-a", LEASE_SECONDS)
+    assert GenerationJobs.finish_job_by_id(job.id, "completed", "worker-a") is None
+
+
+def test_expired_poll_lease_resumes_polling(provider):
+    job = start_polling(provider)
+
+    expire_lease(job.id)
+    assert job.id not in reap_expired_jobs()
+
+    # Polled again, never submitted a second time
+    job = GenerationJobs.get_job_by_id(job.id)
+    assert job.status == "queued"
+    assert job.stage == "poll"
+    assert job.attempts == 1
+    polled = GenerationJobs.claim_due_poll_jobs(provider, "worker-b", LEASE_SECONDS, 10)
+    assert [job.id for job in polled] == [job.id]
+
+
+def test_expired_lease_counts_as_an_attempt(provider):
+    job = start_polling(provider, max_attempts=2)
+
+    expire_lease(job.id)
+    assert job.id not in reap_expired_jobs()
+    polled = GenerationJobs.claim_due_poll_jobs(provider, "worker-b", LEASE_SECONDS, 10)
+    assert [job.id for job in polled] == [job.id]
+
+    # A job that keeps killing its worker is not requeued forever
+    expire_lease(job.id)
+    assert job.id in reap_expired_jobs()
+    assert GenerationJobs.get_job_by_id(job.id).status == "failed"
+
+
+def test_live_lease_is_not_reaped(provider):
+    job = GenerationJobs.insert_new_job(
+        "user", GenerationJobForm(provider=provider, task_id="task")
+    )
+    assert GenerationJobs.claim_next_job("worker-a", LEASE_SECONDS, {}).id == job.id
+    assert GenerationJobs.renew_lease(job.id, "worker-a", LEASE_SECONDS)
+
+    assert job.id not in reap_expired_jobs()
+    assert GenerationJobs.get_job_by_id(job.id).status == "running"
+
+
+def test_failed_jobs_are_refunded(monkeypatch):
+    settled = []
+
+    class FailingProvider(Provider):
+        def on_failed(self, job, error):
+            settled.append(("on_failed", error))
+
+    async def emit_generation_event(job):
+        settled.append(("event", job.status))
+
+    monkeypatch.setitem(generation.GENERATION_PROVIDERS, "test", FailingProvider())
+    monkeypatch.setattr(
+        generation,
+        "refund_generation_job",
+        lambda job, reason: settled.append(("refund", reason)),
+    )
+    monkeypatch.setattr(generation, "emit_generation_event", emit_generation_event)
+
+    job = get_job(provider="test", status="failed", error="任务提交中断，请重新提交")
+    asyncio.run(GenerationTaskEngine()._settle_failed_job(job))
+
+    assert settled == [
+        ("on_failed", "任务提交中断，请重新提交"),
+        ("refund", "task_failed"),
+        ("event", "failed"),
+    ]
+
+
+JIMENG_TASK = {
+    "task_id": "4596668244738",
+    "status": "SUCCESS",
+    "finish_time": 1748192421,
+    "data": {"data": {"video": "https://video.example.com/video.mp4"}},
+}
+
+
+def test_jimeng_submit_sends_the_callback_url(monkeypatch):
+    from open_webui.routers import jimeng
+
+    sent = {}
+
+    class Client:
+        async def post(self, url, headers=None, json=None):
+            sent.update(json)
+            return httpx.Response(
+                200, json={"code": "success", "data": "4596668244738"}
+            )
+
+    task = SimpleNamespace(request_params='{"prompt": "cat"}')
+    monkeypatch.setattr(jimeng.JimengTasks, "get_task_by_id", lambda id: task)
+    monkeypatch.setattr(jimeng.JimengTasks, "update_task_by_id", lambda *args: None)
+    monkeypatch.setattr(jimeng, "get_http_client", lambda name: Client())
+    provider = generation.GENERATION_PROVIDERS["jimeng"]
+    monkeypatch.setattr(
+        provider, "get_credentials", lambda app: ("http://jimeng", "key")
+    )
+
+    app = SimpleNamespace(
+        state=SimpleNamespace(
+            config=SimpleNamespace(WEBUI_URL="https://chat.example.com")
+        )
+    )
+    job = get_job(provider="jimeng", stage="submit")
+    result = asyncio.run(provider.submit(app, job))
+
+    assert result.external_id == "4596668244738"
+    assert sent["prompt"] == "cat"
+    assert sent["notify_hook"] == generation.get_callback_url(app, job)
+    assert sent["notify_hook"].startswith(
+        "https://chat.example.com/api/v1/generation/callback/jimeng/job?signature="
+    )
+
+
+@pytest.mark.parametrize(
+    "payload", [JIMENG_TASK, {"code": "success", "message": "", "data": JIMENG_TASK}]
+)
+def test_jimeng_callback(monkeypatch, payload):
+    from open_webui.routers import jimeng
+
+    updates = []
+    monkeypatch.setattr(
+        jimeng.JimengTasks,
+        "update_task_by_id",
+        lambda task_id, update: updates.append(update),
+    )
+    provider = generation.GENERATION_PROVIDERS["jimeng"]
+    job = get_job(provider="jimeng", external_id="4596668244738")
+
+    assert provider.get_callback_external_id(payload) == job.external_id
+    result = provider.apply_callback(job, payload)
+
+    assert result.status == "completed"
+    assert updates[0]["video_url"] == "https://video.example.com/video.mp4"
+
+
+def test_providers_must_implement_submit_and_poll():
+    class SubmitOnly(GenerationProvider):
+        async def submit(self, app, job):
+            return GenerationResult(status="completed")
+
+    with pytest.raises(TypeError):
+        SubmitOnly()
+    assert Provider().name == "test"
@@ -0,0 +1,98 @@
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from open_webui.internal.db import Base, engine, get_db
+from open_webui.models.ingestion_jobs import (
+    IngestionJob,
+    IngestionJobForm,
+    IngestionJobs,
+)
+from open_webui.utils.ingestion import get_ingestion_priority
+
+LEASE_SECONDS = 60
+
+
+@pytest.fixture
+def user_id():
+    Base.metadata.create_all(bind=engine, tables=[IngestionJob.__table__])
+    user_id = f"test-{uuid.uuid4()}"
+    yield user_id
+    with get_db() as db:
+        db.query(IngestionJob).filter_by(user_id=user_id).delete()
+        db.commit()
+
+
+def enqueue(user_id: str, max_attempts: int):
+    return IngestionJobs.insert_new_job(
+        user_id,
+        IngestionJobForm(
+            kind="file",
+            payload={"file_id": "file"},
+            # Ahead of anything else in the queue
+            priority=1_000_000,
+            max_attempts=max_attempts,
+        ),
+    )
+
+
+def expire_lease(id: str):
+    with get_db() as db:
+        db.query(IngestionJob).filter_by(id=id).update(
+            {"lease_expires_at": int(time.time()) - 1}
+        )
+        db.commit()
+
+
+def test_expired_lease_is_requeued(user_id):
+    job = enqueue(user_id, max_attempts=2)
+    claimed = IngestionJobs.claim_next_job("worker-a", LEASE_SECONDS, 10)
+    assert claimed.id == job.id
+    assert claimed.status == "running"
+    assert claimed.attempts == 1
+
+    expire_lease(job.id)
+    assert IngestionJobs.requeue_expired_jobs() >= 1
+
+    job = IngestionJobs.get_job_by_id(job.id)
+    assert job.status == "queued"
+    # The worker that lost the lease can no longer touch the job
+    assert not IngestionJobs.renew_lease(job.id, "worker-a", LEASE_SECONDS)
+    IngestionJobs.fail_job_by_id(job.id, "worker-a", "late failure")
+    assert IngestionJobs.get_job_by_id(job.id).status == "queued"
+
+    claimed = IngestionJobs.claim_next_job("worker-b", LEASE_SECONDS, 10)
+    assert claimed.id == job.id
+    assert claimed.attempts == 2
+
+
+def test_expired_lease_without_attempts_left_fails(user_id):
+    job = enqueue(user_id, max_attempts=1)
+    assert IngestionJobs.claim_next_job("worker-a", LEASE_SECONDS, 10).id == job.id
+
+    expire_lease(job.id)
+    IngestionJobs.requeue_expired_jobs()
+
+    job = IngestionJobs.get_job_by_id(job.id)
+    assert job.status == "failed"
+    assert job.error == "Ingestion worker lost the job lease"
+
+
+def test_live_lease_is_not_reaped(user_id):
+    job = enqueue(user_id, max_attempts=2)
+    assert IngestionJobs.claim_next_job("worker-a", LEASE_SECONDS, 10).id == job.id
+    assert IngestionJobs.renew_lease(job.id, "worker-a", LEASE_SECONDS)
+
+    IngestionJobs.requeue_expired_jobs()
+    assert IngestionJobs.get_job_by_id(job.id).status == "running"
+
+
+@pytest.mark.parametrize(
+    "role, priority, expected",
+    [("admin", 10, 10), ("user", 10, 0), ("user", -5, -5), ("user", 0, 0)],
+)
+def test_only_admins_raise_ingestion_priority(role, priority, expected):
+    user = SimpleNamespace(role=role)
+    assert get_ingestion_priority(user, priority) == expected
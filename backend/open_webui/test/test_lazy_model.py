@@ -0,0 +1,51 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from open_webui.retrieval.models.lazy import LazyModel
+
+
+def test_loads_once():
+    calls = []
+    barrier = threading.Barrier(4)
+
+    def load():
+        calls.append(1)
+        return SimpleNamespace(encode=lambda text: text.upper())
+
+    model = LazyModel("model", load)
+    assert not model.loaded
+
+    def use():
+        barrier.wait()
+        return model.encode("hi")
+
+    threads = [threading.Thread(target=use) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.loaded
+    assert model.encode("hi") == "HI"
+    assert len(calls) == 1
+
+
+def test_failed_load_is_remembered():
+    calls = []
+
+    def load():
+        calls.append(1)
+        raise OSError("model not found")
+
+    model = LazyModel("missing", load)
+    model.warm_up()
+
+    for _ in range(3):
+        with pytest.raises(Exception, match="model not found"):
+            model.encode("hi")
+
+    assert model.failed
+    assert not model.loaded
+    assert len(calls) == 1
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from open_webui.utils.llm_scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_TOOLS,
+    LLMScheduler,
+    ModelQueue,
+)
+
+
+async def admission_order(queue: ModelQueue, requests: list[tuple[str, str]]):
+    """
+    Queue `requests` of (priority, user_id) behind a held slot, then free it
+    and return the order the requests were admitted in.
+    """
+    await queue.acquire(PRIORITY_INTERACTIVE, "holder", timeout=1)
+
+    admitted = []
+
+    async def request(priority, user_id, name):
+        await queue.acquire(priority, user_id, timeout=1)
+        admitted.append(name)
+        queue.release()
+
+    tasks = []
+    for i, (priority, user_id) in enumerate(requests):
+        tasks.append(asyncio.create_task(request(priority, user_id, i)))
+        # Let the request reach the queue before the next one
+        await asyncio.sleep(0)
+
+    assert queue.depth() == len(requests)
+    queue.release()
+    await asyncio.gather(*tasks)
+    return [requests[i] for i in admitted]
+
+
+def test_priority_order():
+    queue = ModelQueue("test", concurrency=1)
+    requests = [
+        (PRIORITY_BACKGROUND, "user"),
+        (PRIORITY_TOOLS, "user"),
+        (PRIORITY_INTERACTIVE, "user"),
+        (PRIORITY_BACKGROUND, "other"),
+        (PRIORITY_INTERACTIVE, "other"),
+    ]
+
+    order = asyncio.run(admission_order(queue, requests))
+
+    assert [priority for priority, _ in order] == [
+        PRIORITY_INTERACTIVE,
+        PRIORITY_INTERACTIVE,
+        PRIORITY_TOOLS,
+        PRIORITY_BACKGROUND,
+        PRIORITY_BACKGROUND,
+    ]
+    assert queue.in_flight == 0
+
+
+def test_round_robin_across_users():
+    queue = ModelQueue("test", concurrency=1)
+    # A burst from one user, queued before anyone else
+    requests = [(PRIORITY_INTERACTIVE, "busy")] * 3 + [
+        (PRIORITY_INTERACTIVE, "a"),
+        (PRIORITY_INTERACTIVE, "b"),
+    ]
+
+    order = asyncio.run(admission_order(queue, requests))
+
+    assert [user_id for _, user_id in order] == ["busy", "a", "b", "busy", "busy"]
+
+
+def test_timeout_is_rejected_with_429():
+    async def run():
+        queue = ModelQueue("test", concurrency=1)
+        await queue.acquire(PRIORITY_INTERACTIVE, "holder", timeout=1)
+
+        with pytest.raises(HTTPException) as e:
+            await queue.acquire(PRIORITY_INTERACTIVE, "user", timeout=0.05)
+        assert e.value.status_code == 429
+
+        # The timed out request does not take the slot once it frees up
+        queue.release()
+        assert queue.in_flight == 0
+        return queue
+
+    queue = asyncio.run(run())
+    assert queue.rejected == 1
+
+
+def test_rate_limit_admits_when_tokens_refill():
+    async def run():
+        queue = ModelQueue("test", rate=20, burst=1)
+        await queue.acquire(PRIORITY_INTERACTIVE, "user", timeout=1)
+        queue.release()
+        # Out of tokens, admitted once the bucket refills in about 50ms
+        await queue.acquire(PRIORITY_INTERACTIVE, "user", timeout=1)
+        queue.release()
+        return queue
+
+    queue = asyncio.run(run())
+    assert queue.admitted[PRIORITY_INTERACTIVE] == 2
+    assert queue.rejected == 0
+
+
+def test_unlimited_models_are_not_queued():
+    async def run():
+        scheduler = LLMScheduler(limits={"limited": {"concurrency": 1}})
+        ticket = await scheduler.acquire({"id": "free", "owned_by": "openai"})
+        assert ticket.queue is None
+
+        ticket = await scheduler.acquire({"id": "limited", "owned_by": "openai"})
+        assert ticket.queue.in_flight == 1
+        ticket.release()
+        ticket.release()
+        assert ticket.queue.in_flight == 0
+
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+import asyncio
+
+from open_webui.socket import utils
+from open_webui.socket.utils import MessageEventBuffer
+
+
+class Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        await asyncio.sleep(0.01)
+        self.redis.executed.append(self.commands)
+
+
+class Redis:
+    def __init__(self):
+        self.executed = []
+
+    def pipeline(self, transaction=True):
+        return Pipeline(self)
+
+
+def get_snapshot(content: str) -> dict:
+    return {"type": "chat:completion", "data": {"content": content}}
+
+
+def test_redis_mirror_is_coalesced_off_the_emit_path(monkeypatch):
+    monkeypatch.setattr(utils, "REDIS_FLUSH_INTERVAL", 0.05)
+    redis = Redis()
+    buffer = MessageEventBuffer(100, 60, redis=redis)
+
+    async def run():
+        content = ""
+        for token in "one two three four".split():
+            content += token
+            await buffer.append("message", "user", "chat", get_snapshot(content))
+        # Emitting never waited on Redis
+        assert redis.executed == []
+
+        await asyncio.sleep(0.1)
+        content += " five"
+        await buffer.append("message", "user", "chat", get_snapshot(content))
+        await buffer.append(
+            "message",
+            "user",
+            "chat",
+            {"type": "chat:completion", "data": {"content": content, "done": True}},
+        )
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+
+    first, second = redis.executed
+    # Only the latest snapshot of the window is written
+    assert [args for name, args, _ in first if name == "xadd"] == [
+        (
+            "open-webui:message-events:message",
+            {
+                "data": '{"type": "chat:completion", "data": {"content": "onetwothreefour"}}'
+            },
+        )
+    ]
+    assert [kwargs["id"] for name, _, kwargs in first if name == "xadd"] == ["4-0"]
+    assert [kwargs["id"] for name, _, kwargs in second if name == "xadd"] == [
+        "5-0",
+        "6-0",
+    ]
+    assert ("xdel", ("open-webui:message-events:message", "4-0"), {}) in second
+
+    result = asyncio.run(buffer.get("message"))
+    assert [event["seq"] for event in result["events"]] == [5, 6]
+    assert result["done"]
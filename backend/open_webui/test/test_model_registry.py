@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from open_webui.utils.model_registry import ModelRegistry
+
+MODELS = [{"id": "a"}, {"id": "b"}]
+
+
+def get_registry(loader, on_update=None):
+    registry = ModelRegistry(refresh_interval=300, sync_interval=60)
+    registry.register("openai", loader, on_update)
+    return registry
+
+
+def test_filtering_does_not_change_the_snapshot():
+    async def loader(request):
+        return {"data": list(MODELS)}
+
+    async def run():
+        registry = get_registry(loader)
+        app = SimpleNamespace()
+
+        # What the /models endpoints do for regular users
+        models = await registry.get(app, "openai")
+        models["data"] = [models["data"][0]]
+        models = await registry.get(app, "openai")
+        models["data"].pop()
+
+        return await registry.get(app, "openai")
+
+    assert asyncio.run(run()) == {"data": MODELS}
+
+
+def test_cold_start_fetches_once():
+    calls = []
+
+    async def loader(request):
+        calls.append(request.app)
+        await asyncio.sleep(0.01)
+        return {"data": list(MODELS)}
+
+    async def run():
+        registry = get_registry(loader)
+        app = SimpleNamespace()
+        return app, await asyncio.gather(
+            *[registry.get(app, "openai") for _ in range(5)]
+        )
+
+    app, results = asyncio.run(run())
+
+    assert calls == [app]
+    assert all(models == {"data": MODELS} for models in results)
+
+
+def test_failed_refresh_keeps_the_last_snapshot():
+    responses = [{"data": list(MODELS)}, RuntimeError("upstream down")]
+    updates = []
+
+    async def loader(request):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def run():
+        registry = get_registry(loader, lambda app, models: updates.append(models))
+        app = SimpleNamespace()
+        await registry.refresh(app, "openai")
+        return await registry.refresh(app, "openai")
+
+    assert asyncio.run(run()) == {"data": MODELS}
+    assert len(updates) == 1
+
+
+def test_failed_first_fetch_raises():
+    async def loader(request):
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(get_registry(loader).get(SimpleNamespace(), "openai"))
@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from open_webui.retrieval.vector.dbs.pgvector import (
+    PgvectorClient,
+    get_filter_values,
+    get_metadata_filter,
+)
+
+
+def test_filter_values_match_numbers_and_numeric_strings():
+    assert get_filter_values(1) == [1, "1"]
+    assert get_filter_values("1") == ["1", 1]
+    assert get_filter_values("a.pdf") == ["a.pdf"]
+    assert get_filter_values(True) == [True]
+    assert get_filter_values("true") == ["true"]
+
+
+def test_metadata_filter_uses_containment():
+    compiled = get_metadata_filter({"file_id": "abc", "page": 1}).compile(
+        dialect=postgresql.dialect()
+    )
+    assert str(compiled).count("@>") == 3
+    assert sorted(compiled.params.values(), key=str) == [
+        {"file_id": "abc"},
+        {"page": "1"},
+        {"page": 1},
+    ]
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        'idx_document_chunk_vector"; DROP TABLE document_chunk; --',
+        "idx_document_chunk_vector; DROP TABLE document_chunk",
+        "idx_document_chunk_collection_name",
+        "idx_document_chunk_vmetadata",
+    ],
+)
+def test_drop_index_rejects_unmanaged_names(name):
+    client = PgvectorClient.__new__(PgvectorClient)
+    with pytest.raises(ValueError):
+        client.drop_index(name)
@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+
+from open_webui.models.ppt_config import PptConfigModel
+from open_webui.routers import ppt
+
+
+class Client:
+    def __init__(self):
+        self.calls = []
+
+    async def get(self, url, headers=None, **kwargs):
+        self.calls.append((url, headers["Api-Key"]))
+        return SimpleNamespace(
+            status_code=200, json=lambda: {"url": url, "key": headers["Api-Key"]}
+        )
+
+
+def test_cache_is_keyed_by_upstream(monkeypatch):
+    client = Client()
+    config = PptConfigModel(enabled=True, api_url="http://old", api_key="old")
+    monkeypatch.setattr(ppt, "get_http_client", lambda name: client)
+    monkeypatch.setattr(ppt, "get_current_ppt_config", lambda: config)
+    ppt.ppt_response_cache.invalidate()
+
+    async def run():
+        first = await ppt.get_template_options(user=None)
+        assert await ppt.get_template_options(user=None) == first
+
+        # Changed by another worker, this one never invalidated its cache
+        config.api_url, config.api_key = "http://new", "new"
+        return first, await ppt.get_template_options(user=None)
+
+    first, second = asyncio.run(run())
+
+    assert first["key"] == "old"
+    assert second == {"url": "http://new/api/ppt/template/options", "key": "new"}
+    assert len(client.calls) == 2
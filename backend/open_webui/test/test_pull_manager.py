@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+from open_webui.utils.pull_manager import PullManager
+
+URL = "http://ollama-a:11434"
+OTHER_URL = "http://ollama-b:11434"
+PAYLOAD = {"name": "llama3"}
+
+
+class Upstream:
+    """A pull stream whose progress lines are fed in by the test."""
+
+    def __init__(self, error: Exception = None):
+        self.queue = asyncio.Queue()
+        self.error = error
+        self.starts = 0
+
+    async def start(self):
+        self.starts += 1
+        # Let identical requests arrive while the pull is starting
+        await asyncio.sleep(0)
+        if self.error:
+            raise self.error
+        return self.chunks()
+
+    async def chunks(self):
+        while (chunk := await self.queue.get()) is not None:
+            yield chunk
+
+
+def get_chunk(completed: int) -> dict:
+    return {"status": "pulling", "completed": completed, "total": 3}
+
+
+def test_identical_pulls_share_one_stream():
+    async def run():
+        manager = PullManager()
+        upstream = Upstream()
+        first, second = await asyncio.gather(
+            *[
+                manager.stream(URL, "pull", "llama3", PAYLOAD, upstream.start)
+                for _ in range(2)
+            ]
+        )
+
+        upstream.queue.put_nowait(get_chunk(1))
+        assert await anext(first) == get_chunk(1)
+        assert await anext(second) == get_chunk(1)
+        upstream.queue.put_nowait(get_chunk(2))
+        assert await anext(first) == get_chunk(2)
+        assert await anext(second) == get_chunk(2)
+
+        # A late subscriber starts from the latest progress line
+        late = await manager.stream(URL, "pull", "llama3", PAYLOAD, upstream.start)
+        assert await anext(late) == get_chunk(2)
+
+        upstream.queue.put_nowait(get_chunk(3))
+        upstream.queue.put_nowait(None)
+        for subscriber in (first, second, late):
+            assert [chunk async for chunk in subscriber] == [get_chunk(3)]
+
+        assert upstream.starts == 1
+        assert manager.deduplicated == 2
+
+    asyncio.run(run())
+
+
+def test_different_connections_are_not_shared():
+    async def run():
+        manager = PullManager()
+        upstream = Upstream()
+        for url in (URL, OTHER_URL):
+            await manager.stream(url, "pull", "llama3", PAYLOAD, upstream.start)
+        return upstream.starts, manager.deduplicated
+
+    assert asyncio.run(run()) == (2, 0)
+
+
+def test_start_error_reaches_every_caller():
+    async def run():
+        manager = PullManager()
+        upstream = Upstream(error=ConnectionError("ollama down"))
+        results = await asyncio.gather(
+            *[
+                manager.stream(URL, "pull", "llama3", PAYLOAD, upstream.start)
+                for _ in range(2)
+            ],
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert not manager.is_pulling(URL, "llama3")
+
+        # The failed job is forgotten: a retry starts a new pull
+        with pytest.raises(ConnectionError):
+            await manager.stream(URL, "pull", "llama3", PAYLOAD, upstream.start)
+        return upstream.starts
+
+    assert asyncio.run(run()) == 2
+
+
+def test_routing_avoids_connections_that_are_pulling():
+    async def run():
+        manager = PullManager()
+        upstream = Upstream()
+        subscriber = await manager.stream(
+            URL, "pull", "llama3", PAYLOAD, upstream.start
+        )
+
+        assert manager.is_pulling(URL, "llama3:latest")
+        assert not manager.is_pulling(OTHER_URL, "llama3")
+        assert not manager.is_pulling(URL, "qwen2")
+        assert manager.exclude_pulling([URL, OTHER_URL], [0, 1], "llama3") == [1]
+        # Better a connection that is pulling than none at all
+        assert manager.exclude_pulling([URL, OTHER_URL], [0], "llama3") == [0]
+
+        upstream.queue.put_nowait(None)
+        assert [chunk async for chunk in subscriber] == []
+        assert not manager.is_pulling(URL, "llama3")
+
+    asyncio.run(run())
+
+
+def test_pull_finishes_after_subscribers_leave():
+    refreshes = []
+
+    async def on_done():
+        refreshes.append(True)
+
+    async def run():
+        manager = PullManager()
+        upstream = Upstream()
+        subscriber = await manager.stream(
+            URL, "pull", "llama3", PAYLOAD, upstream.start, on_done
+        )
+        job = next(iter(manager._jobs.values()))
+
+        upstream.queue.put_nowait(get_chunk(1))
+        assert await anext(subscriber) == get_chunk(1)
+        # The client disconnects mid-pull
+        await subscriber.aclose()
+        assert not job.subscribers
+
+        upstream.queue.put_nowait(get_chunk(2))
+        upstream.queue.put_nowait(None)
+        await job.task
+
+        assert job.last == get_chunk(2)
+        assert manager.get_stats()["jobs"] == []
+
+    asyncio.run(run())
+    assert refreshes == [True]
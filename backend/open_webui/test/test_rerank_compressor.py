@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document
+
+from open_webui.retrieval.utils import RerankCompressor
+
+
+def get_compressor(scores, r_score=0.0):
+    return RerankCompressor(
+        embedding_function=None,
+        top_n=2,
+        reranking_function=SimpleNamespace(predict=lambda pairs: scores),
+        r_score=r_score,
+    )
+
+
+def get_documents():
+    return [Document(page_content=text, metadata={}) for text in ("a", "b", "c")]
+
+
+def test_top_n_by_score():
+    compressor = get_compressor([0.1, 0.9, 0.5], r_score=0.2)
+
+    results = compressor.compress_documents(get_documents(), "query")
+
+    assert [doc.page_content for doc in results] == ["b", "c"]
+    assert [doc.metadata["score"] for doc in results] == [0.9, 0.5]
+
+
+@pytest.mark.parametrize("r_score", [0.0, 0.5])
+def test_failed_reranking_raises(r_score):
+    compressor = get_compressor(None, r_score=r_score)
+
+    # Instead of returning NaN scores, so hybrid search falls back
+    with pytest.raises(ValueError):
+        compressor.compress_documents(get_documents(), "query")
@@ -0,0 +1,60 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from open_webui.retrieval import executor
+from open_webui.retrieval.executor import RETRIEVAL_METRICS, run_with_deadline
+
+
+@pytest.fixture
+def single_slot(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1 * executor.STRAGGLER_HEADROOM)
+    monkeypatch.setattr(executor, "_executor", pool)
+    monkeypatch.setattr(executor, "_slots", threading.BoundedSemaphore(1))
+    RETRIEVAL_METRICS.reset()
+    yield
+    pool.shutdown(wait=False)
+
+
+def test_results_keep_their_order(single_slot):
+    results = run_with_deadline(lambda x: x * 2, [(1,), (2,), (3,)], timeout=5)
+
+    assert results == [2, 4, 6]
+    metrics = RETRIEVAL_METRICS.snapshot()
+    assert metrics["collection"]["count"] == 3
+    assert metrics["collection_queue"]["count"] == 3
+
+
+def test_slow_task_misses_the_deadline(single_slot):
+    stalled = threading.Event()
+
+    def query(x):
+        if x == "slow":
+            stalled.wait(5)
+        return x
+
+    start = time.monotonic()
+    results = run_with_deadline(query, [("slow",), ("fast",)], timeout=0.2)
+
+    assert time.monotonic() - start < 1
+    # The fast query waited for the only slot, behind the stalled one
+    assert results == [None, None]
+    assert RETRIEVAL_METRICS.snapshot()["collection"]["timeouts"] == 2
+    stalled.set()
+
+
+def test_stalled_query_frees_its_slot(single_slot):
+    stalled = threading.Event()
+
+    def query(x):
+        if x == "slow":
+            stalled.wait(5)
+        return x
+
+    assert run_with_deadline(query, [("slow",)], timeout=0.1) == [None]
+
+    # The stalled thread is still running, but no longer holds the slot
+    assert run_with_deadline(query, [("fast",)], timeout=1) == ["fast"]
+    stalled.set()
@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Seconds a worker may take to import the app, generous so slow CI runners pass
+IMPORT_BUDGET = float(os.environ.get("STARTUP_IMPORT_BUDGET", "20"))
+
+# Only imported once a feature that needs them is used
+LAZY_MODULES = [
+    "transformers",
+    "sentence_transformers",
+    "langchain.retrievers",
+    "fpdf",
+    "black",
+]
+if sys.platform != "darwin":
+    # Imported on macOS to probe for MPS
+    LAZY_MODULES.append("torch")
+
+SCRIPT = """
+import json, sys
+import open_webui.main
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def import_app(tmp_path) -> tuple[float, set[str]]:
+    env = {
+        **os.environ,
+        "DATA_DIR": str(tmp_path),
+        "RAG_EMBEDDING_ENGINE": "",
+        "REDIS_URL": "",
+    }
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+    return elapsed, set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def test_startup_skips_heavy_modules(tmp_path):
+    elapsed, modules = import_app(tmp_path)
+
+    loaded = [name for name in LAZY_MODULES if name in modules]
+    assert not loaded, f"Imported at startup: {loaded}"
+    assert elapsed < IMPORT_BUDGET, f"Importing the app took {elapsed:.1f}s"
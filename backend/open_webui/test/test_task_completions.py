@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+from open_webui.routers import tasks
+
+PAYLOAD = {
+    "model": "task-model",
+    "messages": [{"role": "user", "content": "Title this chat"}],
+    "metadata": {"task": "title_generation"},
+}
+
+
+def get_request():
+    return SimpleNamespace(state=SimpleNamespace())
+
+
+def get_user(id: str):
+    return SimpleNamespace(id=id)
+
+
+def test_task_completions_are_not_shared_across_users(monkeypatch):
+    calls = []
+
+    async def generate_chat_completion(request, form_data, user, priority):
+        calls.append(user.id)
+        return {"choices": [{"message": {"content": f"title of {user.id}"}}]}
+
+    monkeypatch.setattr(tasks, "generate_chat_completion", generate_chat_completion)
+    monkeypatch.setattr(tasks, "task_completions", tasks.StaleWhileRevalidateCache(60))
+
+    async def run():
+        return [
+            await tasks.generate_task_completion(get_request(), PAYLOAD, get_user(id))
+            for id in ("a", "b", "a")
+        ]
+
+    responses = asyncio.run(run())
+
+    assert calls == ["a", "b"]
+    assert [r["choices"][0]["message"]["content"] for r in responses] == [
+        "title of a",
+        "title of b",
+        "title of a",
+    ]
+
+
+def test_sessions_of_a_user_do_not_supersede_each_other(monkeypatch):
+    async def generate_chat_completion(request, form_data, user, priority):
+        await asyncio.sleep(0.05)
+        return {"choices": [{"message": {"content": form_data["messages"][0]}}]}
+
+    monkeypatch.setattr(tasks, "generate_chat_completion", generate_chat_completion)
+    monkeypatch.setattr(tasks, "task_completions", tasks.StaleWhileRevalidateCache(60))
+
+    def get_payload(content):
+        return {**PAYLOAD, "messages": [{"role": "user", "content": content}]}
+
+    async def run():
+        user = get_user("a")
+        return await asyncio.gather(
+            tasks.generate_task_completion(
+                get_request(), get_payload("one"), user, session_id="tab-1"
+            ),
+            tasks.generate_task_completion(
+                get_request(), get_payload("two"), user, session_id="tab-2"
+            ),
+            tasks.generate_task_completion(
+                get_request(), get_payload("three"), user, session_id="tab-2"
+            ),
+        )
+
+    first, superseded, latest = asyncio.run(run())
+
+    assert isinstance(first, dict)
+    assert superseded.status_code == 409
+    assert isinstance(latest, dict)
@@ -0,0 +1,210 @@
+import asyncio
+import time
+
+import pytest
+
+from open_webui import tasks
+
+
+class Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+class PubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.redis.subscribers.remove(self.queue)
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.append(self.queue)
+
+    async def listen(self):
+        while True:
+            yield {"type": "message", "data": await self.queue.get()}
+
+
+class Redis:
+    """In-memory stand-in for the commands the task registry uses."""
+
+    def __init__(self):
+        self.hashes: dict[str, dict] = {}
+        self.zsets: dict[str, dict] = {}
+        self.subscribers: list[asyncio.Queue] = []
+
+    def pipeline(self, transaction=True):
+        return Pipeline(self)
+
+    def pubsub(self):
+        return PubSub(self)
+
+    async def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    async def expire(self, key, ttl):
+        pass
+
+    async def delete(self, key):
+        self.hashes.pop(key, None)
+
+    async def exists(self, key):
+        return int(key in self.hashes)
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    async def zremrangebyscore(self, key, min, max):
+        zset = self.zsets.get(key, {})
+        for member, score in list(zset.items()):
+            if float(min) <= score <= float(max):
+                del zset[member]
+
+    async def zrangebyscore(self, key, min, max):
+        zset = self.zsets.get(key, {})
+        return [
+            member
+            for member, score in sorted(zset.items(), key=lambda item: item[1])
+            if float(min) <= score <= float(max)
+        ]
+
+    async def publish(self, channel, message):
+        for queue in self.subscribers:
+            queue.put_nowait(message)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = Redis()
+    monkeypatch.setattr(tasks, "_redis", redis)
+    monkeypatch.setattr(tasks, "tasks", {})
+    monkeypatch.setattr(tasks, "chat_tasks", {})
+    monkeypatch.setattr(tasks, "task_users", {})
+    monkeypatch.setattr(tasks, "STOP_TIMEOUT", 1)
+    return redis
+
+
+async def settle():
+    # Let the background (un)registrations reach Redis
+    await asyncio.gather(*tasks._background)
+
+
+def add_remote_task(redis: Redis, task_id: str, chat_id: str, user_id: str, at=None):
+    at = time.time() if at is None else at
+    redis.hashes[f"{tasks.REDIS_KEY_PREFIX}:{task_id}"] = {
+        "worker_id": "other-worker",
+        "chat_id": chat_id,
+        "user_id": user_id,
+    }
+    redis.zsets.setdefault(tasks.REDIS_KEY_PREFIX, {})[task_id] = at
+    redis.zsets.setdefault(f"{tasks.REDIS_KEY_PREFIX}:chat:{chat_id}", {})[task_id] = at
+
+
+def test_tasks_are_listed_across_workers(redis):
+    async def run():
+        task_id, task = tasks.create_task(asyncio.sleep(10), id="chat", user_id="a")
+        await settle()
+        add_remote_task(redis, "remote", "chat", "b")
+
+        assert await tasks.list_tasks() == [task_id, "remote"]
+        assert await tasks.list_tasks(user_id="b") == ["remote"]
+        assert await tasks.list_task_ids_by_chat_id("chat") == [task_id, "remote"]
+        assert await tasks.get_task_user_id("remote") == "b"
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await settle()
+        # Unregistered once done
+        assert await tasks.list_tasks() == ["remote"]
+
+    asyncio.run(run())
+
+
+def test_tasks_of_dead_workers_age_out(redis):
+    async def run():
+        add_remote_task(redis, "dead", "chat", "b", at=time.time() - tasks.TASK_TTL - 1)
+        add_remote_task(redis, "alive", "chat", "b")
+
+        assert await tasks.list_tasks() == ["alive"]
+        assert await tasks.list_task_ids_by_chat_id("chat") == ["alive"]
+
+    asyncio.run(run())
+
+
+def test_stop_request_reaches_the_owner(redis):
+    async def run():
+        listener = asyncio.create_task(tasks._listen_for_stop_requests())
+        task_id, task = tasks.create_task(asyncio.sleep(10), id="chat", user_id="a")
+        await settle()
+        await asyncio.sleep(0)
+
+        # What another worker does: publish, then wait for the owner to
+        # cancel and unregister the task
+        result = await tasks.stop_remote_task(task_id)
+
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        return result, task
+
+    result, task = asyncio.run(run())
+
+    assert result["status"] is True
+    assert task.cancelled()
+
+
+def test_unanswered_stop_request(redis):
+    async def run():
+        # Registered, but its worker never answers
+        add_remote_task(redis, "remote", "chat", "b")
+        return await tasks.stop_remote_task("remote")
+
+    assert asyncio.run(run())["status"] is False
+
+
+def test_unknown_task(redis):
+    with pytest.raises(ValueError):
+        asyncio.run(tasks.stop_task("missing"))
+
+
+def test_local_tasks_without_redis(monkeypatch):
+    monkeypatch.setattr(tasks, "_redis", None)
+    monkeypatch.setattr(tasks, "tasks", {})
+    monkeypatch.setattr(tasks, "chat_tasks", {})
+    monkeypatch.setattr(tasks, "task_users", {})
+
+    async def run():
+        task_id, task = tasks.create_task(asyncio.sleep(10), id="chat", user_id="a")
+        assert await tasks.list_tasks(user_id="a") == [task_id]
+        assert (await tasks.stop_task(task_id))["status"] is True
+        with pytest.raises(ValueError):
+            await tasks.stop_task("missing")
+
+    asyncio.run(run())
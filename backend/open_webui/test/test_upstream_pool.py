@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from fastapi import HTTPException
+
+from open_webui.utils.upstream_pool import UpstreamPool, UpstreamUnavailableError
+
+URLS = ["http://a", "http://b", "http://c"]
+
+
+class Response:
+    def __init__(self, status: int):
+        self.status = status
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def send_with(outcomes: dict):
+    """A `send` callback answering each url with its outcome, logging the calls."""
+    calls = []
+
+    async def send(idx, attempt):
+        calls.append(URLS[idx])
+        outcome = outcomes[URLS[idx]]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Response(outcome)
+
+    return send, calls
+
+
+def test_fails_over_on_connection_error():
+    pool = UpstreamPool(max_attempts=3)
+    send, calls = send_with(
+        {
+            "http://a": aiohttp.ClientConnectionError("refused"),
+            "http://b": 200,
+        }
+    )
+
+    # Make the failing replica the preferred one
+    pool.get_upstream("openai", "http://b").in_flight = 10
+    result, attempt = asyncio.run(pool.send("openai", URLS[:2], [0, 1], send))
+
+    assert result.status == 200
+    assert attempt.upstream.url == "http://b"
+    assert calls == ["http://a", "http://b"]
+    assert pool.retries == 1
+    assert pool.get_upstream("openai", "http://a").errors == 1
+
+
+def test_fails_over_on_5xx_response():
+    pool = UpstreamPool(max_attempts=2)
+    responses = {"http://a": Response(503), "http://b": Response(200)}
+
+    async def send(idx, attempt):
+        return responses[URLS[idx]]
+
+    # Make the failing replica the preferred one
+    pool.get_upstream("openai", "http://b").in_flight = 10
+    result, attempt = asyncio.run(pool.send("openai", URLS[:2], [0, 1], send))
+
+    assert result is responses["http://b"]
+    assert responses["http://a"].closed
+    assert pool.retries == 1
+
+
+def test_retry_cap():
+    pool = UpstreamPool(max_attempts=2)
+    send, calls = send_with(
+        {url: aiohttp.ClientConnectionError("refused") for url in URLS}
+    )
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        asyncio.run(pool.send("openai", URLS, [0, 1, 2], send))
+
+    assert len(calls) == 2
+    assert len(set(calls)) == 2
+    assert pool.retries == 1
+
+
+def test_last_failing_response_is_returned():
+    pool = UpstreamPool(max_attempts=2)
+    send, calls = send_with({url: 502 for url in URLS})
+
+    result, attempt = asyncio.run(pool.send("openai", URLS, [0, 1, 2], send))
+
+    # Once the attempts are used up the caller gets the upstream error as is
+    assert result.status == 502
+    assert not result.closed
+    assert len(calls) == 2
+
+
+def test_client_errors_are_not_retried():
+    pool = UpstreamPool(max_attempts=3)
+    send, calls = send_with(
+        {url: HTTPException(status_code=400, detail="bad") for url in URLS}
+    )
+
+    with pytest.raises(HTTPException):
+        asyncio.run(pool.send("openai", URLS, [0, 1, 2], send))
+
+    assert len(calls) == 1
+    assert pool.retries == 0
+
+
+def test_open_circuits_are_skipped():
+    pool = UpstreamPool(max_attempts=3)
+    pool.get_upstream("openai", "http://a").breaker.opened_at = time.monotonic()
+    send, calls = send_with({"http://a": 200, "http://b": 200})
+
+    result, attempt = asyncio.run(pool.send("openai", URLS[:2], [0, 1], send))
+
+    assert calls == ["http://b"]
+
+
+def test_unavailable_when_every_circuit_is_open():
+    pool = UpstreamPool(max_attempts=3)
+    for url in URLS[:2]:
+        pool.get_upstream("openai", url).breaker.opened_at = time.monotonic()
+    send, calls = send_with({})
+
+    with pytest.raises(UpstreamUnavailableError) as e:
+        asyncio.run(pool.send("openai", URLS[:2], [0, 1], send))
+
+    assert e.value.status_code == 503
+    assert calls == []
+    assert pool.rejected == 1
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class StaleWhileRevalidateCache:
+    """
+    In-process cache for slow upstream lookups. Entries younger than `ttl`
+    are served as is. Older ones are still served for up to `stale_ttl`
+    while a single background refresh runs. Concurrent misses for the same
+    key share one load. Failed loads are never cached, and a failed refresh
+    keeps the stale value.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0, max_size: int = 1024):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        self._loads: dict[Hashable, asyncio.Future] = {}
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.stale_ttl:
+                if key not in self._loads:
+                    self._start_load(key, loader).add_done_callback(
+                        lambda f: f.cancelled() or f.exception()
+                    )
+                return value
+
+        future = self._loads.get(key) or self._start_load(key, loader)
+        return await asyncio.shield(future)
+
+    def _start_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> asyncio.Future:
+        async def load():
+            try:
+                value = await loader()
+                self.set(key, value)
+                return value
+            except Exception as e:
+                log.debug(f"Cache load failed for {key}: {e}")
+                raise
+            finally:
+                self._loads.pop(key, None)
+
+        future = asyncio.ensure_future(load())
+        self._loads[key] = future
+        return future
+
+    def set(self, key: Hashable, value: Any):
+        if key not in self._entries and len(self._entries) >= self.max_size:
+            # Drop the oldest entry
+            oldest = min(self._entries, key=lambda k: self._entries[k][0])
+            del self._entries[oldest]
+        self._entries[key] = (time.monotonic(), value)
+
+    def cancel(self, key: Hashable):
+        """Cancel the in-flight load of `key`, failing everyone waiting on it."""
+        future = self._loads.get(key)
+        if future is not None:
+            future.cancel()
+
+    def invalidate(self, key: Hashable = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
@@ -41,6 +41,7 @@ from open_webui.models.functions import Functions
 from open_webui.models.models import Models
 from open_webui.utils.credit.usage import CreditDeduct
 from open_webui.utils.credit.utils import check_credit_by_user_id
+from open_webui.utils.llm_scheduler import PRIORITY_INTERACTIVE, llm_scheduler
 
 from open_webui.utils.plugin import load_function_module_by_id
 from open_webui.utils.models import get_all_models, check_model_access
@@ -161,6 +162,7 @@ async def generate_chat_completion(
     form_data: dict,
     user: Any,
     bypass_filter: bool = False,
+    priority: str = PRIORITY_INTERACTIVE,
 ):
     check_credit_by_user_id(user_id=user.id, form_data=form_data)
 
@@ -234,7 +236,7 @@ async def generate_chat_completion(
                         yield chunk
 
                 response = await generate_chat_completion(
-                    request, form_data, user, bypass_filter=True
+                    request, form_data, user, bypass_filter=True, priority=priority
                 )
                 return StreamingResponse(
                     stream_wrapper(response.body_iterator),
@@ -245,53 +247,79 @@ async def generate_chat_completion(
                 return {
                     **(
                         await generate_chat_completion(
-                            request, form_data, user, bypass_filter=True
+                            request,
+                            form_data,
+                            user,
+                            bypass_filter=True,
+                            priority=priority,
                         )
                     ),
                     "selected_model_id": selected_model_id,
                 }
 
-        if model.get("pipe"):
-            # Below does not require bypass_filter because this is the only route the uses this function and it is already bypassing the filter
-            return await generate_function_chat_completion(
-                request, form_data, user=user, models=models
+        # Wait for a slot of the model, streams hold it until they are over
+        ticket = await llm_scheduler.acquire(model, priority=priority, user_id=user.id)
+        try:
+            response = await send_chat_completion(
+                request, form_data, user, model, models, bypass_filter
             )
-        if model.get("owned_by") == "ollama":
-            # Using /ollama/api/chat endpoint
-            payload = copy.deepcopy(form_data)
-            form_data = convert_payload_openai_to_ollama(form_data)
-            response = await generate_ollama_chat_completion(
-                request=request,
-                form_data=form_data,
-                user=user,
-                bypass_filter=bypass_filter,
+        except BaseException:
+            ticket.release()
+            raise
+        return ticket.release_after(response)
+
+
+async def send_chat_completion(
+    request: Request,
+    form_data: dict,
+    user: Any,
+    model: dict,
+    models: dict,
+    bypass_filter: bool = False,
+):
+    model_id = form_data["model"]
+
+    if model.get("pipe"):
+        # Below does not require bypass_filter because this is the only route the uses this function and it is already bypassing the filter
+        return await generate_function_chat_completion(
+            request, form_data, user=user, models=models
+        )
+    if model.get("owned_by") == "ollama":
+        # Using /ollama/api/chat endpoint
+        payload = copy.deepcopy(form_data)
+        form_data = convert_payload_openai_to_ollama(form_data)
+        response = await generate_ollama_chat_completion(
+            request=request,
+            form_data=form_data,
+            user=user,
+            bypass_filter=bypass_filter,
+        )
+        if form_data.get("stream"):
+            response.headers["content-type"] = "text/event-stream"
+            return StreamingResponse(
+                convert_streaming_response_ollama_to_openai(
+                    user, model_id, payload, response
+                ),
+                headers=dict(response.headers),
+                background=response.background,
             )
-            if form_data.get("stream"):
-                response.headers["content-type"] = "text/event-stream"
-                return StreamingResponse(
-                    convert_streaming_response_ollama_to_openai(
-                        user, model_id, payload, response
-                    ),
-                    headers=dict(response.headers),
-                    background=response.background,
-                )
-            else:
-                with CreditDeduct(
-                    user=user,
-                    model_id=model_id,
-                    body=payload,
-                    is_stream=False,
-                ) as credit_deduct:
-                    response = convert_response_ollama_to_openai(response)
-                    credit_deduct.run(response)
-                    return credit_deduct.add_usage_to_resp(response)
         else:
-            return await generate_openai_chat_completion(
-                request=request,
-                form_data=form_data,
+            with CreditDeduct(
                 user=user,
-                bypass_filter=bypass_filter,
-            )
+                model_id=model_id,
+                body=payload,
+                is_stream=False,
+            ) as credit_deduct:
+                response = convert_response_ollama_to_openai(response)
+                credit_deduct.run(response)
+                return credit_deduct.add_usage_to_resp(response)
+    else:
+        return await generate_openai_chat_completion(
+            request=request,
+            form_data=form_data,
+            user=user,
+            bypass_filter=bypass_filter,
+        )
 
 
 chat_completion = generate_chat_completion
@@ -29,6 +29,12 @@ class CompletionUsage(BaseModel):
     def format_input(cls, data: dict) -> dict:
         if not isinstance(data, dict):
             return data
+        # Anthropic input tokens do not include the cached ones
+        is_uncached_input = (
+            "input_tokens" in data
+            and not data.get("prompt_tokens")
+            and not data.get("promptTokenCount")
+        )
         # standard tokens
         prompt_tokens = (
             data.pop("prompt_tokens", 0)
@@ -40,6 +46,23 @@ class CompletionUsage(BaseModel):
             or data.pop("candidatesTokenCount", 0)
             or data.pop("output_tokens", 0)
         )
+        # cached prompt tokens
+        cached_tokens = (
+            data.get("prompt_cache_hit_tokens", 0)  # DeepSeek
+            or data.get("cache_read_input_tokens", 0)  # Anthropic
+            or data.get("cachedContentTokenCount", 0)  # Gemini
+        )
+        if is_uncached_input:
+            prompt_tokens += (data.get("cache_read_input_tokens") or 0) + (
+                data.get("cache_creation_input_tokens") or 0
+            )
+        prompt_tokens_details = data.get("prompt_tokens_details") or {}
+        if cached_tokens and isinstance(prompt_tokens_details, dict):
+            if not prompt_tokens_details.get("cached_tokens"):
+                data["prompt_tokens_details"] = {
+                    **prompt_tokens_details,
+                    "cached_tokens": cached_tokens,
+                }
         total_tokens = (
             data.pop("total_tokens", 0)
             or data.pop("totalTokenCount", 0)
@@ -1,8 +1,9 @@
 import json
 import logging
+import re
 import time
 from decimal import Decimal
-from typing import List, Union
+from typing import AsyncIterator, List, Union
 
 import tiktoken
 from fastapi import HTTPException
@@ -33,6 +34,8 @@ from open_webui.utils.credit.utils import (
 logger = logging.getLogger(__name__)
 logger.setLevel(SRC_LOG_LEVELS["MAIN"])
 
+USAGE_NULL_PATTERN = re.compile(rb'"usage"\s*:\s*null')
+
 
 class Calculator:
     """
@@ -142,6 +145,9 @@ class CreditDeduct:
 
     with CreditDeduct(xxx) as credit_deduct:
         credit_deduct.run(xxx)
+
+    Passthrough streams only `tap` the lines they forward, and call `settle`
+    once the stream is over, usually from a background task.
     """
 
     def __init__(
@@ -164,6 +170,7 @@ class CreditDeduct:
             self.prompt_unit_price,
             self.completion_unit_price,
             self.request_unit_price,
+            self.cached_prompt_unit_price,
             _,
         ) = get_model_price(model=self.model)
         self.features = {
@@ -174,11 +181,88 @@ class CreditDeduct:
             if v
         }
         self.is_official_usage = False
+        self._lines: List[bytes] = []
+        self._usage_line = None
+        self._collected = False
+        self._settled = False
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self.deduct()
+
+    def tap(self, line: bytes) -> None:
+        """Keep a forwarded stream line, without parsing it."""
+        # Upstreams asked for usage send `"usage": null` on every other chunk
+        if b'"usage"' in line and not USAGE_NULL_PATTERN.search(line):
+            self._usage_line = line
+        # Only the content deltas matter to the token count fallback
+        if b'"content"' in line:
+            self._lines.append(line)
+
+    async def passthrough(self, content: AsyncIterator[bytes]) -> AsyncIterator:
+        """Forward the lines of a stream as is, then the usage it reported."""
+        async for line in content:
+            self.tap(line)
+            yield line
+
+        # Counting the tokens of upstreams that reported no usage is left to
+        # `settle`, so it does not hold up the end of the stream
+        if self.collect_usage():
+            yield self.usage_message
+
+    def collect_usage(self) -> bool:
+        """Parse the chunk carrying the upstream usage, if any was tapped."""
+        if self._usage_line is not None and not self.is_official_usage:
+            self.run(self._usage_line)
+        return self.is_official_usage
+
+    def collect(self) -> None:
+        """
+        Compute the usage of the tapped lines: the upstream usage, or else the
+        tokens of the prompt and of the concatenated content deltas.
+        """
+        if self._collected:
+            return
+        self._collected = True
+
+        if not self.collect_usage():
+            self.usage = CompletionUsage(
+                prompt_tokens=0, completion_tokens=0, total_tokens=0
+            )
+            contents = []
+            for line in self._lines:
+                try:
+                    chunk = self.clean_response(
+                        response=line,
+                        default_response={
+                            "choices": [{"delta": {"content": self.to_str(line)}}],
+                        },
+                    )
+                    self.remote_id = chunk.get("id") or self.remote_id
+                    choices = chunk.get("choices") or [{}]
+                    contents.append(choices[0].get("delta", {}).get("content") or "")
+                except Exception as e:
+                    logger.debug("[credit_deduct] skipped stream line: %s", e)
+            # One chunk, so the completion is encoded at once
+            self.run(
+                {
+                    "id": self.remote_id,
+                    "choices": [{"delta": {"content": "".join(contents)}}],
+                }
+            )
+        self._lines = []
+
+    def settle(self) -> None:
+        """Collect and deduct, once however often the stream's background runs."""
+        if self._settled:
+            return
+        self._settled = True
+        self.collect()
+        self.deduct()
+
+    def deduct(self) -> None:
         from open_webui.models.groups import Groups
         from open_webui.models.subscription import SubscriptionCredits
 
@@ -284,6 +368,9 @@ class CreditDeduct:
                             - remaining_cost,
                             "regular_credits_used": remaining_cost,
                             "prompt_unit_price": float(self.prompt_unit_price),
+                            "cached_prompt_unit_price": float(
+                                self.cached_prompt_unit_price
+                            ),
                             "completion_unit_price": float(self.completion_unit_price),
                             "request_unit_price": float(self.request_unit_price),
                             "feature_price": float(self.feature_price),
@@ -307,20 +394,36 @@ class CreditDeduct:
                 )
             )
         logger.info(
-            "[credit_deduct] user: %s; actual_payer: %s; group: %s; tokens: %d %d; cost: %s; subscription_used: %d; regular_used: %d",
+            "[credit_deduct] user: %s; actual_payer: %s; group: %s; tokens: %d %d; cached_tokens: %d; cost: %s; subscription_used: %d; regular_used: %d",
             self.user.id,
             user_id_to_deduct,
             selected_group.name if selected_group else "None",
             self.usage.prompt_tokens,
             self.usage.completion_tokens,
+            self.cached_prompt_tokens,
             self.total_price,
             int(self.total_price) - remaining_cost,
             remaining_cost,
         )
 
+    @property
+    def cached_prompt_tokens(self) -> int:
+        details = self.usage.prompt_tokens_details
+        cached_tokens = (details.cached_tokens or 0) if details else 0
+        return min(cached_tokens, self.usage.prompt_tokens)
+
     @property
     def prompt_price(self) -> Decimal:
-        return self.prompt_unit_price * self.usage.prompt_tokens / 1000 / 1000
+        # cached prompt tokens are billed at their own price
+        return (
+            (
+                self.prompt_unit_price
+                * (self.usage.prompt_tokens - self.cached_prompt_tokens)
+                + self.cached_prompt_unit_price * self.cached_prompt_tokens
+            )
+            / 1000
+            / 1000
+        )
 
     @property
     def completion_price(self) -> Decimal:
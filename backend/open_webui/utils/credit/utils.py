@@ -25,13 +25,19 @@ from open_webui.models.models import Models, ModelModel
 
 def get_model_price(
     model: Optional[ModelModel] = None,
-) -> (Decimal, Decimal, Decimal, Decimal):
+) -> (Decimal, Decimal, Decimal, Decimal, Decimal):
+    """
+    Prompt, completion, request and cached prompt prices of a model, and the
+    minimum credit it requires. Cached prompt tokens cost the prompt price
+    unless the model has a price of its own for them.
+    """
     # no model provide
     if not model or not isinstance(model, ModelModel):
         return (
             Decimal(USAGE_CALCULATE_DEFAULT_TOKEN_PRICE.value),
             Decimal(USAGE_CALCULATE_DEFAULT_TOKEN_PRICE.value),
             Decimal(USAGE_CALCULATE_DEFAULT_REQUEST_PRICE.value),
+            Decimal(USAGE_CALCULATE_DEFAULT_TOKEN_PRICE.value),
             Decimal(0),
         )
     # base model
@@ -41,10 +47,12 @@ def get_model_price(
             return get_model_price(base_model)
     # model price
     model_price = model.price or {}
+    prompt_price = Decimal(
+        model_price.get("prompt_price", USAGE_CALCULATE_DEFAULT_TOKEN_PRICE.value)
+    )
+    cached_prompt_price = model_price.get("cached_prompt_price")
     return (
-        Decimal(
-            model_price.get("prompt_price", USAGE_CALCULATE_DEFAULT_TOKEN_PRICE.value)
-        ),
+        prompt_price,
         Decimal(
             model_price.get(
                 "completion_price", USAGE_CALCULATE_DEFAULT_TOKEN_PRICE.value
@@ -55,6 +63,11 @@ def get_model_price(
                 "request_price", USAGE_CALCULATE_DEFAULT_REQUEST_PRICE.value
             )
         ),
+        (
+            Decimal(cached_prompt_price)
+            if cached_prompt_price is not None
+            else prompt_price
+        ),
         Decimal(model_price.get("minimum_credit", 0)),
     )
 
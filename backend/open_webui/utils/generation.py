@@ -0,0 +1,743 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import os
+import socket
+import time
+import uuid
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import Optional
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from open_webui.env import (
+    SRC_LOG_LEVELS,
+    WEBUI_SECRET_KEY,
+    GENERATION_WORKER_CONCURRENCY,
+    GENERATION_JOB_LEASE_SECONDS,
+    GENERATION_JOB_MAX_ATTEMPTS,
+    GENERATION_PROVIDER_CONCURRENCY,
+    GENERATION_POLL_BATCH_SIZE,
+)
+from open_webui.models.credits import (
+    Credits,
+    CreditReservations,
+    CreditReservationModel,
+    AddCreditForm,
+    SetCreditFormDetail,
+)
+from open_webui.models.generation_jobs import (
+    GenerationJobs,
+    GenerationJobForm,
+    GenerationJobModel,
+)
+from open_webui.socket.main import emit_to_user
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+# How long an idle worker waits before polling the queue again. Jobs enqueued
+# on this process wake the workers up immediately.
+IDLE_POLL_INTERVAL = 1
+
+# How often the poller looks for tasks due for a status poll
+POLLER_TICK_INTERVAL = 1
+
+
+class GenerationProviderError(Exception):
+    """
+    Raised by providers for errors reported by the upstream API. Only errors
+    marked `retryable` are retried, everything else fails the task.
+    """
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class GenerationResult(BaseModel):
+    # pending, completed, failed
+    status: str = "pending"
+    external_id: Optional[str] = None
+    progress: Optional[int] = None
+    error: Optional[str] = None
+
+
+class GenerationProvider(ABC):
+    """
+    A media generation backend driven by the engine. Providers are registered
+    by the routers that own them (routers/midjourney.py, kling.py, jimeng.py,
+    seedream.py) and update their own task table from submit/poll.
+    """
+
+    name: str = ""
+    title: str = ""
+
+    # Tasks in flight upstream at once, overridable per provider with
+    # GENERATION_PROVIDER_CONCURRENCY
+    max_concurrency: int = 10
+    # Seconds between two polls of the same task, adapted to its progress
+    # within [min_poll_interval, max_poll_interval]
+    poll_interval: int = 5
+    min_poll_interval: int = 2
+    max_poll_interval: int = 30
+    # Seconds after which a task that is still running is given up
+    timeout: int = 600
+    # Set for providers that push status changes to a callback URL: polling
+    # only starts once no callback arrived for this many seconds
+    callback_timeout: Optional[int] = None
+
+    @abstractmethod
+    async def submit(self, app, job: GenerationJobModel) -> GenerationResult:
+        """Start the task upstream, or run it for synchronous APIs."""
+        pass
+
+    @abstractmethod
+    async def poll(self, app, job: GenerationJobModel) -> GenerationResult:
+        """Fetch the status of a submitted task."""
+        pass
+
+    async def poll_many(
+        self, app, jobs: list[GenerationJobModel]
+    ) -> dict[str, GenerationResult | Exception]:
+        """
+        Poll the status of several tasks, keyed by job id. Providers with a
+        batch query endpoint override this; by default tasks are polled one
+        by one over the shared client.
+        """
+        results = await asyncio.gather(
+            *[self.poll(app, job) for job in jobs], return_exceptions=True
+        )
+        return {job.id: result for job, result in zip(jobs, results)}
+
+    def get_poll_interval(self, job: GenerationJobModel, progress: int) -> int:
+        """
+        Estimate when the task is worth polling again. While the task reports
+        progress, poll at half the estimated remaining time; otherwise back
+        off from `poll_interval` the longer it stays queued upstream.
+        """
+        started_at = job.deadline_at - self.timeout if job.deadline_at else None
+        elapsed = time.time() - started_at if started_at else 0
+
+        if progress > job.progress and 0 < progress < 100 and elapsed > 0:
+            interval = elapsed * (100 - progress) / progress / 2
+        else:
+            interval = self.poll_interval * 1.5 ** min(job.poll_count, 6)
+
+        return int(min(max(interval, self.min_poll_interval), self.max_poll_interval))
+
+    def get_callback_external_id(self, payload: dict) -> Optional[str]:
+        """Upstream task id a callback payload refers to."""
+        return None
+
+    def apply_callback(
+        self, job: GenerationJobModel, payload: dict
+    ) -> GenerationResult:
+        """
+        Apply a callback payload to the provider's task, like a poll result.
+        Only called for providers with a `callback_timeout`.
+        """
+        raise NotImplementedError
+
+    def on_failed(self, job: GenerationJobModel, error: str):
+        """Mark the provider's task as failed."""
+        pass
+
+    def on_cancelled(self, job: GenerationJobModel):
+        pass
+
+    def get_task_data(self, task_id: str) -> Optional[dict]:
+        """Task as returned by the provider's status endpoint, pushed to the user."""
+        return None
+
+
+GENERATION_PROVIDERS: dict[str, GenerationProvider] = {}
+
+
+def register_generation_provider(cls):
+    GENERATION_PROVIDERS[cls.name] = cls()
+    return cls
+
+
+def is_retryable_error(e: Exception, stage: str) -> bool:
+    if isinstance(e, GenerationProviderError):
+        return e.retryable
+
+    if stage == "submit":
+        # Only retry a submit that surely never reached the upstream API,
+        # anything else could start (and bill) the same task twice. A gateway
+        # 502/504 may come after the upstream accepted the task.
+        if isinstance(e, httpx.HTTPStatusError):
+            return e.response.status_code in (429, 503)
+        return isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in (429, 502, 503, 504) or (
+            stage == "poll" and e.response.status_code >= 500
+        )
+
+    return isinstance(e, (httpx.TransportError, asyncio.TimeoutError))
+
+
+def get_provider_caps() -> dict[str, int]:
+    caps = {}
+    for name, provider in GENERATION_PROVIDERS.items():
+        try:
+            caps[name] = int(
+                GENERATION_PROVIDER_CONCURRENCY.get(name, provider.max_concurrency)
+            )
+        except (TypeError, ValueError):
+            caps[name] = provider.max_concurrency
+    return caps
+
+
+def get_callback_signature(provider: str, job_id: str) -> str:
+    return hmac.new(
+        WEBUI_SECRET_KEY.encode(), f"{provider}:{job_id}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def verify_callback_signature(provider: str, job_id: str, signature: str) -> bool:
+    return hmac.compare_digest(get_callback_signature(provider, job_id), signature)
+
+
+def is_public_url(url: Optional[str]) -> bool:
+    # Upstream APIs only call back domain names, never localhost or bare IPs
+    host = urlparse(url).hostname if url else None
+    if not host or host == "localhost":
+        return False
+    try:
+        ipaddress.ip_address(host)
+        return False
+    except ValueError:
+        return True
+
+
+def get_callback_url(app, job: GenerationJobModel) -> Optional[str]:
+    """
+    Signed callback URL handed to the provider on submit, or None if the
+    provider has no callbacks or this instance is not reachable publicly.
+    """
+    provider = GENERATION_PROVIDERS.get(job.provider)
+    if provider is None or not provider.callback_timeout:
+        return None
+
+    webui_url = getattr(app.state.config, "WEBUI_URL", "") if app else ""
+    for base_url in (webui_url, (job.payload or {}).get("base_url")):
+        if is_public_url(base_url):
+            return (
+                f"{base_url.rstrip('/')}/api/v1/generation/callback/"
+                f"{job.provider}/{job.id}"
+                f"?signature={get_callback_signature(job.provider, job.id)}"
+            )
+    return None
+
+
+async def emit_generation_event(job: GenerationJobModel):
+    provider = GENERATION_PROVIDERS.get(job.provider)
+    try:
+        task = (
+            await asyncio.to_thread(provider.get_task_data, job.task_id)
+            if provider
+            else None
+        )
+        await emit_to_user(
+            job.user_id,
+            "generation-events",
+            {
+                "provider": job.provider,
+                "task_id": job.task_id,
+                "status": job.status,
+                "stage": job.stage,
+                "progress": job.progress,
+                "error": job.error,
+                "task": task,
+            },
+        )
+    except Exception as e:
+        log.debug(f"Failed to emit generation event for job {job.id}: {e}")
+
+
+def reserve_generation_credits(
+    user_id: str, credits: int, detail: SetCreditFormDetail
+) -> CreditReservationModel:
+    """
+    Hold the credits of a new task. Raises 400 with the current balance when
+    it is insufficient. Pass the reservation id to `enqueue_generation_job`,
+    the engine commits or releases it once the task settles.
+    """
+    reservation = CreditReservations.reserve_credit(user_id, Decimal(credits), detail)
+    if reservation is None:
+        user_credit = Credits.get_credit_by_user_id(user_id)
+        balance = user_credit.credit if user_credit else Decimal(0)
+        raise HTTPException(
+            status_code=400,
+            detail=f"v豆余额不足，需要{credits}v豆，当前余额：{balance:.2f}v豆",
+        )
+    return reservation
+
+
+def commit_generation_job(job: GenerationJobModel):
+    if job.reservation_id:
+        CreditReservations.commit_reservation_by_id(job.reservation_id)
+
+
+def refund_generation_job(job: GenerationJobModel, reason: str):
+    if job.credits <= 0 and not job.reservation_id:
+        return
+
+    provider = GENERATION_PROVIDERS.get(job.provider)
+    title = provider.title if provider else job.provider
+    desc = "取消退款" if reason == "task_cancelled" else "失败退款"
+    detail = SetCreditFormDetail(
+        desc=f"{title}任务{desc}",
+        api_path=f"/{job.provider}/task",
+        api_params={"task_id": job.task_id},
+        usage={"credits_refunded": job.credits, "reason": reason},
+    )
+    try:
+        if job.reservation_id:
+            # Settling the reservation is what makes the refund happen once
+            if not CreditReservations.release_reservation_by_id(
+                job.reservation_id, detail
+            ):
+                return
+            GenerationJobs.mark_refunded_by_id(job.id)
+        else:
+            # Jobs charged before reservations existed
+            if not GenerationJobs.mark_refunded_by_id(job.id):
+                return
+            Credits.add_credit_by_user_id(
+                AddCreditForm(
+                    user_id=job.user_id, amount=Decimal(job.credits), detail=detail
+                )
+            )
+        log.info(f"已退还 {job.credits} v豆给用户 {job.user_id} ({job.task_id})")
+    except Exception as e:
+        log.error(f"退还v豆失败 {job.task_id}: {e}")
+
+
+def settle_expired_credit_reservations() -> int:
+    """
+    Settle reservations left behind by dead jobs: the router died before
+    enqueueing, or the process died between finishing a job and settling
+    its credits. Reservations of jobs still in flight are extended.
+    """
+    settled = 0
+    for reservation in CreditReservations.get_expired_reservations():
+        job = GenerationJobs.get_job_by_reservation_id(reservation.id)
+        if job is None:
+            settled += CreditReservations.release_reservation_by_id(reservation.id)
+        elif job.status == "completed":
+            settled += CreditReservations.commit_reservation_by_id(reservation.id)
+        elif job.status in ("failed", "cancelled"):
+            reason = "task_cancelled" if job.status == "cancelled" else "task_failed"
+            refund_generation_job(job, reason)
+            settled += 1
+        else:
+            CreditReservations.extend_reservation_by_id(reservation.id)
+    return settled
+
+
+class GenerationTaskEngine:
+    """
+    Submit workers claim one queued task at a time, within the per-provider
+    caps. Status polls are not done per task: the poller claims every task
+    of a provider that is due and hands them to `provider.poll_many`, so
+    providers with a batch endpoint fetch many tasks in a single request.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = GENERATION_WORKER_CONCURRENCY,
+        lease_seconds: int = GENERATION_JOB_LEASE_SECONDS,
+        poll_batch_size: int = GENERATION_POLL_BATCH_SIZE,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = max(30, lease_seconds)
+        self.poll_batch_size = max(1, poll_batch_size)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self.app = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: list[asyncio.Task] = []
+        self._polls: dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self, app):
+        if self._tasks:
+            return
+
+        self.app = app
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run_worker()) for _ in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._run_poller()))
+        self._tasks.append(asyncio.create_task(self._run_reaper()))
+        log.info(f"Started {self.concurrency} generation workers ({self.worker_id})")
+
+    async def stop(self):
+        tasks = self._tasks + list(self._polls.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._polls = {}
+
+    def notify(self):
+        # May be called from sync endpoints running in the threadpool
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run_worker(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(
+                    GenerationJobs.claim_next_job,
+                    self.worker_id,
+                    self.lease_seconds,
+                    get_provider_caps(),
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception(f"Failed to claim generation job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=IDLE_POLL_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process_job(job)
+
+    async def _run_poller(self):
+        while True:
+            for name, provider in GENERATION_PROVIDERS.items():
+                # One batch in flight per provider, the next one picks up
+                # whatever became due meanwhile
+                if name in self._polls and not self._polls[name].done():
+                    continue
+
+                try:
+                    jobs = await asyncio.to_thread(
+                        GenerationJobs.claim_due_poll_jobs,
+                        name,
+                        self.worker_id,
+                        self.lease_seconds,
+                        self.poll_batch_size,
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log.exception(f"Failed to claim {name} poll jobs: {e}")
+                    continue
+
+                if jobs:
+                    self._polls[name] = asyncio.create_task(
+                        self._poll_jobs(provider, jobs)
+                    )
+
+            await asyncio.sleep(POLLER_TICK_INTERVAL)
+
+    async def _run_reaper(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 2)
+            try:
+                failed = await asyncio.to_thread(GenerationJobs.fail_expired_jobs)
+                for job in failed:
+                    log.warning(
+                        f"{job.provider} job {job.id} lost its lease in the "
+                        f"{job.stage} stage, failing it"
+                    )
+                    await self._settle_failed_job(job)
+            except Exception as e:
+                log.exception(f"Failed to reap expired generation jobs: {e}")
+
+            try:
+                requeued = await asyncio.to_thread(GenerationJobs.requeue_expired_jobs)
+                if requeued:
+                    log.warning(
+                        f"Requeued {requeued} generation jobs with expired lease"
+                    )
+                    self.notify()
+            except Exception as e:
+                log.exception(f"Failed to requeue expired generation jobs: {e}")
+
+            try:
+                settled = await asyncio.to_thread(settle_expired_credit_reservations)
+                if settled:
+                    log.warning(f"Settled {settled} expired credit reservations")
+            except Exception as e:
+                log.exception(f"Failed to settle expired credit reservations: {e}")
+
+    async def _heartbeat(self, job: GenerationJobModel):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await asyncio.to_thread(
+                GenerationJobs.renew_lease, job.id, self.worker_id, self.lease_seconds
+            )
+
+    def _get_error_result(self, job: GenerationJobModel, e: Exception):
+        if is_retryable_error(e, job.stage) and job.attempts + 1 < job.max_attempts:
+            log.warning(
+                f"{job.provider} job {job.id} {job.stage} failed, retrying: {e}"
+            )
+            return GenerationResult(status="retry", error=str(e))
+
+        log.error(f"{job.provider} job {job.id} {job.stage} failed: {e}")
+        return GenerationResult(status="failed", error=str(e))
+
+    async def _settle_failed_job(self, job: GenerationJobModel):
+        """Mark the provider's task as failed, refund it and notify the user."""
+        provider = GENERATION_PROVIDERS.get(job.provider)
+        if provider:
+            await asyncio.to_thread(provider.on_failed, job, job.error)
+        await asyncio.to_thread(refund_generation_job, job, "task_failed")
+        await emit_generation_event(job)
+
+    async def _process_job(self, job: GenerationJobModel):
+        provider = GENERATION_PROVIDERS.get(job.provider)
+        if provider is None:
+            log.error(f"Unknown generation provider: {job.provider}")
+            GenerationJobs.finish_job_by_id(
+                job.id, "failed", self.worker_id, f"未知的服务: {job.provider}"
+            )
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await provider.submit(self.app, job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            result = self._get_error_result(job, e)
+        finally:
+            heartbeat.cancel()
+
+        await self._apply_result(provider, job, result)
+
+    async def _poll_jobs(
+        self, provider: GenerationProvider, jobs: list[GenerationJobModel]
+    ):
+        now = time.time()
+        expired = [job for job in jobs if job.deadline_at and now > job.deadline_at]
+        due = [job for job in jobs if job not in expired]
+
+        for job in expired:
+            try:
+                await self._apply_result(
+                    provider,
+                    job,
+                    GenerationResult(status="failed", error="任务处理超时，请稍后重试"),
+                )
+            except Exception as e:
+                log.exception(f"Failed to expire generation job {job.id}: {e}")
+
+        if not due:
+            return
+
+        try:
+            results = await provider.poll_many(self.app, due)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            results = {job.id: e for job in due}
+
+        for job in due:
+            result = results.get(job.id)
+            if result is None:
+                result = GenerationResult(progress=job.progress)
+            elif isinstance(result, Exception):
+                result = self._get_error_result(job, result)
+
+            try:
+                await self._apply_result(provider, job, result)
+            except Exception as e:
+                log.exception(f"Failed to update generation job {job.id}: {e}")
+
+    async def _apply_result(
+        self,
+        provider: GenerationProvider,
+        job: GenerationJobModel,
+        result: GenerationResult,
+    ):
+        if result.status == "retry":
+            updated = await asyncio.to_thread(
+                GenerationJobs.release_job_by_id,
+                job.id,
+                self.worker_id,
+                min(60, 5 * 2**job.attempts),
+                {"attempts": job.attempts + 1, "error": result.error},
+            )
+        elif result.status == "completed":
+            updated = await asyncio.to_thread(
+                GenerationJobs.finish_job_by_id, job.id, "completed", self.worker_id
+            )
+            if updated:
+                await asyncio.to_thread(commit_generation_job, updated)
+        elif result.status == "failed":
+            updated = await asyncio.to_thread(
+                GenerationJobs.finish_job_by_id,
+                job.id,
+                "failed",
+                self.worker_id,
+                result.error,
+            )
+            if updated:
+                await self._settle_failed_job(updated)
+                return
+        else:
+            progress = job.progress if result.progress is None else result.progress
+            updates = {
+                "stage": "poll",
+                "attempts": 0,
+                "error": None,
+                "progress": progress,
+                "poll_count": job.poll_count + (job.stage == "poll"),
+            }
+            if result.external_id:
+                updates["external_id"] = result.external_id
+
+            if job.stage == "submit":
+                updates["deadline_at"] = int(time.time()) + provider.timeout
+                # Wait for the callback first, poll only if it is overdue
+                delay = (
+                    provider.callback_timeout
+                    if get_callback_url(self.app, job)
+                    else provider.poll_interval
+                )
+            else:
+                delay = provider.get_poll_interval(job, progress)
+
+            updated = await asyncio.to_thread(
+                GenerationJobs.release_job_by_id,
+                job.id,
+                self.worker_id,
+                delay,
+                updates,
+            )
+            # Nothing changed for the user, skip the socket event
+            if job.stage == "poll" and progress == job.progress:
+                return
+
+        if updated:
+            await emit_generation_event(updated)
+
+
+generation_engine = GenerationTaskEngine()
+
+
+def enqueue_generation_job(
+    provider: str,
+    task_id: str,
+    user_id: str,
+    credits: int = 0,
+    payload: Optional[dict] = None,
+    reservation_id: Optional[str] = None,
+) -> Optional[GenerationJobModel]:
+    """
+    Queue a task that has been stored by its router, with its `credits`
+    held by `reservation_id`. The reservation is committed when the task
+    completes and released once if it fails or is cancelled.
+    """
+    job = GenerationJobs.insert_new_job(
+        user_id,
+        GenerationJobForm(
+            provider=provider,
+            task_id=task_id,
+            payload=payload,
+            credits=credits,
+            reservation_id=reservation_id,
+            max_attempts=GENERATION_JOB_MAX_ATTEMPTS,
+        ),
+    )
+    generation_engine.notify()
+    return job
+
+
+def cancel_generation_job(provider: str, task_id: str) -> Optional[GenerationJobModel]:
+    """
+    Stop driving a task and refund it. Returns None if the task has no job,
+    e.g. it was created before the engine existed.
+    """
+    job = GenerationJobs.get_job_by_task_id(provider, task_id)
+    if job is None:
+        return None
+
+    cancelled = GenerationJobs.finish_job_by_id(job.id, "cancelled")
+    if cancelled:
+        if provider in GENERATION_PROVIDERS:
+            GENERATION_PROVIDERS[provider].on_cancelled(cancelled)
+        refund_generation_job(cancelled, "task_cancelled")
+        return cancelled
+
+    return job
+
+
+async def handle_generation_callback(
+    provider_name: str, job_id: str, payload: dict
+) -> Optional[GenerationJobModel]:
+    """
+    Apply a status update pushed by a provider. Idempotent: callbacks for
+    finished jobs, for another upstream task or racing the submit are
+    acknowledged without changes. Returns None if the job does not exist.
+    """
+    provider = GENERATION_PROVIDERS.get(provider_name)
+    job = await asyncio.to_thread(GenerationJobs.get_job_by_id, job_id)
+    if provider is None or job is None or job.provider != provider_name:
+        return None
+
+    # Providers without callbacks were never handed a callback URL
+    if not provider.callback_timeout:
+        return job
+
+    if job.status not in ("queued", "running") or job.stage != "poll":
+        return job
+
+    external_id = provider.get_callback_external_id(payload)
+    if external_id and external_id != job.external_id:
+        log.warning(f"Ignoring {provider_name} callback for {external_id} on {job.id}")
+        return job
+
+    result = await asyncio.to_thread(provider.apply_callback, job, payload)
+
+    if result.status == "completed":
+        updated = await asyncio.to_thread(
+            GenerationJobs.finish_job_by_id, job.id, "completed"
+        )
+        if updated:
+            await asyncio.to_thread(commit_generation_job, updated)
+    elif result.status == "failed":
+        updated = await asyncio.to_thread(
+            GenerationJobs.finish_job_by_id, job.id, "failed", None, result.error
+        )
+        if updated:
+            await asyncio.to_thread(provider.on_failed, updated, result.error)
+            await asyncio.to_thread(refund_generation_job, updated, "task_failed")
+    else:
+        updated = await asyncio.to_thread(
+            GenerationJobs.defer_job_by_id,
+            job.id,
+            provider.callback_timeout or provider.max_poll_interval,
+            result.progress,
+        )
+
+    if updated:
+        await emit_generation_event(updated)
+        return updated
+    return job
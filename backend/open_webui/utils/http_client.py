@@ -0,0 +1,214 @@
+import importlib.util
+import logging
+import time
+from typing import Optional
+
+import aiohttp
+import httpx
+
+from open_webui.env import (
+    SRC_LOG_LEVELS,
+    HTTP_CLIENT_MAX_CONNECTIONS,
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_CLIENT_KEEPALIVE_EXPIRY,
+    HTTP_CLIENT_HTTP2,
+    HTTP_CLIENT_BREAKER_THRESHOLD,
+    HTTP_CLIENT_BREAKER_RESET_SECONDS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+# Default for calls that do not pass their own timeout
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+# HTTP/2 needs the optional `h2` package
+HTTP2_ENABLED = HTTP_CLIENT_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+class CircuitOpenError(httpx.ConnectError):
+    """Raised without touching the network while an upstream is short-circuited."""
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, reset_seconds: int):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "half_open":
+            # Let a single trial request through, the rest wait for its outcome
+            self.opened_at = time.monotonic()
+            return True
+        return state == "closed"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class UpstreamTransport(httpx.AsyncBaseTransport):
+    """
+    Pooled transport of one upstream that keeps request counters and trips a
+    circuit breaker per host on repeated connection errors or 5xx responses.
+    """
+
+    def __init__(self, name: str, **kwargs):
+        self.name = name
+        self._transport = httpx.AsyncHTTPTransport(**kwargs)
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(
+                HTTP_CLIENT_BREAKER_THRESHOLD, HTTP_CLIENT_BREAKER_RESET_SECONDS
+            )
+
+        if not breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"Upstream {self.name} ({host}) is unavailable, circuit open",
+                request=request,
+            )
+
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError:
+            self.failures += 1
+            breaker.record_failure()
+            raise
+        finally:
+            self.in_flight -= 1
+
+        if response.status_code >= 500:
+            self.failures += 1
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    def get_stats(self) -> dict:
+        connections = getattr(
+            getattr(self._transport, "_pool", None), "connections", []
+        )
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "circuits": {host: b.state for host, b in self.breakers.items()},
+        }
+
+
+class HTTPClientRegistry:
+    """
+    Long-lived HTTP clients, one connection pool per upstream, so calls reuse
+    keep-alive connections instead of paying TCP and TLS handshakes each time.
+    httpx clients serve the third-party integrations, aiohttp sessions the
+    LLM proxies. Created lazily, closed by the app lifespan.
+    """
+
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._transports: dict[str, UpstreamTransport] = {}
+        self._sessions: dict[str, aiohttp.ClientSession] = {}
+
+    def get_client(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            transport = UpstreamTransport(
+                name,
+                http2=HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=HTTP_CLIENT_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_CLIENT_KEEPALIVE_EXPIRY,
+                ),
+            )
+            client = httpx.AsyncClient(transport=transport, timeout=DEFAULT_TIMEOUT)
+            self._clients[name] = client
+            self._transports[name] = transport
+        return client
+
+    def get_session(self, name: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            # No session-wide timeout, requests pass their own
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=HTTP_CLIENT_MAX_CONNECTIONS,
+                    keepalive_timeout=HTTP_CLIENT_KEEPALIVE_EXPIRY,
+                    ttl_dns_cache=300,
+                ),
+                timeout=aiohttp.ClientTimeout(total=None),
+                trust_env=True,
+            )
+            self._sessions[name] = session
+        return session
+
+    def get_stats(self) -> dict:
+        stats = {
+            name: {"type": "httpx", "http2": HTTP2_ENABLED, **transport.get_stats()}
+            for name, transport in self._transports.items()
+        }
+        for name, session in self._sessions.items():
+            connector = session.connector
+            stats[name] = {
+                "type": "aiohttp",
+                "limit": connector.limit if connector else 0,
+                "acquired_connections": len(getattr(connector, "_acquired", ())),
+                "idle_connections": sum(
+                    len(conns) for conns in getattr(connector, "_conns", {}).values()
+                ),
+            }
+        return stats
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.aclose()
+        for session in self._sessions.values():
+            await session.close()
+        self._clients = {}
+        self._transports = {}
+        self._sessions = {}
+
+
+http_clients = HTTPClientRegistry()
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    return http_clients.get_client(name)
+
+
+def get_http_session(name: str) -> aiohttp.ClientSession:
+    return http_clients.get_session(name)
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Callable, Optional
+
+from starlette.requests import Request
+
+from open_webui.env import (
+    SRC_LOG_LEVELS,
+    INGESTION_WORKER_CONCURRENCY,
+    INGESTION_USER_CONCURRENCY,
+    INGESTION_JOB_LEASE_SECONDS,
+    INGESTION_JOB_MAX_ATTEMPTS,
+)
+from open_webui.models.ingestion_jobs import (
+    IngestionJobs,
+    IngestionJobForm,
+    IngestionJobModel,
+    IngestionJobResponse,
+)
+from open_webui.models.users import Users
+from open_webui.socket.main import emit_to_user
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# How long an idle worker waits before polling the queue again. Jobs enqueued
+# on this process wake the workers up immediately.
+IDLE_POLL_INTERVAL = 2
+
+# Handlers are registered by the routers that own the work, e.g. "file" in
+# routers/files.py and "knowledge_batch" in routers/knowledge.py.
+# Signature: handler(request, job, user, context) -> Optional[dict]
+INGESTION_HANDLERS: dict[str, Callable] = {}
+
+
+def register_ingestion_handler(kind: str):
+    def decorator(func):
+        INGESTION_HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+class IngestionJobCancelled(Exception):
+    pass
+
+
+async def emit_ingestion_event(job: IngestionJobModel):
+    try:
+        await emit_to_user(
+            job.user_id,
+            "ingestion-events",
+            IngestionJobResponse(**job.model_dump()).model_dump(),
+        )
+    except Exception as e:
+        log.debug(f"Failed to emit ingestion event for job {job.id}: {e}")
+
+
+class IngestionJobContext:
+    """
+    Passed to handlers, which run in a worker thread. Lets them report
+    progress and stop early when the job has been cancelled.
+    """
+
+    def __init__(self, job: IngestionJobModel, loop: asyncio.AbstractEventLoop) -> None:
+        self.job = job
+        self.loop = loop
+        self.cancelled = False
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise IngestionJobCancelled(self.job.id)
+
+    def report_progress(self, progress: int, stage: Optional[str] = None):
+        self.check_cancelled()
+        if not IngestionJobs.update_job_progress_by_id(self.job.id, progress, stage):
+            self.cancelled = True
+            raise IngestionJobCancelled(self.job.id)
+
+        self.job = self.job.model_copy(update={"progress": progress, "stage": stage})
+        asyncio.run_coroutine_threadsafe(emit_ingestion_event(self.job), self.loop)
+
+
+class IngestionWorkerPool:
+    def __init__(
+        self,
+        concurrency: int = INGESTION_WORKER_CONCURRENCY,
+        user_concurrency: int = INGESTION_USER_CONCURRENCY,
+        lease_seconds: int = INGESTION_JOB_LEASE_SECONDS,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.user_concurrency = max(1, user_concurrency)
+        self.lease_seconds = max(30, lease_seconds)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self.app = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self, app):
+        if self._tasks:
+            return
+
+        self.app = app
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run_worker()) for _ in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._run_reaper()))
+        log.info(f"Started {self.concurrency} ingestion workers ({self.worker_id})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        # May be called from sync endpoints running in the threadpool
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _get_request(self) -> Request:
+        # Handlers reuse the router functions, which only need `request.app`
+        return Request(
+            {
+                "type": "http",
+                "app": self.app,
+                "method": "POST",
+                "path": "/",
+                "headers": [],
+                "query_string": b"",
+            }
+        )
+
+    async def _run_worker(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(
+                    IngestionJobs.claim_next_job,
+                    self.worker_id,
+                    self.lease_seconds,
+                    self.user_concurrency,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception(f"Failed to claim ingestion job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=IDLE_POLL_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process_job(job)
+
+    async def _run_reaper(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 2)
+            try:
+                requeued = await asyncio.to_thread(IngestionJobs.requeue_expired_jobs)
+                if requeued:
+                    log.warning(
+                        f"Requeued {requeued} ingestion jobs with expired lease"
+                    )
+                    self.notify()
+            except Exception as e:
+                log.exception(f"Failed to requeue expired ingestion jobs: {e}")
+
+    async def _heartbeat(self, context: IngestionJobContext):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            renewed = await asyncio.to_thread(
+                IngestionJobs.renew_lease,
+                context.job.id,
+                self.worker_id,
+                self.lease_seconds,
+            )
+            if not renewed:
+                context.cancelled = True
+                return
+
+    async def _process_job(self, job: IngestionJobModel):
+        log.info(f"Processing ingestion job {job.id} ({job.kind})")
+        await emit_ingestion_event(job)
+
+        context = IngestionJobContext(job, asyncio.get_running_loop())
+        heartbeat = asyncio.create_task(self._heartbeat(context))
+        try:
+            handler = INGESTION_HANDLERS.get(job.kind)
+            if handler is None:
+                raise ValueError(f"Unknown ingestion job kind: {job.kind}")
+
+            user = Users.get_user_by_id(job.user_id)
+            if user is None:
+                raise ValueError(f"User {job.user_id} not found")
+
+            result = await asyncio.to_thread(
+                handler, self._get_request(), job, user, context
+            )
+            job = IngestionJobs.complete_job_by_id(job.id, self.worker_id, result)
+        except IngestionJobCancelled:
+            log.info(f"Ingestion job {job.id} was cancelled")
+            job = IngestionJobs.get_job_by_id(job.id)
+        except Exception as e:
+            log.exception(f"Ingestion job {job.id} failed: {e}")
+            error = str(e.detail) if hasattr(e, "detail") else str(e)
+            job = IngestionJobs.fail_job_by_id(
+                job.id, self.worker_id, error, retry_delay=min(300, 5 * 2**job.attempts)
+            )
+            if job and job.status == "queued":
+                self.notify()
+        finally:
+            heartbeat.cancel()
+
+        if job:
+            await emit_ingestion_event(job)
+
+
+ingestion_worker_pool = IngestionWorkerPool()
+
+
+def get_ingestion_priority(user, priority: int) -> int:
+    """
+    Priority a user may queue a job with. Only admins can jump the shared
+    queue, other users can only lower the priority of their own jobs.
+    """
+    return priority if user.role == "admin" else min(priority, 0)
+
+
+def enqueue_ingestion_job(
+    user_id: str,
+    kind: str,
+    payload: dict,
+    priority: int = 0,
+) -> Optional[IngestionJobModel]:
+    job = IngestionJobs.insert_new_job(
+        user_id,
+        IngestionJobForm(
+            kind=kind,
+            payload=payload,
+            priority=priority,
+            max_attempts=INGESTION_JOB_MAX_ATTEMPTS,
+        ),
+    )
+    ingestion_worker_pool.notify()
+    return job
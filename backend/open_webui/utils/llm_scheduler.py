@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from fastapi import HTTPException
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+from open_webui.env import (
+    SRC_LOG_LEVELS,
+    LLM_SCHEDULER_LIMITS,
+    LLM_SCHEDULER_QUEUE_TIMEOUT,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+# Priority classes, served in this order when a model is saturated
+PRIORITY_INTERACTIVE = "interactive"
+# Auxiliary calls a user is waiting on: tool calling, search queries, ...
+PRIORITY_TOOLS = "tools"
+# Titles, tags and other generations nobody waits on
+PRIORITY_BACKGROUND = "background"
+
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_TOOLS, PRIORITY_BACKGROUND)
+
+
+class Ticket:
+    """An admitted request, holding its slot until `release`."""
+
+    def __init__(self, queue: Optional["ModelQueue"] = None):
+        self.queue = queue
+        self.released = queue is None
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self.queue.release()
+
+    def release_after(self, response):
+        """Release now, or once the stream of a streaming response is over."""
+        if not isinstance(response, StreamingResponse):
+            self.release()
+            return response
+
+        iterator = response.body_iterator
+
+        async def body_iterator():
+            try:
+                async for chunk in iterator:
+                    yield chunk
+            finally:
+                self.release()
+
+        background = response.background
+
+        async def finish():
+            # The stream may never have been iterated if the client left early
+            self.release()
+            if background:
+                await background()
+
+        response.body_iterator = body_iterator()
+        response.background = BackgroundTask(finish)
+        return response
+
+
+class ModelQueue:
+    """
+    Admission of one model: at most `concurrency` requests in flight and a
+    token bucket of `rate` requests per second with `burst` capacity. Waiting
+    requests are admitted by priority class, and round-robin across users
+    within a class, so one user's burst cannot starve the others.
+    """
+
+    def __init__(self, key: str, concurrency: int = 0, rate: float = 0, burst=None):
+        self.key = key
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = max(1, burst or (int(rate) or 1))
+        self.tokens = float(self.burst)
+        self.refilled_at = time.monotonic()
+
+        self.in_flight = 0
+        self.waiting: dict[str, OrderedDict[str, deque]] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self.admitted = {priority: 0 for priority in PRIORITIES}
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def limited(self) -> bool:
+        return self.concurrency > 0 or self.rate > 0
+
+    def depth(self, priority: Optional[str] = None) -> int:
+        priorities = [priority] if priority else PRIORITIES
+        return sum(
+            len(waiters)
+            for priority in priorities
+            for waiters in self.waiting[priority].values()
+        )
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.refilled_at) * self.rate
+            )
+        self.refilled_at = now
+
+    def _admissible(self) -> bool:
+        if self.concurrency > 0 and self.in_flight >= self.concurrency:
+            return False
+        if self.rate > 0:
+            self._refill()
+            if self.tokens < 1:
+                return False
+        return True
+
+    def _admit(self, priority: str):
+        if self.rate > 0:
+            self.tokens -= 1
+        self.in_flight += 1
+        self.admitted[priority] += 1
+
+    def _next(self) -> Optional[tuple[str, asyncio.Future, float]]:
+        for priority in PRIORITIES:
+            users = self.waiting[priority]
+            while users:
+                user_id, waiters = next(iter(users.items()))
+                future, enqueued_at = waiters.popleft()
+                if waiters:
+                    users.move_to_end(user_id)
+                else:
+                    del users[user_id]
+                if not future.done():
+                    return priority, future, enqueued_at
+        return None
+
+    def _dispatch(self):
+        while self.depth() and self._admissible():
+            waiter = self._next()
+            if waiter is None:
+                return
+            priority, future, enqueued_at = waiter
+            self._admit(priority)
+            self.wait_seconds += time.monotonic() - enqueued_at
+            future.set_result(None)
+
+        if self.depth() and self.rate > 0 and self._timer is None:
+            # Out of tokens: come back once the next one is there
+            delay = max(0.0, (1 - self.tokens) / self.rate)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._wake)
+
+    def _wake(self):
+        self._timer = None
+        self._dispatch()
+
+    async def acquire(self, priority: str, user_id: str, timeout: float):
+        if not self.depth() and self._admissible():
+            self._admit(priority)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[priority].setdefault(user_id, deque()).append(
+            (future, time.monotonic())
+        )
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(future, timeout=timeout or None)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests to this model, please try again later",
+            )
+        except asyncio.CancelledError:
+            # Admitted at the same time as the caller went away
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def get_stats(self) -> dict:
+        admitted = sum(self.admitted.values())
+        return {
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "burst": self.burst,
+            "in_flight": self.in_flight,
+            "queued": {priority: self.depth(priority) for priority in PRIORITIES},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait": round(self.wait_seconds / admitted, 3) if admitted else 0,
+        }
+
+
+class LLMScheduler:
+    """
+    Admission control of outbound chat completions, one queue per
+    connection type and model. Limits come from LLM_SCHEDULER_LIMITS, models
+    without limits are admitted right away.
+    """
+
+    def __init__(
+        self,
+        limits: dict = LLM_SCHEDULER_LIMITS,
+        queue_timeout: int = LLM_SCHEDULER_QUEUE_TIMEOUT,
+    ):
+        self.limits = limits
+        self.queue_timeout = queue_timeout
+        self._queues: dict[str, ModelQueue] = {}
+
+    def get_queue(self, model: dict) -> ModelQueue:
+        owned_by = model.get("owned_by", "")
+        key = f"{owned_by}:{model['id']}"
+        queue = self._queues.get(key)
+        if queue is None:
+            limits = (
+                self.limits.get(model["id"])
+                or self.limits.get(owned_by)
+                or self.limits.get("*")
+                or {}
+            )
+            queue = self._queues[key] = ModelQueue(
+                key,
+                concurrency=int(limits.get("concurrency", 0)),
+                rate=float(limits.get("rate", 0)),
+                burst=limits.get("burst"),
+            )
+        return queue
+
+    async def acquire(
+        self, model: dict, priority: str = PRIORITY_INTERACTIVE, user_id: str = ""
+    ) -> Ticket:
+        queue = self.get_queue(model)
+        if not queue.limited:
+            return Ticket()
+
+        if priority not in PRIORITIES:
+            priority = PRIORITY_INTERACTIVE
+        await queue.acquire(priority, user_id, self.queue_timeout)
+        return Ticket(queue)
+
+    def get_stats(self) -> dict:
+        return {
+            key: queue.get_stats()
+            for key, queue in self._queues.items()
+            if queue.limited
+        }
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,179 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Any, BinaryIO, Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, Response
+
+from open_webui.constants import ERROR_MESSAGES
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.models.files import FileForm, FileModel, Files
+from open_webui.storage.provider import Storage
+from open_webui.utils.http_client import get_http_client
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+# Downloads stay in memory up to this size before spilling to a temp file
+MEDIA_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Generated media never changes once stored, so clients may cache it for good
+MEDIA_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# Upper bound of tasks returned by one page of a task list
+TASK_LIST_MAX_LIMIT = 200
+
+
+def get_image_content_type(data: bytes) -> str:
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+def store_media_file(
+    user_id: str,
+    file: BinaryIO,
+    name: str,
+    content_type: str,
+    data: Optional[dict] = None,
+) -> FileModel:
+    """Upload generated media to the storage provider and register it as a file."""
+    id = str(uuid.uuid4())
+    tags = {
+        "OpenWebUI-User-Id": user_id,
+        "OpenWebUI-File-Id": id,
+    }
+    contents, file_path = Storage.upload_file(file, f"{id}_{name}", tags)
+
+    return Files.insert_new_file(
+        user_id,
+        FileForm(
+            id=id,
+            filename=name,
+            path=file_path,
+            meta={
+                "name": name,
+                "content_type": content_type,
+                "size": len(contents),
+                "data": data or {},
+            },
+        ),
+    )
+
+
+async def download_media_file(
+    url: str, user_id: str, name: str, data: Optional[dict] = None
+) -> FileModel:
+    """Stream a provider result URL into the storage provider."""
+    client = get_http_client("media")
+    with tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_MAX_SIZE) as file:
+        async with client.stream("GET", url, timeout=120.0) as response:
+            response.raise_for_status()
+            content_type = response.headers.get(
+                "content-type", "application/octet-stream"
+            ).split(";")[0]
+            async for chunk in response.aiter_bytes():
+                file.write(chunk)
+
+        file.seek(0)
+        return await asyncio.to_thread(
+            store_media_file, user_id, file, name, content_type, data
+        )
+
+
+def delete_media_file(id: str):
+    file = Files.get_file_by_id(id)
+    if not file:
+        return
+    try:
+        Storage.delete_file(file.path)
+    except Exception as e:
+        log.warning(f"Failed to delete media file {id} from storage: {e}")
+    Files.delete_file_by_id(id)
+
+
+def get_media_file_response(request: Request, id: str) -> Response:
+    """
+    Serve stored media with long-lived cache headers. The file id doubles as
+    ETag, range requests are handled by FileResponse.
+    """
+    file = Files.get_file_by_id(id)
+    if not file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+    etag = f'"{file.id}"'
+    headers = {"Cache-Control": MEDIA_CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    file_path = Path(Storage.get_file(file.path))
+    if not file_path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+    return FileResponse(
+        file_path,
+        headers=headers,
+        media_type=file.meta.get("content_type"),
+        filename=file.meta.get("name", file.filename),
+        content_disposition_type="inline",
+    )
+
+
+def encode_task_cursor(task: dict) -> str:
+    """Opaque keyset cursor pointing after `task` in a newest-first list."""
+    value = f"{task['created_at']}:{task['task_id']}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_task_cursor(cursor: Optional[str]) -> Optional[tuple[int, str]]:
+    if not cursor:
+        return None
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, task_id = value.split(":", 1)
+        return int(created_at), task_id
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标"
+        )
+
+
+def get_task_list_limit(limit: Optional[int], default: int) -> int:
+    return max(1, min(limit or default, TASK_LIST_MAX_LIMIT))
+
+
+def get_task_list_response(
+    request: Request, content: Any, tasks: list[dict], limit: int
+) -> Response:
+    """
+    JSON response for one page of a task list. The cursor of the next page
+    is sent in the X-Next-Cursor header, so the body keeps its shape. The
+    body hash is the ETag: clients polling an unchanged list get a 304, and
+    browsers revalidate their cached copy on their own.
+    """
+    body = json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if len(tasks) >= limit:
+        headers["X-Next-Cursor"] = encode_task_cursor(tasks[-1])
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
@@ -15,7 +15,6 @@ import re
 import ast
 
 from uuid import uuid4
-from concurrent.futures import ThreadPoolExecutor
 
 
 from fastapi import Request, HTTPException
@@ -53,6 +52,7 @@ from open_webui.retrieval.utils import get_sources_from_files
 
 
 from open_webui.utils.chat import generate_chat_completion
+from open_webui.utils.llm_scheduler import PRIORITY_TOOLS
 from open_webui.utils.task import (
     get_task_model_id,
     rag_template,
@@ -63,6 +63,7 @@ from open_webui.utils.misc import (
     get_message_list,
     add_or_update_system_message,
     add_or_update_user_message,
+    append_to_last_user_message_content,
     get_last_user_message,
     get_last_assistant_message,
     prepend_to_first_user_message_content,
@@ -88,6 +89,7 @@ from open_webui.env import (
     GLOBAL_LOG_LEVEL,
     BYPASS_MODEL_ACCESS_CONTROL,
     ENABLE_REALTIME_CHAT_SAVE,
+    ENABLE_PROMPT_CACHE_SHAPING,
 )
 from open_webui.constants import TASKS
 
@@ -161,7 +163,9 @@ async def chat_completion_tools_handler(
     )
 
     try:
-        response = await generate_chat_completion(request, form_data=payload, user=user)
+        response = await generate_chat_completion(
+            request, form_data=payload, user=user, priority=PRIORITY_TOOLS
+        )
         log.debug(f"{response=}")
         content = await get_content_from_response(response)
         log.debug(f"{content=}")
@@ -535,13 +539,30 @@ async def chat_image_generation_handler(
         system_message_content = "<context>Unable to generate an image, tell the user that an error occurred</context>"
 
     if system_message_content:
-        form_data["messages"] = add_or_update_system_message(
-            system_message_content, form_data["messages"]
-        )
+        if ENABLE_PROMPT_CACHE_SHAPING:
+            form_data["messages"] = append_to_last_user_message_content(
+                system_message_content, form_data["messages"]
+            )
+        else:
+            form_data["messages"] = add_or_update_system_message(
+                system_message_content, form_data["messages"]
+            )
 
     return form_data
 
 
+def is_pinned_source(request: Request, source: dict) -> bool:
+    """Whole documents attached to the chat, the same on every turn."""
+    file = source.get("source", {})
+    if not file.get("id") or file.get("type") == "web_search" or "distances" in source:
+        return False
+    return (
+        file.get("context") == "full"
+        or request.app.state.config.RAG_FULL_CONTEXT
+        or request.app.state.config.BYPASS_EMBEDDING_AND_RETRIEVAL
+    )
+
+
 async def chat_completion_files_handler(
     request: Request, body: dict, user: UserModel
 ) -> tuple[dict, dict[str, list]]:
@@ -581,26 +602,28 @@ async def chat_completion_files_handler(
             queries = [get_last_user_message(body["messages"])]
 
         try:
-            # Offload get_sources_from_files to a separate thread
+            # Offload get_sources_from_files to a separate thread. The default
+            # executor is used here: the collection queries themselves run on
+            # the bounded retrieval executor, which must not be waited on from
+            # one of its own threads.
             loop = asyncio.get_running_loop()
-            with ThreadPoolExecutor() as executor:
-                sources = await loop.run_in_executor(
-                    executor,
-                    lambda: get_sources_from_files(
-                        request=request,
-                        files=files,
-                        queries=queries,
-                        embedding_function=lambda query, prefix: request.app.state.EMBEDDING_FUNCTION(
-                            query, prefix=prefix, user=user
-                        ),
-                        k=request.app.state.config.TOP_K,
-                        reranking_function=request.app.state.rf,
-                        k_reranker=request.app.state.config.TOP_K_RERANKER,
-                        r=request.app.state.config.RELEVANCE_THRESHOLD,
-                        hybrid_search=request.app.state.config.ENABLE_RAG_HYBRID_SEARCH,
-                        full_context=request.app.state.config.RAG_FULL_CONTEXT,
+            sources = await loop.run_in_executor(
+                None,
+                lambda: get_sources_from_files(
+                    request=request,
+                    files=files,
+                    queries=queries,
+                    embedding_function=lambda query, prefix: request.app.state.EMBEDDING_FUNCTION(
+                        query, prefix=prefix, user=user
                     ),
-                )
+                    k=request.app.state.config.TOP_K,
+                    reranking_function=request.app.state.rf,
+                    k_reranker=request.app.state.config.TOP_K_RERANKER,
+                    r=request.app.state.config.RELEVANCE_THRESHOLD,
+                    hybrid_search=request.app.state.config.ENABLE_RAG_HYBRID_SEARCH,
+                    full_context=request.app.state.config.RAG_FULL_CONTEXT,
+                ),
+            )
         except Exception as e:
             log.exception(e)
 
@@ -841,6 +864,10 @@ async def process_chat_payload(request, form_data, user, metadata, model):
                 {"type": "function", "function": tool.get("spec", {})}
                 for tool in tools_dict.values()
             ]
+            if ENABLE_PROMPT_CACHE_SHAPING:
+                form_data["tools"].sort(
+                    key=lambda tool: tool["function"].get("name", "")
+                )
         else:
             # If the function calling is not native, then call the tools function calling handler
             try:
@@ -860,10 +887,18 @@ async def process_chat_payload(request, form_data, user, metadata, model):
 
     # If context is not empty, insert it into the messages
     if len(sources) > 0:
+        if ENABLE_PROMPT_CACHE_SHAPING:
+            # Number whole documents first, so their ids stay put between turns
+            sources.sort(key=lambda source: not is_pinned_source(request, source))
+
         context_string = ""
+        pinned_context_string = ""
         citation_idx = {}
         for source in sources:
             if "document" in source:
+                pinned = ENABLE_PROMPT_CACHE_SHAPING and is_pinned_source(
+                    request, source
+                )
                 for doc_context, doc_meta in zip(
                     source["document"], source["metadata"]
                 ):
@@ -874,9 +909,14 @@ async def process_chat_payload(request, form_data, user, metadata, model):
                     )
                     if citation_id not in citation_idx:
                         citation_idx[citation_id] = len(citation_idx) + 1
-                    context_string += f'<source id="{citation_idx[citation_id]}">{doc_context}</source>\n'
+                    source_string = f'<source id="{citation_idx[citation_id]}">{doc_context}</source>\n'
+                    if pinned:
+                        pinned_context_string += source_string
+                    else:
+                        context_string += source_string
 
         context_string = context_string.strip()
+        pinned_context_string = pinned_context_string.strip()
         prompt = get_last_user_message(form_data["messages"])
 
         if prompt is None:
@@ -889,9 +929,23 @@ async def process_chat_payload(request, form_data, user, metadata, model):
                 f"With a 0 relevancy threshold for RAG, the context cannot be empty"
             )
 
+        if ENABLE_PROMPT_CACHE_SHAPING:
+            # Whole documents join the cacheable prefix, the retrieved context
+            # and the query go last
+            if pinned_context_string:
+                form_data["messages"] = add_or_update_system_message(
+                    f"<context>\n{pinned_context_string}\n</context>",
+                    form_data["messages"],
+                )
+            form_data["messages"] = append_to_last_user_message_content(
+                rag_template(
+                    request.app.state.config.RAG_TEMPLATE, context_string, prompt
+                ),
+                form_data["messages"],
+            )
         # Workaround for Ollama 2.0+ system prompt issue
         # TODO: replace with add_or_update_system_message
-        if model.get("owned_by") == "ollama":
+        elif model.get("owned_by") == "ollama":
             form_data["messages"] = prepend_to_first_user_message_content(
                 rag_template(
                     request.app.state.config.RAG_TEMPLATE, context_string, prompt
@@ -2261,7 +2315,9 @@ async def process_chat_response(
 
         # background_tasks.add_task(post_response_handler, response, events)
         task_id, _ = create_task(
-            post_response_handler(response, events), id=metadata["chat_id"]
+            post_response_handler(response, events),
+            id=metadata["chat_id"],
+            user_id=user.id,
         )
         return {"status": True, "task_id": task_id}
 
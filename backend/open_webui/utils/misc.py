@@ -130,6 +130,24 @@ def prepend_to_first_user_message_content(
     return messages
 
 
+def append_to_last_user_message_content(
+    content: str, messages: list[dict]
+) -> list[dict]:
+    for message in reversed(messages):
+        if message["role"] == "user":
+            if isinstance(message["content"], list):
+                for item in reversed(message["content"]):
+                    if item["type"] == "text":
+                        item["text"] = f"{item['text']}\n{content}"
+                        break
+                else:
+                    message["content"].append({"type": "text", "text": content})
+            else:
+                message["content"] = f"{message['content']}\n{content}"
+            break
+    return messages
+
+
 def add_or_update_system_message(content: str, messages: list[dict]):
     """
     Adds a new system message at the beginning of the messages list
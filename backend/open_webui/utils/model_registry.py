@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import Request
+from redis import asyncio as aioredis
+
+from open_webui.env import (
+    SRC_LOG_LEVELS,
+    REDIS_URL,
+    MODEL_REGISTRY_REFRESH_INTERVAL,
+    MODEL_REGISTRY_SYNC_INTERVAL,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+REDIS_KEY_PREFIX = "open-webui:models"
+
+
+def copy_models(models: dict) -> dict:
+    """
+    Copy of a snapshot that callers can filter in place, e.g. by access
+    control, without changing the list everyone else is served.
+    """
+    return {
+        key: list(value) if isinstance(value, list) else value
+        for key, value in models.items()
+    }
+
+
+class ModelRegistry:
+    """
+    Model lists of the OpenAI and Ollama connections. Lookups are served
+    from memory, the upstream `/models` fan-out runs in the background every
+    `refresh_interval` seconds, and on demand through `refresh` after a
+    config change. A failed refresh keeps the last good snapshot.
+
+    Snapshots are published to Redis: every `sync_interval` seconds each
+    worker adopts a newer snapshot refreshed by another one, and only
+    fetches upstream itself once the shared snapshot has aged out.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: int = MODEL_REGISTRY_REFRESH_INTERVAL,
+        sync_interval: int = MODEL_REGISTRY_SYNC_INTERVAL,
+    ):
+        self.refresh_interval = max(1, refresh_interval)
+        self.sync_interval = max(1, min(sync_interval, self.refresh_interval))
+
+        self.app = None
+        self._loaders: dict[str, Callable[[Request], Awaitable[dict]]] = {}
+        self._on_update: dict[str, Callable[[Any, dict], None]] = {}
+        self._snapshots: dict[str, tuple[float, dict]] = {}
+        self._refreshes: dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._redis = None
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[Request], Awaitable[dict]],
+        on_update: Optional[Callable[[Any, dict], None]] = None,
+    ):
+        self._loaders[name] = loader
+        if on_update:
+            self._on_update[name] = on_update
+
+    def start(self, app):
+        if self._task:
+            return
+
+        self.app = app
+        if REDIS_URL:
+            self._redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._redis:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def get(self, app, name: str) -> dict:
+        snapshot = self._snapshots.get(name)
+        if snapshot is not None:
+            return copy_models(snapshot[1])
+
+        # Cold start: take the shared snapshot, or fetch once and share it
+        if await self._sync(app, name):
+            return copy_models(self._snapshots[name][1])
+        return await self.refresh(app, name)
+
+    async def refresh(self, app, name: str) -> dict:
+        """Fetch `name` from upstream now. Concurrent callers share the fetch."""
+        future = self._refreshes.get(name)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh(app, name))
+            self._refreshes[name] = future
+            future.add_done_callback(lambda _: self._refreshes.pop(name, None))
+        return copy_models(await asyncio.shield(future))
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        return {
+            name: {
+                "models": len(next(iter(models.values()), []) or []),
+                "age": round(now - updated_at, 1),
+            }
+            for name, (updated_at, models) in self._snapshots.items()
+        }
+
+    def _get_request(self, app) -> Request:
+        # The model list loaders only need `request.app`
+        return Request(
+            {
+                "type": "http",
+                "app": app,
+                "method": "GET",
+                "path": "/",
+                "headers": [],
+                "query_string": b"",
+            }
+        )
+
+    def _store(self, app, name: str, updated_at: float, models: dict):
+        self._snapshots[name] = (updated_at, models)
+        if name in self._on_update:
+            self._on_update[name](app, models)
+
+    async def _refresh(self, app, name: str) -> dict:
+        try:
+            models = await self._loaders[name](self._get_request(app))
+        except Exception as e:
+            snapshot = self._snapshots.get(name)
+            if snapshot is None:
+                raise
+            log.warning(f"Failed to refresh {name} models, keeping last snapshot: {e}")
+            return snapshot[1]
+
+        updated_at = time.time()
+        self._store(app, name, updated_at, models)
+        await self._publish(name, updated_at, models)
+        return models
+
+    async def _publish(self, name: str, updated_at: float, models: dict):
+        if not self._redis:
+            return
+        try:
+            await self._redis.set(
+                f"{REDIS_KEY_PREFIX}:{name}",
+                json.dumps({"updated_at": updated_at, "models": models}),
+            )
+        except Exception as e:
+            log.debug(f"Failed to publish {name} models to Redis: {e}")
+
+    async def _sync(self, app, name: str) -> bool:
+        """
+        Adopt the shared snapshot if it is newer than ours. Returns True if
+        the local snapshot is fresh enough to skip the upstream fetch.
+        """
+        if self._redis:
+            try:
+                value = await self._redis.get(f"{REDIS_KEY_PREFIX}:{name}")
+                if value:
+                    shared = json.loads(value)
+                    local = self._snapshots.get(name)
+                    if local is None or shared["updated_at"] > local[0]:
+                        self._store(app, name, shared["updated_at"], shared["models"])
+            except Exception as e:
+                log.debug(f"Failed to read {name} models from Redis: {e}")
+
+        snapshot = self._snapshots.get(name)
+        return (
+            snapshot is not None and time.time() - snapshot[0] < self.refresh_interval
+        )
+
+    async def _run(self):
+        # The first pass warms the registry up before the first chat request
+        while True:
+            for name in self._loaders:
+                try:
+                    if not await self._sync(self.app, name):
+                        await self.refresh(self.app, name)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log.exception(f"Failed to refresh {name} models: {e}")
+
+            # Jitter, so workers started together do not refresh in lockstep
+            await asyncio.sleep(self.sync_interval * random.uniform(0.8, 1.2))
+
+
+model_registry = ModelRegistry()
@@ -36,7 +36,8 @@ async def get_all_base_models(request: Request, user: UserModel = None):
 
     if request.app.state.config.ENABLE_OPENAI_API:
         openai_models = await openai.get_all_models(request, user=user)
-        openai_models = openai_models["data"]
+        # Copies, the registry snapshot is shared between requests
+        openai_models = [{**model} for model in openai_models["data"]]
 
     if request.app.state.config.ENABLE_OLLAMA_API:
         ollama_models = await ollama.get_all_models(request, user=user)
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
+
+
+def get_model_name(name: str) -> str:
+    """Ollama name of a model, with the implicit `latest` tag."""
+    return name if ":" in name else f"{name}:latest"
+
+
+class PullJob:
+    def __init__(self, url: str, kind: str, name: str):
+        self.url = url
+        self.kind = kind
+        self.name = name
+        self.started_at = time.time()
+        self.ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.subscribers: set[asyncio.Queue] = set()
+        self.last = None
+        self.task: Optional[asyncio.Task] = None
+
+    def broadcast(self, chunk):
+        self.last = chunk
+        for queue in self.subscribers:
+            queue.put_nowait(chunk)
+
+
+class PullManager:
+    """
+    Model pulls, creations and downloads of the Ollama connections. Identical
+    requests to a connection share one upstream stream: its progress is fanned
+    out to every subscriber, and a late subscriber starts from the latest
+    progress line. Jobs run to completion even if all subscribers leave.
+
+    Keeps an index of the model digests each connection serves, taken from
+    `/api/tags`, and of the models each connection is pulling, so routing
+    avoids a connection until its pull is over.
+    """
+
+    def __init__(self):
+        self._jobs: dict[tuple, PullJob] = {}
+        self.digests: dict[str, dict[str, str]] = {}
+        self.deduplicated = 0
+
+    def get_key(self, url: str, kind: str, payload: dict) -> tuple:
+        digest = hashlib.sha256(
+            json.dumps(payload, sort_keys=True).encode()
+        ).hexdigest()
+        return url, kind, digest
+
+    def is_pulling(self, url: str, name: str) -> bool:
+        name = get_model_name(name)
+        return any(
+            job.url == url and job.kind == "pull" and get_model_name(job.name) == name
+            for job in self._jobs.values()
+        )
+
+    def exclude_pulling(
+        self, urls: list[str], candidates: Iterable[int], name: str
+    ) -> list[int]:
+        """Candidates not pulling `name`, or all of them if none is done."""
+        candidates = list(candidates)
+        ready = [
+            idx
+            for idx in candidates
+            if idx < len(urls) and not self.is_pulling(urls[idx], name)
+        ]
+        return ready or candidates
+
+    def update_digests(self, url: str, models: list[dict]):
+        self.digests[url] = {
+            model["name"]: model.get("digest", "")
+            for model in models
+            if model.get("name")
+        }
+
+    async def stream(
+        self,
+        url: str,
+        kind: str,
+        name: str,
+        payload: dict,
+        start: Callable[[], Awaitable[AsyncIterator]],
+        on_done: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> AsyncIterator:
+        """
+        Progress of the `kind` job of `payload` on `url`, started by `start`
+        unless an identical one is in flight. Errors starting the job are
+        raised to every caller waiting for it.
+        """
+        key = self.get_key(url, kind, payload)
+        job = self._jobs.get(key)
+
+        if job is not None:
+            self.deduplicated += 1
+            await asyncio.shield(job.ready)
+            return self._subscribe(job)
+
+        job = self._jobs[key] = PullJob(url, kind, name)
+        try:
+            iterator = await start()
+        except Exception as e:
+            del self._jobs[key]
+            job.ready.set_exception(e)
+            # Retrieved here so the loop does not warn when nobody else waits
+            job.ready.exception()
+            raise
+
+        subscriber = self._subscribe(job)
+        job.task = asyncio.create_task(self._run(key, job, iterator, on_done))
+        job.ready.set_result(None)
+        return subscriber
+
+    def _subscribe(self, job: PullJob) -> AsyncIterator:
+        queue = asyncio.Queue()
+        if job.last is not None:
+            queue.put_nowait(job.last)
+        job.subscribers.add(queue)
+
+        async def subscriber():
+            try:
+                while (chunk := await queue.get()) is not None:
+                    yield chunk
+            finally:
+                job.subscribers.discard(queue)
+
+        return subscriber()
+
+    async def _run(
+        self,
+        key: tuple,
+        job: PullJob,
+        iterator: AsyncIterator,
+        on_done: Optional[Callable[[], Awaitable[None]]],
+    ):
+        try:
+            async for chunk in iterator:
+                job.broadcast(chunk)
+        except Exception as e:
+            log.warning(f"Ollama {job.kind} of {job.name} on {job.url} failed: {e}")
+        finally:
+            self._jobs.pop(key, None)
+            for queue in job.subscribers:
+                queue.put_nowait(None)
+
+        if on_done:
+            try:
+                await on_done()
+            except Exception as e:
+                log.warning(f"Failed to refresh models after {job.kind}: {e}")
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        return {
+            "deduplicated": self.deduplicated,
+            "jobs": [
+                {
+                    "url": job.url,
+                    "kind": job.kind,
+                    "name": job.name,
+                    "subscribers": len(job.subscribers),
+                    "age": round(now - job.started_at, 1),
+                }
+                for job in self._jobs.values()
+            ],
+            "digests": self.digests,
+        }
+
+
+pull_manager = PullManager()
@@ -0,0 +1,49 @@
+import sys
+import time
+
+# Set when this module is first imported, main.py imports it before anything else
+STARTED_AT = time.time()
+_started = time.perf_counter()
+
+# Optional dependencies that add seconds to a worker's startup when imported
+HEAVY_MODULES = (
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "langchain.retrievers",
+    "chromadb",
+    "faster_whisper",
+    "fpdf",
+    "black",
+)
+
+_phases: list[tuple[str, float]] = []
+
+
+def mark(phase: str):
+    """Record that startup reached `phase`, in seconds since the first import."""
+    _phases.append((phase, time.perf_counter() - _started))
+
+
+def get_max_rss() -> int:
+    """Peak resident memory of this worker in bytes, 0 where not available."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def get_startup_profile() -> dict:
+    return {
+        "started_at": int(STARTED_AT),
+        "phases": [
+            {"phase": phase, "seconds": round(seconds, 3)} for phase, seconds in _phases
+        ],
+        "modules": len(sys.modules),
+        "heavy_modules": {name: name in sys.modules for name in HEAVY_MODULES},
+        "max_rss": get_max_rss(),
+    }
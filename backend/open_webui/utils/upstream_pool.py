@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+import aiohttp
+import httpx
+from fastapi import HTTPException
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+from open_webui.env import (
+    SRC_LOG_LEVELS,
+    HTTP_CLIENT_BREAKER_THRESHOLD,
+    HTTP_CLIENT_BREAKER_RESET_SECONDS,
+    UPSTREAM_MAX_ATTEMPTS,
+)
+from open_webui.utils.http_client import CircuitBreaker
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+# Weight of the newest sample in the error rate and TTFT averages
+EWMA_ALPHA = 0.2
+
+# How much a replica's error rate inflates its routing cost
+ERROR_RATE_PENALTY = 10
+
+CONNECTION_ERRORS = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+    httpx.TransportError,
+    OSError,
+)
+
+
+class UpstreamUnavailableError(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="Open WebUI: All upstream connections are unavailable",
+        )
+
+
+def is_failure(status: Optional[int] = None, error: Optional[Exception] = None) -> bool:
+    """Connection errors, 5xx and 429 count against a replica, other 4xx do not."""
+    if status is not None:
+        return status >= 500 or status == 429
+    return isinstance(error, CONNECTION_ERRORS)
+
+
+class Upstream:
+    def __init__(self, kind: str, url: str):
+        self.kind = kind
+        self.url = url
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.error_rate = 0.0
+        self.ttft: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.breaker = CircuitBreaker(
+            HTTP_CLIENT_BREAKER_THRESHOLD, HTTP_CLIENT_BREAKER_RESET_SECONDS
+        )
+
+    def record(self, failed: bool, error: Optional[str] = None):
+        self.error_rate += EWMA_ALPHA * (float(failed) - self.error_rate)
+        if failed:
+            self.errors += 1
+            self.last_error = error
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def record_ttft(self, seconds: float):
+        if self.ttft is None:
+            self.ttft = seconds
+        else:
+            self.ttft += EWMA_ALPHA * (seconds - self.ttft)
+
+    def cost(self, default_ttft: float) -> float:
+        ttft = self.ttft if self.ttft is not None else default_ttft
+        return (self.in_flight + 1) * ttft * (1 + ERROR_RATE_PENALTY * self.error_rate)
+
+    def get_stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 3),
+            "ttft": round(self.ttft, 3) if self.ttft is not None else None,
+            "circuit": self.breaker.state,
+            "last_error": self.last_error,
+        }
+
+
+class UpstreamAttempt:
+    """One request sent to an upstream, counted in flight until `done`."""
+
+    def __init__(self, upstream: Upstream):
+        self.upstream = upstream
+        self.started_at = time.monotonic()
+        self.first_byte_at: Optional[float] = None
+        self.finished = False
+        upstream.in_flight += 1
+        upstream.requests += 1
+
+    def first_byte(self):
+        if self.first_byte_at is None:
+            self.first_byte_at = time.monotonic()
+            self.upstream.record_ttft(self.first_byte_at - self.started_at)
+
+    def done(self, status: Optional[int] = None, error: Optional[Exception] = None):
+        if self.finished:
+            return
+        self.finished = True
+        self.upstream.in_flight -= 1
+
+        if (error or status) and is_failure(status, error):
+            self.upstream.record(
+                True, f"HTTP {status}" if status else str(error) or repr(error)
+            )
+        else:
+            self.upstream.record(False)
+
+    async def track(self, iterator: AsyncIterator) -> AsyncIterator:
+        try:
+            async for chunk in iterator:
+                self.first_byte()
+                yield chunk
+        except Exception as e:
+            self.done(error=e)
+            raise
+        finally:
+            self.done()
+
+    def track_response(self, response: StreamingResponse) -> StreamingResponse:
+        """Measure TTFT on the first chunk, and settle once the stream ends."""
+        response.body_iterator = self.track(response.body_iterator)
+
+        background = response.background
+
+        async def finish():
+            # The stream may never have been iterated if the client left early
+            self.done()
+            if background:
+                await background()
+
+        response.background = BackgroundTask(finish)
+        return response
+
+
+class UpstreamPool:
+    """
+    Passive health tracking and routing for LLM connections that serve the
+    same model. Each replica keeps its in-flight count, an error rate and a
+    TTFT moving average, and a circuit breaker. A request goes to the replica
+    with the lowest (in flight + 1) x TTFT cost, inflated by its error rate;
+    open circuits are skipped and a half-open one gets the next request as a
+    probe. `send` retries on another replica while nothing has been sent to
+    the client yet.
+    """
+
+    def __init__(self, max_attempts: int = UPSTREAM_MAX_ATTEMPTS):
+        self.max_attempts = max(1, max_attempts)
+        self._upstreams: dict[tuple[str, str], Upstream] = {}
+        self.decisions: deque[dict] = deque(maxlen=100)
+        self.retries = 0
+        self.rejected = 0
+
+    def get_upstream(self, kind: str, url: str) -> Upstream:
+        upstream = self._upstreams.get((kind, url))
+        if upstream is None:
+            upstream = self._upstreams[(kind, url)] = Upstream(kind, url)
+        return upstream
+
+    def pick(
+        self,
+        kind: str,
+        urls: list[str],
+        candidates: Iterable[int],
+        exclude: Iterable[int] = (),
+        model: Optional[str] = None,
+    ) -> Optional[int]:
+        """Index of the connection to use, None if every candidate is down."""
+        candidates = [idx for idx in dict.fromkeys(candidates) if idx not in exclude]
+        upstreams = {
+            idx: self.get_upstream(kind, urls[idx])
+            for idx in candidates
+            if idx < len(urls)
+        }
+
+        idx, reason = None, None
+        half_open = [
+            idx for idx, u in upstreams.items() if u.breaker.state == "half_open"
+        ]
+        closed = [idx for idx, u in upstreams.items() if u.breaker.state == "closed"]
+
+        if half_open and upstreams[half_open[0]].breaker.allow():
+            idx, reason = half_open[0], "probe"
+        elif len(closed) == 1:
+            idx, reason = closed[0], "only"
+        elif closed:
+            known = [upstreams[i].ttft for i in closed if upstreams[i].ttft]
+            default_ttft = sum(known) / len(known) if known else 1.0
+            # Shuffle first, so ties do not always go to the first connection
+            random.shuffle(closed)
+            idx = min(closed, key=lambda i: upstreams[i].cost(default_ttft))
+            reason = "least_cost"
+
+        if exclude and idx is not None:
+            reason = "retry"
+        if idx is None:
+            self.rejected += 1
+
+        self.decisions.append(
+            {
+                "time": int(time.time()),
+                "kind": kind,
+                "model": model,
+                "url": urls[idx] if idx is not None else None,
+                "reason": reason or "unavailable",
+                "candidates": len(upstreams),
+            }
+        )
+        return idx
+
+    async def send(
+        self,
+        kind: str,
+        urls: list[str],
+        candidates: Iterable[int],
+        send: Callable[[int, UpstreamAttempt], Awaitable[Any]],
+        model: Optional[str] = None,
+    ) -> tuple[Any, UpstreamAttempt]:
+        """
+        Call `send(idx, attempt)` on the best replica. Exceptions and
+        responses that count as failures are retried on the next best one,
+        up to `max_attempts`. The caller settles the returned attempt.
+        """
+        tried: list[int] = []
+        while True:
+            idx = self.pick(kind, urls, candidates, exclude=tried, model=model)
+            if idx is None:
+                raise UpstreamUnavailableError()
+
+            tried.append(idx)
+            attempt = UpstreamAttempt(self.get_upstream(kind, urls[idx]))
+            last = len(tried) >= self.max_attempts
+
+            try:
+                result = await send(idx, attempt)
+            except Exception as e:
+                status = getattr(e, "status_code", None) or getattr(e, "status", None)
+                attempt.done(status=status, error=e)
+                if last or not is_failure(status, e):
+                    raise
+                log.warning(f"{kind} upstream {urls[idx]} failed, retrying: {e}")
+                self.retries += 1
+                continue
+
+            status = getattr(result, "status", None)
+            if not last and status is not None and is_failure(status):
+                attempt.done(status=status)
+                log.warning(f"{kind} upstream {urls[idx]} returned {status}, retrying")
+                self.retries += 1
+                result.close()
+                continue
+
+            return result, attempt
+
+    def get_stats(self) -> dict:
+        upstreams = {}
+        for (kind, url), upstream in self._upstreams.items():
+            upstreams.setdefault(kind, {})[url] = upstream.get_stats()
+        return {
+            "max_attempts": self.max_attempts,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "upstreams": upstreams,
+            "decisions": list(self.decisions),
+        }
+
+
+upstream_pool = UpstreamPool()
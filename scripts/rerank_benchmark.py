@@ -0,0 +1,102 @@
+"""
+CPU throughput benchmark for the batched reranker.
+
+Simulates concurrent chats that each rerank the candidates of one query and
+compares calling the cross-encoder directly (one small batch per query) with
+the BatchedReranker micro-batcher, cold and with a warm score cache.
+
+    PYTHONPATH=backend python scripts/rerank_benchmark.py \\
+        --model cross-encoder/ms-marco-MiniLM-L-6-v2 --threads 8 --queries 64
+
+Pass `--backend onnx` (optionally with `--model-kwargs
+'{"file_name": "onnx/model_qint8_avx512.onnx"}'`) to measure the ONNX or
+quantized variants that SENTENCE_TRANSFORMERS_CROSS_ENCODER_BACKEND enables.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# CPU only, regardless of the available hardware
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+from open_webui.retrieval.models.batched import BatchedReranker
+
+WORDS = (
+    "retrieval augmented generation model vector database index query "
+    "document passage chunk embedding rerank score latency throughput batch "
+    "token context window server cache knowledge file upload search hybrid"
+).split()
+
+
+def make_workload(queries: int, passages: int, seed: int = 0):
+    rng = random.Random(seed)
+
+    def text(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    return [
+        [(query, text(rng.randint(40, 120))) for _ in range(passages)]
+        for query in (text(rng.randint(4, 12)) for _ in range(queries))
+    ]
+
+
+def run(predict, workload, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(predict, workload))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx"])
+    parser.add_argument("--model-kwargs", default=None, type=json.loads)
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--passages", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--window-ms", type=float, default=10.0)
+    parser.add_argument("--max-batch-size", type=int, default=128)
+    args = parser.parse_args()
+
+    import sentence_transformers
+
+    model = sentence_transformers.CrossEncoder(
+        args.model,
+        device="cpu",
+        backend=args.backend,
+        model_kwargs=args.model_kwargs,
+    )
+    workload = make_workload(args.queries, args.passages)
+    pairs = args.queries * args.passages
+
+    # Warm up the model so the first measurement is not penalised
+    model.predict(workload[0])
+
+    results = {"direct": run(model.predict, workload, args.threads)}
+
+    reranker = BatchedReranker(
+        model,
+        batch_window_ms=args.window_ms,
+        max_batch_size=args.max_batch_size,
+        cache_size=pairs,
+    )
+    results["batched"] = run(reranker.predict, workload, args.threads)
+    results["batched (cached)"] = run(reranker.predict, workload, args.threads)
+
+    print(
+        f"{args.model} [{args.backend}] {args.queries} queries x "
+        f"{args.passages} passages, {args.threads} threads, cpu"
+    )
+    for name, seconds in results.items():
+        print(f"  {name:<18} {seconds:8.3f}s  {pairs / seconds:10.1f} pairs/s")
+    print(f"  stats: {reranker.stats}")
+    reranker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -802,7 +802,8 @@ export const generateAutoCompletion = async (
 	model: string,
 	prompt: string,
 	messages?: object[],
-	type: string = 'search query'
+	type: string = 'search query',
+	sessionId: string | null = null
 ) => {
 	const controller = new AbortController();
 	let error = null;
@@ -820,6 +821,7 @@ export const generateAutoCompletion = async (
 			prompt: prompt,
 			...(messages && { messages: messages }),
 			type: type,
+			...(sessionId && { session_id: sessionId }),
 			stream: false
 		})
 	})
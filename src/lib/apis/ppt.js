@@ -837,10 +837,10 @@ export const downloadPpt = async (token, pptId, refresh = false) => {
 		throw new Error(error);
 	}
 
-	// 如果有文件URL，直接下载
+	// 文件存在时通过服务端流式下载，重复下载直接使用服务端缓存
 	if (res.data?.fileUrl) {
 		const link = document.createElement('a');
-		link.href = res.data.fileUrl;
+		link.href = `${WEBUI_API_BASE_URL}/ppt/downloadPptx/file?id=${encodeURIComponent(pptId)}&refresh=${refresh}`;
 		link.download = res.data.name || 'presentation.pptx';
 		document.body.appendChild(link);
 		link.click();
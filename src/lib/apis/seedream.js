@@ -129,7 +129,7 @@ export const getUserCredits = async (token) => {
 };
 
 /**
- * 生成图像（同步接口）
+ * 提交图像生成任务，立即返回任务ID
  */
 export const generateImage = async (token, request) => {
 	try {
@@ -179,6 +179,61 @@ export const getTaskStatus = async (token, taskId) => {
 	}
 };
 
+/**
+ * 等待任务完成：优先使用socket推送的generation-events，同时低频轮询兜底
+ */
+export const waitForTask = (token, taskId, socket = null, onUpdate = null, timeout = 300000) => {
+	return new Promise((resolve, reject) => {
+		let finished = false;
+		let timer = null;
+		const startedAt = Date.now();
+
+		const finish = (task, error = null) => {
+			if (finished) return;
+			finished = true;
+			clearTimeout(timer);
+			socket?.off('generation-events', onEvent);
+			error ? reject(error) : resolve(task);
+		};
+
+		const handle = (task) => {
+			if (!task) return;
+			if (task.status === TASK_STATUS.COMPLETED) {
+				finish(task);
+			} else if (task.status === TASK_STATUS.FAILED) {
+				finish(null, new Error(task.message || '图像生成失败'));
+			} else if (onUpdate) {
+				onUpdate({ status: task.status, message: task.message });
+			}
+		};
+
+		const onEvent = (event) => {
+			if (event?.provider === 'seedream' && event?.task_id === taskId) {
+				handle(event.task);
+			}
+		};
+
+		const poll = async () => {
+			if (finished) return;
+			if (Date.now() - startedAt > timeout) {
+				finish(null, new Error('任务处理超时，请稍后在历史记录中查看'));
+				return;
+			}
+			try {
+				handle(await getTaskStatus(token, taskId));
+			} catch (error) {
+				console.error('查询即梦3.0任务状态失败:', error);
+			}
+			if (!finished) {
+				timer = setTimeout(poll, socket?.connected ? 10000 : 3000);
+			}
+		};
+
+		socket?.on('generation-events', onEvent);
+		timer = setTimeout(poll, socket?.connected ? 10000 : 3000);
+	});
+};
+
 /**
  * 获取用户任务列表
  */